@@ -0,0 +1,90 @@
+"""Microbenchmark of DiskPage against the previous (copying) implementation.
+
+The previous DiskPage unpacked the whole page with struct.unpack (which
+materializes a bytes object with the data) and copied it into a fresh
+bytearray. to_bytes packed the whole page again. The current DiskPage is
+a view over a single buffer.
+
+Usage:
+    python benchmarks/bench_disk_page.py
+"""
+import os
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pysilisk.dsm import DiskPage
+
+
+class LegacyDiskPage(object):
+    """Copy of the DiskPage before it became a view over a buffer"""
+    PAGE_SIZE = 4096
+    PAGE_DATA_SIZE = PAGE_SIZE - 8
+    FMT_PACK_UNPACK_PAGE = '<{data_size}sii'.format(data_size=PAGE_DATA_SIZE)
+
+    def __init__(self, page_id=-1):
+        self._data = bytearray(LegacyDiskPage.PAGE_DATA_SIZE)
+        self._id = page_id
+        self.next_page_pointer = -1
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data[:] = value
+
+    @staticmethod
+    def from_bytes(array_bytes):
+        fields = struct.unpack(LegacyDiskPage.FMT_PACK_UNPACK_PAGE, array_bytes)
+        data, page_id, next_page_pointer = fields
+        disk_page = LegacyDiskPage(page_id)
+        disk_page.data = data
+        disk_page.next_page_pointer = next_page_pointer
+        return disk_page
+
+    @staticmethod
+    def to_bytes(disk_page):
+        return struct.pack(LegacyDiskPage.FMT_PACK_UNPACK_PAGE,
+                           disk_page._data,
+                           disk_page._id,
+                           disk_page.next_page_pointer)
+
+
+def run(number=200000):
+    page_bytes = DiskPage.to_bytes(DiskPage(7))
+    frame = memoryview(bytearray(page_bytes))
+    legacy = LegacyDiskPage.from_bytes(page_bytes)
+    current = DiskPage.from_bytes(page_bytes)
+
+    cases = [
+        ('from_bytes', lambda: LegacyDiskPage.from_bytes(page_bytes),
+                       lambda: DiskPage.from_bytes(page_bytes)),
+        ('wrap a frame', lambda: LegacyDiskPage.from_bytes(frame),
+                         lambda: DiskPage.from_buffer(frame)),
+        ('to_bytes / buffer', lambda: LegacyDiskPage.to_bytes(legacy),
+                              lambda: current.buffer),
+        ('read header', lambda: (legacy.id, legacy.next_page_pointer),
+                        lambda: (current.id, current.next_page_pointer)),
+    ]
+
+    print('%-20s %12s %12s %8s' % ('operation', 'legacy(us)',
+                                   'current(us)', 'speedup'))
+    for name, legacy_fn, current_fn in cases:
+        t_legacy = min(timeit.repeat(legacy_fn, number=number, repeat=3))
+        t_current = min(timeit.repeat(current_fn, number=number, repeat=3))
+        print('%-20s %12.3f %12.3f %7.1fx' % (name,
+                                             t_legacy / number * 1e6,
+                                             t_current / number * 1e6,
+                                             t_legacy / t_current))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,58 @@
+"""Microbenchmark of the compiled expressions against the tree-evaluator.
+
+A TreeEvaluator walks the AST of the expression for every row (a call
+and an isinstance dispatch per node). A compiled expression is a single
+python function generated from the AST; a compiled filter evaluates a
+whole batch in a list comprehension.
+
+Usage:
+    python benchmarks/bench_expressions.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pysilisk.parser.sqlparser import SQL_GRAMMAR, to_ast_expr
+from pysilisk.engine import TreeEvaluator, compile_filter
+
+
+def parse_expr(condition):
+    parsed = SQL_GRAMMAR.parseString('SELECT a FROM t WHERE %s;'
+                                     % condition)
+    return to_ast_expr(parsed.where_clause, 'where_clause')
+
+
+def run(num_rows=100000, number=5):
+    random.seed(7)
+    columns = [('t', 'a'), ('t', 'b'), ('t', 'c')]
+    rows = [(random.randint(0, 100),
+             None if random.random() < 0.1 else random.randint(0, 100),
+             random.random()) for _ in range(num_rows)]
+    conditions = ['a = 7',
+                  'a > 10 AND b < 50',
+                  'a + b * 2 > 100 OR NOT c < 0.5',
+                  '(a > 10 AND a < 90) AND (b > 10 OR c < 0.2) AND a <> b']
+
+    print('%-60s %10s %12s %8s' % ('condition', 'tree(ms)', 'compiled(ms)',
+                                   'speedup'))
+    for condition in conditions:
+        expr = parse_expr(condition)
+        tree = TreeEvaluator(expr, columns)
+        select = compile_filter(expr, columns)
+        assert [r for r in rows if tree(r) is True] == select(rows)
+        t_tree = min(timeit.repeat(
+            lambda: [r for r in rows if tree(r) is True],
+            number=number, repeat=3))
+        t_compiled = min(timeit.repeat(lambda: select(rows), number=number,
+                                       repeat=3))
+        print('%-60s %10.1f %12.1f %7.1fx' % (condition,
+                                              t_tree / number * 1e3,
+                                              t_compiled / number * 1e3,
+                                              t_tree / t_compiled))
+
+
+if __name__ == '__main__':
+    run()
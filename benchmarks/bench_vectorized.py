@@ -0,0 +1,76 @@
+"""Benchmark of a filter and a projection over a columnar table: row by
+row (SeqScan + Filter + Project, with compiled expressions) against
+numpy over column vectors (VectorScan).
+
+Usage:
+    python benchmarks/bench_vectorized.py
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pysilisk.server import PysiliskSQL, ExecutionEngine
+from pysilisk.records import Column, TableSchema
+from pysilisk.sqltypes import SQLDataType, StorageType
+from pysilisk.parser.sqlparser import SQL_GRAMMAR, to_ast_expr
+from pysilisk.engine import SeqScan, Filter, Project, VectorScan
+
+
+def parse_expr(condition):
+    parsed = SQL_GRAMMAR.parseString('SELECT id FROM t WHERE %s;'
+                                     % condition)
+    return to_ast_expr(parsed.where_clause, 'where_clause')
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def run(num_rows=500000):
+    random.seed(7)
+    db_path = tempfile.mkdtemp()
+    server = PysiliskSQL(db_path)
+    server.open()
+    try:
+        server.create_table(TableSchema('t', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('qty', SQLDataType.INTEGER),
+            Column('price', SQLDataType.FLOAT)], StorageType.COLUMNAR))
+        server.bulk_insert('t', ((i, random.randint(0, 100),
+                                  random.random() * 50)
+                                 for i in range(num_rows)))
+        table_file = server.get_table_file('t')
+        engine = ExecutionEngine(batch_size=1024)
+        condition = parse_expr('qty > 20 AND price < 40 OR qty = 7')
+        revenue = parse_expr('qty * price > 0').left_expr
+
+        def rows_plan():
+            plan = Filter(SeqScan(table_file), condition)
+            plan = Project(plan, [revenue])
+            return sum(row[0] for row in engine.execute(plan))
+
+        def vector_plan():
+            plan = VectorScan(table_file, condition=condition,
+                              expressions=[revenue], pages_per_batch=64)
+            return sum(float(batch.vectors[0].data.sum())
+                       for batch in plan.column_batches())
+
+        t_rows, total_rows = timed(rows_plan)
+        t_vector, total_vector = timed(vector_plan)
+        assert abs(total_rows - total_vector) < 1e-6 * abs(total_rows)
+        print('%d rows: row-wise %.3fs, vectorized %.3fs (%.1fx)'
+              % (num_rows, t_rows, t_vector, t_rows / t_vector))
+    finally:
+        server.close()
+        shutil.rmtree(db_path)
+
+
+if __name__ == '__main__':
+    run()
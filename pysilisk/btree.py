@@ -0,0 +1,673 @@
+import struct
+import threading
+from bisect import bisect_left, bisect_right
+from pysilisk.dsm import DiskPage
+from pysilisk.records import RID, _date_to_int, _datetime_to_float
+from pysilisk.sqltypes import SQLDataType, Date, DateTime
+
+
+class IndexKeyCodec(object):
+    """Order-preserving encoding of the keys of an index: the encoded
+    keys compare as bytes like the tuples of values. Each column is
+    encoded as:
+
+        NULL       - 0x00 (the NULLs go first)
+        not NULL   - 0x01 + value:
+            INTEGER and DATE - 4 bytes big-endian with the sign-bit flipped
+            FLOAT and DATETIME - 8 bytes big-endian of the double with the
+                                 sign-bit flipped (all the bits if < 0)
+            CHAR and VARCHAR - utf-8 with 0x00 escaped as 0x00 0xff, and
+                               ended by 0x00 0x00
+
+    An entry of the index is the encoded key followed by the RID (the
+    entries are unique, so duplicated keys are allowed):
+
+        | key | page-id (4) | slot-no (2) |
+    """
+
+    FMT_RID = '>IH'
+    RID_SIZE = struct.calcsize(FMT_RID)
+    _SIGN_32 = 1 << 31
+    _SIGN_64 = 1 << 63
+    _MASK_64 = (1 << 64) - 1
+
+    def __init__(self, key_types):
+        self.key_types = list(key_types)
+        self._encoders = [self._get_encoder(t) for t in self.key_types]
+        self._decoders = [self._get_decoder(t) for t in self.key_types]
+
+    @property
+    def num_columns(self):
+        return len(self.key_types)
+
+    def _get_encoder(self, type_id):
+        if type_id == SQLDataType.INTEGER:
+            return lambda v: struct.pack('>I', int(v) + self._SIGN_32)
+        if type_id == SQLDataType.DATE:
+            return lambda v: struct.pack('>I', _date_to_int(v) +
+                                         self._SIGN_32)
+        if type_id == SQLDataType.FLOAT:
+            return lambda v: self._encode_double(float(v))
+        if type_id == SQLDataType.DATETIME:
+            return lambda v: self._encode_double(_datetime_to_float(v))
+        return self._encode_string
+
+    def _get_decoder(self, type_id):
+        """Returns a function (buffer, offset) -> (value, next-offset)"""
+        def decode_int(buffer, offset):
+            value = struct.unpack_from('>I', buffer, offset)[0]
+            return value - self._SIGN_32, offset + 4
+
+        def decode_double(buffer, offset):
+            bits = struct.unpack_from('>Q', buffer, offset)[0]
+            if bits & self._SIGN_64:
+                bits ^= self._SIGN_64
+            else:
+                bits ^= self._MASK_64
+            return struct.unpack('>d', struct.pack('>Q', bits))[0], offset + 8
+
+        if type_id == SQLDataType.INTEGER:
+            return decode_int
+        if type_id == SQLDataType.DATE:
+            def decode_date(buffer, offset):
+                value, offset = decode_int(buffer, offset)
+                return Date.from_int4(value), offset
+            return decode_date
+        if type_id == SQLDataType.FLOAT:
+            return decode_double
+        if type_id == SQLDataType.DATETIME:
+            def decode_datetime(buffer, offset):
+                value, offset = decode_double(buffer, offset)
+                return DateTime.from_timestamp(value), offset
+            return decode_datetime
+        return self._decode_string
+
+    def _encode_double(self, value):
+        value += 0.0  # -0.0 is 0.0
+        bits = struct.unpack('>Q', struct.pack('>d', value))[0]
+        if bits & self._SIGN_64:
+            bits ^= self._MASK_64
+        else:
+            bits |= self._SIGN_64
+        return struct.pack('>Q', bits)
+
+    @staticmethod
+    def _encode_string(value):
+        if not isinstance(value, str):
+            raise TypeError('A string is expected')
+        return value.encode().replace(b'\x00', b'\x00\xff') + b'\x00\x00'
+
+    @staticmethod
+    def _decode_string(buffer, offset):
+        chunks = []
+        while True:
+            end = buffer.index(b'\x00', offset)
+            chunks.append(buffer[offset:end])
+            if buffer[end + 1] == 0:
+                return b'\x00'.join(chunks).decode(), end + 2
+            offset = end + 2  # Escaped 0x00
+
+    def encode_key(self, key):
+        """Encodes a key or a prefix of it (the values of the first
+        columns)"""
+        if len(key) > self.num_columns:
+            msg = 'The index has %s columns but %s values were given'
+            raise IndexException(msg % (self.num_columns, len(key)))
+        parts = []
+        for i, value in enumerate(key):
+            if value is None:
+                parts.append(b'\x00')
+                continue
+            try:
+                parts.append(b'\x01' + self._encoders[i](value))
+            except (TypeError, ValueError, AttributeError, struct.error):
+                msg = 'Invalid value for the key column %s: %r'
+                raise IndexException(msg % (i, value))
+        return b''.join(parts)
+
+    def encode_entry(self, key, rid):
+        if len(key) != self.num_columns:
+            msg = 'The index has %s columns but %s values were given'
+            raise IndexException(msg % (self.num_columns, len(key)))
+        return self.encode_key(key) + struct.pack(self.FMT_RID, *rid)
+
+    def decode_entry(self, entry):
+        """Returns (key, RID) of an entry"""
+        key = []
+        offset = 0
+        for decoder in self._decoders:
+            if entry[offset] == 0:
+                key.append(None)
+                offset += 1
+            else:
+                value, offset = decoder(entry, offset + 1)
+                key.append(value)
+        return tuple(key), RID(*struct.unpack_from(self.FMT_RID, entry,
+                                                   offset))
+
+
+def prefix_successor(prefix):
+    """Returns the smallest bytes greater than all the bytes that start
+    with 'prefix' (None if there is no such bytes)"""
+    prefix = prefix.rstrip(b'\xff')
+    if not prefix:
+        return None
+    return prefix[:-1] + bytes([prefix[-1] + 1])
+
+
+class _Node(object):
+    __slots__ = ('page_id', 'is_leaf', 'keys', 'children', 'prev_id',
+                 'next_id')
+
+    def __init__(self, page_id, is_leaf, keys=None, children=None,
+                 prev_id=-1, next_id=-1):
+        self.page_id = page_id
+        self.is_leaf = is_leaf
+        self.keys = keys if keys is not None else []
+        self.children = children if children is not None else []
+        self.prev_id = prev_id
+        self.next_id = next_id
+
+    def entry_size(self, key):
+        return BPlusTree.LEAF_ENTRY_OVERHEAD + len(key) if self.is_leaf \
+            else BPlusTree.INNER_ENTRY_OVERHEAD + len(key)
+
+    def size(self):
+        overhead = BPlusTree.LEAF_ENTRY_OVERHEAD if self.is_leaf \
+            else BPlusTree.INNER_ENTRY_OVERHEAD
+        return BPlusTree.NODE_HEADER_SIZE + \
+            sum(overhead + len(key) for key in self.keys)
+
+
+class BPlusTree(object):
+    """B+tree index stored in pages of the buffer manager. The index is
+    identified by its header page, which stores the page-id of the root
+    (it changes when the root splits or shrinks):
+
+        | root-page-id (4) |
+
+    A node (page) has the entries (see IndexKeyCodec) in order:
+
+        | is-leaf (1) | num-keys (2) | link-1 (4) | link-2 (4) |
+        | offsets (2 * num-keys) | entries |
+
+    A leaf entry is | length (2) | entry | and its links are the previous
+    and the next leaves, so a range scan follows the chain of leaves.
+    An internal entry is | length (2) | child (4) | separator |, where
+    child has the entries >= separator (and < the next separator), and
+    link-1 is the child with the entries < the first separator. The
+    offsets let a lookup do a binary search in a page without decoding
+    it; the updates decode the node, change it and write it back.
+
+    A node is split when it overflows its page. After a delete, a node
+    with less than MIN_FILL bytes is merged with a sibling (or it takes
+    entries from it if both do not fit in a page).
+    """
+
+    # Lookups of prefixes of the keys and range scans are supported
+    SUPPORTS_RANGES = True
+
+    FMT_HEADER = '<i'
+    FMT_NODE = '<BHii'
+    NODE_HEADER_SIZE = struct.calcsize(FMT_NODE)
+    LEAF_ENTRY_OVERHEAD = 4    # offset + length
+    INNER_ENTRY_OVERHEAD = 8   # offset + length + child
+    CAPACITY = DiskPage.PAGE_DATA_SIZE - NODE_HEADER_SIZE
+    # A split always leaves room for any entry in both halves
+    MAX_ENTRY_SIZE = CAPACITY // 4 - INNER_ENTRY_OVERHEAD
+    MIN_FILL = NODE_HEADER_SIZE + CAPACITY // 4
+
+    def __init__(self, buff_mngr, key_types, header_page_id):
+        self.buff_mngr = buff_mngr
+        self.codec = IndexKeyCodec(key_types)
+        self.header_page_id = header_page_id
+        self._lock = threading.RLock()
+        header = buff_mngr.pin(header_page_id)
+        self._root_id = struct.unpack_from(self.FMT_HEADER, header.data, 0)[0]
+        buff_mngr.unpin(header_page_id)
+
+    @classmethod
+    def create(cls, buff_mngr, key_types):
+        """Allocates the header page and the root (an empty leaf) of a
+        new index"""
+        root = buff_mngr.new_page()
+        root_id = root.id
+        buff_mngr.unpin(root_id)
+        header = buff_mngr.new_page()
+        struct.pack_into(cls.FMT_HEADER, header.data, 0, root_id)
+        buff_mngr.unpin(header.id, is_dirty=True)
+        tree = cls(buff_mngr, key_types, header.id)
+        tree._write_node(_Node(root_id, True))
+        return tree
+
+    @classmethod
+    def bulk_load(cls, buff_mngr, key_types, entries, fill_factor=0.9):
+        """Builds a new index bottom-up from (key, RID) pairs sorted by
+        key (and RID, see IndexKeyCodec): the leaves are filled up to
+        'fill_factor' and written once, left to right, then each level
+        of internal nodes is built from the first entries of the level
+        below. Raises IndexException if the entries are not sorted."""
+        tree = cls.create(buff_mngr, key_types)
+        tree._load(entries, fill_factor)
+        return tree
+
+    @property
+    def root_id(self):
+        return self._root_id
+
+    def _set_root(self, page_id):
+        self._root_id = page_id
+        header = self.buff_mngr.pin(self.header_page_id)
+        struct.pack_into(self.FMT_HEADER, header.data, 0, page_id)
+        self.buff_mngr.unpin(self.header_page_id, is_dirty=True)
+
+    # Pages
+    # =====
+
+    def _read_node(self, page_id):
+        disk_page = self.buff_mngr.pin(page_id)
+        try:
+            data = disk_page.data
+            is_leaf, num_keys, link_1, link_2 = \
+                struct.unpack_from(self.FMT_NODE, data, 0)
+            offsets = struct.unpack_from('<%dH' % num_keys, data,
+                                         self.NODE_HEADER_SIZE)
+            keys = []
+            if is_leaf:
+                for offset in offsets:
+                    length = struct.unpack_from('<H', data, offset)[0]
+                    keys.append(data[offset + 2:offset + 2 + length]
+                                .tobytes())
+                return _Node(page_id, True, keys, None, link_1, link_2)
+            children = [link_1]
+            for offset in offsets:
+                length, child = struct.unpack_from('<Hi', data, offset)
+                children.append(child)
+                keys.append(data[offset + 6:offset + 6 + length].tobytes())
+            return _Node(page_id, False, keys, children)
+        finally:
+            self.buff_mngr.unpin(page_id)
+
+    def _write_node(self, node):
+        num_keys = len(node.keys)
+        offset = self.NODE_HEADER_SIZE + 2 * num_keys
+        offsets = []
+        parts = []
+        if node.is_leaf:
+            header = struct.pack(self.FMT_NODE, 1, num_keys, node.prev_id,
+                                 node.next_id)
+            for key in node.keys:
+                offsets.append(offset)
+                parts.append(struct.pack('<H', len(key)))
+                parts.append(key)
+                offset += 2 + len(key)
+        else:
+            header = struct.pack(self.FMT_NODE, 0, num_keys,
+                                 node.children[0], -1)
+            for key, child in zip(node.keys, node.children[1:]):
+                offsets.append(offset)
+                parts.append(struct.pack('<Hi', len(key), child))
+                parts.append(key)
+                offset += 6 + len(key)
+        content = header + struct.pack('<%dH' % num_keys, *offsets) + \
+            b''.join(parts)
+        disk_page = self.buff_mngr.pin(node.page_id)
+        disk_page.data[:len(content)] = content
+        self.buff_mngr.unpin(node.page_id, is_dirty=True)
+
+    def _new_node(self, is_leaf):
+        disk_page = self.buff_mngr.new_page()
+        self.buff_mngr.unpin(disk_page.id)
+        return _Node(disk_page.id, is_leaf)
+
+    def _set_prev(self, page_id, prev_id):
+        """Changes the link to the previous leaf of a leaf"""
+        disk_page = self.buff_mngr.pin(page_id)
+        struct.pack_into('<i', disk_page.data, 3, prev_id)
+        self.buff_mngr.unpin(page_id, is_dirty=True)
+
+    @staticmethod
+    def _key_at(data, i, is_leaf):
+        offset = struct.unpack_from('<H', data, BPlusTree.NODE_HEADER_SIZE +
+                                    2 * i)[0]
+        length = struct.unpack_from('<H', data, offset)[0]
+        start = offset + 2 if is_leaf else offset + 6
+        return bytes(data[start:start + length]), offset
+
+    def _find_leaf(self, key, path=None):
+        """Returns the leaf where 'key' (encoded) is or would be. The
+        internal nodes from the root are appended to path."""
+        page_id = self._root_id
+        while True:
+            disk_page = self.buff_mngr.pin(page_id)
+            try:
+                data = disk_page.data
+                is_leaf, num_keys, link_1, _ = \
+                    struct.unpack_from(self.FMT_NODE, data, 0)
+                if is_leaf:
+                    return page_id
+                low, high = 0, num_keys
+                while low < high:
+                    mid = (low + high) // 2
+                    if key < self._key_at(data, mid, False)[0]:
+                        high = mid
+                    else:
+                        low = mid + 1
+                if low == 0:
+                    child = link_1
+                else:
+                    offset = self._key_at(data, low - 1, False)[1]
+                    child = struct.unpack_from('<i', data, offset + 2)[0]
+            finally:
+                self.buff_mngr.unpin(page_id)
+            if path is not None:
+                path.append(page_id)
+            page_id = child
+
+    def _read_leaf(self, page_id, start, stop):
+        """Returns (entries, next-leaf, reached-stop) of the entries of a
+        leaf in [start, stop)"""
+        disk_page = self.buff_mngr.pin(page_id)
+        try:
+            data = disk_page.data
+            num_keys, next_id = struct.unpack_from('<H4xi', data, 1)
+            low, high = 0, num_keys
+            if start is not None:
+                while low < high:
+                    mid = (low + high) // 2
+                    if self._key_at(data, mid, True)[0] < start:
+                        low = mid + 1
+                    else:
+                        high = mid
+            entries = []
+            for i in range(low, num_keys):
+                entry = self._key_at(data, i, True)[0]
+                if stop is not None and entry >= stop:
+                    return entries, next_id, True
+                entries.append(entry)
+            return entries, next_id, False
+        finally:
+            self.buff_mngr.unpin(page_id)
+
+    # Lookups
+    # =======
+
+    def _scan_entries(self, start, stop):
+        """Generates the encoded entries in [start, stop) (None: no
+        bound)"""
+        with self._lock:
+            page_id = self._find_leaf(start if start is not None else b'')
+        while page_id != -1:
+            with self._lock:
+                entries, page_id, is_done = self._read_leaf(page_id, start,
+                                                            stop)
+            for entry in entries:
+                yield entry
+            if is_done:
+                return
+
+    def search(self, key):
+        """Returns the RIDs of the rows with the key (or with a prefix of
+        the key: the values of its first columns)"""
+        start = self.codec.encode_key(key)
+        rid_format = IndexKeyCodec.FMT_RID
+        rid_size = IndexKeyCodec.RID_SIZE
+        rids = []
+        for entry in self._scan_entries(start, prefix_successor(start)):
+            rids.append(RID(*struct.unpack_from(rid_format, entry,
+                                                len(entry) - rid_size)))
+        return rids
+
+    def range_scan(self, low=None, high=None, low_inclusive=True,
+                   high_inclusive=True):
+        """Generates the (key, RID) of the entries between the keys low
+        and high (None: no bound), in order. The bounds can be prefixes
+        of the keys. The scan follows the chain of leaves, and the tree
+        is locked per leaf: the changes made meanwhile may be seen."""
+        start = stop = None
+        if low is not None:
+            start = self.codec.encode_key(low)
+            if not low_inclusive:
+                start = prefix_successor(start)
+                if start is None:
+                    return
+        if high is not None:
+            stop = self.codec.encode_key(high)
+            if high_inclusive:
+                stop = prefix_successor(stop)
+        decode_entry = self.codec.decode_entry
+        for entry in self._scan_entries(start, stop):
+            yield decode_entry(entry)
+
+    def scan(self):
+        """Generates the (key, RID) of all the entries in order"""
+        return self.range_scan()
+
+    @property
+    def height(self):
+        height = 1
+        with self._lock:
+            node = self._read_node(self._root_id)
+            while not node.is_leaf:
+                node = self._read_node(node.children[0])
+                height += 1
+        return height
+
+    # Updates
+    # =======
+
+    def _encode(self, key, rid):
+        entry = self.codec.encode_entry(key, rid)
+        if len(entry) > self.MAX_ENTRY_SIZE:
+            msg = 'Key of %s bytes is too large' % len(entry)
+            raise IndexException(msg)
+        return entry
+
+    def insert(self, key, rid):
+        entry = self._encode(key, rid)
+        with self._lock:
+            path = []
+            leaf = self._read_node(self._find_leaf(entry, path))
+            pos = bisect_left(leaf.keys, entry)
+            if pos < len(leaf.keys) and leaf.keys[pos] == entry:
+                msg = 'Entry (%r, %r) already exists' % (key, rid)
+                raise IndexException(msg)
+            leaf.keys.insert(pos, entry)
+            self._store(leaf, path)
+
+    def delete(self, key, rid):
+        entry = self._encode(key, rid)
+        with self._lock:
+            path = []
+            leaf = self._read_node(self._find_leaf(entry, path))
+            pos = bisect_left(leaf.keys, entry)
+            if pos == len(leaf.keys) or leaf.keys[pos] != entry:
+                msg = 'Entry (%r, %r) does not exist' % (key, rid)
+                raise IndexException(msg)
+            del leaf.keys[pos]
+            self._rebalance(leaf, path)
+
+    @staticmethod
+    def _split_point(node, keys):
+        """Returns the index that splits the keys in two halves of about
+        the same size (both not empty)"""
+        total = sum(node.entry_size(key) for key in keys)
+        size = 0
+        for i, key in enumerate(keys):
+            size += node.entry_size(key)
+            if size * 2 >= total:
+                return min(max(i, 1), len(keys) - 1)
+        return len(keys) - 1
+
+    def _store(self, node, path):
+        """Writes a node, splitting it (and its ancestors) if it does not
+        fit in its page. path has the ancestors of the node."""
+        if node.size() <= DiskPage.PAGE_DATA_SIZE:
+            self._write_node(node)
+            return
+        right = self._new_node(node.is_leaf)
+        mid = self._split_point(node, node.keys)
+        if node.is_leaf:
+            right.keys = node.keys[mid:]
+            node.keys = node.keys[:mid]
+            separator = right.keys[0]
+            right.prev_id = node.page_id
+            right.next_id = node.next_id
+            if node.next_id != -1:
+                self._set_prev(node.next_id, right.page_id)
+            node.next_id = right.page_id
+        else:
+            separator = node.keys[mid]
+            right.keys = node.keys[mid + 1:]
+            right.children = node.children[mid + 1:]
+            node.keys = node.keys[:mid]
+            node.children = node.children[:mid + 1]
+        self._write_node(node)
+        self._write_node(right)
+        if path:
+            parent = self._read_node(path.pop())
+            pos = bisect_right(parent.keys, separator)
+            parent.keys.insert(pos, separator)
+            parent.children.insert(pos + 1, right.page_id)
+            self._store(parent, path)
+        else:
+            root = self._new_node(False)
+            root.keys = [separator]
+            root.children = [node.page_id, right.page_id]
+            self._write_node(root)
+            self._set_root(root.page_id)
+
+    def _rebalance(self, node, path):
+        """Writes a node after a delete. If it is underfull, it is merged
+        with a sibling or it takes entries from it."""
+        if not path:
+            if not node.is_leaf and not node.keys:
+                # The root has a single child: the tree shrinks
+                self._set_root(node.children[0])
+                self.buff_mngr.free_page(node.page_id)
+            else:
+                self._write_node(node)
+            return
+        if node.size() >= self.MIN_FILL:
+            self._write_node(node)
+            return
+
+        parent = self._read_node(path[-1])
+        if len(parent.children) == 1:
+            self._write_node(node)  # No sibling (see _load)
+            return
+        idx = parent.children.index(node.page_id)
+        if idx > 0:
+            left, right = self._read_node(parent.children[idx - 1]), node
+            sep_idx = idx - 1
+        else:
+            left, right = node, self._read_node(parent.children[1])
+            sep_idx = 0
+        separator = parent.keys[sep_idx]
+
+        merged_size = left.size() + right.size() - self.NODE_HEADER_SIZE
+        if not left.is_leaf:
+            merged_size += left.entry_size(separator)
+        if merged_size <= DiskPage.PAGE_DATA_SIZE:
+            # Merge the right node into the left one
+            if left.is_leaf:
+                left.keys.extend(right.keys)
+                left.next_id = right.next_id
+                if right.next_id != -1:
+                    self._set_prev(right.next_id, left.page_id)
+            else:
+                left.keys.extend([separator] + right.keys)
+                left.children.extend(right.children)
+            self._write_node(left)
+            self.buff_mngr.free_page(right.page_id)
+            del parent.keys[sep_idx]
+            del parent.children[sep_idx + 1]
+            path.pop()
+            self._rebalance(parent, path)
+            return
+
+        # Redistribute the entries of both nodes
+        if left.is_leaf:
+            keys = left.keys + right.keys
+            mid = self._split_point(left, keys)
+            left.keys, right.keys = keys[:mid], keys[mid:]
+            parent.keys[sep_idx] = right.keys[0]
+        else:
+            keys = left.keys + [separator] + right.keys
+            children = left.children + right.children
+            mid = self._split_point(left, keys)
+            mid = min(mid, len(keys) - 2)
+            left.keys, right.keys = keys[:mid], keys[mid + 1:]
+            left.children = children[:mid + 1]
+            right.children = children[mid + 1:]
+            parent.keys[sep_idx] = keys[mid]
+        self._write_node(left)
+        self._write_node(right)
+        path.pop()
+        # The new separator may be longer than the old one
+        self._store(parent, path)
+
+    def _load(self, entries, fill_factor):
+        limit = self.NODE_HEADER_SIZE + int(self.CAPACITY * fill_factor)
+        leaf = _Node(self._root_id, True)
+        size = self.NODE_HEADER_SIZE
+        level = [(b'', leaf.page_id)]  # (first entry, page-id) per node
+        previous = None
+        with self._lock:
+            for key, rid in entries:
+                entry = self._encode(key, rid)
+                if previous is not None and entry <= previous:
+                    raise IndexException('The entries are not sorted')
+                previous = entry
+                entry_size = leaf.entry_size(entry)
+                if leaf.keys and size + entry_size > limit:
+                    new_leaf = self._new_node(True)
+                    new_leaf.prev_id = leaf.page_id
+                    leaf.next_id = new_leaf.page_id
+                    self._write_node(leaf)
+                    leaf = new_leaf
+                    size = self.NODE_HEADER_SIZE
+                    level.append((entry, leaf.page_id))
+                leaf.keys.append(entry)
+                size += entry_size
+            self._write_node(leaf)
+
+            while len(level) > 1:
+                upper_level = []
+                node = None
+                for first_entry, page_id in level:
+                    if node is not None and node.keys and \
+                            size + node.entry_size(first_entry) > limit:
+                        self._write_node(node)
+                        node = None
+                    if node is None:
+                        node = self._new_node(False)
+                        node.children = [page_id]
+                        size = self.NODE_HEADER_SIZE
+                        upper_level.append((first_entry, node.page_id))
+                        continue
+                    node.keys.append(first_entry)
+                    node.children.append(page_id)
+                    size += node.entry_size(first_entry)
+                self._write_node(node)
+                level = upper_level
+            self._set_root(level[0][1])
+
+    def drop(self):
+        """Releases all the pages of the index"""
+        with self._lock:
+            page_ids = []
+            pending = [self._root_id]
+            while pending:
+                node = self._read_node(pending.pop())
+                page_ids.append(node.page_id)
+                if not node.is_leaf:
+                    pending.extend(node.children)
+            for page_id in page_ids + [self.header_page_id]:
+                self.buff_mngr.free_page(page_id)
+
+
+class IndexException(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,706 @@
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from pysilisk.dsm import DiskPage
+
+
+def _changed_range(before, after):
+    """Returns (start, end) of the bytes that differ between two images
+    of the same size (start == end if they are equal). The common prefix
+    and suffix are found by bisection, comparing slices."""
+    size = len(before)
+    if before == after:
+        return 0, 0
+    low, high = 0, size
+    while high - low > 1:
+        middle = (low + high) // 2
+        if before[:middle] == after[:middle]:
+            low = middle
+        else:
+            high = middle
+    start = low
+    low, high = 0, size - start
+    while high - low > 1:
+        middle = (low + high) // 2
+        if before[size - middle:] == after[size - middle:]:
+            low = middle
+        else:
+            high = middle
+    return start, size - low
+
+
+class BufferFrame(object):
+    """A slot of the buffer-pool. The disk-page of a frame wraps a slice
+    of the pool, so loading a page into a frame does not allocate."""
+    __slots__ = ('frame_id', 'page', 'page_id', 'pin_count', 'txn_pins',
+                 'is_dirty', 'is_writing', 'page_lsn')
+
+    def __init__(self, frame_id, page):
+        self.frame_id = frame_id
+        self.page = page        # DiskPage over the frame's memory
+        self.page_id = -1       # -1: the frame is empty
+        self.pin_count = 0
+        self.txn_pins = 0       # Pins of transactions (changes not logged)
+        self.is_dirty = False
+        self.is_writing = False # True while a batched flush writes it
+        self.page_lsn = 0       # LSN of the last logged change
+
+
+class ReplacementPolicy(object):
+    """Decides which frame of the buffer-pool is evicted. The buffer
+    manager notifies the policy of every event of the frames:
+        record_load   : a page was loaded into the frame. 'prefetched'
+                        is True if it was loaded by the read-ahead (not
+                        requested by anybody yet)
+        record_access : the page of the frame was pinned (a hit)
+        record_evict  : the page is going to be removed from the frame
+    and asks for a victim with choose_victim(is_evictable), where
+    is_evictable(frame) tells if a frame can be evicted (e.g. it is not
+    pinned). choose_victim returns None if there is no candidate.
+    """
+    def setup(self, frames):
+        self.frames = frames
+
+    def record_load(self, frame, prefetched=False):
+        pass
+
+    def record_access(self, frame):
+        pass
+
+    def record_evict(self, frame):
+        pass
+
+    def choose_victim(self, is_evictable):
+        raise NotImplementedError()
+
+
+class ClockPolicy(ReplacementPolicy):
+    """Clock (second-chance): a hand sweeps the frames, clearing the
+    reference-bit of the recently used ones, and evicts the first
+    candidate whose bit is clear."""
+    def setup(self, frames):
+        super().setup(frames)
+        self._ref_bits = bytearray(len(frames))
+        self._hand = 0
+
+    def record_load(self, frame, prefetched=False):
+        # Prefetched pages that are never used are the first to go
+        self._ref_bits[frame.frame_id] = 0 if prefetched else 1
+
+    def record_access(self, frame):
+        self._ref_bits[frame.frame_id] = 1
+
+    def choose_victim(self, is_evictable):
+        # Two sweeps are enough: the first one clears the ref-bits
+        num_frames = len(self.frames)
+        for _ in range(2 * num_frames):
+            frame = self.frames[self._hand]
+            self._hand = (self._hand + 1) % num_frames
+            if not is_evictable(frame):
+                continue
+            if self._ref_bits[frame.frame_id]:
+                self._ref_bits[frame.frame_id] = 0  # Second chance
+                continue
+            return frame
+        return None
+
+
+class TwoQueuePolicy(ReplacementPolicy):
+    """2Q (Johnson and Shasha, VLDB'94). Pages referenced once live in
+    a FIFO queue (A1in). Only the pages that are referenced again after
+    they left A1in (their ids are remembered in the ghost queue A1out)
+    get into the main LRU queue (Am). A full-table scan only goes
+    through A1in, so it can't flush the hot pages of Am.
+
+    in_ratio  - max size of A1in (fraction of the pool)
+    out_ratio - max size of A1out (fraction of the pool)
+    """
+    def __init__(self, in_ratio=0.25, out_ratio=0.5):
+        self.in_ratio = in_ratio
+        self.out_ratio = out_ratio
+
+    def setup(self, frames):
+        super().setup(frames)
+        self._max_in = max(1, int(len(frames) * self.in_ratio))
+        self._max_out = max(1, int(len(frames) * self.out_ratio))
+        self._a1_in = OrderedDict()    # frame-id --> frame (FIFO)
+        self._a1_out = OrderedDict()   # page-id --> None (FIFO of ghosts)
+        self._am = OrderedDict()       # frame-id --> frame (LRU)
+
+    def record_load(self, frame, prefetched=False):
+        if frame.page_id in self._a1_out:
+            del self._a1_out[frame.page_id]
+            self._am[frame.frame_id] = frame
+        else:
+            self._a1_in[frame.frame_id] = frame
+
+    def record_access(self, frame):
+        # The references while the page is in A1in are considered
+        # correlated (e.g. the same scan), so A1in is not reordered
+        if frame.frame_id in self._am:
+            self._am.move_to_end(frame.frame_id)
+
+    def record_evict(self, frame):
+        if self._a1_in.pop(frame.frame_id, None) is not None:
+            self._a1_out[frame.page_id] = None
+            if len(self._a1_out) > self._max_out:
+                self._a1_out.popitem(last=False)
+        else:
+            self._am.pop(frame.frame_id, None)
+
+    def choose_victim(self, is_evictable):
+        queues = (self._a1_in, self._am)
+        if len(self._a1_in) <= self._max_in:
+            queues = (self._am, self._a1_in)
+        for queue in queues:
+            for frame in queue.values():
+                if is_evictable(frame):
+                    return frame
+        return None
+
+
+class LRUKPolicy(ReplacementPolicy):
+    """LRU-K (O'Neil et al., SIGMOD'93). The victim is the page whose
+    K-th most recent reference is the oldest. Pages with less than K
+    references have an infinite backward distance and are evicted first
+    (the least recently used of them). So, the pages read once by a
+    scan are evicted before the pages that are used repeatedly.
+
+    The history of the evicted pages is retained (up to history_ratio
+    times the size of the pool) to recognize them when they come back.
+    """
+    def __init__(self, k=2, history_ratio=2.0):
+        if k < 1:
+            raise ValueError('K must be greater than zero')
+        self.k = k
+        self.history_ratio = history_ratio
+
+    def setup(self, frames):
+        super().setup(frames)
+        self._max_history = max(len(frames),
+                                int(len(frames) * self.history_ratio))
+        self._history = OrderedDict()  # page-id --> deque of timestamps
+        self._resident = set()         # page-ids in the pool
+        self._clock = 0
+
+    def _reference(self, page_id):
+        self._clock += 1
+        history = self._history.get(page_id)
+        if history is None:
+            history = deque(maxlen=self.k)
+            self._history[page_id] = history
+        else:
+            self._history.move_to_end(page_id)
+        history.append(self._clock)
+
+    def record_load(self, frame, prefetched=False):
+        self._resident.add(frame.page_id)
+        # A prefetched page has not been referenced yet
+        if not prefetched:
+            self._reference(frame.page_id)
+
+    def record_access(self, frame):
+        self._reference(frame.page_id)
+
+    def record_evict(self, frame):
+        self._resident.discard(frame.page_id)
+
+        # Forget the oldest histories of non-resident pages
+        excess = len(self._history) - self._max_history
+        if excess <= 0:
+            return
+        oldest = islice(self._history, excess + len(self._resident))
+        for page_id in list(oldest):
+            if page_id not in self._resident:
+                del self._history[page_id]
+                excess -= 1
+                if excess == 0:
+                    break
+
+    def choose_victim(self, is_evictable):
+        victim = None
+        victim_key = None
+        for frame in self.frames:
+            if frame.page_id == -1 or not is_evictable(frame):
+                continue
+            history = self._history.get(frame.page_id)
+            if not history:
+                key = (-1, -1)
+            elif len(history) < self.k:
+                key = (-1, history[-1])  # infinite backward K-distance
+            else:
+                key = (history[0], history[-1])
+            if victim_key is None or key < victim_key:
+                victim, victim_key = frame, key
+        return victim
+
+
+class BufferManager(object):
+    """Fixed-size pool of frames that caches the disk-pages of a
+    DiskSpaceManager.
+
+    A page must be pinned before it is used and unpinned when it is not
+    needed anymore:
+        page = buff_mngr.pin(page_id)
+        ...
+        buff_mngr.unpin(page_id, is_dirty=True)
+
+    The unpinned frames are replaced according to a ReplacementPolicy
+    (Clock by default). Dirty frames are written back (write_page) when
+    they are evicted.
+
+    Sequential read-ahead: when 'seq_threshold' consecutive pins follow
+    the next-page pointers of a chain of pages, the next
+    'read_ahead_pages' pages of the chain are loaded (unpinned) into the
+    pool. If the chain is made of consecutive ids, they are read with a
+    single read_pages call. read_ahead_pages=0 disables it.
+
+    Background writer: start_background_writer() starts a thread that
+    flushes the dirty frames periodically, or as soon as the dirty
+    frames exceed a fraction of the pool. While it runs, the eviction
+    prefers clean frames, so a query only writes a page when there is
+    no clean frame to evict.
+
+    Write-ahead logging: if a WriteAheadLog is given, the log is flushed
+    up to the page-LSN of a frame (see unpin) before the page is
+    written. A thread that runs a transaction (see set_transaction) has
+    all its changes logged: the images of the pages, their allocation
+    and release, and the header of the disk-space. The changes of a
+    page are logged when the transaction unpins it, so a page pinned by
+    a transaction is never written.
+
+    The buffer manager is thread-safe.
+    """
+
+    DEFAULT_NUM_FRAMES = 1024  # 4 MB with pages of 4KB
+
+    def __init__(self, dsm, num_frames=DEFAULT_NUM_FRAMES, policy=None,
+                 read_ahead_pages=0, seq_threshold=2, wal=None):
+        if num_frames < 1:
+            raise ValueError('Num-frames must be greater than zero')
+        self._dsm = dsm
+        self.wal = wal
+        self.num_frames = num_frames
+        self.read_ahead_pages = read_ahead_pages
+        self.seq_threshold = seq_threshold
+
+        # All the frames live in a single buffer
+        self._pool = memoryview(bytearray(num_frames * DiskPage.PAGE_SIZE))
+        self._frames = []
+        for i in range(num_frames):
+            start = i * DiskPage.PAGE_SIZE
+            buffer = self._pool[start:start + DiskPage.PAGE_SIZE]
+            self._frames.append(BufferFrame(i, DiskPage.from_buffer(buffer)))
+
+        self._page_table = {}  # page-id --> frame
+        self._empty_frames = list(reversed(self._frames))
+        self._policy = policy or ClockPolicy()
+        self._policy.setup(self._frames)
+        self._lock = threading.RLock()
+        self._num_dirty = 0
+        self._writer = None
+
+        # Logged transaction of each thread (see set_transaction)
+        self._local = threading.local()
+
+        # State of the sequential-access detector
+        self._last_page_id = -1
+        self._expected_next_id = -1
+        self._seq_run = 0
+
+        # Counters
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+        self.num_writes = 0
+        self.num_prefetched = 0
+
+    @property
+    def hit_ratio(self):
+        num_requests = self.num_hits + self.num_misses
+        return self.num_hits / num_requests if num_requests else 0.0
+
+    @property
+    def dsm(self):
+        return self._dsm
+
+    @property
+    def num_dirty(self):
+        return self._num_dirty
+
+    def set_transaction(self, txn_id):
+        """Logs the changes made by the calling thread as part of the
+        transaction txn_id (None stops the logging). The image of a page
+        is taken when the thread pins it, and the changed bytes are
+        logged when the thread unpins it dirty."""
+        if txn_id is None:
+            self._local.txn_id = None
+            self._local.images = None
+            return
+        if self.wal is None:
+            raise ValueError('The buffer manager has no write-ahead log')
+        self._local.txn_id = txn_id
+        self._local.images = {}  # page-id --> [num-pins, image, is-dirty]
+
+    def pin(self, page_id):
+        """Returns the disk-page 'page_id' (reading it from disk if it
+        is not in the pool) and pins it, so it can't be evicted."""
+        with self._lock:
+            frame = self._page_table.get(page_id)
+            if frame is not None:
+                self.num_hits += 1
+                self._policy.record_access(frame)
+            else:
+                self.num_misses += 1
+                frame = self._get_victim_frame()
+                try:
+                    self._dsm.read_page_into(page_id, frame.page)
+                except Exception:
+                    self._empty_frames.append(frame)
+                    raise
+                self._set_page(frame, page_id)
+                self._policy.record_load(frame)
+            frame.pin_count += 1
+            images = getattr(self._local, 'images', None)
+            if images is not None:
+                frame.txn_pins += 1
+                entry = images.get(page_id)
+                if entry is None:
+                    images[page_id] = [1, frame.page.buffer.tobytes(), False]
+                else:
+                    entry[0] += 1
+
+            if self.read_ahead_pages > 0:
+                self._detect_sequential_access(frame)
+            return frame.page
+
+    def unpin(self, page_id, is_dirty=False, page_lsn=0):
+        """Releases a pin of the page. is_dirty must be True if the page
+        was modified while it was pinned. page_lsn is the LSN returned
+        by the write-ahead log for the changes."""
+        with self._lock:
+            frame = self._page_table.get(page_id)
+            if frame is None or frame.pin_count == 0:
+                msg = 'Page-id %s is not pinned.' % page_id
+                raise ValueError(msg)
+            images = getattr(self._local, 'images', None)
+            if images is not None and page_id in images:
+                page_lsn = max(page_lsn, self._log_unpin(images, frame,
+                                                         is_dirty))
+                frame.txn_pins -= 1
+            frame.pin_count -= 1
+            if page_lsn > frame.page_lsn:
+                frame.page_lsn = page_lsn
+            if is_dirty:
+                self._mark_dirty(frame)
+
+    def new_page(self):
+        """Allocates a new page in the disk-space and returns it pinned.
+        The page is dirty: it will be written back even if it is not
+        modified."""
+        with self._lock:
+            # The frame first: a full pool must not leak the new page
+            frame = self._get_victim_frame()
+            header = self._dsm_header()
+            try:
+                free_page = self._dsm.get_free_page()
+            except Exception:
+                self._empty_frames.append(frame)
+                raise
+            frame.page.buffer[:] = free_page.buffer
+            self._set_page(frame, free_page.id)
+            self._policy.record_load(frame)
+            frame.pin_count = 1
+            self._mark_dirty(frame)
+            images = getattr(self._local, 'images', None)
+            if images is not None:
+                self._log_header(free_page.id, header)
+                # The page was a node of the free-list or a never-used
+                # page (beyond the high-water mark)
+                before = DiskPage(free_page.id)
+                if self._dsm.high_water_mark == header[1]:
+                    before.next_page_pointer = self._dsm.first_free_id
+                images[free_page.id] = [1, before.buffer.tobytes(), True]
+                frame.txn_pins = 1
+            return frame.page
+
+    def free_page(self, page_id):
+        """Removes the page from the pool (without writing it) and
+        releases it in the disk-space. The disk-space writes the page (a
+        node of the free-list) at once, so in a transaction the log is
+        flushed first."""
+        with self._lock:
+            frame = self._page_table.get(page_id)
+            if frame is not None:
+                if frame.pin_count > 0 or frame.is_writing:
+                    msg = 'Page-id %s is pinned.' % page_id
+                    raise ValueError(msg)
+            if getattr(self._local, 'images', None) is not None:
+                if frame is not None:
+                    before = frame.page.buffer.tobytes()
+                else:
+                    before = self._dsm.read_page(page_id).buffer.tobytes()
+                header = self._dsm_header()
+                after = DiskPage(page_id)
+                after.next_page_pointer = header[0]
+                self._log_image(page_id, before, after.buffer.tobytes())
+                self.wal.flush(self.wal.log_header(
+                    self._local.txn_id, page_id, header,
+                    (page_id, header[1])))
+            if frame is not None:
+                self._policy.record_evict(frame)
+                self._remove_page(frame)
+                self._empty_frames.append(frame)
+            self._dsm.release_page(page_id)
+
+    def flush_page(self, page_id):
+        """Writes the page to disk if it is in the pool and is dirty"""
+        with self._lock:
+            frame = self._page_table.get(page_id)
+            if frame is not None and frame.is_dirty:
+                self._write_back(frame)
+
+    def flush_dirty_pages(self, include_pinned=False):
+        """Writes the dirty frames in batches: they are sorted by page-id
+        and each run of adjacent ids is written with a single syscall
+        (DiskSpaceManager.write_pages). The pool is not locked while the
+        pages are written (the disk-space serializes its own accesses):
+        copies of the frames are written, so a page that is pinned and
+        changed meanwhile is not written half-changed (it gets dirty
+        again and the next flush writes it). The frames pinned by a
+        transaction are never written (their changes are not logged
+        yet). Returns the number of pages written."""
+        with self._lock:
+            frames = [frame for frame in self._frames
+                      if frame.is_dirty and not frame.is_writing and
+                      frame.txn_pins == 0 and
+                      (include_pinned or frame.pin_count == 0)]
+            frames.sort(key=lambda frame: frame.page_id)
+            copies = []
+            for frame in frames:
+                frame.is_writing = True  # It can't be evicted
+                self._mark_clean(frame)
+                copy = DiskPage()
+                copy.buffer[:] = frame.page.buffer
+                copies.append(copy)
+        if not frames:
+            return 0
+
+        try:
+            if self.wal is not None:
+                self.wal.flush(max(frame.page_lsn for frame in frames))
+            self._dsm.write_pages(copies)
+        except Exception:
+            with self._lock:
+                for frame in frames:
+                    self._mark_dirty(frame)
+            raise
+        finally:
+            with self._lock:
+                for frame in frames:
+                    frame.is_writing = False
+        with self._lock:
+            self.num_writes += len(frames)
+        return len(frames)
+
+    def flush_all(self):
+        """Writes all the dirty pages (pinned or not, but not the ones
+        pinned by a transaction) and the header of the disk-space (after
+        the log, which has its changes)."""
+        self.flush_dirty_pages(include_pinned=True)
+        with self._lock:
+            if self.wal is not None:
+                self.wal.flush()
+            self._dsm.flush_header()
+
+    def start_background_writer(self, interval=1.0, dirty_ratio=0.25):
+        """Starts a thread that flushes the dirty frames every 'interval'
+        seconds, or as soon as the number of dirty frames exceeds
+        dirty_ratio * num_frames."""
+        if self._writer is None:
+            self._writer = BackgroundWriter(self, interval, dirty_ratio)
+            self._writer.start()
+
+    def stop_background_writer(self):
+        if self._writer is not None:
+            self._writer.stop()
+            self._writer = None
+
+    def _dsm_header(self):
+        return self._dsm.first_free_id, self._dsm.high_water_mark
+
+    def _log_header(self, page_id, before):
+        after = self._dsm_header()
+        if after != before:
+            self.wal.log_header(self._local.txn_id, page_id, before, after)
+
+    def _log_image(self, page_id, before, after):
+        """Logs the bytes that differ between two images of a page.
+        Returns the LSN (0 if nothing changed)."""
+        start, end = _changed_range(before, after)
+        if start == end:
+            return 0
+        return self.wal.log_page_write(self._local.txn_id, page_id, start,
+                                       before[start:end], after[start:end])
+
+    def _log_unpin(self, images, frame, is_dirty):
+        entry = images[frame.page_id]
+        entry[0] -= 1
+        entry[2] = entry[2] or is_dirty
+        if entry[0] > 0:
+            return 0
+        del images[frame.page_id]
+        if not entry[2]:
+            return 0
+        return self._log_image(frame.page_id, entry[1],
+                               frame.page.buffer.tobytes())
+
+    def _mark_dirty(self, frame):
+        if not frame.is_dirty:
+            frame.is_dirty = True
+            self._num_dirty += 1
+            writer = self._writer
+            if writer is not None and writer.under_pressure():
+                writer.wake()
+
+    def _mark_clean(self, frame):
+        if frame.is_dirty:
+            frame.is_dirty = False
+            self._num_dirty -= 1
+
+    def _set_page(self, frame, page_id):
+        frame.page_id = page_id
+        self._page_table[page_id] = frame
+
+    def _remove_page(self, frame):
+        del self._page_table[frame.page_id]
+        self._mark_clean(frame)
+        frame.page_id = -1
+        frame.pin_count = 0
+        frame.txn_pins = 0
+        frame.page_lsn = 0
+
+    def _write_back(self, frame):
+        if self.wal is not None:
+            self.wal.flush(frame.page_lsn)
+        self._dsm.write_page(frame.page)
+        self._mark_clean(frame)
+        self.num_writes += 1
+
+    @staticmethod
+    def _is_evictable(frame):
+        return frame.pin_count == 0 and not frame.is_writing
+
+    @staticmethod
+    def _is_clean_and_evictable(frame):
+        return (frame.pin_count == 0 and not frame.is_writing and
+                not frame.is_dirty)
+
+    def _get_victim_frame(self):
+        """Returns an empty frame. If all the frames are used, the
+        replacement-policy chooses the frame to evict (dirty frames are
+        written back first)."""
+        if self._empty_frames:
+            return self._empty_frames.pop()
+
+        frame = None
+        if self._writer is not None:
+            frame = self._policy.choose_victim(self._is_clean_and_evictable)
+            if frame is None:
+                self._writer.wake()  # No clean frames left
+        if frame is None:
+            frame = self._policy.choose_victim(self._is_evictable)
+        if frame is None:
+            raise BufferPoolFullException(self.num_frames)
+        if frame.is_dirty:
+            self._write_back(frame)
+        self._policy.record_evict(frame)
+        self._remove_page(frame)
+        self.num_evictions += 1
+        return frame
+
+    def _detect_sequential_access(self, frame):
+        """Triggers the read-ahead when the last pins followed a chain"""
+        page_id = frame.page_id
+        if page_id == self._expected_next_id:
+            self._seq_run += 1
+        elif page_id != self._last_page_id:
+            self._seq_run = 0
+        self._last_page_id = page_id
+        next_id = frame.page.next_page_pointer
+        self._expected_next_id = next_id
+
+        if (self._seq_run >= self.seq_threshold and next_id != -1 and
+                next_id not in self._page_table):
+            self._read_ahead(frame.page)
+
+    def _read_ahead(self, disk_page):
+        """Loads (unpinned) the next pages of the chain of disk_page"""
+        next_id = disk_page.next_page_pointer
+        batch = {}
+        if next_id == disk_page.id + 1:
+            # The chain looks contiguous: speculative single read
+            count = min(self.read_ahead_pages, self._dsm.num_pages - next_id)
+            for page in self._dsm.read_pages(next_id, count):
+                batch[page.id] = page
+
+        page_id = next_id
+        num_loaded = 0
+        while page_id != -1 and num_loaded < self.read_ahead_pages:
+            frame = self._page_table.get(page_id)
+            if frame is None:
+                try:
+                    frame = self._get_victim_frame()
+                except BufferPoolFullException:
+                    return
+                if page_id in batch:
+                    frame.page.buffer[:] = batch[page_id].buffer
+                else:
+                    self._dsm.read_page_into(page_id, frame.page)
+                self._set_page(frame, page_id)
+                self._policy.record_load(frame, prefetched=True)
+                self.num_prefetched += 1
+            num_loaded += 1
+            page_id = frame.page.next_page_pointer
+
+
+class BackgroundWriter(threading.Thread):
+    """Thread that flushes the dirty frames of a BufferManager. It wakes
+    up every 'interval' seconds or when the buffer manager signals that
+    there are too many dirty frames (or no clean frame to evict)."""
+    def __init__(self, buff_mngr, interval=1.0, dirty_ratio=0.25):
+        super().__init__(name='pysilisk-bgwriter', daemon=True)
+        self._buff_mngr = buff_mngr
+        self.interval = interval
+        self.max_dirty = max(1, int(buff_mngr.num_frames * dirty_ratio))
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self.num_flushes = 0
+
+    def under_pressure(self):
+        return self._buff_mngr.num_dirty > self.max_dirty
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self.join()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            if self._buff_mngr.flush_dirty_pages() > 0:
+                self.num_flushes += 1
+
+
+class BufferPoolFullException(Exception):
+    def __init__(self, num_frames):
+        self.num_frames = num_frames
+        self.message = "All the %s frames of the buffer-pool are pinned" \
+                       % num_frames
+        super().__init__(self.message)
@@ -0,0 +1,218 @@
+import json
+import struct
+import threading
+from pysilisk.dsm import DiskPage
+from pysilisk.records import Column, TableSchema, StringDictionary
+from pysilisk.sqltypes import StorageType
+
+
+class IndexInfo(object):
+    """Index of a table: its columns, its type (see IndexType) and its
+    header page"""
+    def __init__(self, index_name, col_names, index_type, page_id):
+        self.index_name = index_name
+        self.col_names = list(col_names)
+        self.index_type = index_type
+        self.page_id = page_id
+
+    def to_dict(self):
+        return {'columns': self.col_names, 'type': self.index_type,
+                'page': self.page_id}
+
+    @classmethod
+    def from_dict(cls, index_name, info):
+        return cls(index_name, info['columns'], info['type'], info['page'])
+
+
+class TableInfo(object):
+    """Entry of the catalog: the schema of a table, the first page
+    (directory or header) of its file, the dictionaries of its
+    dictionary-encoded columns and its indexes"""
+    def __init__(self, schema, dir_page_id, indexes=None):
+        self.schema = schema
+        self.dir_page_id = dir_page_id
+        self.indexes = indexes if indexes is not None else {}
+
+    def to_dict(self):
+        columns = [[c.name, c.type_id, c.size, c.nullable, c.dictionary]
+                   for c in self.schema.columns]
+        info = {'columns': columns, 'storage': self.schema.storage,
+                'heap': self.dir_page_id}
+        if self.schema.dictionaries:
+            info['dictionaries'] = {
+                self.schema.columns[i].name: list(dictionary.values)
+                for i, dictionary in self.schema.dictionaries.items()}
+        if self.indexes:
+            info['indexes'] = {name: index.to_dict()
+                               for name, index in self.indexes.items()}
+        return info
+
+    @classmethod
+    def from_dict(cls, table_name, info):
+        columns = [Column(*column) for column in info['columns']]
+        storage = info.get('storage', StorageType.ROW)
+        schema = TableSchema(table_name, columns, storage)
+        for col_name, values in info.get('dictionaries', {}).items():
+            schema.dictionaries[schema.column_index(col_name)] = \
+                StringDictionary(values)
+        indexes = {name: IndexInfo.from_dict(name, index)
+                   for name, index in info.get('indexes', {}).items()}
+        return cls(schema, info['heap'], indexes)
+
+    @property
+    def dictionaries(self):
+        return self.schema.dictionaries.values()
+
+
+class Catalog(object):
+    """Tables of the database. The catalog is stored as json in a chain
+    of pages (linked by their next-page pointers) that starts at
+    'first_page_id'. Each page stores:
+
+        | length (4) | json bytes |
+
+    The whole catalog is rewritten by save (the DDL statements are not
+    frequent).
+    """
+
+    FMT_LENGTH = '<I'
+    LENGTH_SIZE = struct.calcsize(FMT_LENGTH)
+    CHUNK_SIZE = DiskPage.PAGE_DATA_SIZE - LENGTH_SIZE
+
+    def __init__(self, buff_mngr, first_page_id):
+        self.buff_mngr = buff_mngr
+        self.first_page_id = first_page_id
+        self._tables = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def create(cls, buff_mngr):
+        """Allocates the first page of a new (empty) catalog"""
+        disk_page = buff_mngr.new_page()
+        disk_page.next_page_pointer = -1
+        buff_mngr.unpin(disk_page.id, is_dirty=True)
+        catalog = cls(buff_mngr, disk_page.id)
+        catalog.save()
+        return catalog
+
+    def load(self):
+        chunks = []
+        page_id = self.first_page_id
+        while page_id != -1:
+            disk_page = self.buff_mngr.pin(page_id)
+            length = struct.unpack_from(self.FMT_LENGTH, disk_page.data, 0)[0]
+            start = self.LENGTH_SIZE
+            chunks.append(disk_page.data[start:start + length].tobytes())
+            next_id = disk_page.next_page_pointer
+            self.buff_mngr.unpin(page_id)
+            page_id = next_id
+        content = json.loads(b''.join(chunks).decode() or '{}')
+        with self._lock:
+            self._tables = {name: TableInfo.from_dict(name, info)
+                            for name, info in content.get('tables',
+                                                          {}).items()}
+
+    def save(self):
+        with self._lock:
+            # The values added from now on will dirty the dictionaries
+            for info in self._tables.values():
+                for dictionary in info.dictionaries:
+                    dictionary.is_dirty = False
+            tables = {name: info.to_dict()
+                      for name, info in self._tables.items()}
+        content = json.dumps({'tables': tables}).encode()
+        chunks = [content[i:i + self.CHUNK_SIZE]
+                  for i in range(0, len(content), self.CHUNK_SIZE)] or [b'']
+
+        page_id = self.first_page_id
+        for i, chunk in enumerate(chunks):
+            disk_page = self.buff_mngr.pin(page_id)
+            struct.pack_into(self.FMT_LENGTH, disk_page.data, 0, len(chunk))
+            start = self.LENGTH_SIZE
+            disk_page.data[start:start + len(chunk)] = chunk
+            next_id = disk_page.next_page_pointer
+            if i == len(chunks) - 1:
+                disk_page.next_page_pointer = -1
+            elif next_id == -1:
+                new_page = self.buff_mngr.new_page()
+                new_page.next_page_pointer = -1
+                next_id = new_page.id
+                self.buff_mngr.unpin(next_id, is_dirty=True)
+                disk_page.next_page_pointer = next_id
+            self.buff_mngr.unpin(page_id, is_dirty=True)
+            page_id = next_id
+
+        # Release the pages that are not used anymore
+        while page_id != -1:
+            disk_page = self.buff_mngr.pin(page_id)
+            next_id = disk_page.next_page_pointer
+            self.buff_mngr.unpin(page_id)
+            self.buff_mngr.free_page(page_id)
+            page_id = next_id
+
+    def save_dictionaries(self):
+        """Saves the catalog if a dictionary got new values. Returns True
+        if it was saved."""
+        with self._lock:
+            is_dirty = any(dictionary.is_dirty
+                           for info in self._tables.values()
+                           for dictionary in info.dictionaries)
+            if is_dirty:
+                self.save()
+        return is_dirty
+
+    @property
+    def table_names(self):
+        return sorted(self._tables)
+
+    def has_table(self, table_name):
+        return table_name in self._tables
+
+    def get_table(self, table_name):
+        info = self._tables.get(table_name)
+        if info is None:
+            raise CatalogException('Table %s does not exist' % table_name)
+        return info
+
+    def add_table(self, schema, dir_page_id):
+        with self._lock:
+            if schema.table_name in self._tables:
+                msg = 'Table %s already exists' % schema.table_name
+                raise CatalogException(msg)
+            self._tables[schema.table_name] = TableInfo(schema, dir_page_id)
+        self.save()
+
+    def remove_table(self, table_name):
+        with self._lock:
+            info = self.get_table(table_name)
+            del self._tables[table_name]
+        self.save()
+        return info
+
+    def add_index(self, table_name, index_info):
+        with self._lock:
+            info = self.get_table(table_name)
+            if index_info.index_name in info.indexes:
+                msg = 'Index %s already exists in table %s'
+                raise CatalogException(msg % (index_info.index_name,
+                                              table_name))
+            for col_name in index_info.col_names:
+                info.schema.column_index(col_name)  # Checks the column
+            info.indexes[index_info.index_name] = index_info
+        self.save()
+
+    def remove_index(self, table_name, index_name):
+        with self._lock:
+            info = self.get_table(table_name)
+            index_info = info.indexes.pop(index_name, None)
+            if index_info is None:
+                msg = 'Index %s does not exist in table %s'
+                raise CatalogException(msg % (index_name, table_name))
+        self.save()
+        return index_info
+
+
+class CatalogException(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,702 @@
+import struct
+import threading
+from contextlib import contextmanager
+from pysilisk.dsm import DiskPage
+from pysilisk.records import RID, SchemaException, RecordException
+from pysilisk.records import VacuumResult
+from pysilisk.sqltypes import SQLDataType
+from pysilisk.vectors import BatchDecoder
+from pysilisk.zonemap import ZoneMap
+
+
+class PaxLayout(object):
+    """Layout of the pages of a columnar table (PAX). A page stores up to
+    'capacity' rows, and the values of each column are stored together
+    in a minipage:
+
+        | num-rows (2) | num-deleted (2) | deleted-bitmap |
+        | minipage-0 | minipage-1 | ... |
+
+    minipage = | null-bitmap | values (capacity * width) |
+
+    The values are fixed-width arrays: INTEGER and DATE (4 bytes),
+    FLOAT and DATETIME (8 bytes), CHAR(n) (n bytes) and VARCHAR(n)
+    (2-bytes length + n bytes). So, a column of a page is decoded with
+    a single struct.unpack_from and the other columns are not touched.
+    A dictionary-encoded CHAR is stored as the 4-bytes codes.
+    """
+
+    FMT_HEADER = '<HH'
+    HEADER_SIZE = struct.calcsize(FMT_HEADER)
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.num_columns = schema.num_columns
+        self.widths = [PaxLayout._width(c) for c in schema.columns]
+
+        # Max number of rows that fit in a page
+        row_bits = 8 * sum(self.widths) + self.num_columns + 1
+        capacity = \
+            (DiskPage.PAGE_DATA_SIZE - self.HEADER_SIZE) * 8 // row_bits
+        while capacity > 0 and self._page_size(capacity) > \
+                DiskPage.PAGE_DATA_SIZE:
+            capacity -= 1
+        if capacity < 1:
+            msg = 'The rows of table %s are too wide for a columnar page'
+            raise SchemaException(msg % schema.table_name)
+        self.capacity = capacity
+        self.bitmap_size = (capacity + 7) // 8
+
+        # Offsets of the null-bitmap and the values of each column
+        self.deleted_offset = self.HEADER_SIZE
+        self.null_offsets = []
+        self.value_offsets = []
+        offset = self.HEADER_SIZE + self.bitmap_size
+        for width in self.widths:
+            self.null_offsets.append(offset)
+            self.value_offsets.append(offset + self.bitmap_size)
+            offset += self.bitmap_size + capacity * width
+
+        # The codes of the dictionary-encoded columns are integers
+        self._kinds = [SQLDataType.INTEGER if c.dictionary else c.type_id
+                       for c in schema.columns]
+        self._decoders = [schema.codec.decoder(i)
+                          for i in range(self.num_columns)]
+
+    @staticmethod
+    def _width(column):
+        if column.dictionary:
+            return 4
+        if column.type_id in (SQLDataType.INTEGER, SQLDataType.DATE):
+            return 4
+        if column.type_id in (SQLDataType.FLOAT, SQLDataType.DATETIME):
+            return 8
+        if column.type_id == SQLDataType.CHAR:
+            return column.size
+        return column.size + 2  # VARCHAR
+
+    def _page_size(self, capacity):
+        bitmap_size = (capacity + 7) // 8
+        return (self.HEADER_SIZE + bitmap_size * (self.num_columns + 1) +
+                capacity * sum(self.widths))
+
+    def _array_format(self, col_index, count):
+        type_id = self._kinds[col_index]
+        if type_id in (SQLDataType.INTEGER, SQLDataType.DATE):
+            return '<%di' % count
+        if type_id in (SQLDataType.FLOAT, SQLDataType.DATETIME):
+            return '<%dd' % count
+        return None
+
+    @staticmethod
+    def get_header(data):
+        return struct.unpack_from(PaxLayout.FMT_HEADER, data, 0)
+
+    @staticmethod
+    def set_header(data, num_rows, num_deleted):
+        struct.pack_into(PaxLayout.FMT_HEADER, data, 0, num_rows,
+                         num_deleted)
+
+    def format(self, data):
+        data[:] = bytes(len(data))
+
+    def pack_rows(self, rows):
+        """Packs converted rows (see RowCodec.convert) by columns. The
+        values of each column are packed with a single struct.pack_into
+        (when they are numbers). Returns a (null-bits, values) pair per
+        column, for write_packed. An invalid value raises a
+        SchemaException before any page is touched."""
+        count = len(rows)
+        minipages = []
+        for col in range(self.num_columns):
+            values = [row[col] for row in rows]
+            null_bits = 0
+            for i, value in enumerate(values):
+                if value is None:
+                    null_bits |= 1 << i
+
+            width = self.widths[col]
+            packed = bytearray(count * width)
+            fmt = self._array_format(col, count)
+            try:
+                if fmt is not None:
+                    default = 0 if fmt[-1] == 'i' else 0.0
+                    struct.pack_into(fmt, packed, 0,
+                                     *[default if v is None else v
+                                       for v in values])
+                elif self._kinds[col] == SQLDataType.CHAR:
+                    for i, value in enumerate(values):
+                        if value is not None:
+                            struct.pack_into('%ds' % width, packed,
+                                             i * width, value)
+                else:
+                    for i, value in enumerate(values):
+                        if value is not None:
+                            struct.pack_into('<H%ds' % (width - 2), packed,
+                                             i * width, len(value), value)
+            except struct.error as e:
+                msg = 'Invalid value for column %s: %s'
+                raise SchemaException(msg % (self.schema.columns[col].name,
+                                             e))
+            minipages.append((null_bits, packed))
+        return minipages
+
+    def write_packed(self, data, start, minipages, first, count):
+        """Writes the packed rows first..first + count - 1 (see
+        pack_rows) at position 'start'. The null bits of the written
+        positions are reset."""
+        mask = ((1 << count) - 1) << start
+        for col, (null_bits, packed) in enumerate(minipages):
+            null_offset = self.null_offsets[col]
+            nulls = int.from_bytes(data[null_offset:
+                                        null_offset + self.bitmap_size],
+                                   'little')
+            nulls = nulls & ~mask | (null_bits >> first << start) & mask
+            data[null_offset:null_offset + self.bitmap_size] = \
+                nulls.to_bytes(self.bitmap_size, 'little')
+            width = self.widths[col]
+            offset = self.value_offsets[col] + start * width
+            data[offset:offset + count * width] = \
+                packed[first * width:(first + count) * width]
+
+    def write_rows(self, data, start, rows):
+        """Writes converted rows (see RowCodec.convert) at position
+        'start'. The page is not modified if a value is invalid."""
+        self.write_packed(data, start, self.pack_rows(rows), 0, len(rows))
+
+    def read_column(self, data, col, num_rows):
+        """Returns the list of the python values of a column"""
+        null_offset = self.null_offsets[col]
+        nulls = int.from_bytes(data[null_offset:
+                                    null_offset + self.bitmap_size], 'little')
+        width = self.widths[col]
+        offset = self.value_offsets[col]
+        fmt = self._array_format(col, num_rows)
+        if fmt is not None:
+            values = list(struct.unpack_from(fmt, data, offset))
+            decoder = self._decoders[col]
+            if decoder is not None:
+                # The NULLs are not valid values (e.g. a DATE of 0)
+                values = [None if nulls >> i & 1 else decoder(v)
+                          for i, v in enumerate(values)]
+        elif self._kinds[col] == SQLDataType.CHAR:
+            values = [data[offset + i * width:offset + (i + 1) * width]
+                      .tobytes().rstrip(b'\x00').decode()
+                      for i in range(num_rows)]
+        else:
+            values = []
+            for i in range(num_rows):
+                start = offset + i * width
+                length = struct.unpack_from('<H', data, start)[0]
+                values.append(data[start + 2:start + 2 + length]
+                              .tobytes().decode())
+
+        if nulls:
+            for i in range(num_rows):
+                if nulls >> i & 1:
+                    values[i] = None
+        return values
+
+    def read_physical(self, data, col, num_rows):
+        """Returns the list of the physical values of a fixed-width column
+        (None for NULL)"""
+        null_offset = self.null_offsets[col]
+        nulls = int.from_bytes(data[null_offset:
+                                    null_offset + self.bitmap_size], 'little')
+        values = list(struct.unpack_from(self._array_format(col, num_rows),
+                                         data, self.value_offsets[col]))
+        if nulls:
+            for i in range(num_rows):
+                if nulls >> i & 1:
+                    values[i] = None
+        return values
+
+    def find_equal(self, data, col, num_rows, value):
+        """Returns the indexes of the (not NULL) rows whose column is
+        equal to 'value' (its physical value, see RowCodec.convert). The
+        values are compared without decoding them."""
+        null_offset = self.null_offsets[col]
+        nulls = int.from_bytes(data[null_offset:
+                                    null_offset + self.bitmap_size], 'little')
+        width = self.widths[col]
+        offset = self.value_offsets[col]
+        fmt = self._array_format(col, num_rows)
+        if fmt is not None:
+            values = struct.unpack_from(fmt, data, offset)
+            matches = [i for i, v in enumerate(values) if v == value]
+        elif self._kinds[col] == SQLDataType.CHAR:
+            value = value.ljust(width, b'\x00')
+            matches = [i for i in range(num_rows)
+                       if data[offset + i * width:
+                               offset + (i + 1) * width] == value]
+        else:
+            stored = struct.pack('<H', len(value)) + value
+            end = len(stored)
+            matches = [i for i in range(num_rows)
+                       if data[offset + i * width:
+                               offset + i * width + end] == stored]
+        return [i for i in matches if not nulls >> i & 1]
+
+    def deleted_rows(self, data):
+        """Returns the bitmap (int) of the deleted rows"""
+        offset = self.deleted_offset
+        return int.from_bytes(data[offset:offset + self.bitmap_size],
+                              'little')
+
+    def compact(self, data):
+        """Removes the deleted rows of a page: the live rows are moved to
+        the first positions, in order. Returns the list of their old
+        indexes (their new index is their position in the list)."""
+        num_rows, num_deleted = PaxLayout.get_header(data)
+        deleted = self.deleted_rows(data)
+        live = [i for i in range(num_rows) if not deleted >> i & 1]
+        old = data.tobytes()
+        for col in range(self.num_columns):
+            width = self.widths[col]
+            value_offset = self.value_offsets[col]
+            null_offset = self.null_offsets[col]
+            nulls = int.from_bytes(old[null_offset:
+                                       null_offset + self.bitmap_size],
+                                   'little')
+            new_nulls = 0
+            for j, i in enumerate(live):
+                start = value_offset + i * width
+                data[value_offset + j * width:
+                     value_offset + (j + 1) * width] = old[start:start + width]
+                if nulls >> i & 1:
+                    new_nulls |= 1 << j
+            start = value_offset + len(live) * width
+            end = value_offset + num_rows * width
+            data[start:end] = bytes(end - start)
+            data[null_offset:null_offset + self.bitmap_size] = \
+                new_nulls.to_bytes(self.bitmap_size, 'little')
+        offset = self.deleted_offset
+        data[offset:offset + self.bitmap_size] = bytes(self.bitmap_size)
+        PaxLayout.set_header(data, len(live), 0)
+        return live
+
+    def set_deleted(self, data, row_idx):
+        offset = self.deleted_offset
+        deleted = self.deleted_rows(data) | 1 << row_idx
+        data[offset:offset + self.bitmap_size] = \
+            deleted.to_bytes(self.bitmap_size, 'little')
+
+
+class ColumnarFile(object):
+    """File of a columnar table: a chain of PAX pages (linked by their
+    next-page pointers) plus a header page:
+
+        | first-page-id (4) | last-page-id (4) | num-pages (4) |
+
+    The ids of the pages (in chain order) are kept in memory: they are
+    read once, when the file is opened. The rows are appended to the
+    last page, or to a page that vacuum compacted (the list of these
+    pages is kept in memory too, and rebuilt by the next vacuum). A
+    scan reads only the columns it needs (see scan_batches). The RID of
+    a row is (page-id, row-index); a deleted row is marked in the
+    deleted-bitmap of its page (its space is reused after a vacuum).
+
+    The zone map of the file (see zonemap.py) lets the scans with
+    predicates skip the pages that have no matching rows. As in a
+    heap-file, vacuum does not move rows while the file is scanned.
+    """
+
+    FMT_HEADER = '<iii'
+
+    def __init__(self, buff_mngr, schema, header_page_id):
+        self.buff_mngr = buff_mngr
+        self.schema = schema
+        self.dir_page_id = header_page_id
+        self.layout = PaxLayout(schema)
+        self.zone_map = ZoneMap(schema)
+        self._lock = threading.RLock()
+        self._num_scans = 0
+        self._pages_with_room = []  # Not full pages (besides the last)
+        self._read_header()
+
+    def _read_header(self):
+        """Reads the header and the ids of the pages of the chain"""
+        header = self.buff_mngr.pin(self.dir_page_id)
+        self._first_page_id, self._last_page_id, self._num_pages = \
+            struct.unpack_from(self.FMT_HEADER, header.data, 0)
+        self.buff_mngr.unpin(self.dir_page_id)
+        self._data_pages = []     # Ids of the data pages (in order)
+        page_id = self._first_page_id
+        while page_id != -1:
+            self._data_pages.append(page_id)
+            disk_page = self.buff_mngr.pin(page_id)
+            next_id = disk_page.next_page_pointer
+            self.buff_mngr.unpin(page_id)
+            page_id = next_id
+
+    @classmethod
+    def create(cls, buff_mngr, schema):
+        """Allocates the header page of a new columnar file"""
+        PaxLayout(schema)  # Checks that a row fits in a page
+        header = buff_mngr.new_page()
+        struct.pack_into(cls.FMT_HEADER, header.data, 0, -1, -1, 0)
+        buff_mngr.unpin(header.id, is_dirty=True)
+        return cls(buff_mngr, schema, header.id)
+
+    def reload(self):
+        """Reads the header again (e.g. after a rollback). The zone map
+        is built again by the next scan that needs it."""
+        with self._lock:
+            self._read_header()
+            page_ids = set(self._data_pages) - {self._last_page_id}
+            self._pages_with_room = [page_id for page_id in
+                                     self._pages_with_room
+                                     if page_id in page_ids]
+            self.zone_map.clear()
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    @property
+    def page_ids(self):
+        return list(self._data_pages)
+
+    def _write_header(self):
+        header = self.buff_mngr.pin(self.dir_page_id)
+        struct.pack_into(self.FMT_HEADER, header.data, 0,
+                         self._first_page_id, self._last_page_id,
+                         self._num_pages)
+        self.buff_mngr.unpin(self.dir_page_id, is_dirty=True)
+
+    def _add_page(self):
+        disk_page = self.buff_mngr.new_page()
+        page_id = disk_page.id
+        self.layout.format(disk_page.data)
+        disk_page.next_page_pointer = -1
+        self.buff_mngr.unpin(page_id, is_dirty=True)
+        if self._last_page_id != -1:
+            last_page = self.buff_mngr.pin(self._last_page_id)
+            last_page.next_page_pointer = page_id
+            self.buff_mngr.unpin(self._last_page_id, is_dirty=True)
+        else:
+            self._first_page_id = page_id
+        self._last_page_id = page_id
+        self._data_pages.append(page_id)
+        self._num_pages += 1
+        self._write_header()
+        return page_id
+
+    def insert(self, values):
+        return self.insert_rows([values])[0]
+
+    def insert_rows(self, rows):
+        """Appends a batch of rows. Returns their RIDs. Each page is
+        pinned (and logged) once per batch."""
+        convert = self.schema.codec.convert
+        converted = [convert(row) for row in rows]
+        return self._append(converted, self.layout.pack_rows(converted))
+
+    def _append(self, converted, minipages):
+        """Writes a batch of converted rows (and their packed minipages,
+        see PaxLayout.pack_rows). Returns their RIDs."""
+        capacity = self.layout.capacity
+        rids = []
+        with self._lock:
+            i = 0
+            while i < len(converted):
+                if self._pages_with_room:
+                    page_id = self._pages_with_room[-1]
+                else:
+                    page_id = self._last_page_id
+                    if page_id == -1:
+                        page_id = self._add_page()
+                disk_page = self.buff_mngr.pin(page_id)
+                data = disk_page.data
+                num_rows, num_deleted = PaxLayout.get_header(data)
+                if num_rows == capacity:
+                    self.buff_mngr.unpin(page_id)
+                    if self._pages_with_room:
+                        self._pages_with_room.pop()
+                    else:
+                        self._add_page()
+                    continue
+                try:
+                    count = min(capacity - num_rows, len(converted) - i)
+                    self.layout.write_packed(data, num_rows, minipages, i,
+                                             count)
+                    PaxLayout.set_header(data, num_rows + count, num_deleted)
+                finally:
+                    self.buff_mngr.unpin(page_id, is_dirty=True)
+                rids.extend(RID(page_id, num_rows + k) for k in range(count))
+                if self.zone_map.is_built:
+                    self.zone_map.add_rows(page_id, converted[i:i + count])
+                i += count
+        return rids
+
+    def _check_rid(self, data, rid):
+        num_rows = PaxLayout.get_header(data)[0]
+        if rid.slot_no < 0 or rid.slot_no >= num_rows or \
+                self.layout.deleted_rows(data) >> rid.slot_no & 1:
+            raise RecordException('Record %s does not exist' % (rid,))
+
+    def get(self, rid):
+        disk_page = self.buff_mngr.pin(rid.page_id)
+        try:
+            data = disk_page.data
+            self._check_rid(data, rid)
+            num_rows = rid.slot_no + 1
+            return tuple(self.layout.read_column(data, col, num_rows)[-1]
+                         for col in range(self.layout.num_columns))
+        finally:
+            self.buff_mngr.unpin(rid.page_id)
+
+    def delete(self, rid):
+        with self._lock:
+            disk_page = self.buff_mngr.pin(rid.page_id)
+            try:
+                data = disk_page.data
+                self._check_rid(data, rid)
+                self.layout.set_deleted(data, rid.slot_no)
+                num_rows, num_deleted = PaxLayout.get_header(data)
+                PaxLayout.set_header(data, num_rows, num_deleted + 1)
+            finally:
+                self.buff_mngr.unpin(rid.page_id, is_dirty=True)
+
+    def update(self, rid, values):
+        """Deletes the row and appends the new version. Returns its RID.
+        The new values are checked first, so an invalid row does not
+        delete the old one."""
+        converted = [self.schema.codec.convert(values)]
+        minipages = self.layout.pack_rows(converted)
+        with self._lock:
+            self.delete(rid)
+            return self._append(converted, minipages)[0]
+
+    def build_zone_map(self):
+        """Computes the zones of all the pages with a scan of their
+        numeric minipages (the deleted rows are included)"""
+        col_indexes = self.zone_map.col_indexes
+        with self._lock:
+            self.zone_map.clear()
+            self.zone_map.set_built()
+            for page_id in self._data_pages:
+                disk_page = self.buff_mngr.pin(page_id)
+                try:
+                    num_rows = PaxLayout.get_header(disk_page.data)[0]
+                    columns = [self.layout.read_physical(disk_page.data, col,
+                                                         num_rows)
+                               for col in col_indexes]
+                finally:
+                    self.buff_mngr.unpin(page_id)
+                self.zone_map.add_columns(page_id, columns)
+
+    def pages_matching(self, predicates):
+        """Returns the pages that may have rows that satisfy all the
+        predicates (a list of ZonePredicates). The zone map is built by
+        the first call."""
+        with self._lock:
+            if predicates and not self.zone_map.is_built:
+                self.build_zone_map()
+            return self.zone_map.filter_pages(self.page_ids, predicates)
+
+    def _read_page(self, page_id, col_indexes):
+        """Returns (row-indexes, columns, next-page-id) of a page"""
+        disk_page = self.buff_mngr.pin(page_id)
+        try:
+            data = disk_page.data
+            num_rows, num_deleted = PaxLayout.get_header(data)
+            columns = [self.layout.read_column(data, col, num_rows)
+                       for col in col_indexes]
+            row_indexes = list(range(num_rows))
+            if num_deleted:
+                deleted = self.layout.deleted_rows(data)
+                row_indexes = [i for i in row_indexes
+                               if not deleted >> i & 1]
+                columns = [[values[i] for i in row_indexes]
+                           for values in columns]
+            return row_indexes, columns, disk_page.next_page_pointer
+        finally:
+            self.buff_mngr.unpin(page_id)
+
+    @contextmanager
+    def _scanning(self):
+        """Counts a running scan (see vacuum)"""
+        with self._lock:
+            self._num_scans += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._num_scans -= 1
+
+    def scan_batches(self, col_indexes=None, predicates=None):
+        """Generates a batch per page: (page-id, row-indexes, columns),
+        where columns is the list of values of each column in
+        col_indexes (all the columns by default). Only those columns are
+        decoded. The pages that can not satisfy the predicates (see
+        pages_matching) are skipped; the rows of the other pages are not
+        filtered."""
+        if col_indexes is None:
+            col_indexes = range(self.layout.num_columns)
+        with self._scanning():
+            if predicates:
+                for page_id in self.pages_matching(predicates):
+                    row_indexes, columns, _ = self._read_page(page_id,
+                                                              col_indexes)
+                    if row_indexes:
+                        yield page_id, row_indexes, columns
+                return
+            page_id = self._first_page_id
+            while page_id != -1:
+                row_indexes, columns, next_id = self._read_page(page_id,
+                                                                col_indexes)
+                if row_indexes:
+                    yield page_id, row_indexes, columns
+                page_id = next_id
+
+    def scan(self, col_names=None, predicates=None):
+        """Generates (RID, row) where row only has the values of the
+        columns in col_names (all the columns by default). See
+        scan_batches for the predicates."""
+        col_indexes = None
+        if col_names is not None:
+            col_indexes = [self.schema.column_index(n) for n in col_names]
+        for page_id, row_indexes, columns in self.scan_batches(col_indexes,
+                                                               predicates):
+            rows = zip(*columns) if columns else [()] * len(row_indexes)
+            for k, row in enumerate(rows):
+                yield RID(page_id, row_indexes[k]), row
+
+    def scan_equal(self, col_name, value, col_names=None):
+        """Generates the (RID, row) of the rows whose column is equal to
+        'value' (see scan). The column is compared without decoding it
+        (the codes of a dictionary-encoded column are compared as
+        integers); only the matching rows are decoded."""
+        col = self.schema.column_index(col_name)
+        if col_names is None:
+            col_indexes = range(self.layout.num_columns)
+        else:
+            col_indexes = [self.schema.column_index(n) for n in col_names]
+        physical = self.schema.codec.physical_value(col, value)
+        if physical is None:
+            return
+        with self._scanning():
+            page_id = self._first_page_id
+            while page_id != -1:
+                rows, next_id = self._find_equal(page_id, col, physical,
+                                                 col_indexes)
+                for rid, row in rows:
+                    yield rid, row
+                page_id = next_id
+
+    def _find_equal(self, page_id, col, physical, col_indexes):
+        """Returns ([(RID, row)...], next-page-id) of the rows of a page
+        whose column is equal to a physical value"""
+        disk_page = self.buff_mngr.pin(page_id)
+        try:
+            data = disk_page.data
+            num_rows = PaxLayout.get_header(data)[0]
+            matches = self.layout.find_equal(data, col, num_rows, physical)
+            deleted = self.layout.deleted_rows(data)
+            matches = [i for i in matches if not deleted >> i & 1]
+            rows = []
+            if matches:
+                count = matches[-1] + 1
+                columns = [self.layout.read_column(data, c, count)
+                           for c in col_indexes]
+                rows = [(RID(page_id, i),
+                         tuple(values[i] for values in columns))
+                        for i in matches]
+            return rows, disk_page.next_page_pointer
+        finally:
+            self.buff_mngr.unpin(page_id)
+
+    def scan_vectors(self, col_names=None, pages_per_batch=16,
+                     use_numpy=None, predicates=None, with_rids=True):
+        """Generates a ColumnBatch (see vectors.py) per run of
+        'pages_per_batch' pages. The numeric minipages are copied into
+        typed vectors without decoding their values. The pages that can
+        not satisfy the predicates are skipped (see scan_batches)."""
+        decoder = BatchDecoder(self, col_names, use_numpy, with_rids)
+        with self._scanning():
+            yield from decoder.scan(pages_per_batch,
+                                    self.pages_matching(predicates))
+
+    def vacuum(self, max_pages=None, on_move=None):
+        """Reclaims the space of the deleted rows: the pages whose rows
+        were all deleted are released, and the other pages with deleted
+        rows are compacted (see PaxLayout.compact). The pages that are
+        not full are filled by the next inserts. At most 'max_pages'
+        pages are processed; vacuum stops if a scan is running. The
+        moved rows get a new RID: on_move(moved) is called with the
+        (old-RID, new-RID) of each compacted page, under the lock of the
+        file (see HeapFile.vacuum). Returns a VacuumResult."""
+        released = 0
+        compacted = 0
+        moved = []
+        with self._lock:
+            page_ids = self.page_ids
+        prev_id = -1
+        for page_id in page_ids:
+            if max_pages is not None and released + compacted >= max_pages:
+                break
+            with self._lock:
+                if self._num_scans:
+                    break
+                disk_page = self.buff_mngr.pin(page_id)
+                data = disk_page.data
+                num_rows, num_deleted = PaxLayout.get_header(data)
+                next_id = disk_page.next_page_pointer
+                if num_deleted == 0:
+                    self.buff_mngr.unpin(page_id)
+                    self._add_page_with_room(page_id, num_rows)
+                    prev_id = page_id
+                    continue
+                if num_deleted == num_rows:
+                    self.buff_mngr.unpin(page_id)
+                    self._remove_page(page_id, prev_id, next_id)
+                    released += 1
+                    continue
+                try:
+                    live = self.layout.compact(data)
+                finally:
+                    self.buff_mngr.unpin(page_id, is_dirty=True)
+                page_moves = [(RID(page_id, i), RID(page_id, j))
+                              for j, i in enumerate(live) if i != j]
+                if page_moves and on_move is not None:
+                    on_move(page_moves)
+                moved.extend(page_moves)
+                self._add_page_with_room(page_id, len(live))
+                compacted += 1
+                prev_id = page_id
+        return VacuumResult(released, compacted, moved)
+
+    def _add_page_with_room(self, page_id, num_rows):
+        if (num_rows < self.layout.capacity and
+                page_id != self._last_page_id and
+                page_id not in self._pages_with_room):
+            self._pages_with_room.append(page_id)
+
+    def _remove_page(self, page_id, prev_id, next_id):
+        """Unlinks a page from the chain and releases it"""
+        if prev_id == -1:
+            self._first_page_id = next_id
+        else:
+            prev_page = self.buff_mngr.pin(prev_id)
+            prev_page.next_page_pointer = next_id
+            self.buff_mngr.unpin(prev_id, is_dirty=True)
+        if self._last_page_id == page_id:
+            self._last_page_id = prev_id
+        if page_id in self._pages_with_room:
+            self._pages_with_room.remove(page_id)
+        self._data_pages.remove(page_id)
+        self._num_pages -= 1
+        self._write_header()
+        self.buff_mngr.free_page(page_id)
+        self.zone_map.remove_page(page_id)
+
+    def drop(self):
+        with self._lock:
+            for page_id in self._data_pages + [self.dir_page_id]:
+                self.buff_mngr.free_page(page_id)
+            self._first_page_id = self._last_page_id = -1
+            self._data_pages = []
+            self._pages_with_room = []
+            self._num_pages = 0
+            self.zone_map.clear()
@@ -0,0 +1,307 @@
+import lzma
+import os
+import struct
+import zlib
+from pysilisk.dsm import DiskSpaceManager, DiskPage, _pack_int, _unpack_int
+
+
+class PageCodec(object):
+    """Identifiers of the codecs used to store a page image"""
+    NONE = 0  # Stored raw (the page did not compress)
+    ZLIB = 1
+    LZMA = 2
+
+    _names = {'zlib': ZLIB, 'lzma': LZMA}
+
+    @classmethod
+    def from_string(cls, codec_name):
+        if codec_name not in cls._names:
+            raise ValueError('Unsupported codec: %s' % codec_name)
+        return cls._names[codec_name]
+
+
+class CompressedDiskSpaceManager(DiskSpaceManager):
+    """Disk space manager that stores the pages compressed.
+
+    The pages keep their ids and their size (PAGE_SIZE) for the upper
+    layers: the buffer pool reads and writes decompressed images, so
+    nothing above the disk space manager changes. Underneath, every
+    page image is compressed (zlib or lzma) and stored in a slot of the
+    data file. A slot is a run of GRANULE_SIZE-byte granules, so a page
+    that compresses 4x takes 2 granules (1KB) instead of 4KB.
+
+    The indirection map (filename + '.map') has an entry per page:
+
+        | first-granule (4) | length (2) | num-granules (1) | codec (1) |
+
+    A length of 0 means that the page has never been written. A page
+    that is rewritten moves to a free slot (or to the end of the file)
+    and its old slot is released: the slots are never overwritten in
+    place (copy-on-write). The released slots are reused only after the
+    map has been written (flush_header/sync/close_file), and the data
+    file is synced before the map, so the map on disk always points to
+    complete page images (those of its last write) after a crash.
+
+    Reads of consecutive pages whose slots are adjacent in the file
+    (e.g. pages written in order) are done with a single pread.
+
+    Memory-mapping is not supported (the file does not contain page
+    images).
+    """
+
+    GRANULE_SIZE = 512
+    MAX_GRANULES = DiskPage.PAGE_SIZE // GRANULE_SIZE
+
+    _ENTRY = struct.Struct('<IHBB')
+    _EMPTY_ENTRY = (0, 0, 0, PageCodec.NONE)
+
+    def __init__(self, filename, codec='zlib', level=6, growth_policy=None):
+        super().__init__(filename, use_mmap=False,
+                         growth_policy=growth_policy)
+        self.map_filename = filename + '.map'
+        self.codec = PageCodec.from_string(codec)
+        self.level = level
+        self._entries = []       # page-id --> map entry
+        self._end_granule = 0    # First granule after the last slot
+        self._free_slots = {}    # num-granules --> list of first-granules
+        self._pending_slots = [] # Released since the last map write
+        self._map_is_dirty = False
+
+        # Counters (bytes transferred to/from the data file)
+        self.num_bytes_read = 0
+        self.num_bytes_written = 0
+
+    def create_file(self, num_pages, lazy=False):
+        if num_pages < 2:
+            raise ValueError('Num-pages must be greater than or equal to two')
+        if os.path.exists(self.filename):
+            raise OSError('The filename %s already exists' % self.filename)
+
+        open(self.filename, 'wb').close()
+        self._dbfile = open(self.filename, 'r+b', buffering=0)
+        self._reset_slots([self._EMPTY_ENTRY] * num_pages)
+        self._num_pages = num_pages
+        try:
+            if lazy:
+                header = DiskPage(0)
+                _pack_int(header.data, DiskSpaceManager.HWM_OFFSET, 1)
+                self._writev(0, [header.buffer])
+            else:
+                # Create a sequence of connected disk-pages
+                disk_pages = [DiskPage(i) for i in range(num_pages)]
+                for i in range(num_pages - 1):
+                    disk_pages[i].next_page_pointer = i + 1
+                self._writev(0, [p.buffer for p in disk_pages])
+            self._write_map()
+        finally:
+            self._dbfile.close()
+
+    def delete_file(self):
+        super().delete_file()
+        if os.path.exists(self.map_filename):
+            os.remove(self.map_filename)
+
+    def open_file(self):
+        with self._lock:
+            if self._dbfile.closed:
+                if not os.path.exists(self.filename):
+                    raise OSError('File %s  does not exist.' % self.filename)
+                self._dbfile = open(self.filename, 'r+b', buffering=0)
+                with open(self.map_filename, 'rb') as f:
+                    entries = list(self._ENTRY.iter_unpack(f.read()))
+                self._reset_slots(entries)
+                self._num_pages = len(entries)
+
+                # Load the in-memory copy of the header
+                header = self._read_page(0)
+                self._first_free_id = header.next_page_pointer
+                hwm = _unpack_int(header.data, DiskSpaceManager.HWM_OFFSET)[0]
+                self._high_water_mark = hwm if hwm > 0 else self._num_pages
+                self._header_is_dirty = False
+
+    def close_file(self):
+        with self._lock:
+            if not self._dbfile.closed:
+                self.flush_header()
+            self._dbfile.close()
+
+    def flush_header(self):
+        with self._lock:
+            super().flush_header()
+            if self._map_is_dirty:
+                self._write_map()
+
+    def sync(self):
+        with self._lock:
+            self.flush_header()
+            os.fsync(self._dbfile.fileno())
+
+    @property
+    def file_size(self):
+        """Size of the data file (without the map)"""
+        return self._end_granule * self.GRANULE_SIZE
+
+    def _reset_slots(self, entries):
+        """Rebuilds the free slots: they are the gaps between the slots
+        of the pages."""
+        self._entries = entries
+        self._free_slots = {}
+        self._pending_slots = []
+        self._end_granule = 0
+        used = sorted((e[0], e[2]) for e in entries if e[1] > 0)
+        for first_granule, num_granules in used:
+            if first_granule > self._end_granule:
+                self._add_free_slot(self._end_granule,
+                                    first_granule - self._end_granule)
+            self._end_granule = first_granule + num_granules
+        self._map_is_dirty = False
+
+    def _write_map(self):
+        # The slots referenced by the new map must be on disk first
+        if not self._dbfile.closed:
+            os.fsync(self._dbfile.fileno())
+        buffer = bytearray(len(self._entries) * self._ENTRY.size)
+        for i, entry in enumerate(self._entries):
+            self._ENTRY.pack_into(buffer, i * self._ENTRY.size, *entry)
+        tmp_filename = self.map_filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            f.write(buffer)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, self.map_filename)
+        self._map_is_dirty = False
+
+        # The released slots are not referenced anymore
+        for first_granule, num_granules in self._pending_slots:
+            self._add_free_slot(first_granule, num_granules)
+        self._pending_slots = []
+
+    def _add_free_slot(self, first_granule, num_granules):
+        # Gaps larger than a page are split in page-sized slots
+        while num_granules > 0:
+            n = min(num_granules, self.MAX_GRANULES)
+            self._free_slots.setdefault(n, []).append(first_granule)
+            first_granule += n
+            num_granules -= n
+
+    def _allocate_slot(self, num_granules):
+        """Returns the first granule of a free slot. The smallest free
+        slot that fits is used (the rest of it stays free)."""
+        for n in range(num_granules, self.MAX_GRANULES + 1):
+            slots = self._free_slots.get(n)
+            if slots:
+                first_granule = slots.pop()
+                if n > num_granules:
+                    self._add_free_slot(first_granule + num_granules,
+                                        n - num_granules)
+                return first_granule
+        first_granule = self._end_granule
+        self._end_granule += num_granules
+        return first_granule
+
+    def _compress(self, buffer):
+        if self.codec == PageCodec.ZLIB:
+            compressed = zlib.compress(buffer, self.level)
+        else:
+            compressed = lzma.compress(buffer, preset=self.level)
+        if len(compressed) > DiskPage.PAGE_SIZE - self.GRANULE_SIZE:
+            # It does not save a granule
+            return PageCodec.NONE, bytes(buffer)
+        return self.codec, compressed
+
+    @staticmethod
+    def _decompress(codec, data, buffer):
+        if codec == PageCodec.ZLIB:
+            buffer[:] = zlib.decompress(data)
+        elif codec == PageCodec.LZMA:
+            buffer[:] = lzma.decompress(data)
+        else:
+            buffer[:] = data
+
+    def _grow(self, num_requested):
+        """Adds entries to the map. The data file only grows when the
+        new pages are written."""
+        num_new_pages = self.growth_policy.num_new_pages(self._num_pages,
+                                                         num_requested)
+        self._entries.extend([self._EMPTY_ENTRY] * num_new_pages)
+        self._num_pages = len(self._entries)
+        self._map_is_dirty = True
+
+    def _readv(self, first_id, buffers):
+        """Reads and decompresses consecutive pages. The pages whose
+        slots are adjacent in the file are read with a single pread.
+        Returns the number of syscalls issued."""
+        fd = self._dbfile.fileno()
+        num_syscalls = 0
+        i = 0
+        while i < len(buffers):
+            first_granule, length, num_granules, codec = \
+                self._entries[first_id + i]
+            if length == 0:
+                # Never written: all zeros
+                buffers[i][:] = bytes(DiskPage.PAGE_SIZE)
+                i += 1
+                continue
+            # Extend the run while the next slot follows this one
+            j = i + 1
+            end_granule = first_granule + num_granules
+            while j < len(buffers):
+                entry = self._entries[first_id + j]
+                if entry[1] == 0 or entry[0] != end_granule:
+                    break
+                end_granule += entry[2]
+                j += 1
+            offset = first_granule * self.GRANULE_SIZE
+            size = (end_granule - first_granule) * self.GRANULE_SIZE
+            data = os.pread(fd, size, offset)
+            num_syscalls += 1
+            self.num_bytes_read += len(data)
+            for k in range(i, j):
+                entry = self._entries[first_id + k]
+                start = (entry[0] - first_granule) * self.GRANULE_SIZE
+                self._decompress(entry[3], data[start:start + entry[1]],
+                                 buffers[k])
+            i = j
+        return num_syscalls
+
+    def _writev(self, first_id, buffers):
+        """Compresses and writes consecutive pages. Each page is written
+        in a new slot (the old one is released, see _write_map). Adjacent
+        slots are written with a single pwrite. Returns the number of
+        syscalls issued."""
+        slots = []
+        for i, buffer in enumerate(buffers):
+            page_id = first_id + i
+            codec, data = self._compress(buffer)
+            num_granules = -(-len(data) // self.GRANULE_SIZE)
+            old_first, old_length, old_num, _ = self._entries[page_id]
+            if old_length > 0:
+                self._pending_slots.append((old_first, old_num))
+            first_granule = self._allocate_slot(num_granules)
+            self._entries[page_id] = (first_granule, len(data),
+                                      num_granules, codec)
+            slots.append((first_granule, num_granules, data))
+        self._map_is_dirty = True
+
+        fd = self._dbfile.fileno()
+        num_syscalls = 0
+        slots.sort(key=lambda slot: slot[0])
+        i = 0
+        while i < len(slots):
+            first_granule = slots[i][0]
+            chunks = []
+            j = i
+            end_granule = first_granule
+            while j < len(slots) and slots[j][0] == end_granule:
+                _, num_granules, data = slots[j]
+                padding = num_granules * self.GRANULE_SIZE - len(data)
+                chunks.append(data)
+                chunks.append(bytes(padding))
+                end_granule += num_granules
+                j += 1
+            data = b''.join(chunks)
+            os.pwrite(fd, data, first_granule * self.GRANULE_SIZE)
+            num_syscalls += 1
+            self.num_bytes_written += len(data)
+            i = j
+        return num_syscalls
@@ -1,9 +1,32 @@
 import struct
+import mmap
 import os
 import io
+import threading
+
+# Positional I/O is not available on every platform (e.g. Windows).
+# Without it, we fall back to seek + read/write.
+_HAS_PREADV = hasattr(os, 'preadv') and hasattr(os, 'pwritev')
+
+# Max number of buffers that can be passed to a single preadv/pwritev
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
 
 class DiskPage(object):
-    """ """
+    """A disk-page is a view over a single buffer of PAGE_SIZE bytes:
+
+        | data (PAGE_DATA_SIZE bytes) | page-id (4) | next-page-id (4) |
+
+    The page-id and the next-page pointer are read and written in place
+    with struct.unpack_from/pack_into. Therefore, a disk-page can wrap a
+    frame of the buffer-pool or a slice of a memory-mapped file without
+    allocating or copying anything (see DiskPage.from_buffer).
+    """
 
     PAGE_SIZE = 4096  # Size of a physical disk-page
 
@@ -18,20 +41,32 @@ class DiskPage(object):
     # The integers are packed using little-endian (<)
     FMT_PACK_UNPACK_PAGE = '<{data_size}sii'.format(data_size=PAGE_DATA_SIZE)
 
+    # Offsets of the page-id and the next-page-id inside the buffer
+    ID_OFFSET = PAGE_DATA_SIZE
+    NEXT_PAGE_ID_OFFSET = PAGE_DATA_SIZE + ID_SIZE
+
     def __init__(self, page_id=-1):
         if page_id < -1:
             raise ValueError("Page-id must be greater than or equal to -1")
-        self._data = bytearray(DiskPage.PAGE_DATA_SIZE)
-        self._id = page_id
-        self.next_page_pointer = -1
+        self._buffer = memoryview(bytearray(DiskPage.PAGE_SIZE))
+        self._data = self._buffer[:DiskPage.PAGE_DATA_SIZE]
+        _pack_id_next(self._buffer, _ID_OFFSET, page_id, -1)
 
     @property
     def id(self):
-        return self._id
+        return _unpack_int(self._buffer, _ID_OFFSET)[0]
+
+    @property
+    def next_page_pointer(self):
+        return _unpack_int(self._buffer, _NEXT_PAGE_ID_OFFSET)[0]
+
+    @next_page_pointer.setter
+    def next_page_pointer(self, value):
+        _pack_int(self._buffer, _NEXT_PAGE_ID_OFFSET, value)
 
     @property
     def data(self):
-        #return bytes(self._data)
+        """Writable memoryview over the data area of the page"""
         return self._data
 
     @data.setter
@@ -39,54 +74,185 @@ class DiskPage(object):
         if len(value) != DiskPage.PAGE_DATA_SIZE:
             raise ValueError('The length of argument value must'
                              ' be the same as PAGE_DATA_SIZE')
-        self._data[:] = value  # This ensure not to change the _data's type
+        self._data[:] = value  # Copy into the page's buffer
+
+    @property
+    def buffer(self):
+        """memoryview over the whole page (PAGE_SIZE bytes)"""
+        return self._buffer
 
     @staticmethod
-    def from_bytes(array_bytes):
-        # Unpack the bytes into "data, "id" and "next"
-        fields = struct.unpack(DiskPage.FMT_PACK_UNPACK_PAGE, array_bytes)
-        data, page_id, next_page_pointer = fields
-
-        # Create the page
-        disk_page = DiskPage(page_id)
-        disk_page.data = data
-        disk_page.next_page_pointer = next_page_pointer
+    def from_buffer(buffer):
+        """Creates a disk-page that wraps (without copying) a writable
+        buffer of PAGE_SIZE bytes. Changes to the page are changes to
+        the buffer and vice versa."""
+        if type(buffer) is not memoryview:
+            buffer = memoryview(buffer)
+        if buffer.nbytes != DiskPage.PAGE_SIZE:
+            raise ValueError('The length of the buffer must'
+                             ' be the same as PAGE_SIZE')
+        if buffer.readonly:
+            raise ValueError('The buffer must be writable')
+        if buffer.format != 'B':
+            buffer = buffer.cast('B')
+        disk_page = DiskPage.__new__(DiskPage)
+        disk_page._buffer = buffer
+        disk_page._data = buffer[:DiskPage.PAGE_DATA_SIZE]
         return disk_page
 
+    @staticmethod
+    def from_bytes(array_bytes):
+        # A single copy of the bytes into the page's own buffer
+        if len(array_bytes) != DiskPage.PAGE_SIZE:
+            raise ValueError('The length of the bytes must'
+                             ' be the same as PAGE_SIZE')
+        return DiskPage.from_buffer(bytearray(array_bytes))
+
     @staticmethod
     def to_bytes(disk_page):
-        # Pack the disk_page as bytes
-        array_bytes = struct.pack(DiskPage.FMT_PACK_UNPACK_PAGE,
-                                  disk_page._data,
-                                  disk_page._id,
-                                  disk_page.next_page_pointer)
-        return array_bytes
+        # Snapshot of the page as bytes. Use disk_page.buffer
+        # to avoid the copy.
+        return disk_page._buffer.tobytes()
+
+
+# Bound methods used to access the header of a disk-page in place.
+# They avoid the attribute lookups in the hot path (page-id and
+# next-page-pointer are read every time a chain of pages is followed)
+_ID_OFFSET = DiskPage.ID_OFFSET
+_NEXT_PAGE_ID_OFFSET = DiskPage.NEXT_PAGE_ID_OFFSET
+_unpack_int = struct.Struct('<i').unpack_from
+_pack_int = struct.Struct('<i').pack_into
+_pack_id_next = struct.Struct('<ii').pack_into
+
+
+def _preallocate(fd, size):
+    """Extends the file to 'size' bytes. The new bytes are zeros.
+    posix_fallocate reserves the blocks on disk; if it is not available
+    (or not supported by the filesystem), we create a sparse file."""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass
+    os.ftruncate(fd, size)
+
+
+class GrowthPolicy(object):
+    """Decides how many pages are added to the db space when
+    there are no free pages left."""
+    def num_new_pages(self, num_pages, num_requested):
+        """num_pages     - current number of pages of the db space.
+        num_requested - pages needed by the current allocation.
+        """
+        raise NotImplementedError()
+
+
+class FixedGrowth(GrowthPolicy):
+    """The db space grows by the same number of pages every time"""
+    def __init__(self, chunk_pages=20):
+        if chunk_pages < 1:
+            raise ValueError('Chunk-pages must be greater than zero')
+        self.chunk_pages = chunk_pages
+
+    def num_new_pages(self, num_pages, num_requested):
+        return max(num_requested, self.chunk_pages)
+
+
+class GeometricGrowth(GrowthPolicy):
+    """The db space grows proportionally to its size ('factor' times
+    the current number of pages), but at least by min_pages and at most
+    by max_pages (if it is given)."""
+    def __init__(self, factor=0.5, min_pages=20, max_pages=None):
+        if factor <= 0:
+            raise ValueError('Factor must be greater than zero')
+        if min_pages < 1:
+            raise ValueError('Min-pages must be greater than zero')
+        self.factor = factor
+        self.min_pages = min_pages
+        self.max_pages = max_pages
+
+    def num_new_pages(self, num_pages, num_requested):
+        new_pages = max(self.min_pages, int(num_pages * self.factor))
+        if self.max_pages is not None:
+            new_pages = min(new_pages, self.max_pages)
+        return max(num_requested, new_pages)
 
 
 class DiskSpaceManager(object):
-    def __init__(self, filename):
+    """Manages the pages of the database space (a single file).
+
+    By default, the pages are read and written with positional I/O
+    (preadv/pwritev) on an unbuffered file. When use_mmap is True, the
+    file is memory-mapped and the pages are served as memoryview slices
+    of the mapping, so reading or writing a page does not issue any
+    syscall.
+
+    The free pages are linked in a list whose head is stored in the
+    next-page pointer of the header (page-0). Additionally, the header
+    stores a high-water mark: the pages beyond it have never been used,
+    they are all zeros and they are implicitly free (they are not part
+    of the free-list). Both values are cached in memory, so a burst of
+    allocations/releases does not rewrite the header each time. The
+    header is written by flush_header (also called by close_file).
+    """
+
+    # Offset (in the data of the header) of the high-water mark.
+    # A stored value of 0 means that all the pages of the file are
+    # initialized (files created without lazy=True).
+    HWM_OFFSET = 0
+
+    def __init__(self, filename, use_mmap=False, growth_policy=None):
         self.filename = filename
+        self.use_mmap = use_mmap
+        self.growth_policy = growth_policy or GeometricGrowth()
         self._is_opened = False
         self._dbfile = io.BytesIO()  # dummy file to avoid from checking
         self._dbfile.close()         # _dbfile == None everytime
         self._num_pages = 0
+        self._mmap = None   # Mapping of the file (only if use_mmap)
+        self._view = None   # memoryview over the mapping
+
+        # In-memory copy of the header
+        self._first_free_id = -1
+        self._high_water_mark = 0
+        self._header_is_dirty = False
+
+        # The disk-space is shared by the buffer-pool and its background
+        # writer: the file, the mapping and the header are only accessed
+        # under this lock (reentrant: allocate_pages calls read_pages).
+        self._lock = threading.RLock()
 
-    def create_file(self, num_pages):
+    def create_file(self, num_pages, lazy=False):
         """Creates a file (database space) with 'num_pages' pages.
         num_pages - it should be at least 2.
+        lazy      - if it is True, only the header is written and the
+                    rest of the file is preallocated (posix_fallocate or
+                    ftruncate), so the creation is O(1). All the pages
+                    stay beyond the high-water mark.
         """
         if num_pages < 2:
             raise ValueError('Num-pages must be greater than or equal to two')
         if os.path.exists(self.filename):
             raise OSError('The filename %s already exists' % self.filename)
 
+        if lazy:
+            with open(self.filename, 'wb') as f:
+                header = DiskPage(0)
+                _pack_int(header.data, DiskSpaceManager.HWM_OFFSET, 1)
+                f.write(header.buffer)
+                f.flush()
+                _preallocate(f.fileno(), num_pages * DiskPage.PAGE_SIZE)
+            self._num_pages = num_pages
+            return
+
         # Create a sequence of connected disk-pages
         with open(self.filename, 'wb') as f:
             for i in range(num_pages):
                 disk_page = DiskPage(i)
                 if i < num_pages - 1:
                     disk_page.next_page_pointer = i+1
-                f.write(DiskPage.to_bytes(disk_page))
+                f.write(disk_page.buffer)
             self._num_pages = num_pages
 
     def delete_file(self):
@@ -96,128 +262,402 @@ class DiskSpaceManager(object):
         os.remove(self.filename)
 
     def open_file(self):
-        if self._dbfile.closed:
-            if not os.path.exists(self.filename):
-                raise OSError('File %s  does not exist.' % self.filename)
-            self._dbfile = open(self.filename, 'r+b')
-            self._size = os.path.getsize(self.filename)
+        with self._lock:
+            if self._dbfile.closed:
+                if not os.path.exists(self.filename):
+                    raise OSError('File %s  does not exist.' % self.filename)
+                # The file is unbuffered because read_pages and write_pages
+                # work directly on the file descriptor (os.preadv/os.pwritev)
+                self._dbfile = open(self.filename, 'r+b', buffering=0)
+                self._size = os.path.getsize(self.filename)
+                self._num_pages = self._size // DiskPage.PAGE_SIZE
+                if self.use_mmap:
+                    self._map_file()
+                # Load the in-memory copy of the header
+                header = self._read_page(0)
+                self._first_free_id = header.next_page_pointer
+                hwm = _unpack_int(header.data, DiskSpaceManager.HWM_OFFSET)[0]
+                self._high_water_mark = hwm if hwm > 0 else self._num_pages
+                self._header_is_dirty = False
 
     def close_file(self):
-        self._dbfile.close()
+        with self._lock:
+            if not self._dbfile.closed:
+                self.flush_header()
+            if self._mmap is not None:
+                # msync the dirty pages of the mapping before closing it
+                self._mmap.flush()
+                self._unmap_file()
+            self._dbfile.close()
+
+    def _map_file(self):
+        """(Re)maps the whole file. It is called when the file is opened
+        and every time the file grows."""
+        self._unmap_file()
+        self._dbfile.flush()
+        self._mmap = mmap.mmap(self._dbfile.fileno(), self._size)
+        self._view = memoryview(self._mmap)
+
+    def _unmap_file(self):
+        if self._mmap is None:
+            return
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            # Some slices of the old mapping are still alive. The mapping
+            # is shared, so they see the same data as the new one, and it
+            # is unmapped when the last of them is garbage-collected.
+            pass
+        self._mmap = None
+        self._view = None
+
+    def _read_page(self, page_id):
+        """Returns a disk-page. With mmap, the page wraps a slice of
+        the mapping (no syscall and no copy)."""
+        if self._view is not None:
+            offset = page_id * DiskPage.PAGE_SIZE
+            disk_page = DiskPage.from_buffer(
+                self._view[offset:offset + DiskPage.PAGE_SIZE])
+        else:
+            disk_page = DiskPage.from_buffer(bytearray(DiskPage.PAGE_SIZE))
+            self._readv(page_id, [disk_page.buffer])
+        if disk_page.id != page_id:
+            # The page has never been written (all zeros). For instance,
+            # a page beyond the high-water mark. It is a clean page.
+            return DiskPage(page_id)
+        return disk_page
 
-    def get_free_page(self):
-        # Get the first-free-page
-        self._dbfile.seek(0)
-        array_bytes = self._dbfile.read(DiskPage.PAGE_SIZE)
-        header = DiskPage.from_bytes(array_bytes)
-        first_free_id = header.next_page_pointer
-
-        if first_free_id == -1:
-            # Get num-pages of the file
-            file_num_pages = self._num_pages
-
-            # Create 20 new pages
-            new_num_pages = 20
-            self._dbfile.seek(0, whence=2)  # Seek to the file's end
-            for i in range(file_num_pages, file_num_pages + new_num_pages):
-                disk_page = DiskPage(i)
-                if i < file_num_pages + new_num_pages - 1:
-                    disk_page.next_page_pointer = i + 1
-                self._dbfile.write(DiskPage.to_bytes(disk_page))
+    def _write_page(self, disk_page):
+        self._writev(disk_page.id, [disk_page.buffer])
+
+    def _readv(self, first_id, buffers):
+        """Reads consecutive pages (starting at first_id) into a list of
+        page-sized buffers. Returns the number of syscalls issued."""
+        offset = first_id * DiskPage.PAGE_SIZE
+        if self._view is not None:
+            for buffer in buffers:
+                buffer[:] = self._view[offset:offset + DiskPage.PAGE_SIZE]
+                offset += DiskPage.PAGE_SIZE
+            return 0
+
+        if not _HAS_PREADV:
+            # One seek and one read per page
+            self._dbfile.seek(offset)
+            for buffer in buffers:
+                self._dbfile.readinto(buffer)
+            return 1 + len(buffers)
+
+        num_syscalls = 0
+        fd = self._dbfile.fileno()
+        for i in range(0, len(buffers), _IOV_MAX):
+            chunk = buffers[i:i + _IOV_MAX]
+            expected = len(chunk) * DiskPage.PAGE_SIZE
+            num_bytes = os.preadv(fd, chunk, offset)
+            num_syscalls += 1
+            if num_bytes != expected:
+                raise OSError('Short read at offset %s: %s of %s bytes'
+                              % (offset, num_bytes, expected))
+            offset += expected
+        return num_syscalls
+
+    def _writev(self, first_id, buffers):
+        """Writes a list of page-sized buffers as consecutive pages
+        (starting at first_id). Returns the number of syscalls issued."""
+        offset = first_id * DiskPage.PAGE_SIZE
+        if self._view is not None:
+            for buffer in buffers:
+                self._view[offset:offset + DiskPage.PAGE_SIZE] = buffer
+                offset += DiskPage.PAGE_SIZE
+            return 0
+
+        if not _HAS_PREADV:
+            # One seek and one write for the whole run
+            self._dbfile.seek(offset)
+            self._dbfile.write(b''.join(buffers))
+            return 2
+
+        num_syscalls = 0
+        fd = self._dbfile.fileno()
+        for i in range(0, len(buffers), _IOV_MAX):
+            chunk = buffers[i:i + _IOV_MAX]
+            expected = len(chunk) * DiskPage.PAGE_SIZE
+            num_bytes = os.pwritev(fd, chunk, offset)
+            num_syscalls += 1
+            if num_bytes != expected:
+                raise OSError('Short write at offset %s: %s of %s bytes'
+                              % (offset, num_bytes, expected))
+            offset += expected
+        return num_syscalls
+
+    @property
+    def num_pages(self):
+        return self._num_pages
 
-            # update the size of the file
-            self._size += new_num_pages * DiskPage.PAGE_SIZE
-            self._num_pages = self._size/DiskPage.PAGE_SIZE
+    @property
+    def high_water_mark(self):
+        return self._high_water_mark
 
-            # Set the first-new-page as the first-free-age
-            first_free_id = file_num_pages
+    @property
+    def first_free_id(self):
+        return self._first_free_id
+
+    def set_header(self, first_free_id, high_water_mark):
+        """Replaces the in-memory copy of the header (the undo and the
+        redo of the write-ahead log). The file grows if the high-water
+        mark is beyond its end."""
+        with self._lock:
+            self.extend(high_water_mark)
+            self._first_free_id = first_free_id
+            self._high_water_mark = high_water_mark
+            self._header_is_dirty = True
+
+    def replace_header(self, expected, header):
+        """Sets the header (first-free-id, high-water mark) only if it
+        is 'expected'. Returns True if it was replaced."""
+        with self._lock:
+            if (self._first_free_id, self._high_water_mark) != expected:
+                return False
+            self.set_header(*header)
+            return True
+
+    def extend(self, num_pages):
+        """Grows the file (if needed) so it has at least num_pages"""
+        with self._lock:
+            if num_pages > self._num_pages:
+                self._grow(num_pages - self._num_pages)
+
+    def flush_header(self):
+        """Writes the in-memory copy of the header (head of the
+        free-list and high-water mark) into page-0"""
+        with self._lock:
+            if self._header_is_dirty:
+                header = self._read_page(0)
+                header.next_page_pointer = self._first_free_id
+                _pack_int(header.data, DiskSpaceManager.HWM_OFFSET,
+                          self._high_water_mark)
+                self._write_page(header)
+                self._header_is_dirty = False
+
+    def sync(self):
+        """Writes the header and forces the pages to the disk (fsync)"""
+        with self._lock:
+            self.flush_header()
+            if self._mmap is not None:
+                self._mmap.flush()
+            os.fsync(self._dbfile.fileno())
+
+    def _grow(self, num_requested):
+        """Extends the file according to the growth-policy. It only
+        changes the size of the file: the new pages are beyond the
+        high-water mark, so they don't need to be initialized."""
+        num_new_pages = self.growth_policy.num_new_pages(self._num_pages,
+                                                         num_requested)
+        self._size += num_new_pages * DiskPage.PAGE_SIZE
+        _preallocate(self._dbfile.fileno(), self._size)
+
+        # update the size of the file
+        self._num_pages = self._size // DiskPage.PAGE_SIZE
+        if self._mmap is not None:
+            self._map_file()  # grow the mapping
+
+    def _take_beyond_hwm(self, num_pages):
+        """Allocates the first 'num_pages' never-used pages"""
+        if self._high_water_mark + num_pages > self._num_pages:
+            missing = self._high_water_mark + num_pages - self._num_pages
+            self._grow(missing)
+        first_id = self._high_water_mark
+        self._high_water_mark += num_pages
+        self._header_is_dirty = True
+        return first_id
+
+    def allocate_pages(self, num_pages):
+        """Allocates an extent of 'num_pages' pages with consecutive ids.
+        Returns the list of (clean) disk-pages.
+
+        The extent is taken from the head of the free-list when the first
+        'num_pages' free-pages are consecutive. Otherwise, it is taken
+        from the never-used pages (beyond the high-water mark), growing
+        the file if it is needed.
+        """
+        if num_pages < 1:
+            raise ValueError('Num-pages must be greater than zero')
+
+        with self._lock:
+            first_id = self._first_free_id
+            hwm = self._high_water_mark
+            if first_id != -1 and first_id + num_pages <= hwm:
+                # Check with a single read if the head of the free-list is
+                # a chain of consecutive pages
+                run = self.read_pages(first_id, num_pages)
+                for disk_page in run[:-1]:
+                    if disk_page.next_page_pointer != disk_page.id + 1:
+                        break
+                else:
+                    # The page after the extent is the new head
+                    self._first_free_id = run[-1].next_page_pointer
+                    self._header_is_dirty = True
+                    return [DiskPage(i) for i in range(first_id,
+                                                       first_id + num_pages)]
+
+            first_id = self._take_beyond_hwm(num_pages)
+            return [DiskPage(i) for i in range(first_id, first_id + num_pages)]
 
-        # Get the first-page's next-page
-        offset_first_free = first_free_id*DiskPage.PAGE_SIZE
-        self._dbfile.seek(offset_first_free)
-        array_bytes = self._dbfile.read(DiskPage.PAGE_SIZE)
-        fields = struct.unpack(DiskPage.FMT_PACK_UNPACK_PAGE, array_bytes)
-        p_data, p_id, nextpage_of_firstfree = fields
+    def get_free_page(self):
+        with self._lock:
+            # Get the first-free-page (it is cached in memory).
+            # If the free-list is empty, we use a never-used page.
+            if self._first_free_id == -1:
+                return DiskPage(self._take_beyond_hwm(1))
+            first_free_id = self._first_free_id
 
-        # next-page of first-free will be the new first-free in the header
-        header.next_page_pointer = nextpage_of_firstfree
-        self._dbfile.seek(0)
-        self._dbfile.write(DiskPage.to_bytes(header))
+            # next-page of first-free will be the new first-free
+            next_page = self._read_page(first_free_id).next_page_pointer
+            self._first_free_id = next_page
+            self._header_is_dirty = True
 
-        # Return the clean free-page
-        return DiskPage(first_free_id)
+            # Return the clean free-page
+            return DiskPage(first_free_id)
 
     def release_page(self, page_id):
-        # before release page:
-        #     page   --> another_page
-        #     header --> first_free
-        #
-        # step 1:
-        #          page
-        #              ¯¯¯¯v
-        #     header --> first_free
-        #
-        # step 2:
-        #     header --> page --> first_free
-
-        if page_id < 0 or page_id >= self._num_pages:
-            msg = 'Page-id %s is outside of the db space.' % page_id
-            raise ValueError(msg)
-
-        # Easiest-approach:
-        # ---------------
-        #    # Get the first-free-page
-        #    header = self.read_page(0)
-        #    first_free_id = header.next_page_pointer
-        #
-        #    # page --> first_free
-        #    page = self.read_page(page_id)
-        #    page.next_page_pointer = first_free_id
-        #    self.write_page(page)
-        #
-        #    # header --> page
-        #    header.next_page_pointer = page_id
-        #    self.write_page(header)
-
-        # The following code avoids the overhead caused by
-        # read_page and write_page (ifs and the offset calculations).
-
-        # Get the first-free-page
-        self._dbfile.seek(0)
-        array_bytes = self._dbfile.read(DiskPage.PAGE_SIZE)
-        header = DiskPage.from_bytes(array_bytes)
-        first_free_id = header.next_page_pointer
-
-        # page --> first-free
-        offset_page = page_id*DiskPage.PAGE_SIZE
-        self._dbfile.seek(offset_page)
-        array_bytes = self._dbfile.read(DiskPage.PAGE_SIZE)
-        page = DiskPage.from_bytes(array_bytes)
-        page.next_page_pointer = first_free_id
-        self._dbfile.seek(offset_page)
-        self._dbfile.write(DiskPage.to_bytes(page))
-
-        # header --> page
-        header.next_page_pointer = page_id
-        self._dbfile.seek(0)
-        self._dbfile.write(DiskPage.to_bytes(header))
+        with self._lock:
+            # before release page:
+            #     page   --> another_page
+            #     header --> first_free
+            #
+            # step 1:
+            #          page
+            #              ¯¯¯¯v
+            #     header --> first_free
+            #
+            # step 2:
+            #     header --> page --> first_free
+
+            if page_id < 0 or page_id >= self._num_pages:
+                msg = 'Page-id %s is outside of the db space.' % page_id
+                raise ValueError(msg)
+            if page_id >= self._high_water_mark:
+                msg = 'Page-id %s has never been allocated.' % page_id
+                raise ValueError(msg)
+
+            # Easiest-approach:
+            # ---------------
+            #    # Get the first-free-page
+            #    header = self.read_page(0)
+            #    first_free_id = header.next_page_pointer
+            #
+            #    # page --> first_free
+            #    page = self.read_page(page_id)
+            #    page.next_page_pointer = first_free_id
+            #    self.write_page(page)
+            #
+            #    # header --> page
+            #    header.next_page_pointer = page_id
+            #    self.write_page(header)
+
+            # The following code avoids the overhead caused by
+            # read_page and write_page (ifs and the offset calculations).
+            # The header is not written: its in-memory copy is updated.
+            # The content of a released page is not relevant, so it is
+            # not read either.
+
+            # page --> first-free
+            page = DiskPage(page_id)
+            page.next_page_pointer = self._first_free_id
+            self._write_page(page)
+
+            # header --> page
+            self._first_free_id = page_id
+            self._header_is_dirty = True
 
     def write_page(self, disk_page):
-        if disk_page.id < 0 or disk_page.id >= self._num_pages:
-            msg = 'Page-id %s is outside of the db space.' % disk_page.id
-            raise ValueError(msg)
-        self._dbfile.seek(disk_page.id * DiskPage.PAGE_SIZE)
-        self._dbfile.write(DiskPage.to_bytes(disk_page))
+        with self._lock:
+            if disk_page.id < 0 or disk_page.id >= self._num_pages:
+                msg = 'Page-id %s is outside of the db space.' % disk_page.id
+                raise ValueError(msg)
+            self._write_page(disk_page)
 
     def read_page(self, page_id):
-        if page_id < 0 or page_id >= self._num_pages:
-            msg = 'Page-id %s is outside of the db space.' % page_id
-            raise ValueError(msg)
-
-        # Read the page from disk
-        self._dbfile.seek(page_id*DiskPage.PAGE_SIZE)
-        array_bytes = self._dbfile.read(DiskPage.PAGE_SIZE)
-        return DiskPage.from_bytes(array_bytes)
-
-
-
+        with self._lock:
+            if page_id < 0 or page_id >= self._num_pages:
+                msg = 'Page-id %s is outside of the db space.' % page_id
+                raise ValueError(msg)
+
+            # Read the page from disk (or from the mapping)
+            return self._read_page(page_id)
+
+    def read_page_into(self, page_id, disk_page):
+        """Reads a page into the buffer of an existing disk-page (e.g. a
+        frame of the buffer-pool) instead of allocating a new one."""
+        with self._lock:
+            if page_id < 0 or page_id >= self._num_pages:
+                msg = 'Page-id %s is outside of the db space.' % page_id
+                raise ValueError(msg)
+            self._readv(page_id, [disk_page.buffer])
+            if disk_page.id != page_id:
+                # The page has never been written (all zeros)
+                _pack_id_next(disk_page.buffer, _ID_OFFSET, page_id, -1)
+
+    def read_pages(self, first_id, count, return_syscalls=False):
+        """Reads 'count' consecutive pages starting at first_id.
+        The whole run is read with a single preadv (one per IOV_MAX
+        pages). With return_syscalls, returns the pages and the number
+        of syscalls issued.
+        """
+        with self._lock:
+            if count < 0:
+                raise ValueError('Count must be greater than or equal to zero')
+            if first_id < 0 or first_id + count > self._num_pages:
+                msg = 'Pages %s-%s are outside of the db space.'
+                raise ValueError(msg % (first_id, first_id + count - 1))
+
+            if self._view is not None:
+                disk_pages = [self._read_page(i)
+                              for i in range(first_id, first_id + count)]
+                if return_syscalls:
+                    return disk_pages, 0
+                return disk_pages
+
+            # A single allocation for the whole run. Each page wraps a slice.
+            run = memoryview(bytearray(count * DiskPage.PAGE_SIZE))
+            buffers = [run[i:i + DiskPage.PAGE_SIZE]
+                       for i in range(0, len(run), DiskPage.PAGE_SIZE)]
+
+            num_syscalls = self._readv(first_id, buffers)
+            disk_pages = [DiskPage.from_buffer(buffer) for buffer in buffers]
+
+            # The never-written pages (all zeros) only need their header
+            for i in range(count):
+                if disk_pages[i].id != first_id + i:
+                    _pack_id_next(buffers[i], _ID_OFFSET, first_id + i, -1)
+            if return_syscalls:
+                return disk_pages, num_syscalls
+            return disk_pages
+
+    def write_pages(self, disk_pages):
+        """Writes a list of disk-pages. The pages are sorted by id and
+        each run of adjacent ids is written with a single pwritev (one
+        per IOV_MAX pages). Returns the number of syscalls issued.
+        """
+        # If a page appears more than once, its last version is written
+        pages_by_id = {}
+        for disk_page in disk_pages:
+            if disk_page.id < 0 or disk_page.id >= self._num_pages:
+                msg = 'Page-id %s is outside of the db space.' % disk_page.id
+                raise ValueError(msg)
+            pages_by_id[disk_page.id] = disk_page
+
+        with self._lock:
+            num_syscalls = 0
+            run_first_id = -1
+            run_buffers = []
+            for page_id in sorted(pages_by_id):
+                if run_buffers and page_id != run_first_id + len(run_buffers):
+                    num_syscalls += self._writev(run_first_id, run_buffers)
+                    run_buffers = []
+                if not run_buffers:
+                    run_first_id = page_id
+                run_buffers.append(pages_by_id[page_id].buffer)
+            if run_buffers:
+                num_syscalls += self._writev(run_first_id, run_buffers)
+            return num_syscalls
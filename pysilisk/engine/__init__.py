@@ -0,0 +1,10 @@
+from pysilisk.engine.evaluator import TreeEvaluator, EngineException
+from pysilisk.engine.compiler import compile_expression, compile_filter
+from pysilisk.engine.compiler import compile_projection
+from pysilisk.engine.operators import Operator, SeqScan, Filter, Project
+from pysilisk.engine.operators import Sort, NestedLoopJoin, Limit, VectorScan
+from pysilisk.engine.vectorized import VectorEvaluator, VectorProgram
+from pysilisk.engine.vectorized import VectorizationUnsupported
+from pysilisk.engine.operators import DEFAULT_BATCH_SIZE, DEFAULT_MAX_SORT_ROWS
+from pysilisk.engine.spill import SpillFile
+from pysilisk.engine.hashjoin import HashJoin, extract_equi_join, make_join
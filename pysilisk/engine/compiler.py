@@ -0,0 +1,168 @@
+from pysilisk.parser.ast import AST_AND, AST_OR, AST_EQ, AST_NEQ, AST_GT
+from pysilisk.parser.ast import AST_GTE, AST_LT, AST_LTE, AST_Add, AST_Sub
+from pysilisk.parser.ast import AST_Mult, AST_Div, AST_Column, AST_EmptyExpr
+from pysilisk.parser.ast import AST_NumberLiteral, AST_StringLiteral
+from pysilisk.parser.ast import AST_NegArithExpr, AST_NotBoolExpr
+from pysilisk.engine.evaluator import TreeEvaluator, EngineException
+from pysilisk.engine.evaluator import resolve_column, coerce_literal
+
+OPERATORS = {AST_EQ: '==', AST_NEQ: '!=', AST_GT: '>', AST_GTE: '>=',
+             AST_LT: '<', AST_LTE: '<=', AST_Add: '+', AST_Sub: '-',
+             AST_Mult: '*', AST_Div: '/'}
+COMPARISONS = (AST_EQ, AST_NEQ, AST_GT, AST_GTE, AST_LT, AST_LTE)
+
+# The compiled code does not handle these errors: the rows are evaluated
+# again by a TreeEvaluator, which raises an EngineException
+FALLBACK_ERRORS = (TypeError, ZeroDivisionError)
+
+
+class ExpressionCompiler(object):
+    """Translates an expression (an AST built by to_ast_expr) into the
+    source of a python expression over 'row': the columns become
+    row[position], the literals become constants and the NULL checks
+    are inlined with temporary variables (:=), e.g.
+
+        a + 1 > b   -->   (None if (_v1 := (None if (_v2 := row[0]) is
+                           None else _v2 + _k0)) is None or (_v3 :=
+                           row[1]) is None else _v1 > _v3)
+
+    The source is compiled once (compile) into a function, so a row is
+    evaluated without walking the tree and without a call per node.
+
+    A string literal compared with a value that is not a string (e.g. a
+    DATE) is converted by coerce_literal, so d = '2020-01-31' compares
+    two dates instead of being always False.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.constants = {}  # name --> value of a literal
+        self._num_vars = 0
+
+    def _new_var(self):
+        self._num_vars += 1
+        return '_v%d' % self._num_vars
+
+    def _constant(self, value):
+        name = '_k%d' % len(self.constants)
+        self.constants[name] = value
+        return name
+
+    def translate(self, expr):
+        if isinstance(expr, AST_Column):
+            return 'row[%d]' % resolve_column(self.columns, expr)
+        if isinstance(expr, (AST_NumberLiteral, AST_StringLiteral)):
+            return self._constant(expr.value)
+        if type(expr) in COMPARISONS and (
+                isinstance(expr.left_expr, AST_StringLiteral) !=
+                isinstance(expr.right_expr, AST_StringLiteral)):
+            return self._translate_literal_comparison(expr)
+        if type(expr) in OPERATORS:
+            left = self.translate(expr.left_expr)
+            right = self.translate(expr.right_expr)
+            var_l, var_r = self._new_var(), self._new_var()
+            return '(None if (%s := %s) is None or (%s := %s) is None ' \
+                   'else %s %s %s)' % (var_l, left, var_r, right, var_l,
+                                       OPERATORS[type(expr)], var_r)
+        if isinstance(expr, (AST_AND, AST_OR)):
+            # AND: False wins over NULL; OR: True wins over NULL
+            stop = 'False' if isinstance(expr, AST_AND) else 'True'
+            left = self.translate(expr.left_expr)
+            right = self.translate(expr.right_expr)
+            var_l, var_r = self._new_var(), self._new_var()
+            return '(%s if (%s := %s) is %s else %s if (%s := %s) is %s ' \
+                   'else None if %s is None or %s is None else %s)' % (
+                       stop, var_l, left, stop, stop, var_r, right, stop,
+                       var_l, var_r, 'True' if stop == 'False' else 'False')
+        if isinstance(expr, AST_NotBoolExpr):
+            var = self._new_var()
+            value = self.translate(expr.bool_expr)
+            return '(None if (%s := %s) is None else not %s)' % (var, value,
+                                                                 var)
+        if isinstance(expr, AST_NegArithExpr):
+            var = self._new_var()
+            value = self.translate(expr.arith_expr)
+            return '(None if (%s := %s) is None else -%s)' % (var, value, var)
+        if isinstance(expr, AST_EmptyExpr):
+            return 'True'
+        msg = 'Unsupported expression: %s' % type(expr).__name__
+        raise EngineException(msg)
+
+    def _translate_literal_comparison(self, expr):
+        """A value compared with a string literal: the literal is used
+        as is if the value is a string, otherwise it is coerced"""
+        is_left = isinstance(expr.left_expr, AST_StringLiteral)
+        literal = self.translate(expr.left_expr if is_left else
+                                 expr.right_expr)
+        value = self.translate(expr.right_expr if is_left else
+                               expr.left_expr)
+        var = self._new_var()
+        coerced = '_coerce(%s.__class__, %s)' % (var, literal)
+        op = OPERATORS[type(expr)]
+        if is_left:
+            compare_str = '%s %s %s' % (literal, op, var)
+            compare_other = '%s %s %s' % (coerced, op, var)
+        else:
+            compare_str = '%s %s %s' % (var, op, literal)
+            compare_other = '%s %s %s' % (var, op, coerced)
+        return '(None if (%s := %s) is None else %s if %s.__class__ is ' \
+               'str else %s)' % (var, value, compare_str, var, compare_other)
+
+
+def _build(source, name, constants):
+    namespace = dict(constants, _coerce=coerce_literal)
+    exec(compile(source, '<%s>' % name, 'exec'), namespace)
+    return namespace[name]
+
+
+def compile_expression(expr, columns):
+    """Returns a function that evaluates the expression for a row (a
+    tuple described by 'columns'), like a TreeEvaluator"""
+    compiler = ExpressionCompiler(columns)
+    source = 'def evaluate(row):\n    return %s\n' % compiler.translate(expr)
+    compiled = _build(source, 'evaluate', compiler.constants)
+    evaluator = TreeEvaluator(expr, columns)
+
+    def evaluate(row):
+        try:
+            return compiled(row)
+        except FALLBACK_ERRORS:
+            return evaluator(row)
+    return evaluate
+
+
+def compile_filter(expr, columns):
+    """Returns a function that takes a batch (list of rows) and returns
+    the rows for which the expression is True"""
+    compiler = ExpressionCompiler(columns)
+    source = 'def select(batch):\n' \
+             '    return [row for row in batch if %s is True]\n' \
+             % compiler.translate(expr)
+    compiled = _build(source, 'select', compiler.constants)
+    evaluator = TreeEvaluator(expr, columns)
+
+    def select(batch):
+        try:
+            return compiled(batch)
+        except FALLBACK_ERRORS:
+            return [row for row in batch if evaluator(row) is True]
+    return select
+
+
+def compile_projection(expressions, columns):
+    """Returns a function that takes a batch (list of rows) and returns
+    the tuples with the values of the expressions of each row"""
+    compiler = ExpressionCompiler(columns)
+    values = ', '.join(compiler.translate(expr) for expr in expressions)
+    source = 'def project(batch):\n' \
+             '    return [(%s,) for row in batch]\n' % values
+    compiled = _build(source, 'project', compiler.constants)
+    evaluators = [TreeEvaluator(expr, columns) for expr in expressions]
+
+    def project(batch):
+        try:
+            return compiled(batch)
+        except FALLBACK_ERRORS:
+            return [tuple([evaluate(row) for evaluate in evaluators])
+                    for row in batch]
+    return project
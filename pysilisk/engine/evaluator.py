@@ -0,0 +1,160 @@
+import functools
+import operator
+from datetime import date, datetime
+from pysilisk.parser.ast import AST_AND, AST_OR, AST_EQ, AST_NEQ, AST_GT
+from pysilisk.parser.ast import AST_GTE, AST_LT, AST_LTE, AST_Add, AST_Sub
+from pysilisk.parser.ast import AST_Mult, AST_Div, AST_Column, AST_EmptyExpr
+from pysilisk.parser.ast import AST_NumberLiteral, AST_StringLiteral
+from pysilisk.parser.ast import AST_NegArithExpr, AST_NotBoolExpr
+
+
+COMPARISONS = {AST_EQ: operator.eq, AST_NEQ: operator.ne,
+               AST_GT: operator.gt, AST_GTE: operator.ge,
+               AST_LT: operator.lt, AST_LTE: operator.le}
+ARITHMETIC = {AST_Add: operator.add, AST_Sub: operator.sub,
+              AST_Mult: operator.mul, AST_Div: operator.truediv}
+
+
+def resolve_column(columns, ast_column):
+    """Returns the position of a column in the rows described by
+    'columns' (list of (table-name, column-name))"""
+    positions = [i for i, (tbl_name, col_name) in enumerate(columns)
+                 if col_name == ast_column.col_name and
+                 (not ast_column.tbl_name or tbl_name == ast_column.tbl_name)]
+    name = ast_column.col_name
+    if ast_column.tbl_name:
+        name = '%s.%s' % (ast_column.tbl_name, name)
+    if not positions:
+        raise EngineException('Column %s does not exist' % name)
+    if len(positions) > 1:
+        raise EngineException('Column %s is ambiguous' % name)
+    return positions[0]
+
+
+@functools.lru_cache(maxsize=256)
+def coerce_literal(value_type, literal):
+    """Converts a string compared with a value of type value_type: it
+    becomes a date if the value is a DATE or a DATETIME (e.g. the
+    literal '2020-01-31'). The conversions are cached, so a literal is
+    parsed once."""
+    if not issubclass(value_type, date):
+        return literal
+    try:
+        if issubclass(value_type, datetime):
+            return datetime.fromisoformat(literal)
+        return date.fromisoformat(literal)
+    except ValueError:
+        raise EngineException('Invalid date: %r' % literal)
+
+
+def coerce_operands(left, right):
+    """Converts a string compared with a DATE or a DATETIME into a date
+    (see coerce_literal)"""
+    if isinstance(right, str) and isinstance(left, date):
+        return left, coerce_literal(type(left), right)
+    if isinstance(left, str) and isinstance(right, date):
+        return coerce_literal(type(right), left), right
+    return left, right
+
+
+def compare(op, left, right):
+    """Applies a comparison to two values that are not NULL. The
+    operands are coerced first (see coerce_operands): otherwise, a date
+    would be different from any string."""
+    if left.__class__ is not right.__class__:
+        left, right = coerce_operands(left, right)
+    try:
+        return op(left, right)
+    except TypeError:
+        msg = 'Can not compare %r and %r' % (left, right)
+        raise EngineException(msg)
+
+
+def apply_arithmetic(op, left, right):
+    """Applies an arithmetic operation to two values that are not NULL"""
+    try:
+        return op(left, right)
+    except ZeroDivisionError:
+        raise EngineException('Division by zero')
+    except TypeError:
+        msg = 'Invalid operands %r and %r' % (left, right)
+        raise EngineException(msg)
+
+
+class TreeEvaluator(object):
+    """Evaluates an expression (an AST built by to_ast_expr) for a row by
+    walking the tree. The columns are resolved once, when the evaluator
+    is created.
+
+    NULL is None: an arithmetic operation or a comparison with a NULL is
+    NULL, and AND, OR and NOT follow the three-valued logic of SQL (a
+    filter keeps the rows whose condition is True).
+    """
+
+    def __init__(self, expr, columns):
+        self.expr = expr
+        self._positions = {}  # id(ast-column) --> position in the row
+        self._bind(expr, columns)
+
+    def _bind(self, expr, columns):
+        if isinstance(expr, AST_Column):
+            self._positions[id(expr)] = resolve_column(columns, expr)
+            return
+        for attr in ('left_expr', 'right_expr', 'bool_expr', 'arith_expr'):
+            child = getattr(expr, attr, None)
+            if child is not None:
+                self._bind(child, columns)
+
+    def __call__(self, row):
+        return self._evaluate(self.expr, row)
+
+    def _evaluate(self, expr, row):
+        if isinstance(expr, AST_Column):
+            return row[self._positions[id(expr)]]
+        if isinstance(expr, (AST_NumberLiteral, AST_StringLiteral)):
+            return expr.value
+        expr_class = type(expr)
+        if expr_class in COMPARISONS:
+            left = self._evaluate(expr.left_expr, row)
+            right = self._evaluate(expr.right_expr, row)
+            if left is None or right is None:
+                return None
+            return compare(COMPARISONS[expr_class], left, right)
+        if expr_class in ARITHMETIC:
+            left = self._evaluate(expr.left_expr, row)
+            right = self._evaluate(expr.right_expr, row)
+            if left is None or right is None:
+                return None
+            return apply_arithmetic(ARITHMETIC[expr_class], left, right)
+        if isinstance(expr, AST_AND):
+            left = self._evaluate(expr.left_expr, row)
+            if left is False:
+                return False
+            right = self._evaluate(expr.right_expr, row)
+            if right is False:
+                return False
+            return None if left is None or right is None else True
+        if isinstance(expr, AST_OR):
+            left = self._evaluate(expr.left_expr, row)
+            if left is True:
+                return True
+            right = self._evaluate(expr.right_expr, row)
+            if right is True:
+                return True
+            return None if left is None or right is None else False
+        if isinstance(expr, AST_NotBoolExpr):
+            value = self._evaluate(expr.bool_expr, row)
+            return None if value is None else not value
+        if isinstance(expr, AST_NegArithExpr):
+            value = self._evaluate(expr.arith_expr, row)
+            return None if value is None else -value
+        if isinstance(expr, AST_EmptyExpr):
+            return True
+        msg = 'Unsupported expression: %s' % type(expr).__name__
+        raise EngineException(msg)
+
+
+class EngineException(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
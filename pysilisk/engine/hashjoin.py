@@ -0,0 +1,255 @@
+from pysilisk.parser.ast import AST_AND, AST_EQ, AST_Column, AST_EmptyExpr
+from pysilisk.engine.evaluator import EngineException, resolve_column
+from pysilisk.engine.compiler import compile_filter
+from pysilisk.engine.operators import Operator, NestedLoopJoin
+from pysilisk.engine.operators import DEFAULT_BATCH_SIZE
+from pysilisk.engine.spill import SpillFile
+
+DEFAULT_MAX_BUILD_ROWS = 100000
+
+
+def _conjuncts(expr):
+    if isinstance(expr, AST_AND):
+        return _conjuncts(expr.left_expr) + _conjuncts(expr.right_expr)
+    return [expr]
+
+
+def _side(columns, ast_column):
+    try:
+        return resolve_column(columns, ast_column)
+    except EngineException:
+        return None
+
+
+def extract_equi_join(condition, left_columns, right_columns):
+    """Splits a join condition (an AST built by to_ast_expr) into the
+    equalities between a column of the left rows and a column of the
+    right rows that are joined by ANDs (e.g. 'f.day_id = d.id'), and the
+    rest of the condition. Returns (left-keys, right-keys, residual):
+    the positions of the columns of each equality in its rows, and an
+    AST with the other conjuncts (None if there are none)."""
+    left_keys, right_keys, others = [], [], []
+    if condition is None or isinstance(condition, AST_EmptyExpr):
+        return left_keys, right_keys, None
+    for expr in _conjuncts(condition):
+        if type(expr) is AST_EQ and \
+                isinstance(expr.left_expr, AST_Column) and \
+                isinstance(expr.right_expr, AST_Column):
+            all_columns = list(left_columns) + list(right_columns)
+            # A column must not be ambiguous in the joined rows
+            resolve_column(all_columns, expr.left_expr)
+            resolve_column(all_columns, expr.right_expr)
+            left = _side(left_columns, expr.left_expr)
+            right = _side(right_columns, expr.right_expr)
+            if left is None or right is None:
+                left = _side(left_columns, expr.right_expr)
+                right = _side(right_columns, expr.left_expr)
+            if left is not None and right is not None:
+                left_keys.append(left)
+                right_keys.append(right)
+                continue
+        others.append(expr)
+    residual = None
+    for expr in others:
+        residual = expr if residual is None else AST_AND(residual, expr)
+    return left_keys, right_keys, residual
+
+
+class HashJoin(Operator):
+    """Equi-join of the rows of the left child (probe side) with the rows
+    of the right child (build side, the smaller one: e.g. a dimension
+    table). The right rows are kept in a hash-table by the values of
+    their keys, and each left row looks for the rows with its key. The
+    rows with a NULL in the key are not joined. The residual condition
+    is evaluated on the joined rows (left row + right row).
+
+    If there are more than max_build_rows right rows and the join has a
+    buffer-manager, it becomes a Grace hash-join: both sides are split
+    into num_partitions partitions (SpillFiles) by the hash of the key,
+    and each pair of partitions is joined; a partition that is still too
+    large is partitioned again with another hash (up to MAX_LEVEL
+    times). The output is not in the order of the left rows then.
+    """
+
+    MAX_LEVEL = 4
+
+    def __init__(self, left, right, left_keys, right_keys, residual=None,
+                 buff_mngr=None, max_build_rows=DEFAULT_MAX_BUILD_ROWS,
+                 num_partitions=16, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__([left, right], batch_size)
+        if not left_keys or len(left_keys) != len(right_keys):
+            raise EngineException('A hash-join requires equi-join keys')
+        self.left_keys = list(left_keys)
+        self.right_keys = list(right_keys)
+        self.residual = residual
+        self.buff_mngr = buff_mngr
+        self.max_build_rows = max_build_rows
+        self.num_partitions = num_partitions
+        self.columns = list(left.columns) + list(right.columns)
+        self._select = None
+        if residual is not None and not isinstance(residual, AST_EmptyExpr):
+            self._select = compile_filter(residual, self.columns)
+        self._left_key = self._key_function(self.left_keys)
+        self._right_key = self._key_function(self.right_keys)
+        self.num_spilled_partitions = 0
+        self._batches = None
+        self._spill_files = []
+        self._pending = []
+
+    @staticmethod
+    def _key_function(positions):
+        if len(positions) == 1:
+            position = positions[0]
+            return lambda row: row[position]
+        return lambda row: tuple([row[i] for i in positions])
+
+    @staticmethod
+    def _has_null(key):
+        if isinstance(key, tuple):
+            return None in key
+        return key is None
+
+    def open(self):
+        super().open()
+        self.num_spilled_partitions = 0
+        self._batches = self._join()
+        self._pending = []
+
+    def next_batch(self):
+        while len(self._pending) < self.batch_size and \
+                self._batches is not None:
+            batch = next(self._batches, None)
+            if batch is None:
+                self._batches = None
+            else:
+                self._pending.extend(batch)
+        batch = self._pending[:self.batch_size]
+        del self._pending[:self.batch_size]
+        return batch
+
+    def close(self):
+        super().close()
+        self._batches = None
+        self._pending = []
+        for spill_file in self._spill_files:
+            spill_file.free()
+        self._spill_files = []
+
+    @staticmethod
+    def _child_batches(child):
+        batch = child.next_batch()
+        while batch:
+            yield batch
+            batch = child.next_batch()
+
+    def _join(self):
+        """Generates the batches of joined rows"""
+        left, right = self.children
+        build_rows = []
+        partitions = None
+        can_spill = self.buff_mngr is not None
+        for batch in self._child_batches(right):
+            if partitions is None:
+                build_rows.extend(batch)
+                if can_spill and len(build_rows) > self.max_build_rows:
+                    partitions = self._partition(build_rows,
+                                                 self._right_key, 0)
+                    build_rows = None
+            else:
+                self._add_to_partitions(partitions, batch,
+                                        self._right_key, 0)
+        if partitions is None:
+            table = self._build(build_rows)
+            for batch in self._child_batches(left):
+                yield self._probe(table, batch)
+            return
+        # Grace hash-join
+        left_partitions = self._new_partitions()
+        for batch in self._child_batches(left):
+            self._add_to_partitions(left_partitions, batch,
+                                    self._left_key, 0)
+        for pair in zip(partitions, left_partitions):
+            yield from self._join_partitions(pair[0], pair[1], 1)
+
+    def _build(self, rows):
+        table = {}
+        key_of = self._right_key
+        for row in rows:
+            key = key_of(row)
+            if not self._has_null(key):
+                table.setdefault(key, []).append(row)
+        return table
+
+    def _probe(self, table, batch):
+        key_of = self._left_key
+        joined = []
+        for left_row in batch:
+            matches = table.get(key_of(left_row))
+            if matches:
+                joined.extend(left_row + right_row for right_row in matches)
+        if self._select is not None and joined:
+            joined = self._select(joined)
+        return joined
+
+    def _new_partitions(self):
+        partitions = [SpillFile(self.buff_mngr)
+                      for _ in range(self.num_partitions)]
+        self._spill_files.extend(partitions)
+        self.num_spilled_partitions += len(partitions)
+        return partitions
+
+    def _partition(self, rows, key_of, level):
+        partitions = self._new_partitions()
+        self._add_to_partitions(partitions, rows, key_of, level)
+        return partitions
+
+    def _add_to_partitions(self, partitions, rows, key_of, level):
+        num_partitions = self.num_partitions
+        for row in rows:
+            key = key_of(row)
+            if not self._has_null(key):
+                partitions[hash((level, key)) % num_partitions].append(row)
+
+    def _release(self, spill_file):
+        spill_file.free()
+        self._spill_files.remove(spill_file)
+
+    def _join_partitions(self, build_file, probe_file, level):
+        if not len(build_file) or not len(probe_file):
+            self._release(build_file)
+            self._release(probe_file)
+            return
+        if len(build_file) > self.max_build_rows and level < self.MAX_LEVEL:
+            build_parts = self._new_partitions()
+            for chunk in build_file.chunks():
+                self._add_to_partitions(build_parts, chunk, self._right_key,
+                                        level)
+            self._release(build_file)
+            probe_parts = self._new_partitions()
+            for chunk in probe_file.chunks():
+                self._add_to_partitions(probe_parts, chunk, self._left_key,
+                                        level)
+            self._release(probe_file)
+            for pair in zip(build_parts, probe_parts):
+                yield from self._join_partitions(pair[0], pair[1], level + 1)
+            return
+        # It fits in memory (or all its rows have the same key)
+        table = self._build(build_file.rows())
+        self._release(build_file)
+        for chunk in probe_file.chunks():
+            yield self._probe(table, chunk)
+        self._release(probe_file)
+
+
+def make_join(left, right, condition=None, buff_mngr=None,
+              max_build_rows=DEFAULT_MAX_BUILD_ROWS,
+              batch_size=DEFAULT_BATCH_SIZE):
+    """Returns the join operator of two plans: a HashJoin if the
+    condition has equalities between the columns of both sides, a
+    NestedLoopJoin otherwise"""
+    left_keys, right_keys, residual = extract_equi_join(
+        condition, left.columns, right.columns)
+    if left_keys:
+        return HashJoin(left, right, left_keys, right_keys, residual,
+                        buff_mngr, max_build_rows, batch_size=batch_size)
+    return NestedLoopJoin(left, right, condition, batch_size)
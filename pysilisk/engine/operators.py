@@ -0,0 +1,467 @@
+import heapq
+from itertools import islice
+from pysilisk.parser.ast import AST_Column, AST_EmptyExpr, OrderType
+from pysilisk.parser.ast import AST_OrderByColumn
+from pysilisk.engine.evaluator import resolve_column
+from pysilisk.engine.compiler import compile_expression, compile_filter
+from pysilisk.engine.compiler import compile_projection
+from pysilisk.engine.vectorized import VectorProgram
+from pysilisk.engine.spill import SpillFile
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_MAX_SORT_ROWS = 100000
+
+
+class Operator(object):
+    """Physical operator (an iterator of the Volcano model) that produces
+    batches of rows:
+
+        open()       - prepares the operator and its children
+        next_batch() - returns a list of at most batch_size rows (tuples);
+                       an empty list when there are no more rows
+        close()      - releases the resources of the operator and its
+                       children
+
+    A call returns a batch instead of a row, so the cost of the calls
+    (and of the python interpreter) is spread over many rows. 'columns'
+    describes the values of the rows: a list of (table-name,
+    column-name); the computed values have an empty table-name.
+    """
+
+    def __init__(self, children=(), batch_size=DEFAULT_BATCH_SIZE):
+        self.children = list(children)
+        self.batch_size = batch_size
+        self.columns = []
+
+    def set_batch_size(self, batch_size):
+        self.batch_size = batch_size
+        for child in self.children:
+            child.set_batch_size(batch_size)
+
+    def open(self):
+        for child in self.children:
+            child.open()
+
+    def next_batch(self):
+        raise NotImplementedError()
+
+    def close(self):
+        for child in self.children:
+            child.close()
+
+
+class SeqScan(Operator):
+    """Reads the rows of a table-file (HeapFile or ColumnarFile). Only the
+    columns in col_names are decoded (all by default). The pages that can
+    not satisfy the predicates (ZonePredicates) are skipped; the rows
+    are not filtered."""
+
+    def __init__(self, table_file, col_names=None, alias=None,
+                 predicates=None, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__((), batch_size)
+        self.table_file = table_file
+        schema = table_file.schema
+        if col_names is None:
+            col_names = [c.name for c in schema.columns]
+        self.col_names = list(col_names)
+        self.predicates = predicates
+        table_name = alias or schema.table_name
+        self.columns = [(table_name, name) for name in self.col_names]
+        self._rows = None
+
+    def open(self):
+        scan = self.table_file.scan(self.col_names, self.predicates)
+        self._rows = (row for _, row in scan)
+
+    def next_batch(self):
+        if self._rows is None:
+            return []
+        batch = list(islice(self._rows, self.batch_size))
+        if not batch:
+            self._rows = None
+        return batch
+
+    def close(self):
+        self._rows = None
+
+
+class VectorScan(Operator):
+    """Reads the rows of a table-file by columns (see scan_vectors) and
+    evaluates the condition and the expressions over whole column
+    vectors with numpy (see VectorProgram). The expressions that can not
+    be vectorized are evaluated row by row. Without expressions, the
+    rows have the columns in col_names."""
+
+    def __init__(self, table_file, col_names=None, alias=None,
+                 condition=None, expressions=None, aliases=None,
+                 predicates=None, batch_size=DEFAULT_BATCH_SIZE,
+                 pages_per_batch=16, use_numpy=None):
+        super().__init__((), batch_size)
+        self.table_file = table_file
+        schema = table_file.schema
+        if col_names is None:
+            col_names = [c.name for c in schema.columns]
+        self.col_names = list(col_names)
+        self.predicates = predicates
+        self.pages_per_batch = pages_per_batch
+        self.use_numpy = use_numpy
+        table_name = alias or schema.table_name
+        scan_columns = [(table_name, name) for name in self.col_names]
+        type_ids = [schema.columns[schema.column_index(name)].type_id
+                    for name in self.col_names]
+        self.program = VectorProgram(scan_columns, type_ids, condition,
+                                     expressions)
+        if expressions is None:
+            self.columns = scan_columns
+        else:
+            aliases = aliases or [None] * len(expressions)
+            self.columns = []
+            for i, expr in enumerate(expressions):
+                if aliases[i] is not None:
+                    self.columns.append(('', aliases[i]))
+                elif isinstance(expr, AST_Column):
+                    position = resolve_column(scan_columns, expr)
+                    self.columns.append(scan_columns[position])
+                else:
+                    self.columns.append(('', 'expr-%d' % (i + 1)))
+        self._batches = None
+        self._rows = []
+
+    def open(self):
+        self._batches = self.table_file.scan_vectors(
+            self.col_names, self.pages_per_batch, self.use_numpy,
+            self.predicates, with_rids=False)
+        self._rows = []
+
+    def column_batches(self):
+        """Generates the filtered and projected ColumnBatches (their
+        vectors keep the numpy arrays, e.g. to aggregate them). Only if
+        the program is vectorized."""
+        batches = self.table_file.scan_vectors(
+            self.col_names, self.pages_per_batch, self.use_numpy,
+            self.predicates, with_rids=False)
+        for batch in batches:
+            batch = self.program.process(batch)
+            if batch.num_rows:
+                yield batch
+
+    def next_batch(self):
+        while len(self._rows) < self.batch_size and \
+                self._batches is not None:
+            batch = next(self._batches, None)
+            if batch is None:
+                self._batches = None
+            else:
+                self._rows.extend(self.program.rows(batch))
+        batch = self._rows[:self.batch_size]
+        del self._rows[:self.batch_size]
+        return batch
+
+    def close(self):
+        self._batches = None
+        self._rows = []
+
+
+class Filter(Operator):
+    """Keeps the rows whose condition (an AST expression) is True"""
+
+    def __init__(self, child, condition, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__([child], batch_size)
+        self.condition = condition
+        self.columns = list(child.columns)
+        self._select = None
+        if not isinstance(condition, AST_EmptyExpr):
+            self._select = compile_filter(condition, self.columns)
+
+    def next_batch(self):
+        child = self.children[0]
+        while True:
+            batch = child.next_batch()
+            if not batch or self._select is None:
+                return batch
+            batch = self._select(batch)
+            if batch:
+                return batch
+
+
+class Project(Operator):
+    """Computes the expressions (ASTs) of each row. The names of the
+    computed columns are given by 'aliases' (expr-N by default)."""
+
+    def __init__(self, child, expressions, aliases=None,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__([child], batch_size)
+        self.expressions = list(expressions)
+        aliases = aliases or [None] * len(self.expressions)
+        self.columns = []
+        for i, expr in enumerate(self.expressions):
+            if aliases[i] is not None:
+                self.columns.append(('', aliases[i]))
+            elif isinstance(expr, AST_Column):
+                position = resolve_column(child.columns, expr)
+                self.columns.append(child.columns[position])
+            else:
+                self.columns.append(('', 'expr-%d' % (i + 1)))
+        if all(isinstance(expr, AST_Column) for expr in self.expressions):
+            # Only columns: the values are just picked
+            self._positions = [resolve_column(child.columns, expr)
+                               for expr in self.expressions]
+            self._project = None
+        else:
+            self._positions = None
+            self._project = compile_projection(self.expressions,
+                                               child.columns)
+
+    def next_batch(self):
+        batch = self.children[0].next_batch()
+        if self._positions is not None:
+            positions = self._positions
+            return [tuple([row[i] for i in positions]) for row in batch]
+        return self._project(batch)
+
+
+def null_last_key(value):
+    """Sort key of a value: the NULLs go after the other values"""
+    return (value is None, value)
+
+
+class Descending(object):
+    """Sort key that reverses the order of another key"""
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+class Sort(Operator):
+    """Sorts the rows by a list of (expression, OrderType) or of
+    AST_OrderByColumn (ORDER BY). The rows of the child are read (and
+    sorted) by the first call to next_batch. The NULLs are greater than
+    the other values. The sort is stable.
+
+    If there are more than max_rows rows and the sort has a
+    buffer-manager, it becomes an external merge sort: each max_rows
+    rows are sorted in memory and written as a run to a SpillFile, and
+    the runs are merged with a heap (heapq.merge), merge_fan_in runs at
+    a time; the last merge is streamed by next_batch.
+    """
+
+    def __init__(self, child, sort_keys, buff_mngr=None,
+                 max_rows=DEFAULT_MAX_SORT_ROWS, merge_fan_in=64,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__([child], batch_size)
+        self.sort_keys = [(k.ast_column, k.order_type)
+                          if isinstance(k, AST_OrderByColumn) else tuple(k)
+                          for k in sort_keys]
+        self.buff_mngr = buff_mngr
+        self.max_rows = max_rows
+        self.merge_fan_in = merge_fan_in
+        self.columns = list(child.columns)
+        self._key_of, self._reverse = self._key_function()
+        self.num_runs = 0
+        self._runs = []
+        self._rows = None
+        self._merged = None
+        self._position = 0
+
+    def _key_function(self):
+        """Returns (key-function, reverse). If all the keys have the same
+        order, the keys are not wrapped: the rows are sorted (and merged)
+        with reverse=True for DESC."""
+        evaluators = [compile_expression(expr, self.columns)
+                      for expr, _ in self.sort_keys]
+        descending = [order_type == OrderType.DESC
+                      for _, order_type in self.sort_keys]
+        if len(set(descending)) > 1:
+            keys = list(zip(evaluators, descending))
+
+            def key_of(row):
+                return tuple([Descending(null_last_key(evaluate(row)))
+                              if is_desc else null_last_key(evaluate(row))
+                              for evaluate, is_desc in keys])
+            return key_of, False
+        if len(evaluators) == 1:
+            evaluate = evaluators[0]
+
+            def key_of(row):
+                value = evaluate(row)
+                return (value is None, value)
+        else:
+            def key_of(row):
+                return tuple([null_last_key(evaluate(row))
+                              for evaluate in evaluators])
+        return key_of, all(descending)
+
+    def open(self):
+        super().open()
+        self._free_runs()
+        self.num_runs = 0
+        self._rows = None
+        self._merged = None
+        self._position = 0
+
+    def _sort(self):
+        """Sorts the rows in memory (into self._rows) or merges the runs
+        (into self._merged)"""
+        child = self.children[0]
+        can_spill = self.buff_mngr is not None
+        rows = []
+        batch = child.next_batch()
+        while batch:
+            rows.extend(batch)
+            if can_spill and len(rows) >= self.max_rows:
+                self._write_run(rows[:self.max_rows])
+                rows = rows[self.max_rows:]
+            batch = child.next_batch()
+        rows.sort(key=self._key_of, reverse=self._reverse)
+        if not self._runs:
+            self._rows = rows
+            return
+        if rows:
+            self._write_run(rows, is_sorted=True)
+        while len(self._runs) > self.merge_fan_in:
+            self._merge_runs()
+        self._merged = heapq.merge(*[run.rows() for run in self._runs],
+                                   key=self._key_of, reverse=self._reverse)
+
+    def _write_run(self, rows, is_sorted=False):
+        if not is_sorted:
+            rows.sort(key=self._key_of, reverse=self._reverse)
+        run = SpillFile(self.buff_mngr)
+        run.extend(rows)
+        run.flush()
+        self._runs.append(run)
+        self.num_runs += 1
+
+    def _merge_runs(self):
+        """Merges each merge_fan_in consecutive runs into a new run. The
+        runs keep the order of the rows of the child: the merge is
+        stable."""
+        runs = []
+        for i in range(0, len(self._runs), self.merge_fan_in):
+            group = self._runs[i:i + self.merge_fan_in]
+            merged = SpillFile(self.buff_mngr)
+            merged.extend(heapq.merge(*[run.rows() for run in group],
+                                      key=self._key_of,
+                                      reverse=self._reverse))
+            merged.flush()
+            for run in group:
+                run.free()
+            runs.append(merged)
+        self._runs = runs
+
+    def next_batch(self):
+        if self._rows is None and self._merged is None:
+            self._sort()
+        if self._merged is not None:
+            return list(islice(self._merged, self.batch_size))
+        batch = self._rows[self._position:self._position + self.batch_size]
+        self._position += len(batch)
+        return batch
+
+    def _free_runs(self):
+        for run in self._runs:
+            run.free()
+        self._runs = []
+
+    def close(self):
+        super().close()
+        self._merged = None
+        self._rows = None
+        self._free_runs()
+
+
+class NestedLoopJoin(Operator):
+    """Joins the rows of the left child with the rows of the right child
+    that satisfy the condition (all of them if it is None). The right
+    rows are read once and kept in memory; each batch of left rows is
+    joined with all of them (block nested loop)."""
+
+    def __init__(self, left, right, condition=None,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__([left, right], batch_size)
+        self.condition = condition
+        self.columns = list(left.columns) + list(right.columns)
+        self._select = None
+        if condition is not None and \
+                not isinstance(condition, AST_EmptyExpr):
+            self._select = compile_filter(condition, self.columns)
+        self._right_rows = None
+        self._pending = []
+
+    def open(self):
+        super().open()
+        self._right_rows = None
+        self._pending = []
+
+    def _read_right(self):
+        rows = []
+        right = self.children[1]
+        batch = right.next_batch()
+        while batch:
+            rows.extend(batch)
+            batch = right.next_batch()
+        return rows
+
+    def next_batch(self):
+        if self._right_rows is None:
+            self._right_rows = self._read_right()
+        left = self.children[0]
+        select = self._select
+        while len(self._pending) < self.batch_size:
+            batch = left.next_batch()
+            if not batch:
+                break
+            right_rows = self._right_rows
+            for left_row in batch:
+                joined = [left_row + right_row for right_row in right_rows]
+                if select is not None:
+                    joined = select(joined)
+                self._pending.extend(joined)
+        batch = self._pending[:self.batch_size]
+        del self._pending[:self.batch_size]
+        return batch
+
+    def close(self):
+        super().close()
+        self._right_rows = None
+        self._pending = []
+
+
+class Limit(Operator):
+    """Returns at most 'limit' rows, after skipping 'offset' rows"""
+
+    def __init__(self, child, limit, offset=0, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__([child], batch_size)
+        self.limit = limit
+        self.offset = offset
+        self.columns = list(child.columns)
+        self._skipped = 0
+        self._returned = 0
+
+    def open(self):
+        super().open()
+        self._skipped = 0
+        self._returned = 0
+
+    def next_batch(self):
+        child = self.children[0]
+        while self._returned < self.limit:
+            batch = child.next_batch()
+            if not batch:
+                return []
+            if self._skipped < self.offset:
+                skip = min(self.offset - self._skipped, len(batch))
+                self._skipped += skip
+                batch = batch[skip:]
+            batch = batch[:self.limit - self._returned]
+            if batch:
+                self._returned += len(batch)
+                return batch
+        return []
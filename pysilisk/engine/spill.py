@@ -0,0 +1,115 @@
+import pickle
+import struct
+from pysilisk.dsm import DiskPage
+
+
+class SpillFile(object):
+    """Temporary file of rows (tuples) stored in pages of the database
+    file: the pages are allocated by the buffer-manager (so the
+    disk-space-manager) and they are released by free(). It is used by
+    the operators whose rows do not fit in their memory budget (e.g. the
+    partitions of a HashJoin or the runs of an external Sort).
+
+    The rows are pickled in chunks of ROWS_PER_CHUNK rows; the file is a
+    stream of chunks (<I length + pickle) cut into pages:
+
+        Page: [num-bytes <H][bytes of the stream]
+
+    The ids of the pages are kept in memory: a spill-file does not
+    survive the process (its pages are not logged in the WAL).
+    """
+
+    ROWS_PER_CHUNK = 256
+    FMT_HEADER = '<H'
+    HEADER_SIZE = struct.calcsize(FMT_HEADER)
+    FMT_CHUNK_LEN = '<I'
+    CHUNK_LEN_SIZE = struct.calcsize(FMT_CHUNK_LEN)
+    PAGE_CAPACITY = DiskPage.PAGE_DATA_SIZE - HEADER_SIZE
+
+    def __init__(self, buff_mngr):
+        self.buff_mngr = buff_mngr
+        self.page_ids = []
+        self.num_rows = 0
+        self._rows = []  # Rows that are not pickled yet
+        self._stream = bytearray()  # Bytes that are not in a page yet
+
+    def __len__(self):
+        return self.num_rows
+
+    def append(self, row):
+        self._rows.append(row)
+        self.num_rows += 1
+        if len(self._rows) >= self.ROWS_PER_CHUNK:
+            self._pickle_rows()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def _pickle_rows(self):
+        chunk = pickle.dumps(self._rows, pickle.HIGHEST_PROTOCOL)
+        self._rows = []
+        self._stream += struct.pack(self.FMT_CHUNK_LEN, len(chunk))
+        self._stream += chunk
+        while len(self._stream) >= self.PAGE_CAPACITY:
+            self._write_page(self.PAGE_CAPACITY)
+
+    def _write_page(self, num_bytes):
+        disk_page = self.buff_mngr.new_page()
+        try:
+            data = disk_page.data
+            struct.pack_into(self.FMT_HEADER, data, 0, num_bytes)
+            start = self.HEADER_SIZE
+            data[start:start + num_bytes] = self._stream[:num_bytes]
+        finally:
+            self.buff_mngr.unpin(disk_page.id, is_dirty=True)
+        self.page_ids.append(disk_page.id)
+        del self._stream[:num_bytes]
+
+    def flush(self):
+        """Writes the rows kept in memory to the pages"""
+        if self._rows:
+            self._pickle_rows()
+        if self._stream:
+            self._write_page(len(self._stream))
+
+    def rows(self):
+        """Generates the rows in the order they were appended"""
+        for chunk in self.chunks():
+            yield from chunk
+
+    def chunks(self):
+        """Generates the rows in lists (of at most ROWS_PER_CHUNK rows)"""
+        self.flush()
+        buffer = bytearray()
+        position = 0
+        for page_id in list(self.page_ids):
+            disk_page = self.buff_mngr.pin(page_id)
+            try:
+                data = disk_page.data
+                num_bytes = struct.unpack_from(self.FMT_HEADER, data, 0)[0]
+                start = self.HEADER_SIZE
+                buffer += data[start:start + num_bytes]
+            finally:
+                self.buff_mngr.unpin(page_id)
+            while True:
+                end = position + self.CHUNK_LEN_SIZE
+                if end > len(buffer):
+                    break
+                chunk_len = struct.unpack_from(self.FMT_CHUNK_LEN, buffer,
+                                               position)[0]
+                if end + chunk_len > len(buffer):
+                    break
+                yield pickle.loads(buffer[end:end + chunk_len])
+                position = end + chunk_len
+            del buffer[:position]
+            position = 0
+
+    def free(self):
+        """Releases the pages of the file"""
+        for page_id in self.page_ids:
+            self.buff_mngr.free_page(page_id)
+        self.page_ids = []
+        self.num_rows = 0
+        self._rows = []
+        self._stream = bytearray()
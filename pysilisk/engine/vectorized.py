@@ -0,0 +1,388 @@
+from datetime import date, datetime
+from pysilisk.parser.ast import AST_AND, AST_OR, AST_EQ, AST_NEQ, AST_GT
+from pysilisk.parser.ast import AST_GTE, AST_LT, AST_LTE, AST_Add, AST_Sub
+from pysilisk.parser.ast import AST_Mult, AST_Div, AST_Column, AST_EmptyExpr
+from pysilisk.parser.ast import AST_NumberLiteral, AST_StringLiteral
+from pysilisk.parser.ast import AST_NegArithExpr, AST_NotBoolExpr
+from pysilisk.engine.evaluator import EngineException, resolve_column
+from pysilisk.engine.compiler import compile_filter, compile_projection
+from pysilisk.sqltypes import SQLDataType
+from pysilisk.vectors import ColumnBatch, ColumnVector, has_numpy
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+COMPARISONS = {AST_EQ: '__eq__', AST_NEQ: '__ne__', AST_GT: '__gt__',
+               AST_GTE: '__ge__', AST_LT: '__lt__', AST_LTE: '__le__'}
+ARITHMETIC = {AST_Add: '__add__', AST_Sub: '__sub__', AST_Mult: '__mul__',
+              AST_Div: '__truediv__'}
+
+# Kinds of the values of an expression
+NUMBER, STRING, BOOLEAN = 'number', 'string', 'boolean'
+_KINDS = {SQLDataType.INTEGER: NUMBER, SQLDataType.FLOAT: NUMBER,
+          SQLDataType.VARCHAR: STRING, SQLDataType.CHAR: STRING,
+          SQLDataType.DATE: SQLDataType.DATE,
+          SQLDataType.DATETIME: SQLDataType.DATETIME}
+
+
+class VectorEvaluator(object):
+    """Evaluates an expression (an AST built by to_ast_expr) over the
+    ColumnVectors of a ColumnBatch with numpy: a call per node and per
+    batch, not per row. The result of a node is (values, nulls): a numpy
+    array (or a scalar for the literals) and a bool array with the NULLs
+    (None if there are no NULLs). The values of the NULLs are
+    meaningless; the comparisons and AND, OR and NOT follow the
+    three-valued logic of the TreeEvaluator. A dictionary-encoded column
+    compared (= or <>) with a string literal is not decoded: its codes
+    are compared with the code of the literal.
+
+    The expression is checked when the evaluator is created: an
+    expression that can not be evaluated with numpy (e.g. arithmetic
+    over strings, or numpy is not installed) raises
+    VectorizationUnsupported, and the rows must be evaluated one by one.
+
+    columns  - (table-name, column-name) of the vectors of the batches
+    type_ids - SQLDataType of each column
+    """
+
+    def __init__(self, expr, columns, type_ids):
+        if not has_numpy():
+            raise VectorizationUnsupported('numpy is not installed')
+        self.expr = expr
+        self.columns = columns
+        self.type_ids = type_ids
+        self.kind, self._evaluate = self._build(expr)
+
+    def __call__(self, batch):
+        """Returns (values, nulls) with a value per row of the batch"""
+        cache = {}
+        values, nulls = self._evaluate(batch.vectors, cache)
+        num_rows = batch.num_rows
+        if numpy.ndim(values) == 0:
+            values = numpy.full(num_rows, values)
+        if nulls is not None and numpy.ndim(nulls) == 0:
+            nulls = numpy.full(num_rows, nulls, dtype=bool)
+        return values, nulls
+
+    def select(self, batch):
+        """Returns the positions of the rows whose value is True"""
+        values, nulls = self(batch)
+        mask = values.astype(bool, copy=False)
+        if nulls is not None:
+            mask = mask & ~nulls
+        return numpy.flatnonzero(mask)
+
+    # The builders return (kind, function(vectors, cache) --> (values,
+    # nulls))
+
+    def _build(self, expr):
+        if isinstance(expr, AST_Column):
+            return self._build_column(resolve_column(self.columns, expr))
+        if isinstance(expr, AST_NumberLiteral):
+            value = expr.value
+            return NUMBER, lambda vectors, cache: (value, None)
+        if isinstance(expr, AST_StringLiteral):
+            value = expr.value
+            return STRING, lambda vectors, cache: (value, None)
+        if type(expr) in COMPARISONS:
+            return self._build_comparison(expr)
+        if type(expr) in ARITHMETIC:
+            return self._build_arithmetic(expr)
+        if isinstance(expr, (AST_AND, AST_OR)):
+            return self._build_logical(expr)
+        if isinstance(expr, AST_NotBoolExpr):
+            kind, evaluate = self._build(expr.bool_expr)
+            self._check(kind == BOOLEAN, expr)
+
+            def negate(vectors, cache):
+                values, nulls = evaluate(vectors, cache)
+                return ~values, nulls
+            return BOOLEAN, negate
+        if isinstance(expr, AST_NegArithExpr):
+            kind, evaluate = self._build(expr.arith_expr)
+            self._check(kind == NUMBER, expr)
+
+            def minus(vectors, cache):
+                values, nulls = evaluate(vectors, cache)
+                return -values, nulls
+            return NUMBER, minus
+        if isinstance(expr, AST_EmptyExpr):
+            return BOOLEAN, lambda vectors, cache: (True, None)
+        self._check(False, expr)
+
+    @staticmethod
+    def _check(condition, expr):
+        if not condition:
+            msg = 'Can not vectorize %s' % type(expr).__name__
+            raise VectorizationUnsupported(msg)
+
+    def _build_column(self, position):
+        type_id = self.type_ids[position]
+        kind = _KINDS.get(type_id)
+        if kind is None:
+            raise VectorizationUnsupported('Unsupported type %s' % type_id)
+
+        def column(vectors, cache):
+            if position not in cache:
+                cache[position] = self._column_values(vectors[position])
+            return cache[position]
+        return kind, column
+
+    @staticmethod
+    def _column_values(vector):
+        nulls = vector.null_mask
+        if nulls is not None:
+            nulls = numpy.asarray(nulls, dtype=bool)
+        if vector.dictionary is not None:
+            # The codes are decoded with a single lookup (the code of a
+            # NULL is 0, even if the dictionary is empty)
+            values = numpy.array(vector.dictionary.values + [''],
+                                 dtype=object)[numpy.asarray(vector.data)]
+        elif vector.type_id in (SQLDataType.VARCHAR, SQLDataType.CHAR):
+            values = numpy.array(['' if v is None else v
+                                  for v in vector.data], dtype=object)
+        elif vector.type_id == SQLDataType.INTEGER:
+            # int64: the arithmetic of int4 values must not overflow
+            values = numpy.asarray(vector.data, dtype=numpy.int64)
+        else:
+            values = numpy.asarray(vector.data)
+        return values, nulls
+
+    def _build_comparison(self, expr):
+        left_kind, left = self._build(expr.left_expr)
+        right_kind, right = self._build(expr.right_expr)
+        if left_kind != right_kind:
+            # A DATE or a DATETIME compared with a string literal: the
+            # literal is converted into the physical value of the column
+            if right_kind == STRING and \
+                    isinstance(expr.right_expr, AST_StringLiteral):
+                right = self._date_literal(left_kind, expr.right_expr)
+                right_kind = left_kind
+            elif left_kind == STRING and \
+                    isinstance(expr.left_expr, AST_StringLiteral):
+                left = self._date_literal(right_kind, expr.left_expr)
+                left_kind = right_kind
+        self._check(left_kind == right_kind and left_kind != BOOLEAN, expr)
+        method = COMPARISONS[type(expr)]
+        column_literal = None
+        if method in ('__eq__', '__ne__'):
+            column_literal = self._column_literal(expr)
+
+        def compare(vectors, cache):
+            if column_literal is not None:
+                position, literal = column_literal
+                vector = vectors[position]
+                if vector.dictionary is not None:
+                    return _compare_codes(vector, literal, method)
+            left_values, left_nulls = left(vectors, cache)
+            right_values, right_nulls = right(vectors, cache)
+            values = getattr(numpy.asarray(left_values), method)(
+                right_values)
+            return values, _union(left_nulls, right_nulls)
+        return BOOLEAN, compare
+
+    def _column_literal(self, expr):
+        """Returns (position, value) of a comparison of a string column
+        with a string literal (None for other comparisons)"""
+        column, literal = expr.left_expr, expr.right_expr
+        if isinstance(column, AST_StringLiteral):
+            column, literal = literal, column
+        if not isinstance(column, AST_Column) or \
+                not isinstance(literal, AST_StringLiteral):
+            return None
+        position = resolve_column(self.columns, column)
+        if _KINDS.get(self.type_ids[position]) != STRING:
+            return None
+        return position, literal.value
+
+    def _date_literal(self, kind, ast_literal):
+        try:
+            if kind == SQLDataType.DATE:
+                value = date.fromisoformat(ast_literal.value)
+                value = value.year * 10000 + value.month * 100 + value.day
+            elif kind == SQLDataType.DATETIME:
+                value = datetime.fromisoformat(ast_literal.value).timestamp()
+            else:
+                raise ValueError()
+        except ValueError:
+            self._check(False, ast_literal)
+        return lambda vectors, cache: (value, None)
+
+    def _build_arithmetic(self, expr):
+        left_kind, left = self._build(expr.left_expr)
+        right_kind, right = self._build(expr.right_expr)
+        self._check(left_kind == NUMBER and right_kind == NUMBER, expr)
+        method = ARITHMETIC[type(expr)]
+        is_division = isinstance(expr, AST_Div)
+
+        def apply(vectors, cache):
+            left_values, left_nulls = left(vectors, cache)
+            right_values, right_nulls = right(vectors, cache)
+            nulls = _union(left_nulls, right_nulls)
+            if is_division:
+                zeros = numpy.asarray(right_values) == 0
+                if nulls is not None:
+                    zeros = zeros & ~nulls
+                if zeros.any():
+                    raise EngineException('Division by zero')
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                values = getattr(numpy.asarray(left_values), method)(
+                    right_values)
+            return values, nulls
+        return NUMBER, apply
+
+    def _build_logical(self, expr):
+        left_kind, left = self._build(expr.left_expr)
+        right_kind, right = self._build(expr.right_expr)
+        self._check(left_kind == BOOLEAN and right_kind == BOOLEAN, expr)
+        is_and = isinstance(expr, AST_AND)
+
+        def logical(vectors, cache):
+            left_values, left_nulls = left(vectors, cache)
+            right_values, right_nulls = right(vectors, cache)
+            nulls = _union(left_nulls, right_nulls)
+            if is_and:
+                values = numpy.logical_and(left_values, right_values)
+            else:
+                values = numpy.logical_or(left_values, right_values)
+            if nulls is None:
+                return values, None
+            # AND: a False (that is not NULL) wins over a NULL. OR: a True
+            # wins over a NULL
+            decided = _known(left_values, left_nulls, not is_and) | \
+                _known(right_values, right_nulls, not is_and)
+            return values, nulls & ~decided
+        return BOOLEAN, logical
+
+
+def _union(left_nulls, right_nulls):
+    if left_nulls is None:
+        return right_nulls
+    if right_nulls is None:
+        return left_nulls
+    return left_nulls | right_nulls
+
+
+def _compare_codes(vector, value, method):
+    """Compares (= or <>) a dictionary-encoded vector with a string by
+    their codes (see ColumnVector.equal_mask)"""
+    values = numpy.asarray(vector.equal_mask(value), dtype=bool)
+    if method == '__ne__':
+        values = ~values
+    nulls = vector.null_mask
+    if nulls is not None:
+        nulls = numpy.asarray(nulls, dtype=bool)
+    return values, nulls
+
+
+def _known(values, nulls, value):
+    """Returns the mask of the values equal to 'value' that are not NULL"""
+    mask = numpy.asarray(values) if value else ~numpy.asarray(values)
+    return mask if nulls is None else mask & ~nulls
+
+
+class VectorProgram(object):
+    """Filters and projects the ColumnBatches of a scan with numpy. The
+    condition and each expression are vectorized if they can be (see
+    VectorEvaluator); otherwise the rows of the batch are evaluated with
+    the compiled row-wise code (see compiler.py).
+
+    columns  - (table-name, column-name) of the vectors of the batches
+    type_ids - SQLDataType of each column
+    """
+
+    def __init__(self, columns, type_ids, condition=None, expressions=None):
+        self.columns = columns
+        self.type_ids = type_ids
+        self.condition = condition
+        self.expressions = expressions
+        self.vector_condition = None
+        if condition is not None and \
+                not isinstance(condition, AST_EmptyExpr):
+            self.vector_condition = self._vectorize(condition)
+            if self.vector_condition is not None and \
+                    self.vector_condition.kind != BOOLEAN:
+                self.vector_condition = None
+        self.vector_expressions = None
+        if expressions is not None:
+            self.vector_expressions = [self._vectorize(e)
+                                       for e in expressions]
+        self.is_vectorized = \
+            (condition is None or isinstance(condition, AST_EmptyExpr) or
+             self.vector_condition is not None) and \
+            (expressions is None or None not in self.vector_expressions)
+        self._row_filter = None
+        self._row_projection = None
+        if not self.is_vectorized:
+            if self.vector_condition is None and condition is not None:
+                self._row_filter = compile_filter(condition, columns)
+            if expressions is not None:
+                self._row_projection = compile_projection(expressions,
+                                                          columns)
+
+    def _vectorize(self, expr):
+        try:
+            return VectorEvaluator(expr, self.columns, self.type_ids)
+        except VectorizationUnsupported:
+            return None
+
+    def filter(self, batch):
+        """Returns a ColumnBatch with the rows of 'batch' that satisfy the
+        condition (the condition must be vectorized)"""
+        if self.vector_condition is None:
+            return batch
+        positions = self.vector_condition.select(batch)
+        if len(positions) == batch.num_rows:
+            return batch
+        rids = batch.rids
+        if rids is not None:
+            rids = [rids[i] for i in positions]
+        return ColumnBatch(batch.col_names,
+                           [v.take(positions) for v in batch.vectors],
+                           rids, len(positions))
+
+    def project(self, batch):
+        """Returns a ColumnBatch with a vector per expression (the
+        expressions must be vectorized)"""
+        if self.expressions is None:
+            return batch
+        vectors = []
+        names = []
+        for k, evaluator in enumerate(self.vector_expressions):
+            expr = self.expressions[k]
+            if isinstance(expr, AST_Column):
+                position = resolve_column(self.columns, expr)
+                vectors.append(batch.vectors[position])
+                names.append(self.columns[position][1])
+                continue
+            values, nulls = evaluator(batch)
+            vectors.append(ColumnVector(None, values, nulls))
+            names.append('expr-%d' % (k + 1))
+        return ColumnBatch(names, vectors, batch.rids, batch.num_rows)
+
+    def process(self, batch):
+        """Returns the ColumnBatch with the filtered and projected rows.
+        Only if the program is vectorized."""
+        return self.project(self.filter(batch))
+
+    def rows(self, batch):
+        """Returns the filtered and projected rows (tuples) of 'batch'"""
+        if self.is_vectorized:
+            return self.process(batch).rows()
+        if self.vector_condition is not None:
+            rows = self.filter(batch).rows()
+        else:
+            rows = batch.rows()
+            if self._row_filter is not None:
+                rows = self._row_filter(rows)
+        if self._row_projection is not None:
+            rows = self._row_projection(rows)
+        return rows
+
+
+class VectorizationUnsupported(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
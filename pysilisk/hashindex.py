@@ -0,0 +1,344 @@
+import struct
+import threading
+import zlib
+from pysilisk.dsm import DiskPage
+from pysilisk.records import RID
+from pysilisk.btree import IndexKeyCodec, IndexException
+
+
+class LinearHashIndex(object):
+    """Hash index with linear hashing, stored in pages of the buffer
+    manager. A bucket is a chain of pages (a primary page and its
+    overflow pages, linked by their next-page pointers):
+
+        | num-entries (2) | length (2) | entry | length (2) | entry | ...
+
+    The entries are the ones of the B+tree (key + RID, see
+    IndexKeyCodec), and the hash is the crc32 of the encoded key. With
+    'level' and 'split' (the next bucket to split), a key goes to the
+    bucket hash mod (N * 2^level), or hash mod (N * 2^(level + 1)) if that
+    bucket was already split in this round. When the entries take more
+    than MAX_LOAD of the primary pages, the bucket 'split' (not the
+    bucket that overflowed) is split in two: the index grows one bucket
+    at a time and it is never rehashed all at once.
+
+    The index is identified by its header page. The header has the
+    state of the index followed by the directory (the primary page of
+    each bucket), which continues in pages linked by next-page pointers:
+
+        | num-initial-buckets (4) | level (4) | split (4) |
+        | num-entries (4) | size (8) | num-ids (2) | page-id (4) | ... |
+
+    An equality lookup reads the primary page of a bucket (plus its
+    overflow pages, rarely). The buckets are not merged after deletes;
+    the empty overflow pages are released.
+    """
+
+    # This index only supports equality lookups of full keys
+    SUPPORTS_RANGES = False
+
+    FMT_HEADER = '<IIIIQ'
+    HEADER_SIZE = struct.calcsize(FMT_HEADER)
+    FMT_NUM_IDS = '<H'
+    FMT_ID = '<i'
+    ID_SIZE = struct.calcsize(FMT_ID)
+    FMT_NUM_ENTRIES = '<H'
+    ENTRIES_OFFSET = struct.calcsize(FMT_NUM_ENTRIES)
+    CAPACITY = DiskPage.PAGE_DATA_SIZE - ENTRIES_OFFSET
+    MAX_ENTRY_SIZE = DiskPage.PAGE_DATA_SIZE // 4
+    MAX_LOAD = 0.6
+
+    def __init__(self, buff_mngr, key_types, header_page_id):
+        self.buff_mngr = buff_mngr
+        self.codec = IndexKeyCodec(key_types)
+        self.header_page_id = header_page_id
+        self._lock = threading.RLock()
+        self._load_header()
+
+    @classmethod
+    def create(cls, buff_mngr, key_types, num_buckets=4):
+        """Allocates the header page and the buckets of a new index"""
+        header = buff_mngr.new_page()
+        struct.pack_into(cls.FMT_HEADER, header.data, 0, num_buckets, 0, 0,
+                         0, 0)
+        struct.pack_into(cls.FMT_NUM_IDS, header.data, cls.HEADER_SIZE, 0)
+        header.next_page_pointer = -1
+        buff_mngr.unpin(header.id, is_dirty=True)
+        index = cls(buff_mngr, key_types, header.id)
+        with index._lock:
+            for _ in range(num_buckets):
+                index._add_bucket()
+        return index
+
+    def _load_header(self):
+        self._buckets = []    # bucket --> primary page-id
+        self._dir_pages = []  # (page-id, offset of num-ids)
+        page_id = self.header_page_id
+        offset = self.HEADER_SIZE
+        while page_id != -1:
+            disk_page = self.buff_mngr.pin(page_id)
+            data = disk_page.data
+            if page_id == self.header_page_id:
+                self._num_initial, self._level, self._split, \
+                    self._num_entries, self._size = \
+                    struct.unpack_from(self.FMT_HEADER, data, 0)
+            num_ids = struct.unpack_from(self.FMT_NUM_IDS, data, offset)[0]
+            self._buckets.extend(struct.unpack_from(
+                '<%di' % num_ids, data, offset + 2))
+            self._dir_pages.append((page_id, offset))
+            next_id = disk_page.next_page_pointer
+            self.buff_mngr.unpin(page_id)
+            page_id = next_id
+            offset = 0
+
+    def _write_header(self):
+        header = self.buff_mngr.pin(self.header_page_id)
+        struct.pack_into(self.FMT_HEADER, header.data, 0, self._num_initial,
+                         self._level, self._split, self._num_entries,
+                         self._size)
+        self.buff_mngr.unpin(self.header_page_id, is_dirty=True)
+
+    def _add_bucket(self):
+        """Allocates the primary page of a new bucket and adds it to the
+        directory"""
+        bucket_page = self.buff_mngr.new_page()
+        struct.pack_into(self.FMT_NUM_ENTRIES, bucket_page.data, 0, 0)
+        bucket_page.next_page_pointer = -1
+        bucket_id = bucket_page.id
+        self.buff_mngr.unpin(bucket_id, is_dirty=True)
+
+        dir_page_id, offset = self._dir_pages[-1]
+        dir_page = self.buff_mngr.pin(dir_page_id)
+        num_ids = struct.unpack_from(self.FMT_NUM_IDS, dir_page.data,
+                                     offset)[0]
+        max_ids = (DiskPage.PAGE_DATA_SIZE - offset - 2) // self.ID_SIZE
+        if num_ids == max_ids:
+            new_page = self.buff_mngr.new_page()
+            new_page.next_page_pointer = -1
+            struct.pack_into(self.FMT_NUM_IDS, new_page.data, 0, 0)
+            dir_page.next_page_pointer = new_page.id
+            self.buff_mngr.unpin(dir_page_id, is_dirty=True)
+            dir_page, dir_page_id, offset, num_ids = new_page, new_page.id, \
+                0, 0
+            self._dir_pages.append((dir_page_id, offset))
+        struct.pack_into(self.FMT_ID, dir_page.data,
+                         offset + 2 + num_ids * self.ID_SIZE, bucket_id)
+        struct.pack_into(self.FMT_NUM_IDS, dir_page.data, offset,
+                         num_ids + 1)
+        self.buff_mngr.unpin(dir_page_id, is_dirty=True)
+        self._buckets.append(bucket_id)
+
+    @property
+    def num_buckets(self):
+        return len(self._buckets)
+
+    @property
+    def num_entries(self):
+        return self._num_entries
+
+    def _bucket(self, key):
+        """Returns the bucket of an encoded key"""
+        hash_value = zlib.crc32(key)
+        bucket = hash_value % (self._num_initial << self._level)
+        if bucket < self._split:
+            bucket = hash_value % (self._num_initial << (self._level + 1))
+        return bucket
+
+    # Pages
+    # =====
+
+    def _read_page(self, page_id):
+        """Returns (entries, next-page-id) of a page of a bucket"""
+        disk_page = self.buff_mngr.pin(page_id)
+        try:
+            data = disk_page.data
+            num_entries = struct.unpack_from(self.FMT_NUM_ENTRIES, data, 0)[0]
+            entries = []
+            offset = self.ENTRIES_OFFSET
+            for _ in range(num_entries):
+                length = struct.unpack_from('<H', data, offset)[0]
+                entries.append(data[offset + 2:offset + 2 + length].tobytes())
+                offset += 2 + length
+            return entries, disk_page.next_page_pointer
+        finally:
+            self.buff_mngr.unpin(page_id)
+
+    def _write_page(self, page_id, entries, next_id):
+        parts = [struct.pack(self.FMT_NUM_ENTRIES, len(entries))]
+        for entry in entries:
+            parts.append(struct.pack('<H', len(entry)))
+            parts.append(entry)
+        content = b''.join(parts)
+        disk_page = self.buff_mngr.pin(page_id)
+        disk_page.data[:len(content)] = content
+        disk_page.next_page_pointer = next_id
+        self.buff_mngr.unpin(page_id, is_dirty=True)
+
+    @classmethod
+    def _page_size(cls, entries):
+        return cls.ENTRIES_OFFSET + sum(2 + len(e) for e in entries)
+
+    def _read_chain(self, bucket):
+        """Returns the list of (page-id, entries) of a bucket"""
+        chain = []
+        page_id = self._buckets[bucket]
+        while page_id != -1:
+            entries, next_id = self._read_page(page_id)
+            chain.append((page_id, entries))
+            page_id = next_id
+        return chain
+
+    def _write_chain(self, page_ids, entries):
+        """Writes the entries in the pages of a bucket (the first page is
+        the primary one): the pages are filled in order, new overflow
+        pages are allocated if needed and the unused ones are
+        released."""
+        groups = [[]]
+        size = self.ENTRIES_OFFSET
+        for entry in entries:
+            if size + 2 + len(entry) > DiskPage.PAGE_DATA_SIZE:
+                groups.append([])
+                size = self.ENTRIES_OFFSET
+            groups[-1].append(entry)
+            size += 2 + len(entry)
+        page_ids = list(page_ids)
+        while len(page_ids) < len(groups):
+            new_page = self.buff_mngr.new_page()
+            page_ids.append(new_page.id)
+            self.buff_mngr.unpin(new_page.id)
+        for page_id in page_ids[len(groups):]:
+            self.buff_mngr.free_page(page_id)
+        for i, group in enumerate(groups):
+            next_id = page_ids[i + 1] if i + 1 < len(groups) else -1
+            self._write_page(page_ids[i], group, next_id)
+
+    # Lookups
+    # =======
+
+    def search(self, key):
+        """Returns the RIDs of the rows with the key (all its values)"""
+        if len(key) != self.codec.num_columns:
+            msg = 'The index has %s columns but %s values were given'
+            raise IndexException(msg % (self.codec.num_columns, len(key)))
+        encoded = self.codec.encode_key(key)
+        key_size = len(encoded)
+        rid_format = IndexKeyCodec.FMT_RID
+        rids = []
+        with self._lock:
+            page_id = self._buckets[self._bucket(encoded)]
+            while page_id != -1:
+                entries, page_id = self._read_page(page_id)
+                for entry in entries:
+                    if len(entry) == key_size + IndexKeyCodec.RID_SIZE and \
+                            entry.startswith(encoded):
+                        rids.append(RID(*struct.unpack_from(
+                            rid_format, entry, key_size)))
+        return rids
+
+    def scan(self):
+        """Generates the (key, RID) of all the entries (not in order)"""
+        decode_entry = self.codec.decode_entry
+        for bucket in range(self.num_buckets):
+            with self._lock:
+                chain = self._read_chain(bucket)
+            for _, entries in chain:
+                for entry in entries:
+                    yield decode_entry(entry)
+
+    # Updates
+    # =======
+
+    def _encode(self, key, rid):
+        entry = self.codec.encode_entry(key, rid)
+        if len(entry) > self.MAX_ENTRY_SIZE:
+            msg = 'Key of %s bytes is too large' % len(entry)
+            raise IndexException(msg)
+        return entry
+
+    def insert(self, key, rid):
+        entry = self._encode(key, rid)
+        with self._lock:
+            bucket = self._bucket(entry[:-IndexKeyCodec.RID_SIZE])
+            page_id = self._buckets[bucket]
+            while True:
+                entries, next_id = self._read_page(page_id)
+                if entry in entries:
+                    msg = 'Entry (%r, %r) already exists' % (key, rid)
+                    raise IndexException(msg)
+                if self._page_size(entries) + 2 + len(entry) <= \
+                        DiskPage.PAGE_DATA_SIZE:
+                    break
+                if next_id == -1:
+                    # A new overflow page
+                    overflow_page = self.buff_mngr.new_page()
+                    next_id = overflow_page.id
+                    self.buff_mngr.unpin(next_id)
+                    self._write_page(next_id, [], -1)
+                    self._write_page(page_id, entries, next_id)
+                page_id = next_id
+            entries.append(entry)
+            self._write_page(page_id, entries, next_id)
+            self._num_entries += 1
+            self._size += 2 + len(entry)
+            if self._size > self.MAX_LOAD * self.CAPACITY * self.num_buckets:
+                self._split_bucket()
+            self._write_header()
+
+    def delete(self, key, rid):
+        entry = self._encode(key, rid)
+        with self._lock:
+            bucket = self._bucket(entry[:-IndexKeyCodec.RID_SIZE])
+            prev_id = -1
+            page_id = self._buckets[bucket]
+            while page_id != -1:
+                entries, next_id = self._read_page(page_id)
+                if entry in entries:
+                    break
+                prev_id, page_id = page_id, next_id
+            else:
+                msg = 'Entry (%r, %r) does not exist' % (key, rid)
+                raise IndexException(msg)
+            entries.remove(entry)
+            if not entries and prev_id != -1:
+                # Release the empty overflow page
+                prev_entries, _ = self._read_page(prev_id)
+                self._write_page(prev_id, prev_entries, next_id)
+                self.buff_mngr.free_page(page_id)
+            else:
+                self._write_page(page_id, entries, next_id)
+            self._num_entries -= 1
+            self._size -= 2 + len(entry)
+            self._write_header()
+
+    def _split_bucket(self):
+        """Splits the bucket 'split': its entries are rehashed with the
+        next level, so about half of them move to a new bucket"""
+        old_bucket = self._split
+        modulo = self._num_initial << (self._level + 1)
+        chain = self._read_chain(old_bucket)
+        keep, move = [], []
+        rid_size = IndexKeyCodec.RID_SIZE
+        for _, entries in chain:
+            for entry in entries:
+                if zlib.crc32(entry[:-rid_size]) % modulo == old_bucket:
+                    keep.append(entry)
+                else:
+                    move.append(entry)
+        self._add_bucket()
+        self._write_chain([page_id for page_id, _ in chain], keep)
+        self._write_chain([self._buckets[-1]], move)
+        self._split += 1
+        if self._split == self._num_initial << self._level:
+            self._level += 1
+            self._split = 0
+
+    def drop(self):
+        """Releases all the pages of the index"""
+        with self._lock:
+            for bucket in range(self.num_buckets):
+                for page_id, _ in self._read_chain(bucket):
+                    self.buff_mngr.free_page(page_id)
+            for page_id, _ in self._dir_pages:
+                self.buff_mngr.free_page(page_id)
+            self._buckets = []
+            self._dir_pages = []
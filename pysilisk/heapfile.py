@@ -0,0 +1,657 @@
+import struct
+import threading
+from contextlib import contextmanager
+from pysilisk.dsm import DiskPage
+from pysilisk.records import RecordManager, SlottedPage, RID, RecordException
+from pysilisk.records import VacuumResult
+from pysilisk.columnar import ColumnarFile
+from pysilisk.sqltypes import StorageType
+from pysilisk.vectors import BatchDecoder
+from pysilisk.zonemap import ZoneMap
+
+
+class HeapFile(object):
+    """Unordered file of records (slotted-pages) of a table.
+
+    The file is identified by its first directory page. The directory
+    pages are linked by their next-page pointers and they have an entry
+    per data page:
+
+        | num-entries (2) | page-id (4) | category (1) | ...
+
+    The category is the free space of the page in 16 levels (4 bits):
+    a page of category k has at least k * PAGE_DATA_SIZE / 16 free
+    bytes. The directory is cached in memory, including a set of pages
+    per category, so an insert finds a page with room for the record by
+    checking at most 16 sets, whatever the size of the file. When no
+    page has room, a new one is allocated. The directory is updated
+    only when the category of a page changes.
+
+    The data pages are linked by their next-page pointers in allocation
+    order, so a scan follows a chain (and triggers the read-ahead of the
+    buffer manager).
+
+    The zone map of the file (see zonemap.py) lets the scans with
+    predicates skip the pages that have no matching rows.
+
+    The running scans are counted: vacuum does not move rows while the
+    file is scanned (the scan could miss a moved row or read it twice).
+    """
+
+    NUM_CATEGORIES = 16
+    # The records of a page with at least 3/4 of free space are moved to
+    # the other pages by vacuum
+    SPARSE_CATEGORY = 12
+    FMT_NUM_ENTRIES = '<H'
+    FMT_ENTRY = '<iB'
+    ENTRY_SIZE = struct.calcsize(FMT_ENTRY)
+    ENTRIES_OFFSET = struct.calcsize(FMT_NUM_ENTRIES)
+    ENTRIES_PER_PAGE = \
+        (DiskPage.PAGE_DATA_SIZE - ENTRIES_OFFSET) // ENTRY_SIZE
+
+    def __init__(self, buff_mngr, schema, dir_page_id):
+        self.buff_mngr = buff_mngr
+        self.schema = schema
+        self.dir_page_id = dir_page_id
+        self.record_mngr = RecordManager(buff_mngr)
+        self.zone_map = ZoneMap(schema)
+        self._lock = threading.RLock()
+        self._num_scans = 0
+        self._load_directory()
+
+    @classmethod
+    def create(cls, buff_mngr, schema):
+        """Allocates the first directory page of a new heap-file"""
+        dir_page = buff_mngr.new_page()
+        struct.pack_into(cls.FMT_NUM_ENTRIES, dir_page.data, 0, 0)
+        dir_page.next_page_pointer = -1
+        buff_mngr.unpin(dir_page.id, is_dirty=True)
+        return cls(buff_mngr, schema, dir_page.id)
+
+    @staticmethod
+    def category(free_space):
+        """Category of a page with 'free_space' free bytes"""
+        category = free_space * HeapFile.NUM_CATEGORIES // \
+            DiskPage.PAGE_DATA_SIZE
+        return min(category, HeapFile.NUM_CATEGORIES - 1)
+
+    @staticmethod
+    def required_category(size):
+        """Min category of a page that can store 'size' bytes"""
+        return -(-size * HeapFile.NUM_CATEGORIES // DiskPage.PAGE_DATA_SIZE)
+
+    def _load_directory(self):
+        self._dir_pages = []      # Ids of the directory pages
+        self._data_pages = []     # Ids of the data pages (in order)
+        self._entries = {}        # page-id --> (dir-page-id, idx, category)
+        self._pages_by_category = [set() for _ in
+                                   range(HeapFile.NUM_CATEGORIES)]
+        dir_page_id = self.dir_page_id
+        while dir_page_id != -1:
+            self._dir_pages.append(dir_page_id)
+            dir_page = self.buff_mngr.pin(dir_page_id)
+            try:
+                data = dir_page.data
+                num_entries = struct.unpack_from(self.FMT_NUM_ENTRIES,
+                                                 data, 0)[0]
+                offset = self.ENTRIES_OFFSET
+                for idx in range(num_entries):
+                    page_id, category = struct.unpack_from(self.FMT_ENTRY,
+                                                           data, offset)
+                    offset += self.ENTRY_SIZE
+                    self._data_pages.append(page_id)
+                    self._entries[page_id] = (dir_page_id, idx, category)
+                    self._pages_by_category[category].add(page_id)
+                next_id = dir_page.next_page_pointer
+            finally:
+                self.buff_mngr.unpin(dir_page_id)
+            dir_page_id = next_id
+
+    def reload(self):
+        """Reads the directory again (e.g. after a rollback). The zone
+        map is built again by the next scan that needs it."""
+        with self._lock:
+            self._load_directory()
+            self.zone_map.clear()
+
+    @property
+    def num_pages(self):
+        return len(self._data_pages)
+
+    @property
+    def page_ids(self):
+        return list(self._data_pages)
+
+    def _set_category(self, page_id, free_space):
+        """Updates the cache and the directory (if it changed)"""
+        dir_page_id, idx, old_category = self._entries[page_id]
+        category = HeapFile.category(free_space)
+        if category == old_category:
+            return
+        self._pages_by_category[old_category].discard(page_id)
+        self._pages_by_category[category].add(page_id)
+        self._entries[page_id] = (dir_page_id, idx, category)
+        dir_page = self.buff_mngr.pin(dir_page_id)
+        offset = self.ENTRIES_OFFSET + idx * self.ENTRY_SIZE
+        struct.pack_into(self.FMT_ENTRY, dir_page.data, offset, page_id,
+                         category)
+        self.buff_mngr.unpin(dir_page_id, is_dirty=True)
+
+    def _add_data_page(self):
+        """Allocates and formats a new data page, links it after the last
+        one and adds its entry to the directory. Returns its id."""
+        disk_page = self.buff_mngr.new_page()
+        page_id = disk_page.id
+        free_space = SlottedPage.format(disk_page).free_space
+        disk_page.next_page_pointer = -1
+        self.buff_mngr.unpin(page_id, is_dirty=True)
+
+        if self._data_pages:
+            last_id = self._data_pages[-1]
+            last_page = self.buff_mngr.pin(last_id)
+            last_page.next_page_pointer = page_id
+            self.buff_mngr.unpin(last_id, is_dirty=True)
+
+        # Append the entry to the last directory page (or to a new one)
+        last_dir_id = self._dir_pages[-1]
+        dir_page = self.buff_mngr.pin(last_dir_id)
+        num_entries = struct.unpack_from(self.FMT_NUM_ENTRIES,
+                                         dir_page.data, 0)[0]
+        if num_entries == self.ENTRIES_PER_PAGE:
+            new_dir_page = self.buff_mngr.new_page()
+            struct.pack_into(self.FMT_NUM_ENTRIES, new_dir_page.data, 0, 0)
+            new_dir_page.next_page_pointer = -1
+            dir_page.next_page_pointer = new_dir_page.id
+            self.buff_mngr.unpin(last_dir_id, is_dirty=True)
+            dir_page, last_dir_id = new_dir_page, new_dir_page.id
+            self._dir_pages.append(last_dir_id)
+            num_entries = 0
+        category = HeapFile.category(free_space)
+        offset = self.ENTRIES_OFFSET + num_entries * self.ENTRY_SIZE
+        struct.pack_into(self.FMT_ENTRY, dir_page.data, offset, page_id,
+                         category)
+        struct.pack_into(self.FMT_NUM_ENTRIES, dir_page.data, 0,
+                         num_entries + 1)
+        self.buff_mngr.unpin(last_dir_id, is_dirty=True)
+
+        self._data_pages.append(page_id)
+        self._entries[page_id] = (last_dir_id, num_entries, category)
+        self._pages_by_category[category].add(page_id)
+        return page_id
+
+    def _find_page(self, size):
+        """Returns the id of a page with room for 'size' bytes (plus its
+        slot), allocating a new one if there is none."""
+        first = HeapFile.required_category(size + SlottedPage.SLOT_SIZE)
+        for category in range(first, HeapFile.NUM_CATEGORIES):
+            pages = self._pages_by_category[category]
+            if pages:
+                return next(iter(pages))
+        return self._add_data_page()
+
+    def insert_record(self, record):
+        """Stores an encoded record. Returns its RID"""
+        if len(record) > SlottedPage.MAX_RECORD_SIZE:
+            self.record_mngr.free_overflow(self.schema, record)
+            msg = 'Row of %s bytes is too large' % len(record)
+            raise RecordException(msg)
+        with self._lock:
+            page_id = self._find_page(len(record))
+            slotted_page = SlottedPage(self.buff_mngr.pin(page_id))
+            try:
+                slot_no = slotted_page.insert(record)
+                free_space = slotted_page.free_space
+            finally:
+                self.buff_mngr.unpin(page_id, is_dirty=True)
+            self._set_category(page_id, free_space)
+            self._add_to_zone(page_id, record)
+            return RID(page_id, slot_no)
+
+    def insert(self, values):
+        """Inserts a row. Returns its RID"""
+        return self.insert_record(self.record_mngr.encode(self.schema,
+                                                          values))
+
+    def insert_rows(self, rows):
+        """Inserts a batch of rows (see insert_records). The whole batch
+        is validated before writing any data page. Returns their RIDs."""
+        records = []
+        try:
+            for row in rows:
+                records.append(self.record_mngr.encode(self.schema, row))
+        except Exception:
+            for record in records:
+                self.record_mngr.free_overflow(self.schema, record)
+            raise
+        return self.insert_records(records)
+
+    def insert_records(self, records):
+        """Stores a batch of encoded records. Returns their RIDs.
+
+        The lock is taken once, and each target page is pinned once and
+        filled with as many records as it fits. In a transaction (see
+        BufferManager.set_transaction), a single record is logged per
+        page instead of one per row.
+        """
+        for record in records:
+            if len(record) > SlottedPage.MAX_RECORD_SIZE:
+                msg = 'Row of %s bytes is too large' % len(record)
+                for encoded in records:
+                    self.record_mngr.free_overflow(self.schema, encoded)
+                raise RecordException(msg)
+        rids = []
+        i = 0
+        with self._lock:
+            while i < len(records):
+                page_id = self._find_page(len(records[i]))
+                slotted_page = SlottedPage(self.buff_mngr.pin(page_id))
+                try:
+                    while i < len(records):
+                        slot_no = slotted_page.insert(records[i])
+                        if slot_no == -1:
+                            break
+                        rids.append(RID(page_id, slot_no))
+                        self._add_to_zone(page_id, records[i])
+                        i += 1
+                    free_space = slotted_page.free_space
+                finally:
+                    self.buff_mngr.unpin(page_id, is_dirty=True)
+                self._set_category(page_id, free_space)
+        return rids
+
+    def _remove_data_page(self, page_id):
+        """Unlinks an empty data page from the chain and the directory,
+        and releases it. The next entries of the directory are shifted
+        back, so the directory keeps the order of the chain (an emptied
+        directory page is released)."""
+        position = self._data_pages.index(page_id)
+        disk_page = self.buff_mngr.pin(page_id)
+        next_id = disk_page.next_page_pointer
+        self.buff_mngr.unpin(page_id)
+        if position > 0:
+            prev_id = self._data_pages[position - 1]
+            prev_page = self.buff_mngr.pin(prev_id)
+            prev_page.next_page_pointer = next_id
+            self.buff_mngr.unpin(prev_id, is_dirty=True)
+        del self._data_pages[position]
+
+        dir_page_id, idx, category = self._entries.pop(page_id)
+        self._pages_by_category[category].discard(page_id)
+        first = self._dir_pages.index(dir_page_id)
+        for k in range(first, len(self._dir_pages)):
+            start = k * self.ENTRIES_PER_PAGE
+            self._write_dir_page(self._dir_pages[k], self._data_pages[
+                start:start + self.ENTRIES_PER_PAGE])
+        num_dir_pages = -(-len(self._data_pages) // self.ENTRIES_PER_PAGE)
+        if len(self._dir_pages) > max(num_dir_pages, 1):
+            last_dir_id = self._dir_pages.pop()
+            prev_dir_id = self._dir_pages[-1]
+            prev_dir = self.buff_mngr.pin(prev_dir_id)
+            prev_dir.next_page_pointer = -1
+            self.buff_mngr.unpin(prev_dir_id, is_dirty=True)
+            self.buff_mngr.free_page(last_dir_id)
+        self.buff_mngr.free_page(page_id)
+        self.zone_map.remove_page(page_id)
+
+    def _write_dir_page(self, dir_page_id, page_ids):
+        """Rewrites the entries of a directory page"""
+        dir_page = self.buff_mngr.pin(dir_page_id)
+        data = dir_page.data
+        struct.pack_into(self.FMT_NUM_ENTRIES, data, 0, len(page_ids))
+        offset = self.ENTRIES_OFFSET
+        for idx, page_id in enumerate(page_ids):
+            category = self._entries[page_id][2]
+            struct.pack_into(self.FMT_ENTRY, data, offset, page_id, category)
+            self._entries[page_id] = (dir_page_id, idx, category)
+            offset += self.ENTRY_SIZE
+        self.buff_mngr.unpin(dir_page_id, is_dirty=True)
+
+    def _find_target_page(self, size, page_id, position):
+        """Returns the id of a page with room for 'size' bytes, or -1.
+        The sparse pages are only used if they are before page_id in the
+        file (the sparse pages are emptied from the end)."""
+        first = HeapFile.required_category(size + SlottedPage.SLOT_SIZE)
+        limit = position[page_id]
+        for category in range(first, HeapFile.NUM_CATEGORIES):
+            is_sparse = category >= HeapFile.SPARSE_CATEGORY
+            for target_id in self._pages_by_category[category]:
+                if target_id == page_id:
+                    continue
+                if not is_sparse or position.get(target_id, limit) < limit:
+                    return target_id
+        return -1
+
+    def _empty_page(self, page_id, position):
+        """Moves the records of a page to other pages (see
+        _find_target_page). Stops at the first record that has no room
+        elsewhere. Returns the list of (old-RID, new-RID)."""
+        moved = []
+        slotted_page = SlottedPage(self.buff_mngr.pin(page_id))
+        try:
+            for slot_no, record in list(slotted_page.records()):
+                target_id = self._find_target_page(len(record), page_id,
+                                                   position)
+                if target_id == -1:
+                    break
+                target = SlottedPage(self.buff_mngr.pin(target_id))
+                try:
+                    new_slot = target.insert(record.tobytes())
+                    target_free_space = target.free_space
+                finally:
+                    self.buff_mngr.unpin(target_id, is_dirty=True)
+                self._set_category(target_id, target_free_space)
+                self._add_to_zone(target_id, record)
+                slotted_page.delete(slot_no)
+                moved.append((RID(page_id, slot_no),
+                              RID(target_id, new_slot)))
+            free_space = slotted_page.free_space
+        finally:
+            self.buff_mngr.unpin(page_id, is_dirty=bool(moved))
+        self._set_category(page_id, free_space)
+        return moved
+
+    def vacuum(self, max_pages=None, on_move=None):
+        """Reclaims the space of the deleted rows:
+
+        - the rows of the sparse pages (see SPARSE_CATEGORY) are moved
+          to other pages, from the end of the file, and the pages that
+          become empty are released to the disk-space manager (so the
+          scans do not read them anymore);
+        - a full vacuum (max_pages is None) also compacts the fragmented
+          pages (their slot-directories do not change).
+
+        The moved rows get a new RID: on_move(moved) is called with the
+        (old-RID, new-RID) of the rows moved by each step, under the lock
+        of the file, so the indexes are updated in the same step. The
+        file is locked per page, so the other operations can run between
+        the steps; vacuum stops if a scan is running. At most 'max_pages'
+        sparse pages are processed. Returns a VacuumResult (a row moved
+        twice is reported once, with its original and final RIDs).
+        """
+        released = 0
+        compacted = 0
+        moved = {}    # original RID --> current RID
+        origins = {}  # current RID --> original RID
+        with self._lock:
+            position = {page_id: i for i, page_id
+                        in enumerate(self._data_pages)}
+            sparse = [page_id for category in
+                      range(HeapFile.SPARSE_CATEGORY, HeapFile.NUM_CATEGORIES)
+                      for page_id in self._pages_by_category[category]]
+            sparse.sort(key=position.get, reverse=True)
+        for page_id in sparse:
+            if max_pages is not None and released >= max_pages:
+                break
+            with self._lock:
+                if self._num_scans:
+                    return VacuumResult(released, compacted,
+                                        list(moved.items()))
+                if page_id not in self._entries:
+                    continue
+                page_moves = self._empty_page(page_id, position)
+                if page_moves and on_move is not None:
+                    on_move(page_moves)
+                for old_rid, new_rid in page_moves:
+                    origin = origins.pop(old_rid, old_rid)
+                    moved[origin] = new_rid
+                    origins[new_rid] = origin
+                slotted_page = SlottedPage(self.buff_mngr.pin(page_id))
+                is_empty = slotted_page.num_slots == 0
+                self.buff_mngr.unpin(page_id)
+                if is_empty:
+                    self._remove_data_page(page_id)
+                    released += 1
+
+        if max_pages is None:
+            for page_id in self.page_ids:
+                with self._lock:
+                    if self._num_scans:
+                        break
+                    if page_id not in self._entries:
+                        continue
+                    slotted_page = SlottedPage(self.buff_mngr.pin(page_id))
+                    is_fragmented = slotted_page.contiguous_free_space < \
+                        slotted_page.free_space
+                    try:
+                        if is_fragmented:
+                            slotted_page.compact()
+                            compacted += 1
+                    finally:
+                        self.buff_mngr.unpin(page_id, is_dirty=is_fragmented)
+        return VacuumResult(released, compacted, list(moved.items()))
+
+    def get(self, rid):
+        self._check_rid(rid)
+        return self.record_mngr.get(rid, self.schema)
+
+    def delete(self, rid):
+        self._check_rid(rid)
+        codec = self.schema.codec
+        with self._lock:
+            slotted_page = SlottedPage(self.buff_mngr.pin(rid.page_id))
+            overflow_pages = []
+            try:
+                record = slotted_page.get(rid.slot_no)
+                if record is not None:
+                    overflow_pages = codec.overflow_pages(record)
+                slotted_page.delete(rid.slot_no)
+                free_space = slotted_page.free_space
+            finally:
+                self.buff_mngr.unpin(rid.page_id, is_dirty=True)
+            self._set_category(rid.page_id, free_space)
+            for page_id in overflow_pages:
+                self.record_mngr.overflow.free(page_id)
+
+    def update(self, rid, values):
+        """Replaces the row. If it does not fit in its page anymore, it
+        moves to another page. Returns the (new) RID of the row."""
+        self._check_rid(rid)
+        codec = self.schema.codec
+        record = self.record_mngr.encode(self.schema, values)
+        with self._lock:
+            slotted_page = SlottedPage(self.buff_mngr.pin(rid.page_id))
+            old_pages = []
+            try:
+                old_record = slotted_page.get(rid.slot_no)
+                if old_record is not None:
+                    old_pages = codec.overflow_pages(old_record)
+                updated = slotted_page.update(rid.slot_no, record)
+                free_space = slotted_page.free_space
+            finally:
+                self.buff_mngr.unpin(rid.page_id, is_dirty=True)
+            if updated:
+                self._set_category(rid.page_id, free_space)
+                self._add_to_zone(rid.page_id, record)
+                for page_id in old_pages:
+                    self.record_mngr.overflow.free(page_id)
+                return rid
+            self.delete(rid)
+            return self.insert_record(record)
+
+    def _add_to_zone(self, page_id, record):
+        """Widens the zone of the page with the record (if the zone map
+        is built)"""
+        zone_map = self.zone_map
+        if not zone_map.is_built or not zone_map.col_indexes:
+            return
+        null_bits, values = self.schema.codec.physical_values(
+            record, zone_map.col_indexes)
+        zone_map.add(page_id, [None if null_bits >> col & 1 else value
+                               for col, value in
+                               zip(zone_map.col_indexes, values)])
+
+    def build_zone_map(self):
+        """Computes the zones of all the pages with a scan of the file"""
+        with self._lock:
+            self.zone_map.clear()
+            self.zone_map.set_built()
+            for page_id in self._data_pages:
+                slotted_page = SlottedPage(self.buff_mngr.pin(page_id))
+                try:
+                    for _, record in slotted_page.records():
+                        self._add_to_zone(page_id, record)
+                finally:
+                    self.buff_mngr.unpin(page_id)
+
+    def pages_matching(self, predicates):
+        """Returns the data pages that may have rows that satisfy all the
+        predicates (a list of ZonePredicates). The zone map is built by
+        the first call."""
+        with self._lock:
+            if predicates and not self.zone_map.is_built:
+                self.build_zone_map()
+            return self.zone_map.filter_pages(self.page_ids, predicates)
+
+    @contextmanager
+    def _scanning(self):
+        """Counts a running scan (see vacuum)"""
+        with self._lock:
+            self._num_scans += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._num_scans -= 1
+
+    def scan(self, col_names=None, predicates=None):
+        """Generates (RID, row) where row only has the values of the
+        columns in col_names (all the columns by default). The pages
+        that can not satisfy the predicates (see pages_matching) are
+        skipped; the rows of the other pages are not filtered."""
+        if col_names is not None:
+            col_indexes = [self.schema.column_index(n) for n in col_names]
+        with self._scanning():
+            for page_id in self.pages_matching(predicates):
+                for rid, row in self.record_mngr.scan_page(page_id,
+                                                           self.schema):
+                    if col_names is not None:
+                        row = tuple(row[i] for i in col_indexes)
+                    yield rid, row
+
+    def scan_equal(self, col_name, value, col_names=None):
+        """Generates the (RID, row) of the rows whose column is equal to
+        'value' (see scan). The column is compared in the records without
+        decoding them (the codes of a dictionary-encoded column are
+        compared as integers); only the matching rows are decoded."""
+        col_index = self.schema.column_index(col_name)
+        if col_names is not None:
+            col_indexes = [self.schema.column_index(n) for n in col_names]
+        codec = self.schema.codec
+        read_overflow = self.record_mngr.overflow.read
+        is_equal = codec.equal_predicate(col_index, value, read_overflow)
+        with self._scanning():
+            for page_id in self.page_ids:
+                slotted_page = SlottedPage(self.buff_mngr.pin(page_id))
+                try:
+                    rows = [(RID(page_id, slot_no),
+                             codec.decode(record, 0, read_overflow))
+                            for slot_no, record in slotted_page.records()
+                            if is_equal(record)]
+                finally:
+                    self.buff_mngr.unpin(page_id)
+                for rid, row in rows:
+                    if col_names is not None:
+                        row = tuple(row[i] for i in col_indexes)
+                    yield rid, row
+
+    def scan_vectors(self, col_names=None, pages_per_batch=16,
+                     use_numpy=None, predicates=None, with_rids=True):
+        """Generates a ColumnBatch (see vectors.py) per run of
+        'pages_per_batch' data pages (the pages that can not satisfy the
+        predicates are skipped, see scan)"""
+        decoder = BatchDecoder(self, col_names, use_numpy, with_rids)
+        with self._scanning():
+            yield from decoder.scan(pages_per_batch,
+                                    self.pages_matching(predicates))
+
+    def drop(self):
+        """Releases all the pages of the file (and the overflow pages of
+        its rows)"""
+        with self._lock:
+            if self.schema.codec.has_overflow:
+                overflow_pages = []
+                for page_id in self._data_pages:
+                    slotted_page = SlottedPage(self.buff_mngr.pin(page_id))
+                    for _, record in slotted_page.records():
+                        overflow_pages.extend(
+                            self.schema.codec.overflow_pages(record))
+                    self.buff_mngr.unpin(page_id)
+                for page_id in overflow_pages:
+                    self.record_mngr.overflow.free(page_id)
+            for page_id in self._data_pages + self._dir_pages:
+                self.buff_mngr.free_page(page_id)
+            self._data_pages = []
+            self._dir_pages = []
+            self._entries = {}
+            self.zone_map.clear()
+            self._pages_by_category = [set() for _ in
+                                       range(HeapFile.NUM_CATEGORIES)]
+
+    def _check_rid(self, rid):
+        if rid.page_id not in self._entries:
+            msg = 'Page-id %s does not belong to the file' % rid.page_id
+            raise RecordException(msg)
+
+
+class FileManager(object):
+    """Creates, opens and drops the files of the tables: heap-files or
+    columnar files, according to the storage of the schema. The open
+    files are cached by the id of their first page."""
+
+    def __init__(self, buff_mngr):
+        self.buff_mngr = buff_mngr
+        self._heap_files = {}
+
+    @staticmethod
+    def _file_class(schema):
+        if schema.storage == StorageType.COLUMNAR:
+            return ColumnarFile
+        return HeapFile
+
+    def create_file(self, schema):
+        table_file = self._file_class(schema).create(self.buff_mngr, schema)
+        self._heap_files[table_file.dir_page_id] = table_file
+        return table_file
+
+    def open_file(self, schema, dir_page_id):
+        table_file = self._heap_files.get(dir_page_id)
+        if table_file is None:
+            file_class = self._file_class(schema)
+            table_file = file_class(self.buff_mngr, schema, dir_page_id)
+            self._heap_files[dir_page_id] = table_file
+        return table_file
+
+    def drop_file(self, schema, dir_page_id):
+        table_file = self.open_file(schema, dir_page_id)
+        table_file.drop()
+        del self._heap_files[dir_page_id]
+
+
+class Compactor(threading.Thread):
+    """Thread that vacuums the tables in small steps. Every 'interval'
+    seconds it calls vacuum_step(pages_per_step) (a function that
+    returns the number of pages it released or compacted) until there
+    is nothing left to do, sleeping 'pause' seconds between the steps,
+    so the foreground operations are not delayed for long."""
+    def __init__(self, vacuum_step, interval=5.0, pages_per_step=8,
+                 pause=0.05):
+        super().__init__(name='pysilisk-compactor', daemon=True)
+        self._vacuum_step = vacuum_step
+        self.interval = interval
+        self.pages_per_step = pages_per_step
+        self.pause = pause
+        self._stopped = threading.Event()
+        self.num_steps = 0
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            while not self._stopped.is_set():
+                if self._vacuum_step(self.pages_per_step) == 0:
+                    break
+                self.num_steps += 1
+                self._stopped.wait(self.pause)
+
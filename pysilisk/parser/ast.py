@@ -1,6 +1,6 @@
 import logging
-from pysilisk.sqltypes import SQLDataType, NullConstrain
-from pysilisk.parser.sqlparser import SQL_GRAMMAR
+from pysilisk.sqltypes import SQLDataType, NullConstrain, StorageType
+from pysilisk.parser.sqlgrammar import SQL_GRAMMAR
 from pyparsing import ParseResults
 
 
@@ -45,6 +45,7 @@ class AST_Node(object):
     EMPTY_EXPR = -1
     COLUMN_DEFINITION = -1
     CREATE_TABLE = -1
+    VACUUM = -1
     NUM_CONST = 0
     BOOL_CONST = 1        # Boolean constant expression
     AND = 2                # Conditional "and" expression
@@ -200,6 +201,12 @@ class AST_DropTable(AST_Node):
         self.table_name = table_name
 
 
+class AST_Vacuum(AST_Node):
+    def __init__(self, table_name=None):
+        super().__init__(AST_Node.VACUUM)
+        self.table_name = table_name  # None: all the tables
+
+
 class AST_Insert(AST_Node):
     def __init__(self, table_name, inserted_values):
         super().__init__(AST_Node.INSERT)
@@ -280,21 +287,25 @@ class AST_Select(AST_Node):
 
 
 class AST_ColumnDefinition(AST_Node):
-    def __init__(self, column_name, type_name, type_size, null_identifier):
+    def __init__(self, column_name, type_name, type_size, null_identifier,
+                 dictionary=False):
         super().__init__(AST_Node.COLUMN_DEFINITION)
         self.column_name = column_name
         self.type_name = type_name
         self.type_id = SQLDataType.from_string(type_name)
         self.type_size = type_size  # Only for varchar and char types
         self.null_identifier = null_identifier
+        self.dictionary = dictionary  # ENCODING DICTIONARY
 
 
 class AST_CreateTable(AST_Node):
-    def __init__(self, table_name, col_definitions, index_definition):
+    def __init__(self, table_name, col_definitions, index_definition,
+                 storage=StorageType.ROW):
         super().__init__(AST_Node.CREATE_TABLE)
         self.table_name = table_name
         self.col_definitions = col_definitions
         self.index_definition = index_definition
+        self.storage = storage
 
 
 class AST_AllColumns(AST_Node):
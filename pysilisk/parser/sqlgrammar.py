@@ -36,16 +36,19 @@ from pyparsing import Optional, delimitedList, Regex
 (SELECT, FROM, WHERE, AS, NULL, NOT,AND, OR, DISTINCT, ALL, INSERT,
  INTO, VALUES, DELETE, UPDATE, SET, CREATE, INDEX, USING, BTREE, HASH,
  ON, INTEGER, FLOAT, DATETIME, DATE, VARCHAR, CHAR, TABLE, DATABASE,
- DROP, ORDER, BY, ASC, DESC) = map(CaselessKeyword, """SELECT, FROM,
- WHERE, AS, NULL, NOT, AND, OR, DISTINCT, ALL, INSERT, INTO, VALUES,
- DELETE, UPDATE, SET, CREATE, INDEX, USING, BTREE, HASH, ON, INTEGER,
- FLOAT, DATETIME, DATE, VARCHAR, CHAR, TABLE, DATABASE, DROP, ORDER,
- BY, ASC, DESC""".replace(",","").split())
+ DROP, ORDER, BY, ASC, DESC, STORAGE, ROW, COLUMNAR, ENCODING,
+ DICTIONARY, VACUUM) = map(CaselessKeyword,
+ """SELECT, FROM, WHERE, AS, NULL, NOT, AND, OR, DISTINCT, ALL, INSERT,
+ INTO, VALUES, DELETE, UPDATE, SET, CREATE, INDEX, USING, BTREE, HASH,
+ ON, INTEGER, FLOAT, DATETIME, DATE, VARCHAR, CHAR, TABLE, DATABASE,
+ DROP, ORDER, BY, ASC, DESC, STORAGE, ROW,
+ COLUMNAR, ENCODING, DICTIONARY, VACUUM""".replace(",","").split())
 
 keywords = (SELECT|FROM|WHERE|AS|NULL|NOT|AND|OR|DISTINCT|ALL|INSERT|
             INTO|VALUES|DELETE|UPDATE|SET|CREATE|INDEX|USING|BTREE|HASH|
             ON|INTEGER|FLOAT|DATETIME|DATE|VARCHAR|CHAR|TABLE|DATABASE|
-            DROP|ORDER|BY|ASC|DESC)
+            DROP|ORDER|BY|ASC|DESC|STORAGE|ROW|COLUMNAR|ENCODING|
+            DICTIONARY|VACUUM)
 
 # Define basic symbols
 LPAR, RPAR = map(Suppress, '()')
@@ -279,28 +282,42 @@ create_index_stmt = (CREATE + INDEX + index_name + ON + table_name +
 #                                    <list-col-definitions>
 #                                    [<comma> <index-definition>]
 #                                )
+#                                [<storage-option>]
 #     <list-col-definitions> ::= <column-def> [<comma> <column-def>]
 #     <column-def>           ::= <colname> <data-type> [<null-constrain>]
+#                                [<encoding-option>]
 #     <index-definition>     ::= INDEX (<indexed-columns>) USING <index-type>]
+#     <encoding-option>      ::= ENCODING DICTIONARY
+#     <storage-option>       ::= STORAGE {ROW|COLUMNAR}
 null_constrain = (Group(NOT+NULL)|Group(NULL))
 null_constrain = null_constrain.setResultsName('null_constrain')
-column_definition = column_name + data_type + Optional(null_constrain)
+encoding_option = ENCODING + DICTIONARY.setResultsName('encoding')
+column_definition = (column_name + data_type + Optional(null_constrain) +
+                     Optional(encoding_option))
 column_definition = column_definition.setResultsName('column_definition')
 list_column_defs  = delimitedList(Group(column_definition))
 list_column_defs  = list_column_defs.setResultsName('list_column_definitions')
 index_definition = INDEX + ON + indexed_columns + USING + index_type
 index_definition = index_definition.setResultsName('index_definition')
+storage_type = (ROW|COLUMNAR).setResultsName('storage_type')
+storage_option = STORAGE + storage_type
 create_table_stmt = (CREATE + TABLE + table_name +
                      LPAR +
                      list_column_defs +
                      Optional(comma + index_definition) +
-                     RPAR)
+                     RPAR +
+                     Optional(storage_option))
 
 # Drop table and index Statements
 # ===============================
 drop_table_stmt = DROP + TABLE + table_name
 drop_index_stmt = DROP + INDEX  + index_name + ON + table_name
 
+# Vacuum Statement (all the tables by default)
+# ================
+#     <vacuum>               ::= VACUUM [<table-name>]
+vacuum_stmt = VACUUM + Optional(table_name)
+
 # SQL Statement
 SQL_GRAMMAR = (select_stmt.setResultsName('SELECT')|
                insert_stmt.setResultsName('INSERT')|
@@ -309,7 +326,8 @@ SQL_GRAMMAR = (select_stmt.setResultsName('SELECT')|
                create_index_stmt.setResultsName('CREATE_INDEX')|
                create_table_stmt.setResultsName('CREATE_TABLE')|
                drop_table_stmt.setResultsName('DROP_TABLE')|
-               drop_index_stmt.setResultsName('DROP_INDEX')) + semi_colon
+               drop_index_stmt.setResultsName('DROP_INDEX')|
+               vacuum_stmt.setResultsName('VACUUM')) + semi_colon
 
 
 # Other commands such as 'create-db', 'use-db' 'help' or 'quit' are not
@@ -11,7 +11,7 @@ from pysilisk.parser.ast import AST_NegArithExpr, AST_Column, AST_LT, AST_Select
 from pysilisk.parser.ast import AST_Add, AST_Sub, AST_Div, AST_GT, AST_DropTable
 from pysilisk.parser.ast import NullConstrain, AST_OrderByColumn, AST_AllColumns
 from pysilisk.parser.ast import AST_NotBoolExpr, AST_CreateIndex, AST_Delete
-from pysilisk.parser.ast import AST_AND
+from pysilisk.parser.ast import AST_AND, StorageType, AST_Vacuum
 
 
 logger = logging.getLogger(__name__)
@@ -65,6 +65,11 @@ def parse(sql_str):
         logger.debug('table: "%s"', table_name)
         return AST_DropTable(table_name)
         # ==============================================================
+    elif stmt_type == 'VACUUM':
+        table_name = result.table_name[0] if result.table_name else None
+        logger.debug('table: "%s"', table_name)
+        return AST_Vacuum(table_name)
+        # ==============================================================
     elif stmt_type == 'CREATE_INDEX':
         idx_name = result.index_name[0]
         table_name = result.table_name[0]
@@ -94,13 +99,16 @@ def parse(sql_str):
             null_constrain = ' '.join(definition.null_constrain)
             null_code = NullConstrain.from_string(null_constrain)
 
+            dictionary = definition.encoding.upper() == 'DICTIONARY'
+
             msg = ("colName: %s, typeName: %s, typeSize: %s, "
                    "nullIdentifier: %s   -   "+null_constrain)
             logger.debug(msg, col_name, type_name, type_size, null_code)
 
             # Create and append an ast-definition
             ast_column_defs.append(
-                AST_ColumnDefinition(col_name, type_name, type_size, null_code)
+                AST_ColumnDefinition(col_name, type_name, type_size, null_code,
+                                     dictionary)
             )
 
         # Extract index information
@@ -120,7 +128,11 @@ def parse(sql_str):
             logger.debug('index-name: "%s"', idx_name)
             logger.debug('indexed-columns: "%s"', indexed_cols)
             logger.debug('index-type: "%s"', idx_type)
-        return AST_CreateTable(table_name, ast_column_defs, ast_idx)
+
+        # Extract the storage option (ROW by default)
+        storage = StorageType.from_string(result.storage_type)
+        logger.debug('storage: "%s"', result.storage_type)
+        return AST_CreateTable(table_name, ast_column_defs, ast_idx, storage)
         # ==============================================================
     elif stmt_type == 'INSERT':
         table_name = result.table_name[0]
@@ -332,7 +344,7 @@ def to_ast_expr(parsed_expr, _type, depth=0, parent=None):
             # Get the ast-operation
             op = predicate[i]
             ast_op = AST_EQ() if op == '=' else None
-            ast_op = AST_NEQ if op == '<>' else ast_op
+            ast_op = AST_NEQ() if op == '<>' else ast_op
             ast_op = AST_GTE() if op == '>=' else ast_op
             ast_op = AST_LTE() if op == '<=' else ast_op
             ast_op = AST_GT() if op == '>' else ast_op
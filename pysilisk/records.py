@@ -0,0 +1,870 @@
+import struct
+import threading
+from collections import namedtuple
+from datetime import date, datetime
+from pysilisk.dsm import DiskPage
+from pysilisk.sqltypes import SQLDataType, NullConstrain, StorageType
+from pysilisk.sqltypes import Date, DateTime
+
+
+# Record-id: address of a record in the database space
+RID = namedtuple('RID', ['page_id', 'slot_no'])
+
+# Result of the vacuum of a file: the number of released and compacted
+# pages and the list of (old-RID, new-RID) of the rows that were moved
+VacuumResult = namedtuple('VacuumResult', ['released_pages',
+                                           'compacted_pages', 'moved_rids'])
+
+
+class Column(object):
+    """Column of a table schema.
+    size       - max number of characters (only for VARCHAR and CHAR)
+    dictionary - the values are stored as integer codes of a dictionary
+                 of the table (only for CHAR)
+    """
+    __slots__ = ('name', 'type_id', 'size', 'nullable', 'dictionary')
+
+    def __init__(self, name, type_id, size=-1, nullable=True,
+                 dictionary=False):
+        if type_id in (SQLDataType.VARCHAR, SQLDataType.CHAR) and size < 1:
+            msg = 'Column %s: the size of %s must be greater than zero'
+            raise SchemaException(msg % (name, SQLDataType.to_string(type_id)))
+        if dictionary and type_id != SQLDataType.CHAR:
+            msg = 'Column %s: only CHAR columns can be dictionary-encoded'
+            raise SchemaException(msg % name)
+        self.name = name
+        self.type_id = type_id
+        self.size = size
+        self.nullable = nullable
+        self.dictionary = dictionary
+
+    def __repr__(self):
+        type_name = SQLDataType.to_string(self.type_id)
+        if self.size > 0:
+            type_name += '(%s)' % self.size
+        null_str = '' if self.nullable else ' NOT NULL'
+        encoding_str = ' ENCODING DICTIONARY' if self.dictionary else ''
+        return '%s %s%s%s' % (self.name, type_name, null_str, encoding_str)
+
+
+class StringDictionary(object):
+    """Dictionary of a dictionary-encoded column. The code of a value is
+    its position in 'values'; the codes are never reused, so the
+    dictionary only grows. is_dirty is set when a value is added (the
+    dictionary is stored with the catalog)."""
+
+    def __init__(self, values=None):
+        self.values = list(values or [])
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        self.is_dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value):
+        """Returns the code of the value, adding it if it is new"""
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self._codes[value] = code
+                    self.is_dirty = True
+        return code
+
+    def code(self, value):
+        """Returns the code of the value (None if it is not stored)"""
+        return self._codes.get(value)
+
+    def decode(self, code):
+        return self.values[code]
+
+
+class TableSchema(object):
+    """Ordered list of the columns of a table. The row-codec of the
+    schema is compiled the first time it is used. 'storage' is the
+    layout of the pages of the table (StorageType). 'dictionaries' maps
+    the index of each dictionary-encoded column to its dictionary."""
+
+    def __init__(self, table_name, columns, storage=StorageType.ROW):
+        if not columns:
+            raise SchemaException('Table %s has no columns' % table_name)
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.storage = storage
+        self._col_indexes = {}
+        for i, column in enumerate(self.columns):
+            if column.name in self._col_indexes:
+                msg = 'Column %s is duplicated in table %s'
+                raise SchemaException(msg % (column.name, table_name))
+            self._col_indexes[column.name] = i
+        self.dictionaries = {i: StringDictionary()
+                             for i, column in enumerate(self.columns)
+                             if column.dictionary}
+        self._codec = None
+
+    @classmethod
+    def from_ast(cls, ast_create_table):
+        """Creates the schema of an AST_CreateTable"""
+        columns = []
+        for col_def in ast_create_table.col_definitions:
+            nullable = col_def.null_identifier != NullConstrain.NOT_NULL
+            columns.append(Column(col_def.column_name, col_def.type_id,
+                                  col_def.type_size, nullable,
+                                  col_def.dictionary))
+        return cls(ast_create_table.table_name, columns,
+                   ast_create_table.storage)
+
+    @property
+    def num_columns(self):
+        return len(self.columns)
+
+    @property
+    def codec(self):
+        if self._codec is None:
+            self._codec = RowCodec(self)
+        return self._codec
+
+    def column_index(self, col_name):
+        if col_name not in self._col_indexes:
+            msg = 'Column %s does not exist in table %s'
+            raise SchemaException(msg % (col_name, self.table_name))
+        return self._col_indexes[col_name]
+
+
+def _datetime_to_float(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def _date_to_int(value):
+    if isinstance(value, date):
+        return value.day + value.month * 100 + value.year * 10000
+    return int(value)
+
+
+class RowCodec(object):
+    """Encoder/decoder of the rows of a schema. The layout of a row is
+    compiled once into a struct.Struct:
+
+        | null-bitmap | fixed-part | varchar-data |
+
+    null-bitmap  - a bit per column (1: NULL)
+    fixed-part   - the columns in order: INTEGER and DATE (4 bytes),
+                   FLOAT and DATETIME (8 bytes), CHAR(n) (n bytes padded
+                   with zeros) and VARCHAR as (offset, length) of 2-bytes
+                   each, relative to the start of the row
+    varchar-data - the bytes of the varchars
+
+    The strings are encoded with utf-8. The sizes of CHAR(n) and
+    VARCHAR(n) are in bytes.
+
+    Long values: a CHAR(n) larger than OVERFLOW_THRESHOLD is stored
+    like a VARCHAR. A value larger than OVERFLOW_THRESHOLD (or the
+    largest ones, if the row does not fit in a page) is moved to a chain
+    of overflow pages; its length has the OVERFLOW_FLAG bit set and its
+    varchar-data is | first-page-id (4) | length (4) |. The overflow
+    pages are written and read through the callables given to encode and
+    decode (see OverflowStore).
+
+    A dictionary-encoded CHAR is stored as the 4-bytes code of its value.
+    """
+
+    _FORMATS = {SQLDataType.INTEGER: 'i', SQLDataType.DATE: 'i',
+                SQLDataType.FLOAT: 'd', SQLDataType.DATETIME: 'd',
+                SQLDataType.VARCHAR: 'HH'}
+
+    OVERFLOW_THRESHOLD = DiskPage.PAGE_DATA_SIZE // 4
+    OVERFLOW_FLAG = 0x8000
+    FMT_OVERFLOW = '<iI'
+    OVERFLOW_POINTER_SIZE = struct.calcsize(FMT_OVERFLOW)
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.num_columns = schema.num_columns
+        self.bitmap_size = (self.num_columns + 7) // 8
+
+        # Precomputed per-column information (used by every row)
+        self._is_varchar = [RowCodec._is_variable(c) for c in schema.columns]
+        self._is_code = [c.dictionary for c in schema.columns]
+        self._encoders = [self._get_encoder(c) for c in schema.columns]
+        self._decoders = [self._get_decoder(c) for c in schema.columns]
+        self._defaults = [self._get_default(c) for c in schema.columns]
+        # The size of the codes is checked by their encoders
+        self._max_sizes = [-1 if c.dictionary else c.size
+                           for c in schema.columns]
+        fmt = '<%ds' % self.bitmap_size
+        # Position of each column in the struct fields (varchars take 2)
+        # and its offset in the row
+        self._field_pos = []
+        self._field_offsets = []
+        pos = 1
+        for i, column in enumerate(schema.columns):
+            self._field_pos.append(pos)
+            self._field_offsets.append(struct.calcsize(fmt))
+            if self._is_varchar[i]:
+                fmt += 'HH'
+                pos += 2
+                continue
+            if self._is_code[i]:
+                fmt += 'i'
+            elif column.type_id == SQLDataType.CHAR:
+                fmt += '%ds' % column.size
+            else:
+                fmt += self._FORMATS[column.type_id]
+            pos += 1
+        self._struct = struct.Struct(fmt)
+        self.fixed_size = self._struct.size
+
+        # Can a value of the row be moved to overflow pages?
+        varchar_sizes = [c.size for i, c in enumerate(schema.columns)
+                         if self._is_varchar[i]]
+        self.has_overflow = \
+            any(size > self.OVERFLOW_THRESHOLD for size in varchar_sizes) or \
+            self.fixed_size + sum(varchar_sizes) > SlottedPage.MAX_RECORD_SIZE
+
+    @staticmethod
+    def _is_variable(column):
+        if column.type_id == SQLDataType.VARCHAR:
+            return True
+        return column.type_id == SQLDataType.CHAR and not column.dictionary \
+            and column.size > RowCodec.OVERFLOW_THRESHOLD
+
+    def _get_encoder(self, column):
+        type_id = column.type_id
+        if type_id == SQLDataType.INTEGER:
+            return int
+        if type_id == SQLDataType.FLOAT:
+            return float
+        if type_id == SQLDataType.DATETIME:
+            return _datetime_to_float
+        if type_id == SQLDataType.DATE:
+            return _date_to_int
+        if column.dictionary:
+            dictionary = self.schema.dictionaries[
+                self.schema.column_index(column.name)]
+
+            def encode_code(value):
+                if len(value.encode()) > column.size:
+                    msg = 'Value too long for column %s: %r' % (column.name,
+                                                                  value)
+                    raise SchemaException(msg)
+                return dictionary.encode(value)
+            return encode_code
+        return str.encode  # VARCHAR and CHAR
+
+    def _get_decoder(self, column):
+        type_id = column.type_id
+        if type_id == SQLDataType.DATETIME:
+            return DateTime.from_timestamp
+        if type_id == SQLDataType.DATE:
+            return Date.from_int4
+        if column.dictionary:
+            return self.schema.dictionaries[
+                self.schema.column_index(column.name)].decode
+        if type_id == SQLDataType.CHAR:
+            return lambda value: value.rstrip(b'\x00').decode()
+        return None  # The value is used as it is
+
+    @staticmethod
+    def _get_default(column):
+        if column.type_id in (SQLDataType.FLOAT, SQLDataType.DATETIME):
+            return 0.0
+        if column.type_id == SQLDataType.CHAR and not column.dictionary:
+            return b''
+        return 0
+
+    def encode(self, values, write_overflow=None):
+        """Returns the bytes of a row (a sequence of python values in the
+        order of the columns; None is NULL). write_overflow(bytes) stores
+        a long value in overflow pages and returns its first page-id; if
+        it is not given, a row with long values is rejected."""
+        if len(values) != self.num_columns:
+            msg = 'Table %s has %s columns but %s values were given'
+            raise SchemaException(msg % (self.schema.table_name,
+                                         self.num_columns, len(values)))
+        null_bits = 0
+        fields = [None]
+        varchar_values = []  # (column, field of the offset, bytes)
+        columns = self.schema.columns
+        is_varchar = self._is_varchar
+        max_sizes = self._max_sizes
+        for i, value in enumerate(values):
+            column = columns[i]
+            if value is None:
+                if not column.nullable:
+                    msg = 'Column %s can not be NULL' % column.name
+                    raise SchemaException(msg)
+                null_bits |= 1 << i
+                if is_varchar[i]:
+                    fields.append(0)
+                    fields.append(0)
+                else:
+                    fields.append(self._defaults[i])
+                continue
+            try:
+                encoded = self._encoders[i](value)
+            except (TypeError, ValueError, AttributeError):
+                msg = 'Invalid value for column %s: %r' % (column.name, value)
+                raise SchemaException(msg)
+            if max_sizes[i] > 0 and len(encoded) > max_sizes[i]:
+                msg = 'Value too long for column %s: %r' % (column.name,
+                                                              value)
+                raise SchemaException(msg)
+            if is_varchar[i]:
+                varchar_values.append((i, len(fields), encoded))
+                fields.append(0)
+                fields.append(len(encoded))
+            else:
+                fields.append(encoded)
+        fields[0] = null_bits.to_bytes(self.bitmap_size, 'little')
+        try:
+            row = self._struct.pack(*fields)
+        except struct.error as e:
+            raise SchemaException('Invalid row for table %s: %s'
+                                  % (self.schema.table_name, e))
+        if not varchar_values:
+            return row
+
+        # The overflow pages are written once the row is known to be valid
+        parts = self._place_varchars(fields, varchar_values, write_overflow)
+        return self._struct.pack(*fields) + b''.join(parts)
+
+    def _place_varchars(self, fields, varchar_values, write_overflow):
+        """Sets the (offset, length) of the varchars in 'fields' and
+        returns their data. The long values go to overflow pages."""
+        pointer_size = self.OVERFLOW_POINTER_SIZE
+        size = self.fixed_size + sum(len(v) for _, _, v in varchar_values)
+        overflows = set()
+        for k, (_, _, encoded) in enumerate(varchar_values):
+            if len(encoded) > self.OVERFLOW_THRESHOLD:
+                overflows.add(k)
+                size -= len(encoded) - pointer_size
+        # The largest values leave the row until it fits in a page
+        by_size = sorted(range(len(varchar_values)),
+                         key=lambda k: -len(varchar_values[k][2]))
+        for k in by_size:
+            if size <= SlottedPage.MAX_RECORD_SIZE:
+                break
+            encoded = varchar_values[k][2]
+            if k not in overflows and len(encoded) > pointer_size:
+                overflows.add(k)
+                size -= len(encoded) - pointer_size
+
+        if overflows and write_overflow is None:
+            col_name = self.schema.columns[varchar_values[min(overflows)][0]]\
+                .name
+            msg = 'The value of column %s needs overflow pages' % col_name
+            raise SchemaException(msg)
+        parts = []
+        offset = self.fixed_size
+        for k, (_, pos, encoded) in enumerate(varchar_values):
+            if k in overflows:
+                page_id = write_overflow(encoded)
+                part = struct.pack(self.FMT_OVERFLOW, page_id, len(encoded))
+                fields[pos + 1] = self.OVERFLOW_FLAG | pointer_size
+            else:
+                part = encoded
+            fields[pos] = offset
+            parts.append(part)
+            offset += len(part)
+        return parts
+
+    def convert(self, values):
+        """Validates a row and returns the list of its values converted
+        to their physical representation (int, float or bytes; None is
+        NULL). It is used by the layouts that do not store the rows in
+        the format of the codec (e.g. columnar pages)."""
+        if len(values) != self.num_columns:
+            msg = 'Table %s has %s columns but %s values were given'
+            raise SchemaException(msg % (self.schema.table_name,
+                                         self.num_columns, len(values)))
+        converted = []
+        columns = self.schema.columns
+        max_sizes = self._max_sizes
+        for i, value in enumerate(values):
+            column = columns[i]
+            if value is None:
+                if not column.nullable:
+                    msg = 'Column %s can not be NULL' % column.name
+                    raise SchemaException(msg)
+                converted.append(None)
+                continue
+            try:
+                encoded = self._encoders[i](value)
+            except (TypeError, ValueError, AttributeError):
+                msg = 'Invalid value for column %s: %r' % (column.name, value)
+                raise SchemaException(msg)
+            if max_sizes[i] > 0 and len(encoded) > max_sizes[i]:
+                msg = 'Value too long for column %s: %r' % (column.name,
+                                                              value)
+                raise SchemaException(msg)
+            converted.append(encoded)
+        return converted
+
+    def decoder(self, col_index):
+        """Function that converts the physical value of a column to its
+        python value (None if it is not needed)"""
+        return self._decoders[col_index]
+
+    def physical_value(self, col_index, value):
+        """Returns the physical value of 'value' in a column (the code of
+        a dictionary-encoded column), or None if no row can store it
+        (e.g. a string that is not in the dictionary)."""
+        if self._is_code[col_index]:
+            return self.schema.dictionaries[col_index].code(value)
+        try:
+            return self._encoders[col_index](value)
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+    def equal_predicate(self, col_index, value, read_overflow=None):
+        """Returns a function record -> bool that checks if the column is
+        equal to 'value' without decoding the row. The codes of the
+        dictionary-encoded columns are compared as integers."""
+        physical = self.physical_value(col_index, value)
+        if physical is None:
+            return lambda record: False
+        column = self.schema.columns[col_index]
+        null_byte, null_bit = col_index // 8, 1 << col_index % 8
+        if self._is_varchar[col_index]:
+            def is_equal(record):
+                if record[null_byte] & null_bit:
+                    return False
+                values = self.physical_values(record, [col_index], 0,
+                                              read_overflow)[1]
+                return values[0] == value
+            return is_equal
+
+        offset = self._field_offsets[col_index]
+        if self._is_code[col_index]:
+            fmt = struct.Struct('<i')
+        elif column.type_id == SQLDataType.CHAR:
+            fmt = struct.Struct('%ds' % column.size)
+            physical = physical.ljust(column.size, b'\x00')
+        else:
+            fmt = struct.Struct('<' + self._FORMATS[column.type_id])
+        unpack_from = fmt.unpack_from
+
+        def is_equal(record):
+            return not record[null_byte] & null_bit and \
+                unpack_from(record, offset)[0] == physical
+        return is_equal
+
+    def _read_varchar(self, buffer, offset, start, length, read_overflow):
+        start += offset
+        if length & self.OVERFLOW_FLAG:
+            if read_overflow is None:
+                raise RecordException('The row has values in overflow pages')
+            page_id, length = struct.unpack_from(self.FMT_OVERFLOW, buffer,
+                                                 start)
+            return read_overflow(page_id, length).decode()
+        return bytes(buffer[start:start + length]).decode()
+
+    def physical_values(self, buffer, col_indexes, offset=0,
+                        read_overflow=None):
+        """Returns (null-bits, values) of the columns in col_indexes of
+        the row stored at 'offset'. The values are not decoded (DATE is
+        an int, DATETIME a float and a dictionary-encoded CHAR its code),
+        except the strings; the value of a NULL is meaningless."""
+        fields = self._struct.unpack_from(buffer, offset)
+        null_bits = int.from_bytes(fields[0], 'little')
+        values = []
+        field_pos = self._field_pos
+        columns = self.schema.columns
+        for i in col_indexes:
+            pos = field_pos[i]
+            if self._is_varchar[i]:
+                if null_bits >> i & 1:
+                    values.append(None)
+                    continue
+                values.append(self._read_varchar(buffer, offset, fields[pos],
+                                                 fields[pos + 1],
+                                                 read_overflow))
+            elif columns[i].type_id == SQLDataType.CHAR and \
+                    not self._is_code[i]:
+                values.append(self._decoders[i](fields[pos]))
+            else:
+                values.append(fields[pos])
+        return null_bits, values
+
+    def decode(self, buffer, offset=0, read_overflow=None):
+        """Returns the tuple of values of the row stored at 'offset'.
+        read_overflow(page-id, length) returns the bytes of a value
+        stored in overflow pages."""
+        fields = self._struct.unpack_from(buffer, offset)
+        null_bits = int.from_bytes(fields[0], 'little')
+        values = []
+        field_pos = self._field_pos
+        decoders = self._decoders
+        is_varchar = self._is_varchar
+        for i in range(self.num_columns):
+            if null_bits >> i & 1:
+                values.append(None)
+                continue
+            pos = field_pos[i]
+            if is_varchar[i]:
+                values.append(self._read_varchar(buffer, offset, fields[pos],
+                                                 fields[pos + 1],
+                                                 read_overflow))
+                continue
+            decoder = decoders[i]
+            value = fields[pos]
+            values.append(value if decoder is None else decoder(value))
+        return tuple(values)
+
+    def overflow_pages(self, buffer, offset=0):
+        """Returns the first page-ids of the overflow chains of a row"""
+        if not self.has_overflow:
+            return []
+        fields = self._struct.unpack_from(buffer, offset)
+        null_bits = int.from_bytes(fields[0], 'little')
+        page_ids = []
+        for i in range(self.num_columns):
+            if not self._is_varchar[i] or null_bits >> i & 1:
+                continue
+            pos = self._field_pos[i]
+            if fields[pos + 1] & self.OVERFLOW_FLAG:
+                start = offset + fields[pos]
+                page_ids.append(struct.unpack_from(self.FMT_OVERFLOW, buffer,
+                                                   start)[0])
+        return page_ids
+
+
+class SlottedPage(object):
+    """Slotted-page layout over the data of a disk-page:
+
+        | num-slots | free-space-end | slot-directory -->
+                           <-- free space -->         <-- records |
+
+    The slot directory grows from the start of the data and the
+    records grow from its end. A slot is (offset, length); a deleted
+    slot has an offset of 0 and can be reused. A record never moves to
+    another slot, so its RID is stable while it exists.
+    """
+    FMT_HEADER = '<HH'
+    HEADER_SIZE = struct.calcsize(FMT_HEADER)
+    FMT_SLOT = '<HH'
+    SLOT_SIZE = struct.calcsize(FMT_SLOT)
+    MAX_RECORD_SIZE = DiskPage.PAGE_DATA_SIZE - HEADER_SIZE - SLOT_SIZE
+
+    def __init__(self, disk_page):
+        self.disk_page = disk_page
+        self.data = disk_page.data
+
+    @staticmethod
+    def format(disk_page):
+        """Initializes an empty slotted-page"""
+        struct.pack_into(SlottedPage.FMT_HEADER, disk_page.data, 0,
+                         0, DiskPage.PAGE_DATA_SIZE)
+        return SlottedPage(disk_page)
+
+    @property
+    def num_slots(self):
+        return struct.unpack_from('<H', self.data, 0)[0]
+
+    def _get_header(self):
+        return struct.unpack_from(self.FMT_HEADER, self.data, 0)
+
+    def _set_header(self, num_slots, free_space_end):
+        struct.pack_into(self.FMT_HEADER, self.data, 0, num_slots,
+                         free_space_end)
+
+    def _get_slot(self, slot_no):
+        offset = self.HEADER_SIZE + slot_no * self.SLOT_SIZE
+        return struct.unpack_from(self.FMT_SLOT, self.data, offset)
+
+    def _set_slot(self, slot_no, record_offset, length):
+        offset = self.HEADER_SIZE + slot_no * self.SLOT_SIZE
+        struct.pack_into(self.FMT_SLOT, self.data, offset, record_offset,
+                         length)
+
+    def _find_empty_slot(self, num_slots):
+        for slot_no in range(num_slots):
+            if self._get_slot(slot_no)[0] == 0:
+                return slot_no
+        return -1
+
+    @property
+    def contiguous_free_space(self):
+        num_slots, free_space_end = self._get_header()
+        return free_space_end - self.HEADER_SIZE - num_slots * self.SLOT_SIZE
+
+    @property
+    def free_space(self):
+        """Bytes available for a new record (after compacting the page),
+        including the space of its slot"""
+        num_slots = self.num_slots
+        used = self.HEADER_SIZE + num_slots * self.SLOT_SIZE
+        for slot_no in range(num_slots):
+            used += self._get_slot(slot_no)[1]
+        return DiskPage.PAGE_DATA_SIZE - used
+
+    def insert(self, record):
+        """Stores the record and returns its slot-number, or -1 if it
+        does not fit in the page."""
+        size = len(record)
+        num_slots, free_space_end = self._get_header()
+        slot_no = self._find_empty_slot(num_slots)
+        needed = size if slot_no != -1 else size + self.SLOT_SIZE
+        if self.contiguous_free_space < needed:
+            if self.free_space - (needed - size) < size:
+                return -1
+            self.compact()
+            num_slots, free_space_end = self._get_header()
+        if slot_no == -1:
+            slot_no = num_slots
+            num_slots += 1
+        record_offset = free_space_end - size
+        self.data[record_offset:free_space_end] = record
+        self._set_slot(slot_no, record_offset, size)
+        self._set_header(num_slots, record_offset)
+        return slot_no
+
+    def get(self, slot_no):
+        """Returns a memoryview of the record (None if it was deleted)"""
+        if slot_no < 0 or slot_no >= self.num_slots:
+            raise RecordException('Slot %s does not exist' % slot_no)
+        record_offset, length = self._get_slot(slot_no)
+        if record_offset == 0:
+            return None
+        return self.data[record_offset:record_offset + length]
+
+    def delete(self, slot_no):
+        if self.get(slot_no) is None:
+            raise RecordException('Slot %s is empty' % slot_no)
+        num_slots, free_space_end = self._get_header()
+        self._set_slot(slot_no, 0, 0)
+        # Trim the empty slots at the end of the directory
+        while num_slots > 0 and self._get_slot(num_slots - 1)[0] == 0:
+            num_slots -= 1
+        self._set_header(num_slots, free_space_end)
+
+    def update(self, slot_no, record):
+        """Replaces the record. Returns False if the new record does not
+        fit in the page (the old one is kept)."""
+        old = self.get(slot_no)
+        if old is None:
+            raise RecordException('Slot %s is empty' % slot_no)
+        record_offset, length = self._get_slot(slot_no)
+        size = len(record)
+        if size <= length:
+            # In place: the rest of the old record is wasted until the
+            # page is compacted
+            self.data[record_offset:record_offset + size] = record
+            self._set_slot(slot_no, record_offset, size)
+            return True
+        if self.free_space + length < size:
+            return False
+        self._set_slot(slot_no, 0, 0)
+        if self.contiguous_free_space < size:
+            self.compact()
+        num_slots, free_space_end = self._get_header()
+        record_offset = free_space_end - size
+        self.data[record_offset:free_space_end] = record
+        self._set_slot(slot_no, record_offset, size)
+        self._set_header(num_slots, record_offset)
+        return True
+
+    def compact(self):
+        """Moves the records to the end of the page, so all the free
+        space is contiguous. The slot numbers do not change."""
+        num_slots = self.num_slots
+        slots = [(self._get_slot(i), i) for i in range(num_slots)]
+        slots.sort(reverse=True)  # The records at the end go first
+        free_space_end = DiskPage.PAGE_DATA_SIZE
+        for (record_offset, length), slot_no in slots:
+            if record_offset == 0:
+                continue
+            new_offset = free_space_end - length
+            if new_offset != record_offset:
+                self.data[new_offset:free_space_end] = \
+                    self.data[record_offset:record_offset + length]
+                self._set_slot(slot_no, new_offset, length)
+            free_space_end = new_offset
+        self._set_header(num_slots, free_space_end)
+
+    def records(self):
+        """Generates (slot-number, memoryview) of the records"""
+        for slot_no in range(self.num_slots):
+            record_offset, length = self._get_slot(slot_no)
+            if record_offset != 0:
+                yield slot_no, self.data[record_offset:record_offset + length]
+
+
+class OverflowStore(object):
+    """Chains of overflow pages of the long values (see RowCodec). Each
+    page stores a piece of the value and the pages are linked by their
+    next-page pointers:
+
+        | length (2) | bytes |
+    """
+    FMT_LENGTH = '<H'
+    LENGTH_SIZE = struct.calcsize(FMT_LENGTH)
+    CHUNK_SIZE = DiskPage.PAGE_DATA_SIZE - LENGTH_SIZE
+
+    def __init__(self, buff_mngr):
+        self.buff_mngr = buff_mngr
+
+    def write(self, value):
+        """Stores the bytes in a new chain. Returns its first page-id"""
+        size = self.CHUNK_SIZE
+        chunks = [value[i:i + size] for i in range(0, len(value), size)]
+        next_id = -1
+        # From the last piece, so each page knows the next one
+        for chunk in reversed(chunks or [b'']):
+            disk_page = self.buff_mngr.new_page()
+            data = disk_page.data
+            end = self.LENGTH_SIZE + len(chunk)
+            try:
+                struct.pack_into(self.FMT_LENGTH, data, 0, len(chunk))
+                data[self.LENGTH_SIZE:end] = chunk
+                disk_page.next_page_pointer = next_id
+            finally:
+                self.buff_mngr.unpin(disk_page.id, is_dirty=True)
+            next_id = disk_page.id
+        return next_id
+
+    def read(self, page_id, length):
+        """Returns the bytes of the chain that starts at 'page_id'"""
+        chunks = []
+        while page_id != -1 and length > 0:
+            disk_page = self.buff_mngr.pin(page_id)
+            try:
+                data = disk_page.data
+                size = struct.unpack_from(self.FMT_LENGTH, data, 0)[0]
+                chunks.append(data[self.LENGTH_SIZE:
+                                   self.LENGTH_SIZE + size].tobytes())
+                next_id = disk_page.next_page_pointer
+            finally:
+                self.buff_mngr.unpin(page_id)
+            length -= size
+            page_id = next_id
+        if length > 0:
+            raise RecordException('Overflow chain is too short')
+        return b''.join(chunks)
+
+    def free(self, page_id):
+        """Releases the pages of a chain"""
+        while page_id != -1:
+            disk_page = self.buff_mngr.pin(page_id)
+            next_id = disk_page.next_page_pointer
+            self.buff_mngr.unpin(page_id)
+            self.buff_mngr.free_page(page_id)
+            page_id = next_id
+
+
+class RecordManager(object):
+    """Reads and writes the records of slotted-pages through the buffer
+    manager. The records are encoded/decoded with the codec of the
+    table schema; their long values are kept in overflow pages."""
+
+    def __init__(self, buff_mngr):
+        self.buff_mngr = buff_mngr
+        self.overflow = OverflowStore(buff_mngr)
+
+    def format_page(self, page_id):
+        SlottedPage.format(self.buff_mngr.pin(page_id))
+        self.buff_mngr.unpin(page_id, is_dirty=True)
+
+    def encode(self, schema, values):
+        """Encodes a row, writing its long values to overflow pages"""
+        return schema.codec.encode(values, self.overflow.write)
+
+    def free_overflow(self, schema, record):
+        """Releases the overflow pages of an encoded record"""
+        for page_id in schema.codec.overflow_pages(record):
+            self.overflow.free(page_id)
+
+    def insert(self, page_id, schema, values):
+        """Inserts the row in the page. Returns its RID, or None if it
+        does not fit."""
+        record = self.encode(schema, values)
+        if len(record) > SlottedPage.MAX_RECORD_SIZE:
+            self.free_overflow(schema, record)
+            msg = 'Row of %s bytes is too large' % len(record)
+            raise RecordException(msg)
+        slotted_page = SlottedPage(self.buff_mngr.pin(page_id))
+        slot_no = -1
+        try:
+            slot_no = slotted_page.insert(record)
+        finally:
+            self.buff_mngr.unpin(page_id, is_dirty=slot_no != -1)
+        if slot_no == -1:
+            self.free_overflow(schema, record)
+            return None
+        return RID(page_id, slot_no)
+
+    def get(self, rid, schema):
+        slotted_page = SlottedPage(self.buff_mngr.pin(rid.page_id))
+        try:
+            record = slotted_page.get(rid.slot_no)
+            if record is None:
+                raise RecordException('Record %s does not exist' % (rid,))
+            return schema.codec.decode(record, 0, self.overflow.read)
+        finally:
+            self.buff_mngr.unpin(rid.page_id)
+
+    def delete(self, rid, schema=None):
+        """Deletes the record (and its overflow pages if the schema is
+        given)"""
+        slotted_page = SlottedPage(self.buff_mngr.pin(rid.page_id))
+        overflow_pages = []
+        try:
+            if schema is not None:
+                record = slotted_page.get(rid.slot_no)
+                if record is not None:
+                    overflow_pages = schema.codec.overflow_pages(record)
+            slotted_page.delete(rid.slot_no)
+        finally:
+            self.buff_mngr.unpin(rid.page_id, is_dirty=True)
+        for page_id in overflow_pages:
+            self.overflow.free(page_id)
+
+    def update(self, rid, schema, values):
+        """Replaces the row. Returns False if it does not fit in its page
+        anymore."""
+        record = self.encode(schema, values)
+        slotted_page = SlottedPage(self.buff_mngr.pin(rid.page_id))
+        updated = False
+        old_pages = []
+        try:
+            old_record = slotted_page.get(rid.slot_no)
+            if old_record is not None:
+                old_pages = schema.codec.overflow_pages(old_record)
+            updated = slotted_page.update(rid.slot_no, record)
+        finally:
+            self.buff_mngr.unpin(rid.page_id, is_dirty=updated)
+        if updated:
+            for page_id in old_pages:
+                self.overflow.free(page_id)
+        else:
+            self.free_overflow(schema, record)
+        return updated
+
+    def scan_page(self, page_id, schema):
+        """Returns the list of (RID, row) of a page"""
+        decode = schema.codec.decode
+        read_overflow = self.overflow.read
+        slotted_page = SlottedPage(self.buff_mngr.pin(page_id))
+        try:
+            return [(RID(page_id, slot_no), decode(record, 0, read_overflow))
+                    for slot_no, record in slotted_page.records()]
+        finally:
+            self.buff_mngr.unpin(page_id)
+
+
+class SchemaException(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class RecordException(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -1,4 +1,19 @@
 import os
+import threading
+from contextlib import contextmanager
+from pysilisk.dsm import DiskSpaceManager
+from pysilisk.buffer import BufferManager, TwoQueuePolicy
+from pysilisk.wal import WriteAheadLog
+from pysilisk.records import RecordManager
+from pysilisk.heapfile import FileManager, Compactor
+from pysilisk.catalog import Catalog, CatalogException, IndexInfo
+from pysilisk.btree import BPlusTree, IndexKeyCodec
+from pysilisk.hashindex import LinearHashIndex
+from pysilisk.sqltypes import IndexType
+from pysilisk.engine import DEFAULT_BATCH_SIZE, SeqScan, VectorScan
+from pysilisk.engine import Sort, make_join, DEFAULT_MAX_SORT_ROWS
+from pysilisk.parser.sqlparser import SQLParser
+from pysilisk.parser.ast import AST_Vacuum
 
 
 class DDLCompiler(object):
@@ -12,43 +27,104 @@ class QueryCompiler(object):
     #QueryPreProcessor
 
 class ExecutionEngine(object):
-    pass
+    """Runs a physical plan (a tree of engine operators) batch by batch"""
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
 
-class BufferManager(object):
-    pass
+    def execute(self, physical_plan):
+        physical_plan.set_batch_size(self.batch_size)
+        return ResultSet(physical_plan)
 
 class IndexManager(object):
-    pass
-
-class FileManager(object):
-    pass
-
-class RecordManager(object):
-    pass
+    """Keeps the indexes of the tables up to date. An index is any object
+    with insert(key, rid) and delete(key, rid) (e.g. a BPlusTree or a
+    LinearHashIndex); its key is the tuple of the values of
+    'key_columns' (positions in the row)."""
+    def __init__(self):
+        # table-name --> {index-name: (key-columns, index)}
+        self._indexes = {}
+
+    def add_index(self, table_name, key_columns, index, index_name=None):
+        indexes = self._indexes.setdefault(table_name, {})
+        if index_name is None:
+            index_name = '%s_%d' % (table_name, len(indexes))
+        indexes[index_name] = (list(key_columns), index)
+
+    def remove_index(self, table_name, index_name):
+        return self._indexes.get(table_name, {}).pop(index_name, None)
+
+    def get_index(self, table_name, key_columns):
+        """Returns an index whose key starts with 'key_columns' (a lookup
+        with their values is a lookup of a prefix), or None. An index
+        without SUPPORTS_RANGES (a hash index) must have exactly those
+        columns; it is preferred if it does."""
+        key_columns = list(key_columns)
+        found = None
+        for columns, index in self._indexes.get(table_name, {}).values():
+            if columns == key_columns and \
+                    not getattr(index, 'SUPPORTS_RANGES', True):
+                return index
+            if columns[:len(key_columns)] == key_columns and \
+                    getattr(index, 'SUPPORTS_RANGES', True) and found is None:
+                found = index
+        return found
+
+    def has_indexes(self, table_name):
+        return bool(self._indexes.get(table_name))
+
+    def drop_indexes(self, table_name):
+        self._indexes.pop(table_name, None)
+
+    def insert_entries(self, table_name, rids, rows):
+        for key_columns, index in self._indexes.get(table_name, {}).values():
+            for rid, row in zip(rids, rows):
+                index.insert(tuple(row[i] for i in key_columns), rid)
+
+    def delete_entries(self, table_name, rids, rows):
+        for key_columns, index in self._indexes.get(table_name, {}).values():
+            for rid, row in zip(rids, rows):
+                index.delete(tuple(row[i] for i in key_columns), rid)
 
 class ResultSet(object):
     def __init__(self, physical_plan):
         self._physical_plan = physical_plan
         self._physical_plan.open()
         self._buffer_tuples = []
-        self._size_buffer = len(self.buffer_tuples)
-        self._idx_next == 0
+        self._size_buffer = 0
+        self._idx_next = 0
+        self._is_closed = False
+
+    @property
+    def columns(self):
+        return self._physical_plan.columns
 
     def __iter__(self):
         return self
 
-    def next(self):
+    def __next__(self):
         if self._idx_next == self._size_buffer:
-            self._buffer_tuples = self._physical_plan.next()
+            if self._is_closed:
+                raise StopIteration()
+            self._buffer_tuples = self._physical_plan.next_batch()
             self._size_buffer = len(self._buffer_tuples)
+            self._idx_next = 0
             if self._size_buffer == 0:
-                self._physical_plan.close()
+                self.close()
                 raise StopIteration()
-            self._idx_next = 0
         next_row = self._buffer_tuples[self._idx_next]
         self._idx_next += 1
         return next_row
 
+    next = __next__
+
+    def close(self):
+        if not self._is_closed:
+            self._is_closed = True
+            self._buffer_tuples = []
+            self._size_buffer = 0
+            self._idx_next = 0
+            self._physical_plan.close()
+
 
 def create_pysilisk_server(db_path):
     pass
@@ -57,23 +133,49 @@ def create_pysilisk_server(db_path):
 class PysiliskSQL:
     """Facade component"""
 
+    INITIAL_NUM_PAGES = 1024  # 4 MB, allocated lazily
+    CATALOG_PAGE_ID = 1       # First page of the catalog
+    BULK_INSERT_BATCH_SIZE = 1000
+    INDEX_CLASSES = {IndexType.BTREE: BPlusTree,
+                     IndexType.HASH: LinearHashIndex}
+
     def __init__(self, db_directory_path):
         self.db_directory_path = db_directory_path
         self.ddl_compiler = DDLCompiler()
         self.query_compiler = QueryCompiler()
         self.engine = ExecutionEngine()
-        self.buff_mngr = BufferManager()
+        db_filename = os.path.join(db_directory_path, 'pysilisk.db')
+        self.dsm = DiskSpaceManager(db_filename)
+        wal_filename = os.path.join(db_directory_path, 'pysilisk.wal')
+        self.wal = WriteAheadLog(wal_filename)
+        self.buff_mngr = BufferManager(self.dsm, policy=TwoQueuePolicy(),
+                                       read_ahead_pages=16, wal=self.wal)
+        self.record_mngr = RecordManager(self.buff_mngr)
+        self.file_mngr = FileManager(self.buff_mngr)
+        self.index_mngr = IndexManager()
+        self.catalog = Catalog(self.buff_mngr, self.CATALOG_PAGE_ID)
+        self.compactor = None
+        # Held by the running transaction: a rollback restores whole
+        # pages, so two transactions can not change the same pages
+        self._txn_lock = threading.RLock()
         self.sql_preprocessor = 1
         self.query_preproc = 1
         self.sql_preprocsr = 1
         self.result_set = None
         self.ddl_manager = None
-        self.parser = None
+        self.parser = SQLParser()
         self.optimizer = None
 
     def execute(self, sql_str):
         # Create and check the ast-tree that represent the query
         query_tree = self.parser.parse_query(sql_str)
+        if isinstance(query_tree, AST_Vacuum):
+            # Maintenance statement: it does not need a plan
+            results = self.vacuum(query_tree.table_name)
+            self.affected_rows = sum(len(result.moved_rids)
+                                     for result in results.values())
+            self.result_set = None
+            return
         checked_query_tree = self.sql_preprocsr.semantic_check(query_tree)
 
         if not checked_query_tree.is_dml_stmt():
@@ -97,11 +199,275 @@ class PysiliskSQL:
 
     def open(self):
         if not os.path.exists(self.db_directory_path):
-            self.pysilisk_server.create_db()
-        self.pysilisk_server.open_db()
+            os.makedirs(self.db_directory_path)
+        if not os.path.exists(self.dsm.filename):
+            self.dsm.create_file(self.INITIAL_NUM_PAGES, lazy=True)
+        self.dsm.open_file()
+        self.wal.open()
+        self.wal.recover(self.dsm)
+        if self.dsm.high_water_mark == self.CATALOG_PAGE_ID:
+            # New database: the catalog takes the first free page
+            with self._transaction():
+                self.catalog = Catalog.create(self.buff_mngr)
+        else:
+            self.catalog.load()
+            for table_name in self.catalog.table_names:
+                info = self.catalog.get_table(table_name)
+                for index_info in info.indexes.values():
+                    self._register_index(info.schema, index_info,
+                                         self._open_index(info.schema,
+                                                          index_info))
+        self.buff_mngr.start_background_writer()
+
+    @contextmanager
+    def _transaction(self):
+        """Runs a block in a transaction: every page that the block
+        changes (see BufferManager.set_transaction) is logged. The
+        transaction is committed at the end of the block, or rolled back
+        if it raises. The transactions run one at a time (the
+        compactor skips its steps meanwhile). Yields the
+        transaction-id."""
+        with self._txn_lock:
+            txn_id = self.wal.begin()
+            self.buff_mngr.set_transaction(txn_id)
+            try:
+                yield txn_id
+            except BaseException:
+                # The undo is logged by the rollback itself
+                self.buff_mngr.set_transaction(None)
+                self.wal.rollback(txn_id, self.buff_mngr)
+                raise
+            self.buff_mngr.set_transaction(None)
+            self.wal.commit(txn_id)
+
+    def create_table(self, schema):
+        """Creates the heap-file of the table and adds it to the catalog"""
+        with self._transaction():
+            heap_file = self.file_mngr.create_file(schema)
+            self.catalog.add_table(schema, heap_file.dir_page_id)
+        return heap_file
+
+    def drop_table(self, table_name):
+        with self._transaction():
+            info = self.catalog.remove_table(table_name)
+            self.file_mngr.drop_file(info.schema, info.dir_page_id)
+            self.index_mngr.drop_indexes(table_name)
+            for index_info in info.indexes.values():
+                self._open_index(info.schema, index_info).drop()
+
+    @staticmethod
+    def _key_columns(schema, index_info):
+        return [schema.column_index(n) for n in index_info.col_names]
+
+    def _open_index(self, schema, index_info):
+        key_types = [schema.columns[i].type_id
+                     for i in self._key_columns(schema, index_info)]
+        index_class = self.INDEX_CLASSES[index_info.index_type]
+        return index_class(self.buff_mngr, key_types, index_info.page_id)
+
+    def _register_index(self, schema, index_info, index):
+        self.index_mngr.add_index(schema.table_name,
+                                  self._key_columns(schema, index_info),
+                                  index, index_info.index_name)
+
+    def create_index(self, index_name, table_name, col_names,
+                     index_type=IndexType.BTREE):
+        """CREATE INDEX ... USING {BTREE|HASH}: builds the index of the
+        rows of the table, adds it to the catalog and keeps it up to date
+        from now on. A B+tree is built with a bulk load (the entries are
+        sorted first). Returns the index."""
+        info = self.catalog.get_table(table_name)
+        if index_name in info.indexes:
+            msg = 'Index %s already exists in table %s'
+            raise CatalogException(msg % (index_name, table_name))
+        if index_type not in self.INDEX_CLASSES:
+            msg = 'Index type %s is not supported' % index_type
+            raise CatalogException(msg)
+        schema = info.schema
+        key_types = [schema.columns[schema.column_index(n)].type_id
+                     for n in col_names]
+        table_file = self.get_table_file(table_name)
+        entries = ((row, rid) for rid, row in table_file.scan(col_names))
+        with self._transaction():
+            if index_type == IndexType.BTREE:
+                codec = IndexKeyCodec(key_types)
+                entries = sorted(entries,
+                                 key=lambda entry: codec.encode_entry(*entry))
+                index = BPlusTree.bulk_load(self.buff_mngr, key_types,
+                                            entries)
+            else:
+                index = LinearHashIndex.create(self.buff_mngr, key_types)
+                for key, rid in entries:
+                    index.insert(key, rid)
+            index_info = IndexInfo(index_name, col_names, index_type,
+                                   index.header_page_id)
+            self.catalog.add_index(table_name, index_info)
+        self._register_index(schema, index_info, index)
+        return index
+
+    def drop_index(self, index_name, table_name):
+        info = self.catalog.get_table(table_name)
+        with self._transaction():
+            index_info = self.catalog.remove_index(table_name, index_name)
+            self.index_mngr.remove_index(table_name, index_name)
+            self._open_index(info.schema, index_info).drop()
+
+    def get_table_file(self, table_name):
+        """Returns the file of the table (HeapFile or ColumnarFile)"""
+        info = self.catalog.get_table(table_name)
+        return self.file_mngr.open_file(info.schema, info.dir_page_id)
+
+    def table_scan(self, table_name, col_names=None, alias=None,
+                   predicates=None):
+        """Returns a SeqScan operator of the table (the leaf of a physical
+        plan)"""
+        return SeqScan(self.get_table_file(table_name), col_names, alias,
+                       predicates, self.engine.batch_size)
+
+    def vector_scan(self, table_name, col_names=None, alias=None,
+                    condition=None, expressions=None, aliases=None,
+                    predicates=None):
+        """Returns a VectorScan operator of the table: the condition and
+        the expressions are evaluated over column vectors"""
+        return VectorScan(self.get_table_file(table_name), col_names, alias,
+                          condition, expressions, aliases, predicates,
+                          self.engine.batch_size)
+
+    def join(self, left, right, condition=None):
+        """Returns the join operator of two plans (a HashJoin for an
+        equi-join, see make_join). The partitions of a large hash-join
+        are spilled to temporary pages of the database."""
+        return make_join(left, right, condition, self.buff_mngr,
+                         batch_size=self.engine.batch_size)
+
+    def sort(self, child, sort_keys, max_rows=DEFAULT_MAX_SORT_ROWS):
+        """Returns the Sort operator of a plan (sort_keys: the
+        AST_OrderByColumns of ORDER BY). The runs of a sort of more than
+        max_rows rows are spilled to temporary pages of the database."""
+        return Sort(child, sort_keys, self.buff_mngr, max_rows,
+                    batch_size=self.engine.batch_size)
+
+    def bulk_insert(self, table_name, rows, batch_size=None):
+        """Inserts an iterable of tuples into the table without going
+        through the SQL parser. The rows are validated and encoded with
+        the (precompiled) codec of the table, and they are written in
+        batches: a batch takes the lock of the table-file once and logs
+        a single record per page. The indexes are updated per batch. All
+        the rows are inserted in a single transaction (one commit): if a
+        row fails, the pages of the file and of its indexes (and the
+        overflow pages) are rolled back, and the file and the indexes
+        are read again (see _reload_table). Returns the number of
+        inserted rows."""
+        batch_size = batch_size or self.BULK_INSERT_BATCH_SIZE
+        table_file = self.get_table_file(table_name)
+        num_rows = 0
+        try:
+            with self._transaction():
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) == batch_size:
+                        num_rows += len(self._insert_batch(table_file,
+                                                           batch))
+                        batch = []
+                if batch:
+                    num_rows += len(self._insert_batch(table_file, batch))
+                # The rows refer to the codes of the new dictionary values
+                self.catalog.save_dictionaries()
+        except Exception:
+            self._reload_table(table_name, table_file)
+            raise
+        return num_rows
+
+    def _insert_batch(self, table_file, batch):
+        rids = table_file.insert_rows(batch)
+        self.index_mngr.insert_entries(table_file.schema.table_name, rids,
+                                       batch)
+        return rids
+
+    def vacuum(self, table_name=None, max_pages=None):
+        """VACUUM [table]: reclaims the space of the deleted rows of a
+        table (all the tables by default) and releases its empty pages
+        (see HeapFile.vacuum). The indexes are updated with the new RIDs
+        of the moved rows in the same step, under the lock of the file.
+        Returns a dict table-name --> VacuumResult."""
+        if table_name is None:
+            table_names = self.catalog.table_names
+        else:
+            table_names = [table_name]
+        return {name: self._vacuum_table(name, max_pages)
+                for name in table_names}
+
+    def _vacuum_table(self, table_name, max_pages):
+        table_file = self.get_table_file(table_name)
+        on_move = None
+        if self.index_mngr.has_indexes(table_name):
+            def on_move(moved):
+                old_rids = [old_rid for old_rid, _ in moved]
+                new_rids = [new_rid for _, new_rid in moved]
+                rows = [table_file.get(rid) for rid in new_rids]
+                self.index_mngr.delete_entries(table_name, old_rids, rows)
+                self.index_mngr.insert_entries(table_name, new_rids, rows)
+        try:
+            with self._transaction():
+                return table_file.vacuum(max_pages, on_move)
+        except Exception:
+            self._reload_table(table_name, table_file)
+            raise
+
+    def _reload_table(self, table_name, table_file):
+        """Reads the in-memory state of the file and of the indexes of
+        a table again, after the rollback of their pages"""
+        table_file.reload()
+        info = self.catalog.get_table(table_name)
+        for index_info in info.indexes.values():
+            self._register_index(info.schema, index_info,
+                                 self._open_index(info.schema, index_info))
+
+    def _vacuum_step(self, max_pages):
+        """A step of the compactor. Returns the number of pages that were
+        released or compacted. The step is skipped (0) while another
+        transaction is running."""
+        if not self._txn_lock.acquire(blocking=False):
+            return 0
+        try:
+            num_pages = 0
+            for table_name in self.catalog.table_names:
+                try:
+                    result = self._vacuum_table(table_name, max_pages)
+                except CatalogException:
+                    continue  # Dropped meanwhile
+                num_pages += result.released_pages + result.compacted_pages
+            return num_pages
+        finally:
+            self._txn_lock.release()
+
+    def start_compactor(self, interval=5.0, pages_per_step=8, pause=0.05):
+        """Starts a thread that vacuums the tables every 'interval'
+        seconds, 'pages_per_step' pages at a time (see Compactor)."""
+        if self.compactor is None:
+            self.compactor = Compactor(self._vacuum_step, interval,
+                                       pages_per_step, pause)
+            self.compactor.start()
+
+    def stop_compactor(self):
+        if self.compactor is not None:
+            self.compactor.stop()
+            self.compactor = None
+
+    def checkpoint(self):
+        with self._transaction():
+            self.catalog.save_dictionaries()
+        self.wal.checkpoint(self.buff_mngr)
 
     def close(self):
-        pass
+        self.stop_compactor()
+        self.buff_mngr.stop_background_writer()
+        with self._transaction():
+            self.catalog.save_dictionaries()
+        self.wal.checkpoint(self.buff_mngr)
+        self.wal.close()
+        self.dsm.close_file()
 
 
 
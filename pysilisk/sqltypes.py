@@ -16,6 +16,36 @@ class NullConstrain(object):
         elif str_constrain == 'NOT NULL':
             return cls.NOT_NULL
 
+class StorageType(object):
+    """Identifiers for the 'STORAGE ROW' and 'STORAGE COLUMNAR'
+    options in the Create-Table statement
+    """
+    ROW = 0       # Slotted-pages (heap-file)
+    COLUMNAR = 1  # PAX pages: a minipage per column
+
+    @classmethod
+    def from_string(cls, str_storage):
+        str_storage = str_storage.upper()
+        if str_storage in ['', 'ROW']:
+            return cls.ROW
+        elif str_storage == 'COLUMNAR':
+            return cls.COLUMNAR
+
+class IndexType(object):
+    """Identifiers for the 'USING BTREE' and 'USING HASH' options in the
+    Create-Index statement
+    """
+    BTREE = 'BTREE'
+    HASH = 'HASH'
+
+    @classmethod
+    def from_string(cls, str_index_type):
+        str_index_type = str_index_type.upper()
+        if str_index_type == 'BTREE':
+            return cls.BTREE
+        elif str_index_type == 'HASH':
+            return cls.HASH
+
 class SQLDataType(object):
     """Identifiers and Names of the SQL Data-types supported by Pisilisk"""
     INTEGER = 0  # Integer of 4-bytes
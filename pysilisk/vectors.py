@@ -0,0 +1,348 @@
+import sys
+from array import array
+from pysilisk.records import RID, SlottedPage
+from pysilisk.sqltypes import SQLDataType, Date, DateTime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Typecodes and numpy dtypes of the fixed-width types. DATE is stored
+# as an int4 (yyyymmdd) and DATETIME as a double (timestamp).
+_TYPECODES = {SQLDataType.INTEGER: 'i', SQLDataType.DATE: 'i',
+              SQLDataType.FLOAT: 'd', SQLDataType.DATETIME: 'd'}
+_DTYPES = {'i': '<i4', 'd': '<f8'}
+_NEEDS_BYTESWAP = sys.byteorder != 'little'
+
+
+def has_numpy():
+    return numpy is not None
+
+
+def _bits_to_mask(bits, num_rows, use_numpy):
+    """Converts a bitmap (int) into a mask of num_rows bytes/bools"""
+    if use_numpy:
+        bitmap = numpy.frombuffer(bits.to_bytes((num_rows + 7) // 8,
+                                                'little'), dtype=numpy.uint8)
+        return numpy.unpackbits(bitmap, bitorder='little')[:num_rows] \
+            .astype(bool)
+    mask = bytearray(num_rows)
+    while bits:
+        low_bit = bits & -bits
+        mask[low_bit.bit_length() - 1] = 1
+        bits ^= low_bit
+    return mask
+
+
+class ColumnVector(object):
+    """Values of a column for a batch of rows.
+
+    data      - array.array ('i' or 'd') or numpy array for the
+                fixed-width types, list of str for CHAR and VARCHAR.
+                DATE and DATETIME keep their physical values (int4 and
+                timestamp); to_list converts them.
+    null_mask - None if there are no NULLs; otherwise a bytearray or a
+                numpy bool array (1/True: NULL). The value of a NULL in
+                data is meaningless (0).
+    dictionary - StringDictionary of a dictionary-encoded column: data
+                 has the integer codes of the values.
+    """
+    __slots__ = ('type_id', 'data', 'null_mask', 'dictionary')
+
+    def __init__(self, type_id, data, null_mask=None, dictionary=None):
+        self.type_id = type_id
+        self.data = data
+        self.null_mask = null_mask
+        self.dictionary = dictionary
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def is_numpy(self):
+        return numpy is not None and isinstance(self.data, numpy.ndarray)
+
+    @property
+    def has_nulls(self):
+        return self.null_mask is not None and any(self.null_mask)
+
+    def to_list(self):
+        """Returns the python values (None for NULL)"""
+        if self.is_numpy:
+            values = self.data.tolist()
+        else:
+            values = list(self.data)
+        if self.dictionary is not None:
+            decoder = self.dictionary.decode
+        elif self.type_id == SQLDataType.DATE:
+            decoder = Date.from_int4
+        elif self.type_id == SQLDataType.DATETIME:
+            decoder = DateTime.from_timestamp
+        else:
+            decoder = None
+        if self.null_mask is None:
+            if decoder is None:
+                return values
+            return [decoder(v) for v in values]
+        return [None if is_null else (v if decoder is None else decoder(v))
+                for v, is_null in zip(values, self.null_mask)]
+
+    def equal_mask(self, value):
+        """Returns the mask (bytearray or numpy bool array) of the rows
+        equal to 'value' (a physical value, or a string for a
+        dictionary-encoded column: its code is compared, not the
+        strings). The NULLs are not equal to anything."""
+        if self.dictionary is not None:
+            value = self.dictionary.code(value)
+        if self.is_numpy:
+            if value is None:
+                return numpy.zeros(len(self), dtype=bool)
+            mask = self.data == value
+            if self.null_mask is not None:
+                mask &= ~self.null_mask
+            return mask
+        if value is None:
+            return bytearray(len(self))
+        mask = bytearray(v == value for v in self.data)
+        if self.null_mask is not None:
+            mask = bytearray(m and not n for m, n in zip(mask,
+                                                         self.null_mask))
+        return mask
+
+    def take(self, indexes):
+        """Returns a vector with the rows at 'indexes'"""
+        if self.is_numpy:
+            data = self.data[indexes]
+        elif isinstance(self.data, array):
+            data = array(self.data.typecode, [self.data[i] for i in indexes])
+        else:
+            data = [self.data[i] for i in indexes]
+        null_mask = None
+        if self.null_mask is not None:
+            if self.is_numpy:
+                null_mask = self.null_mask[indexes]
+            else:
+                null_mask = bytearray(self.null_mask[i] for i in indexes)
+        return ColumnVector(self.type_id, data, null_mask, self.dictionary)
+
+    @classmethod
+    def concat(cls, type_id, vectors):
+        """Concatenates vectors of the same type"""
+        if not vectors:
+            return cls(type_id, [])
+        if len(vectors) == 1:
+            return vectors[0]
+        if vectors[0].is_numpy:
+            data = numpy.concatenate([v.data for v in vectors])
+        elif isinstance(vectors[0].data, array):
+            data = array(vectors[0].data.typecode)
+            for v in vectors:
+                data.extend(v.data)
+        else:
+            data = []
+            for v in vectors:
+                data.extend(v.data)
+        null_mask = None
+        if any(v.null_mask is not None for v in vectors):
+            masks = [v.null_mask if v.null_mask is not None
+                     else cls._no_nulls(len(v), v.is_numpy) for v in vectors]
+            if vectors[0].is_numpy:
+                null_mask = numpy.concatenate(masks)
+            else:
+                null_mask = bytearray()
+                for mask in masks:
+                    null_mask += mask
+        return cls(type_id, data, null_mask, vectors[0].dictionary)
+
+    @staticmethod
+    def _no_nulls(num_rows, use_numpy):
+        if use_numpy:
+            return numpy.zeros(num_rows, dtype=bool)
+        return bytearray(num_rows)
+
+
+class ColumnBatch(object):
+    """Batch of rows stored by columns: a ColumnVector per column (in
+    the order of 'col_names') and the RID of each row (None if the RIDs
+    were not collected; then num_rows is required)."""
+
+    def __init__(self, col_names, vectors, rids, num_rows=None):
+        self.col_names = list(col_names)
+        self.vectors = vectors
+        self.rids = rids
+        self._num_rows = len(rids) if rids is not None else num_rows
+
+    @property
+    def num_rows(self):
+        return self._num_rows
+
+    def __len__(self):
+        return self._num_rows
+
+    def column(self, col_name):
+        return self.vectors[self.col_names.index(col_name)]
+
+    def rows(self):
+        """Returns the list of tuples of python values"""
+        if not self.vectors:
+            return [()] * self._num_rows
+        return list(zip(*[v.to_list() for v in self.vectors]))
+
+
+class BatchDecoder(object):
+    """Decodes runs of data pages into ColumnBatches.
+
+    For columnar (PAX) pages, the fixed-width columns are read directly
+    from the minipages: the bytes of a column are copied once into a
+    buffer and it is wrapped with numpy.frombuffer (or an array.array),
+    so no python object is created per value. For slotted pages, the
+    rows are unpacked with the precompiled struct of the row-codec and
+    the values are appended to the typed arrays.
+
+    use_numpy - None: use numpy if it is installed.
+    with_rids - False: the batches have no RIDs (creating a RID per row
+                costs more than decoding the numeric columns).
+    """
+
+    def __init__(self, table_file, col_names=None, use_numpy=None,
+                 with_rids=True):
+        self.table_file = table_file
+        schema = table_file.schema
+        if col_names is None:
+            col_names = [c.name for c in schema.columns]
+        self.col_names = list(col_names)
+        self.col_indexes = [schema.column_index(n) for n in self.col_names]
+        self.type_ids = [schema.columns[i].type_id for i in self.col_indexes]
+        self.dictionaries = [schema.dictionaries.get(i)
+                             for i in self.col_indexes]
+        # The codes of the dictionary-encoded columns are int4
+        self.typecodes = [_TYPECODES.get(t) if d is None else 'i'
+                          for t, d in zip(self.type_ids, self.dictionaries)]
+        if use_numpy is None:
+            use_numpy = has_numpy()
+        elif use_numpy and not has_numpy():
+            raise ImportError('numpy is not installed')
+        self.use_numpy = use_numpy
+        self.with_rids = with_rids
+        self._layout = getattr(table_file, 'layout', None)
+
+    def decode_pages(self, page_ids):
+        """Returns a ColumnBatch with the rows of the pages"""
+        buff_mngr = self.table_file.buff_mngr
+        page_vectors = []
+        rids = [] if self.with_rids else None
+        num_rows = 0
+        for page_id in page_ids:
+            disk_page = buff_mngr.pin(page_id)
+            try:
+                if self._layout is not None:
+                    vectors, page_rids = self._decode_pax(disk_page)
+                else:
+                    vectors, page_rids = self._decode_slotted(disk_page)
+            finally:
+                buff_mngr.unpin(page_id)
+            if page_rids:
+                page_vectors.append(vectors)
+                num_rows += len(page_rids)
+                if rids is not None:
+                    rids.extend(page_rids)
+        vectors = []
+        for k in range(len(self.col_indexes)):
+            vector = ColumnVector.concat(self.type_ids[k],
+                                         [pv[k] for pv in page_vectors])
+            vector.dictionary = self.dictionaries[k]
+            vectors.append(vector)
+        return ColumnBatch(self.col_names, vectors, rids, num_rows)
+
+    def _make_data(self, typecode, raw):
+        if typecode is None:
+            return raw
+        if self.use_numpy:
+            return numpy.frombuffer(raw, dtype=_DTYPES[typecode])
+        data = array(typecode)
+        data.frombytes(raw)
+        if _NEEDS_BYTESWAP:
+            data.byteswap()
+        return data
+
+    def _decode_pax(self, disk_page):
+        layout = self._layout
+        data = disk_page.data
+        num_rows, num_deleted = layout.get_header(data)
+        vectors = []
+        for k, col in enumerate(self.col_indexes):
+            typecode = self.typecodes[k]
+            if typecode is not None:
+                start = layout.value_offsets[col]
+                raw = bytearray(data[start:start + num_rows *
+                                     layout.widths[col]])
+                values = self._make_data(typecode, raw)
+                null_offset = layout.null_offsets[col]
+                nulls = int.from_bytes(data[null_offset:null_offset +
+                                            layout.bitmap_size], 'little')
+                mask = _bits_to_mask(nulls, num_rows, self.use_numpy) \
+                    if nulls else None
+                vector = ColumnVector(self.type_ids[k], values, mask)
+            else:
+                # Strings: the python objects can't be avoided
+                values = layout.read_column(data, col, num_rows)
+                mask = None
+                if any(v is None for v in values):
+                    mask = bytearray(v is None for v in values)
+                    if self.use_numpy:
+                        mask = numpy.frombuffer(mask, dtype=bool)
+                vector = ColumnVector(self.type_ids[k], values, mask)
+            vectors.append(vector)
+
+        row_indexes = range(num_rows)
+        if num_deleted:
+            deleted = layout.deleted_rows(data)
+            row_indexes = [i for i in row_indexes if not deleted >> i & 1]
+            vectors = [v.take(row_indexes) for v in vectors]
+        if not self.with_rids:
+            return vectors, row_indexes
+        return vectors, [RID(disk_page.id, i) for i in row_indexes]
+
+    def _decode_slotted(self, disk_page):
+        codec = self.table_file.schema.codec
+        read_overflow = self.table_file.record_mngr.overflow.read
+        columns = [array(t) if t is not None else []
+                   for t in self.typecodes]
+        masks = [bytearray() for _ in self.col_indexes]
+        any_nulls = [False] * len(self.col_indexes)
+        rids = []
+        for slot_no, record in SlottedPage(disk_page).records():
+            null_bits, values = codec.physical_values(
+                record, self.col_indexes, 0, read_overflow)
+            for k, value in enumerate(values):
+                if null_bits >> self.col_indexes[k] & 1:
+                    any_nulls[k] = True
+                    masks[k].append(1)
+                    columns[k].append(0 if self.typecodes[k] else None)
+                else:
+                    masks[k].append(0)
+                    columns[k].append(value)
+            rids.append(RID(disk_page.id, slot_no))
+        vectors = []
+        for k in range(len(self.col_indexes)):
+            values = columns[k]
+            mask = masks[k] if any_nulls[k] else None
+            if self.use_numpy:
+                if self.typecodes[k] is not None:
+                    values = numpy.frombuffer(values, dtype=values.typecode) \
+                        .astype(_DTYPES[self.typecodes[k]])
+                if mask is not None:
+                    mask = numpy.frombuffer(mask, dtype=bool)
+            vectors.append(ColumnVector(self.type_ids[k], values, mask))
+        return vectors, rids
+
+    def scan(self, pages_per_batch=16, page_ids=None):
+        """Generates a ColumnBatch per run of 'pages_per_batch' pages (of
+        'page_ids', all the pages of the file by default)"""
+        if page_ids is None:
+            page_ids = self.table_file.page_ids
+        for i in range(0, len(page_ids), pages_per_batch):
+            batch = self.decode_pages(page_ids[i:i + pages_per_batch])
+            if batch.num_rows:
+                yield batch
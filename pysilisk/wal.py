@@ -0,0 +1,393 @@
+import os
+import struct
+import threading
+import zlib
+
+
+class LogRecordType(object):
+    """Identifiers of the records of the write-ahead log"""
+    PAGE_WRITE = 0  # Before and after images of a range of a page
+    COMMIT = 1
+    ABORT = 2
+    CHECKPOINT = 3
+    HEADER = 4      # Before and after header of the disk-space
+
+
+class LogRecord(object):
+    """Record of the write-ahead log.
+
+    Format:
+        | length | crc32 | type | txn-id | page-id | offset | size |
+        | before-image (size bytes) | after-image (size bytes) |
+
+    'length' is the size of the whole record and the crc32 covers
+    everything after it, so a record that was partially written (a
+    crash in the middle of a flush) is detected and ignored. 'offset'
+    is relative to the page (DiskPage.buffer), so the images may include
+    the page-id and the next-page pointer. The images of a HEADER record
+    are the first-free-id and the high-water mark of the disk-space, and
+    its page-id is the page that was allocated or released.
+    """
+    FMT_HEADER = '<IIBqiHH'
+    HEADER_SIZE = struct.calcsize(FMT_HEADER)
+    FMT_DSM_HEADER = '<ii'
+
+    __slots__ = ('type', 'txn_id', 'page_id', 'offset', 'before', 'after',
+                 'lsn')
+
+    def __init__(self, record_type, txn_id, page_id=-1, offset=0,
+                 before=b'', after=b''):
+        if len(before) != len(after):
+            raise ValueError('The before and after images differ in size')
+        self.type = record_type
+        self.txn_id = txn_id
+        self.page_id = page_id
+        self.offset = offset
+        self.before = bytes(before)
+        self.after = bytes(after)
+        self.lsn = -1  # Offset of the record in the log
+
+    def to_bytes(self):
+        size = len(self.after)
+        length = LogRecord.HEADER_SIZE + 2 * size
+        body = struct.pack(LogRecord.FMT_HEADER, length, 0, self.type,
+                           self.txn_id, self.page_id, self.offset, size)
+        body = body[8:] + self.before + self.after
+        crc = zlib.crc32(body)
+        return struct.pack('<II', length, crc) + body
+
+    @staticmethod
+    def from_buffer(buffer, pos):
+        """Decodes the record that starts at 'pos'. Returns None if the
+        record is truncated or corrupted."""
+        if pos + LogRecord.HEADER_SIZE > len(buffer):
+            return None
+        length, crc, record_type, txn_id, page_id, offset, size = \
+            struct.unpack_from(LogRecord.FMT_HEADER, buffer, pos)
+        if length != LogRecord.HEADER_SIZE + 2 * size or \
+                pos + length > len(buffer):
+            return None
+        if zlib.crc32(buffer[pos + 8:pos + length]) != crc:
+            return None
+        start = pos + LogRecord.HEADER_SIZE
+        record = LogRecord(record_type, txn_id, page_id, offset,
+                           buffer[start:start + size],
+                           buffer[start + size:start + 2 * size])
+        record.lsn = pos
+        return record
+
+
+class WriteAheadLog(object):
+    """Append-only log of the changes made to the pages.
+
+    Rules:
+    - WAL: a dirty page is written to disk only after the log records
+      of its changes (the buffer manager calls flush(page_lsn) before
+      writing a page).
+    - Commit: a transaction is durable when its COMMIT record is on
+      disk. The data pages are not flushed at commit time.
+    - Group commit: the records are appended to an in-memory buffer.
+      The first transaction that commits becomes the leader: it writes
+      the buffer and calls fsync once for all the transactions that
+      committed in the meantime (the followers only wait).
+      'commit_delay' (seconds) makes the leader wait for more commits
+      before the fsync when other transactions are running.
+    - Checkpoint: flushes all the dirty pages and the data file. The
+      log is truncated only if no transaction is running and nothing
+      was logged since the flush started.
+
+    LSNs are byte offsets in the log. An update returns the LSN of the
+    end of its record: the buffer manager must flush the log up to that
+    LSN before it writes the page.
+        txn_id = wal.begin()
+        page = buff_mngr.pin(page_id)
+        lsn = wal.log_update(txn_id, page, offset, new_bytes)
+        buff_mngr.unpin(page_id, is_dirty=True, page_lsn=lsn)
+        wal.commit(txn_id)
+
+    The buffer manager logs the changes by itself (see
+    BufferManager.set_transaction): the images of the pages, including
+    the allocations and releases, and the header of the disk-space.
+    """
+
+    def __init__(self, filename, commit_delay=0.0):
+        self.filename = filename
+        self.commit_delay = commit_delay
+        self._fd = -1
+        self._cond = threading.Condition(threading.Lock())
+        self._buffer = bytearray()  # Records not written yet
+        self._next_lsn = 0          # LSN of the next record
+        self._flushed_lsn = 0       # Everything before is on disk
+        self._flushing = False      # True while a leader writes the log
+        self._next_txn_id = 1
+        self._active_txns = {}      # txn-id --> list of undo records
+
+        # Counters
+        self.num_fsyncs = 0
+        self.num_commits = 0
+
+    @property
+    def flushed_lsn(self):
+        return self._flushed_lsn
+
+    @property
+    def next_lsn(self):
+        return self._next_lsn
+
+    def open(self):
+        if self._fd < 0:
+            flags = os.O_RDWR | os.O_CREAT | os.O_APPEND
+            self._fd = os.open(self.filename, flags, 0o644)
+            self._next_lsn = os.fstat(self._fd).st_size
+            self._flushed_lsn = self._next_lsn
+
+    def close(self):
+        if self._fd >= 0:
+            self.flush()
+            os.close(self._fd)
+            self._fd = -1
+
+    def begin(self):
+        with self._cond:
+            txn_id = self._next_txn_id
+            self._next_txn_id += 1
+            self._active_txns[txn_id] = []
+            return txn_id
+
+    def _append(self, record):
+        """Appends the record to the log-buffer. Returns the LSN of the
+        end of the record. The lock must be held."""
+        if self._fd < 0:
+            raise WALException('The log %s is not open' % self.filename)
+        record.lsn = self._next_lsn
+        record_bytes = record.to_bytes()
+        self._buffer += record_bytes
+        self._next_lsn += len(record_bytes)
+        return self._next_lsn
+
+    def _get_undo_list(self, txn_id):
+        undo_list = self._active_txns.get(txn_id)
+        if undo_list is None:
+            raise WALException('Transaction %s is not active' % txn_id)
+        return undo_list
+
+    def log_page_write(self, txn_id, page_id, offset, before, after):
+        """Logs a change of the data area of a page. Returns its LSN"""
+        record = LogRecord(LogRecordType.PAGE_WRITE, txn_id, page_id,
+                           offset, before, after)
+        with self._cond:
+            self._get_undo_list(txn_id).append(record)
+            return self._append(record)
+
+    def log_header(self, txn_id, page_id, before, after):
+        """Logs a change of the header of the disk-space because page_id
+        was allocated or released: before and after are (first-free-id,
+        high-water mark). Returns its LSN"""
+        record = LogRecord(LogRecordType.HEADER, txn_id, page_id, 0,
+                           struct.pack(LogRecord.FMT_DSM_HEADER, *before),
+                           struct.pack(LogRecord.FMT_DSM_HEADER, *after))
+        with self._cond:
+            self._get_undo_list(txn_id).append(record)
+            return self._append(record)
+
+    def log_update(self, txn_id, disk_page, offset, new_bytes):
+        """Logs and applies the change of disk_page.buffer[offset:...].
+        The page must be pinned. Returns the LSN for BufferManager.unpin
+        """
+        end = offset + len(new_bytes)
+        before = disk_page.buffer[offset:end].tobytes()
+        lsn = self.log_page_write(txn_id, disk_page.id, offset, before,
+                                  new_bytes)
+        disk_page.buffer[offset:end] = new_bytes
+        return lsn
+
+    def commit(self, txn_id):
+        """Appends the COMMIT record and waits until it is on disk"""
+        with self._cond:
+            self._get_undo_list(txn_id)
+            lsn = self._append(LogRecord(LogRecordType.COMMIT, txn_id))
+            del self._active_txns[txn_id]
+            self.num_commits += 1
+        self.flush(lsn, group=True)
+
+    def rollback(self, txn_id, buff_mngr):
+        """Undoes the changes of the transaction (in reverse order). Each
+        undo is logged as a new change, so the recovery only needs to
+        redo it. The undone pages are written, because the disk-space
+        reads the free-list from the file.
+
+        The header of the disk-space is shared: if another transaction
+        allocated or released pages in the meantime, the header is kept
+        and the pages allocated by this one are released instead."""
+        with self._cond:
+            undo_list = self._get_undo_list(txn_id)
+        dsm = buff_mngr.dsm
+        page_ids = set()
+        for record in reversed(undo_list[:]):
+            if record.type == LogRecordType.HEADER:
+                self._undo_header(txn_id, record, buff_mngr)
+                continue
+            disk_page = buff_mngr.pin(record.page_id)
+            lsn = self.log_update(txn_id, disk_page, record.offset,
+                                  record.before)
+            buff_mngr.unpin(record.page_id, is_dirty=True, page_lsn=lsn)
+            page_ids.add(record.page_id)
+        for page_id in sorted(page_ids):
+            buff_mngr.flush_page(page_id)
+        with self._cond:
+            lsn = self._append(LogRecord(LogRecordType.ABORT, txn_id))
+            del self._active_txns[txn_id]
+        self.flush(lsn)
+
+    def _undo_header(self, txn_id, record, buff_mngr):
+        before = struct.unpack(LogRecord.FMT_DSM_HEADER, record.before)
+        after = struct.unpack(LogRecord.FMT_DSM_HEADER, record.after)
+        if buff_mngr.dsm.replace_header(after, before):
+            self.log_header(txn_id, record.page_id, after, before)
+        elif record.page_id != after[0]:
+            # An allocation (a release puts the page first in the list)
+            buff_mngr.set_transaction(txn_id)
+            try:
+                buff_mngr.free_page(record.page_id)
+            finally:
+                buff_mngr.set_transaction(None)
+
+    def flush(self, lsn=None, group=False):
+        """Writes the log (at least up to 'lsn') and calls fsync. Only
+        one thread writes the log at a time; the others wait for it and
+        return if it flushed their records."""
+        with self._cond:
+            # The page-LSNs of the buffer manager may be older than the
+            # last truncation of the log
+            if lsn is None or lsn > self._next_lsn:
+                lsn = self._next_lsn
+            while self._flushed_lsn < lsn:
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                # This thread is the leader
+                self._flushing = True
+                if group and self.commit_delay > 0 and self._active_txns:
+                    self._cond.wait(self.commit_delay)
+                data = bytes(self._buffer)
+                self._buffer.clear()
+                end_lsn = self._flushed_lsn + len(data)
+                self._cond.release()
+                try:
+                    view = memoryview(data)
+                    while view:
+                        num_written = os.write(self._fd, view)
+                        view = view[num_written:]
+                    os.fsync(self._fd)
+                finally:
+                    self._cond.acquire()
+                    self._flushing = False
+                    self._cond.notify_all()
+                self._flushed_lsn = end_lsn
+                self.num_fsyncs += 1
+
+    def read_records(self):
+        """Returns the records that are on disk (it stops at the first
+        truncated or corrupted record)."""
+        self.flush()
+        size = os.fstat(self._fd).st_size
+        buffer = os.pread(self._fd, size, 0)
+        records = []
+        pos = 0
+        while pos < size:
+            record = LogRecord.from_buffer(buffer, pos)
+            if record is None:
+                break
+            records.append(record)
+            pos += LogRecord.HEADER_SIZE + 2 * len(record.after)
+        return records
+
+    def checkpoint(self, buff_mngr):
+        """Flushes the log, the dirty pages and the data file. The log
+        is truncated if no transaction is running and no record was
+        appended since the flush started (a transaction may commit
+        while the pages are written); otherwise a CHECKPOINT record is
+        appended."""
+        with self._cond:
+            redo_lsn = self._next_lsn
+        self.flush()
+        buff_mngr.flush_all()
+        buff_mngr.dsm.sync()
+        with self._cond:
+            if self._active_txns or self._next_lsn != redo_lsn:
+                lsn = self._append(LogRecord(LogRecordType.CHECKPOINT, 0))
+            else:
+                lsn = -1
+                self._truncate()
+        if lsn >= 0:
+            self.flush(lsn)
+
+    def _truncate(self):
+        while self._flushing:
+            self._cond.wait()
+        os.ftruncate(self._fd, 0)
+        os.fsync(self._fd)
+        self._buffer.clear()
+        self._next_lsn = self._flushed_lsn = 0
+
+    def recover(self, dsm):
+        """Brings the data file to a consistent state after a crash:
+        - Redo: applies the after-images of all the records in order.
+        - Undo: applies (in reverse order) the before-images of the
+          transactions without a COMMIT or ABORT record.
+        The last header of the disk-space (first-free-id and high-water
+        mark) is restored too. The pages are written, the data file is synced and the log is
+        truncated. Returns the ids of the rolled-back transactions."""
+        records = self.read_records()
+        if not records:
+            return set()
+        finished = {r.txn_id for r in records
+                    if r.type in (LogRecordType.COMMIT, LogRecordType.ABORT)}
+        writes = [r for r in records if r.type in (LogRecordType.PAGE_WRITE,
+                                                   LogRecordType.HEADER)]
+        losers = {r.txn_id for r in writes} - finished
+
+        # The file may not have reached its size before the crash
+        page_ids = [r.page_id for r in writes
+                    if r.type == LogRecordType.PAGE_WRITE]
+        if page_ids:
+            dsm.extend(max(page_ids) + 1)
+        pages = {}
+        header = None
+        def apply(r, image):
+            nonlocal header
+            if r.type == LogRecordType.HEADER:
+                header = struct.unpack(LogRecord.FMT_DSM_HEADER, image)
+                return
+            disk_page = pages.get(r.page_id)
+            if disk_page is None:
+                disk_page = dsm.read_page(r.page_id)
+                pages[r.page_id] = disk_page
+            disk_page.buffer[r.offset:r.offset + len(image)] = image
+
+        for r in writes:
+            apply(r, r.after)
+        for r in reversed(writes):
+            if r.txn_id in losers:
+                # The header is shared: a later transaction may have
+                # changed it again
+                if r.type == LogRecordType.HEADER and header != \
+                        struct.unpack(LogRecord.FMT_DSM_HEADER, r.after):
+                    continue
+                apply(r, r.before)
+
+        if header is not None:
+            dsm.set_header(*header)
+        dsm.write_pages(list(pages.values()))
+        dsm.sync()
+        with self._cond:
+            self._truncate()
+            max_txn_id = max(r.txn_id for r in records)
+            self._next_txn_id = max(self._next_txn_id, max_txn_id + 1)
+        return losers
+
+
+class WALException(Exception):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,213 @@
+import threading
+from collections import namedtuple
+from datetime import date, datetime
+from pysilisk.sqltypes import SQLDataType
+from pysilisk.parser.ast import AST_AND, AST_EQ, AST_GT, AST_GTE, AST_LT
+from pysilisk.parser.ast import AST_LTE, AST_Column, AST_NumberLiteral
+from pysilisk.parser.ast import AST_StringLiteral, AST_NegArithExpr
+
+
+# Comparison 'column op value' that can be checked against a zone. The
+# value is physical (DATE as int4, DATETIME as timestamp).
+ZonePredicate = namedtuple('ZonePredicate', ['col_index', 'op', 'value'])
+
+ZONE_TYPES = (SQLDataType.INTEGER, SQLDataType.FLOAT, SQLDataType.DATE,
+              SQLDataType.DATETIME)
+
+_OPERATORS = [(AST_EQ, '='), (AST_GTE, '>='), (AST_GT, '>'),
+              (AST_LTE, '<='), (AST_LT, '<')]
+_FLIPPED = {'=': '=', '>': '<', '>=': '<=', '<': '>', '<=': '>='}
+
+
+class ZoneMap(object):
+    """Zone maps of a file: the min and max values and the number of
+    NULLs of each fixed-width column (INTEGER, FLOAT, DATE and DATETIME)
+    in each page. The values are physical, so DATE and DATETIME are
+    compared as numbers.
+
+    The zones are kept in memory: they are built by the first scan that
+    needs them (see is_built) and then they are updated by the inserts
+    and updates of the file. A delete does not shrink a zone, so a zone
+    always contains the values of its page and a page is never skipped
+    by mistake.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.col_indexes = [i for i, c in enumerate(schema.columns)
+                            if c.type_id in ZONE_TYPES]
+        self._positions = {col: k for k, col in enumerate(self.col_indexes)}
+        self._zones = {}  # page-id --> (mins, maxs, null-counts)
+        self.is_built = False
+        self.num_skipped = 0  # Pages skipped by filter_pages
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._zones = {}
+            self.is_built = False
+
+    def set_built(self):
+        self.is_built = True
+
+    def add(self, page_id, values):
+        """Widens the zone of the page with a row: 'values' has the
+        physical values of the columns in col_indexes (None is NULL)."""
+        with self._lock:
+            num_columns = len(self.col_indexes)
+            zone = self._zones.setdefault(page_id, ([None] * num_columns,
+                                                    [None] * num_columns,
+                                                    [0] * num_columns))
+            mins, maxs, null_counts = zone
+            for k, value in enumerate(values):
+                if value is None:
+                    null_counts[k] += 1
+                elif mins[k] is None:
+                    mins[k] = maxs[k] = value
+                elif value < mins[k]:
+                    mins[k] = value
+                elif value > maxs[k]:
+                    maxs[k] = value
+
+    def add_rows(self, page_id, rows):
+        """Widens the zone of the page with rows of physical values (see
+        RowCodec.convert)"""
+        self.add_columns(page_id, [[row[i] for row in rows]
+                                   for i in self.col_indexes])
+
+    def add_columns(self, page_id, columns):
+        """Widens the zone of the page with the values of a batch of rows
+        by columns: columns[k] has the physical values of col_indexes[k]"""
+        with self._lock:
+            num_columns = len(self.col_indexes)
+            zone = self._zones.setdefault(page_id, ([None] * num_columns,
+                                                    [None] * num_columns,
+                                                    [0] * num_columns))
+            mins, maxs, null_counts = zone
+            for k, values in enumerate(columns):
+                not_null = [v for v in values if v is not None]
+                null_counts[k] += len(values) - len(not_null)
+                if not not_null:
+                    continue
+                low, high = min(not_null), max(not_null)
+                if mins[k] is None or low < mins[k]:
+                    mins[k] = low
+                if maxs[k] is None or high > maxs[k]:
+                    maxs[k] = high
+
+    def remove_page(self, page_id):
+        with self._lock:
+            self._zones.pop(page_id, None)
+
+    def get_zone(self, page_id, col_index):
+        """Returns (min, max, null-count) of a column in a page (None if
+        the page has no zone)"""
+        zone = self._zones.get(page_id)
+        if zone is None:
+            return None
+        k = self._positions[col_index]
+        return zone[0][k], zone[1][k], zone[2][k]
+
+    def may_match(self, page_id, predicates):
+        """False if no row of the page can satisfy all the predicates"""
+        zone = self._zones.get(page_id)
+        if zone is None:
+            return not self.is_built  # Built: the page has no rows
+        mins, maxs = zone[0], zone[1]
+        for col_index, op, value in predicates:
+            k = self._positions.get(col_index)
+            if k is None:
+                continue
+            low, high = mins[k], maxs[k]
+            if low is None:
+                return False  # Only NULLs: no comparison is true
+            if op == '=':
+                if value < low or value > high:
+                    return False
+            elif op == '<':
+                if low >= value:
+                    return False
+            elif op == '<=':
+                if low > value:
+                    return False
+            elif op == '>':
+                if high <= value:
+                    return False
+            elif op == '>=':
+                if high < value:
+                    return False
+        return True
+
+    def filter_pages(self, page_ids, predicates):
+        """Returns the pages that may have rows that satisfy all the
+        predicates"""
+        if not predicates:
+            return list(page_ids)
+        selected = [page_id for page_id in page_ids
+                    if self.may_match(page_id, predicates)]
+        self.num_skipped += len(page_ids) - len(selected)
+        return selected
+
+
+def _physical_literal(schema, col_index, ast_literal):
+    """Returns the physical value of a literal compared with a column
+    (None if it can not be converted)"""
+    if isinstance(ast_literal, AST_NegArithExpr):
+        value = _physical_literal(schema, col_index, ast_literal.arith_expr)
+        return None if value is None else -value
+    if not isinstance(ast_literal, (AST_NumberLiteral, AST_StringLiteral)):
+        return None
+    value = ast_literal.value
+    if not isinstance(value, str):
+        # The numbers are not rounded: 'int_col < 2.5' must keep the 2s
+        return value
+    type_id = schema.columns[col_index].type_id
+    try:
+        if type_id == SQLDataType.DATE:
+            value = date.fromisoformat(value)
+        elif type_id == SQLDataType.DATETIME:
+            value = datetime.fromisoformat(value)
+        else:
+            return None
+    except ValueError:
+        return None
+    return schema.codec.physical_value(col_index, value)
+
+
+def extract_predicates(where_expr, schema, table_name=None):
+    """Returns the list of ZonePredicates of a where-expression (an AST
+    built by to_ast_expr): the comparisons between a fixed-width column
+    of the schema and a literal that are joined by ANDs. The others
+    comparisons (e.g. under an OR) are ignored, so the list is implied by
+    the expression."""
+    predicates = []
+    pending = [where_expr]
+    while pending:
+        expr = pending.pop()
+        if isinstance(expr, AST_AND):
+            pending.append(expr.right_expr)
+            pending.append(expr.left_expr)
+            continue
+        for ast_class, op in _OPERATORS:
+            if isinstance(expr, ast_class):
+                break
+        else:
+            continue
+        column, literal = expr.left_expr, expr.right_expr
+        if not isinstance(column, AST_Column):
+            column, literal = literal, column
+            op = _FLIPPED[op]
+        if not isinstance(column, AST_Column):
+            continue
+        if column.tbl_name and table_name is not None and \
+                column.tbl_name != table_name:
+            continue
+        if column.col_name not in [c.name for c in schema.columns]:
+            continue
+        col_index = schema.column_index(column.col_name)
+        if schema.columns[col_index].type_id not in ZONE_TYPES:
+            continue
+        value = _physical_literal(schema, col_index, literal)
+        if value is not None:
+            predicates.append(ZonePredicate(col_index, op, value))
+    return predicates
@@ -0,0 +1,121 @@
+from unittest import TestCase
+import random
+from pysilisk.dsm import DiskSpaceManager
+from pysilisk.buffer import BufferManager
+from pysilisk.btree import BPlusTree, IndexKeyCodec, IndexException
+from pysilisk.records import RID
+from pysilisk.sqltypes import SQLDataType, Date
+import os
+
+
+class TestIndexKeyCodec(TestCase):
+
+    def test_order(self):
+        codec = IndexKeyCodec([SQLDataType.INTEGER, SQLDataType.FLOAT,
+                               SQLDataType.VARCHAR])
+        keys = [(None, 1.0, 'a'), (-5, None, ''), (-5, -2.5, 'b'),
+                (-5, 0.0, 'a'), (-5, 0.0, 'a\x00'), (-5, 0.0, 'ab'),
+                (0, 1e-9, 'z'), (7, -1e9, ''), (2 ** 31 - 1, 3.5, 'x')]
+        encoded = [codec.encode_key(key) for key in keys]
+        self.assertEqual(sorted(encoded), encoded)
+        for key in keys:
+            entry = codec.encode_entry(key, RID(3, 4))
+            self.assertEqual((key, RID(3, 4)), codec.decode_entry(entry))
+        self.assertEqual(codec.encode_key((0, 0.0)),
+                         codec.encode_key((0, -0.0)))
+        with self.assertRaises(IndexException):
+            codec.encode_key(('x',))
+        with self.assertRaises(IndexException):
+            codec.encode_key((1, 2.0, 'a', 'b'))
+
+
+class TestBPlusTree(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_btree.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(10, lazy=True)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=32)
+        self.key_types = [SQLDataType.INTEGER, SQLDataType.VARCHAR]
+
+    def tearDown(self):
+        self.dsm.close_file()
+        os.remove(self.test_database_filename)
+
+    def _entries(self, num_keys):
+        # Keys with duplicates: (i // 2, 'name-...') twice with two RIDs
+        return [((i // 4, 'name-%04d' % (i // 2)), RID(i // 100, i % 100))
+                for i in range(num_keys)]
+
+    def test_insert_search_and_delete(self):
+        tree = BPlusTree.create(self.buff_mngr, self.key_types)
+        entries = self._entries(6000)
+        shuffled = list(entries)
+        random.Random(7).shuffle(shuffled)
+        for key, rid in shuffled:
+            tree.insert(key, rid)
+        self.assertGreater(tree.height, 1)
+        self.assertEqual(entries, list(tree.scan()))
+        self.assertEqual([RID(0, 10), RID(0, 11)],
+                         tree.search((2, 'name-0005')))
+        # A prefix of the key
+        self.assertEqual([RID(0, i) for i in range(8, 12)], tree.search((2,)))
+        self.assertEqual([], tree.search((2, 'other')))
+        with self.assertRaises(IndexException):
+            tree.insert(*entries[0])
+
+        # Range scans through the leaves
+        self.assertEqual(entries[40:48], list(tree.range_scan((10,), (11,))))
+        self.assertEqual(entries[44:48],
+                         list(tree.range_scan((10,), (11,),
+                                              low_inclusive=False)))
+        self.assertEqual(entries[:4],
+                         list(tree.range_scan(high=(1,),
+                                              high_inclusive=False)))
+
+        # The deletes merge the nodes: the tree shrinks
+        random.Random(8).shuffle(shuffled)
+        for key, rid in shuffled[:5900]:
+            tree.delete(key, rid)
+        remaining = sorted(shuffled[5900:])
+        self.assertEqual(remaining, list(tree.scan()))
+        self.assertEqual(1, tree.height)
+        with self.assertRaises(IndexException):
+            tree.delete(*shuffled[0])
+
+        # The tree is persisted in its pages
+        self.buff_mngr.flush_all()
+        tree = BPlusTree(BufferManager(self.dsm, num_frames=8),
+                         self.key_types, tree.header_page_id)
+        self.assertEqual(remaining, list(tree.scan()))
+
+    def test_bulk_load(self):
+        entries = self._entries(20000)
+        tree = BPlusTree.bulk_load(self.buff_mngr, self.key_types, entries)
+        self.assertEqual(3, tree.height)
+        self.assertEqual(entries, list(tree.scan()))
+        self.assertEqual([RID(100, 0), RID(100, 1)],
+                         tree.search((2500, 'name-5000')))
+        # The loaded tree supports the updates
+        for key, rid in entries[:15000]:
+            tree.delete(key, rid)
+        tree.insert((-1, 'first'), RID(1, 1))
+        self.assertEqual([((-1, 'first'), RID(1, 1))] + entries[15000:],
+                         list(tree.scan()))
+        with self.assertRaises(IndexException):
+            BPlusTree.bulk_load(self.buff_mngr, self.key_types,
+                                entries[1:3] + entries[:1])
+
+    def test_dates_and_drop(self):
+        entries = [((Date(2020, 1, 1 + i // 100),), RID(i, 0))
+                   for i in range(3000)]
+        tree = BPlusTree.bulk_load(self.buff_mngr, [SQLDataType.DATE],
+                                   entries)
+        rids = tree.search((Date(2020, 1, 5),))
+        self.assertEqual([RID(i, 0) for i in range(400, 500)], rids)
+        hwm = self.dsm.high_water_mark
+        tree.drop()
+        # The pages are reused
+        BPlusTree.bulk_load(self.buff_mngr, [SQLDataType.DATE], entries)
+        self.assertEqual(hwm, self.dsm.high_water_mark)
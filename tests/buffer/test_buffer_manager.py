@@ -0,0 +1,258 @@
+from unittest import TestCase, mock
+from pysilisk.dsm import DiskSpaceManager, DiskPage
+from pysilisk.buffer import BufferManager, BufferPoolFullException
+from pysilisk.buffer import ClockPolicy, TwoQueuePolicy, LRUKPolicy
+import os
+import time
+
+
+class TestBufferManager(TestCase):
+
+    def setUp(self):
+        # Create a 20-pages database and a pool of 4 frames
+        self.test_database_filename = 'test_buffer.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.num_pages = 20
+        self.dsm.create_file(self.num_pages)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=4)
+
+    def tearDown(self):
+        self.dsm.close_file()
+        if os.path.exists(self.test_database_filename):
+            os.remove(self.test_database_filename)
+
+    def test_pin_and_unpin(self):
+        disk_page = self.buff_mngr.pin(3)
+        self.assertEqual(3, disk_page.id)
+        self.assertEqual(1, self.buff_mngr.num_misses)
+
+        # The second pin is a hit and returns the same frame
+        self.assertIs(disk_page, self.buff_mngr.pin(3))
+        self.assertEqual(1, self.buff_mngr.num_hits)
+
+        self.buff_mngr.unpin(3)
+        self.buff_mngr.unpin(3)
+        with self.assertRaises(ValueError):
+            self.buff_mngr.unpin(3)
+
+    def test_all_frames_pinned(self):
+        for page_id in range(1, 5):
+            self.buff_mngr.pin(page_id)
+        with self.assertRaises(BufferPoolFullException):
+            self.buff_mngr.pin(5)
+
+        # Unpinning one page makes room for another
+        self.buff_mngr.unpin(2)
+        self.assertEqual(5, self.buff_mngr.pin(5).id)
+        self.assertEqual(1, self.buff_mngr.num_evictions)
+
+    def test_new_page_with_all_frames_pinned(self):
+        for page_id in range(5, 9):
+            self.buff_mngr.pin(page_id)
+        with self.assertRaises(BufferPoolFullException):
+            self.buff_mngr.new_page()
+
+        # The first free page was not allocated by the failed call
+        self.buff_mngr.unpin(5)
+        self.assertEqual(1, self.buff_mngr.new_page().id)
+
+    def test_clock_second_chance(self):
+        for page_id in range(1, 5):
+            self.buff_mngr.pin(page_id)
+            self.buff_mngr.unpin(page_id)
+
+        # The first sweep clears all the ref-bits and evicts page-1
+        self.buff_mngr.pin(5)
+        self.buff_mngr.unpin(5)
+
+        # Page-2 is referenced again, so it gets a second chance
+        self.buff_mngr.pin(2)
+        self.buff_mngr.unpin(2)
+        self.buff_mngr.pin(6)
+        self.buff_mngr.unpin(6)
+
+        self.assertEqual(1, self.buff_mngr.num_hits)
+
+        self.buff_mngr.pin(2)  # still in the pool
+        self.assertEqual(2, self.buff_mngr.num_hits)
+        self.buff_mngr.pin(3)  # evicted instead of page-2
+        self.assertEqual(2, self.buff_mngr.num_hits)
+
+    def test_dirty_pages_are_written_back(self):
+        data = bytearray(os.urandom(DiskPage.PAGE_DATA_SIZE))
+        disk_page = self.buff_mngr.pin(1)
+        disk_page.data = data
+        self.buff_mngr.unpin(1, is_dirty=True)
+
+        # Force the eviction of page-1
+        for page_id in range(2, 10):
+            self.buff_mngr.pin(page_id)
+            self.buff_mngr.unpin(page_id)
+        self.assertEqual(1, self.buff_mngr.num_writes)
+        self.assertEqual(data, self.dsm.read_page(1).data)
+
+        # The content survives a round-trip through the pool
+        self.assertEqual(data, self.buff_mngr.pin(1).data)
+
+    def test_new_and_free_page(self):
+        disk_page = self.buff_mngr.new_page()
+        page_id = disk_page.id
+        self.assertEqual(1, page_id)
+        self.buff_mngr.unpin(page_id)
+
+        with self.assertRaises(ValueError):
+            self.buff_mngr.pin(self.num_pages + 100)
+
+        self.buff_mngr.free_page(page_id)
+        self.assertEqual(page_id, self.dsm.get_free_page().id)
+
+    def test_sequential_read_ahead(self):
+        buff_mngr = BufferManager(self.dsm, num_frames=8, read_ahead_pages=4)
+
+        # The pages of the db space form a chain: 1 --> 2 --> 3 ...
+        # The third page of the chain triggers the read-ahead
+        with mock.patch('os.preadv', wraps=os.preadv) as preadv:
+            for page_id in [1, 2, 3]:
+                buff_mngr.pin(page_id)
+                buff_mngr.unpin(page_id)
+        self.assertEqual(4, buff_mngr.num_prefetched)
+        # One preadv per miss and a single one for pages 4-7
+        self.assertEqual(4, preadv.call_count)
+
+        for page_id in [4, 5, 6, 7]:
+            buff_mngr.pin(page_id)
+            buff_mngr.unpin(page_id)
+        self.assertEqual(3, buff_mngr.num_misses)
+        self.assertTrue(buff_mngr.num_hits >= 4)
+
+
+class TestBackgroundWriter(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_bgwriter.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(20)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=8)
+
+    def tearDown(self):
+        self.buff_mngr.stop_background_writer()
+        self.dsm.close_file()
+        if os.path.exists(self.test_database_filename):
+            os.remove(self.test_database_filename)
+
+    def _dirty_pages(self, page_ids):
+        for page_id in page_ids:
+            disk_page = self.buff_mngr.pin(page_id)
+            disk_page.data[0] = page_id
+            self.buff_mngr.unpin(page_id, is_dirty=True)
+
+    def test_flush_coalesces_adjacent_pages(self):
+        self._dirty_pages([5, 3, 4, 10, 11])
+        self.assertEqual(5, self.buff_mngr.num_dirty)
+        with mock.patch('os.pwritev', wraps=os.pwritev) as pwritev:
+            self.assertEqual(5, self.buff_mngr.flush_dirty_pages())
+        self.assertEqual(0, self.buff_mngr.num_dirty)
+        # Two runs: 3-5 and 10-11
+        self.assertEqual(2, pwritev.call_count)
+        for page_id in [3, 4, 5, 10, 11]:
+            self.assertEqual(page_id, self.dsm.read_page(page_id).data[0])
+
+    def test_pinned_pages_are_not_flushed(self):
+        disk_page = self.buff_mngr.pin(2)
+        disk_page.data[0] = 7
+        self.buff_mngr.unpin(2, is_dirty=True)
+        self.buff_mngr.pin(2)
+        self.assertEqual(0, self.buff_mngr.flush_dirty_pages())
+
+        # flush_all writes the pinned pages too
+        self.buff_mngr.flush_all()
+        self.assertEqual(0, self.buff_mngr.num_dirty)
+        self.assertEqual(7, self.dsm.read_page(2).data[0])
+
+    def test_flush_writes_a_copy_of_the_frames(self):
+        self._dirty_pages([2])
+        write_pages = self.dsm.write_pages
+        def change_and_write(disk_pages):
+            # Another thread changes the page while it is written
+            self._dirty_pages([9])
+            disk_page = self.buff_mngr.pin(2)
+            disk_page.data[0] = 99
+            self.buff_mngr.unpin(2, is_dirty=True)
+            return write_pages(disk_pages)
+        with mock.patch.object(self.dsm, 'write_pages',
+                               side_effect=change_and_write):
+            self.assertEqual(1, self.buff_mngr.flush_dirty_pages())
+        self.assertEqual(2, self.dsm.read_page(2).data[0])
+        # The page is dirty again
+        self.assertEqual(2, self.buff_mngr.num_dirty)
+        self.buff_mngr.flush_dirty_pages()
+        self.assertEqual(99, self.dsm.read_page(2).data[0])
+
+    def test_background_writer(self):
+        self.buff_mngr.start_background_writer(interval=0.01,
+                                               dirty_ratio=0.5)
+        self._dirty_pages(range(1, 7))
+        deadline = time.time() + 5
+        while self.buff_mngr.num_dirty > 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(0, self.buff_mngr.num_dirty)
+        for page_id in range(1, 7):
+            self.assertEqual(page_id, self.dsm.read_page(page_id).data[0])
+
+    def test_eviction_prefers_clean_frames(self):
+        self.buff_mngr.start_background_writer(interval=60)
+        self._dirty_pages([1])
+        for page_id in range(2, 9):
+            self.buff_mngr.pin(page_id)
+            self.buff_mngr.unpin(page_id)
+        # The pool is full: the clean page-2 is evicted instead of page-1
+        self.buff_mngr.pin(9)
+        self.assertEqual(0, self.buff_mngr.num_writes)
+        self.assertEqual(1, self.buff_mngr.num_dirty)
+
+
+class TestReplacementPolicies(TestCase):
+    """A scan of many pages must not flush the hot pages"""
+
+    def setUp(self):
+        self.test_database_filename = 'test_buffer_policies.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(200, lazy=True)
+        self.dsm.open_file()
+
+    def tearDown(self):
+        self.dsm.close_file()
+        if os.path.exists(self.test_database_filename):
+            os.remove(self.test_database_filename)
+
+    def access(self, buff_mngr, page_ids):
+        for page_id in page_ids:
+            buff_mngr.pin(page_id)
+            buff_mngr.unpin(page_id)
+
+    def hot_pages_survive_scan(self, policy):
+        buff_mngr = BufferManager(self.dsm, num_frames=8, policy=policy)
+        hot_pages = [1, 2, 3]
+
+        # Warm-up: the hot pages are used repeatedly
+        for i in range(4):
+            self.access(buff_mngr, hot_pages)
+            self.access(buff_mngr, [10 + 2*i, 11 + 2*i])
+
+        # A scan of the "table"
+        self.access(buff_mngr, range(50, 150))
+
+        num_hits = buff_mngr.num_hits
+        self.access(buff_mngr, hot_pages)
+        return buff_mngr.num_hits - num_hits == len(hot_pages)
+
+    def test_clock_policy(self):
+        self.assertFalse(self.hot_pages_survive_scan(ClockPolicy()))
+
+    def test_two_queue_policy(self):
+        self.assertTrue(self.hot_pages_survive_scan(TwoQueuePolicy()))
+
+    def test_lru_2_policy(self):
+        self.assertTrue(self.hot_pages_survive_scan(LRUKPolicy(k=2)))
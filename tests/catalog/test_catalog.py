@@ -0,0 +1,84 @@
+from unittest import TestCase
+from pysilisk.dsm import DiskSpaceManager
+from pysilisk.buffer import BufferManager
+from pysilisk.catalog import Catalog, CatalogException
+from pysilisk.records import Column, TableSchema
+from pysilisk.sqltypes import SQLDataType
+from pysilisk.parser.sqlparser import SQL_GRAMMAR
+import os
+
+
+class TestCatalog(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_catalog.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(10, lazy=True)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=8)
+        self.catalog = Catalog.create(self.buff_mngr)
+
+    def tearDown(self):
+        self.dsm.close_file()
+        os.remove(self.test_database_filename)
+
+    def _schema(self, table_name, num_columns=2):
+        columns = [Column('c%d' % i, SQLDataType.VARCHAR, 10 + i,
+                          nullable=i % 2 == 0) for i in range(num_columns)]
+        return TableSchema(table_name, columns)
+
+    def test_add_and_load(self):
+        self.assertEqual(1, self.catalog.first_page_id)
+        self.catalog.add_table(self._schema('t1'), 5)
+        with self.assertRaises(CatalogException):
+            self.catalog.add_table(self._schema('t1'), 6)
+
+        catalog = Catalog(self.buff_mngr, 1)
+        catalog.load()
+        info = catalog.get_table('t1')
+        self.assertEqual(5, info.dir_page_id)
+        self.assertEqual(['c0', 'c1'], [c.name for c in info.schema.columns])
+        self.assertEqual([10, 11], [c.size for c in info.schema.columns])
+        self.assertEqual([True, False],
+                         [c.nullable for c in info.schema.columns])
+
+    def test_dictionaries(self):
+        schema = TableSchema('t', [
+            Column('a', SQLDataType.CHAR, 4, dictionary=True),
+            Column('b', SQLDataType.INTEGER)])
+        self.catalog.add_table(schema, 5)
+        self.assertFalse(self.catalog.save_dictionaries())
+        schema.codec.encode(('x', 1))
+        schema.codec.encode(('y', 2))
+        self.assertTrue(self.catalog.save_dictionaries())
+        self.assertFalse(self.catalog.save_dictionaries())
+
+        catalog = Catalog(self.buff_mngr, 1)
+        catalog.load()
+        schema = catalog.get_table('t').schema
+        self.assertTrue(schema.columns[0].dictionary)
+        self.assertEqual(['x', 'y'], schema.dictionaries[0].values)
+        self.assertEqual(('y', 2), schema.codec.decode(
+            schema.codec.encode(('y', 2))))
+
+    def test_encoding_option_in_the_grammar(self):
+        sql = ('CREATE TABLE t (a CHAR(4) NOT NULL ENCODING DICTIONARY, '
+               'b INTEGER);')
+        result = SQL_GRAMMAR.parseString(sql)
+        encodings = [d.encoding for d in result.list_column_definitions]
+        self.assertEqual(['DICTIONARY', ''], encodings)
+
+    def test_catalog_spans_several_pages(self):
+        for i in range(30):
+            self.catalog.add_table(self._schema('table%d' % i, 20), i)
+        catalog = Catalog(self.buff_mngr, 1)
+        catalog.load()
+        self.assertEqual(30, len(catalog.table_names))
+
+        # The pages that are not needed anymore are released
+        for i in range(30):
+            self.catalog.remove_table('table%d' % i)
+        self.assertEqual(-1, self.buff_mngr.pin(1).next_page_pointer)
+        self.buff_mngr.unpin(1)
+        with self.assertRaises(CatalogException):
+            self.catalog.get_table('table0')
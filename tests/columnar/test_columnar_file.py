@@ -0,0 +1,199 @@
+from unittest import TestCase
+from pysilisk.dsm import DiskSpaceManager, DiskPage
+from pysilisk.buffer import BufferManager
+from pysilisk.columnar import ColumnarFile, PaxLayout
+from pysilisk.heapfile import FileManager
+from pysilisk.records import Column, TableSchema, RID
+from pysilisk.records import SchemaException, RecordException
+from pysilisk.sqltypes import SQLDataType, StorageType, Date
+from pysilisk.parser.sqlparser import SQL_GRAMMAR
+import os
+
+
+class TestColumnarFile(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_columnar.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(10, lazy=True)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=16)
+        self.schema = TableSchema('sales', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('amount', SQLDataType.FLOAT),
+            Column('day', SQLDataType.DATE),
+            Column('code', SQLDataType.CHAR, 4),
+            Column('comment', SQLDataType.VARCHAR, 20)],
+            StorageType.COLUMNAR)
+        self.file_mngr = FileManager(self.buff_mngr)
+        self.columnar_file = self.file_mngr.create_file(self.schema)
+
+    def tearDown(self):
+        self.dsm.close_file()
+        os.remove(self.test_database_filename)
+
+    def _rows(self, num_rows):
+        return [(i, i * 1.5, Date(2015, 1 + i % 12, 1) if i % 3 else None,
+                 'c%d' % (i % 100), 'comment %d' % i)
+                for i in range(num_rows)]
+
+    def test_layout(self):
+        layout = PaxLayout(self.schema)
+        # 4 + 8 + 4 + 4 + 22 bytes per row, plus the bitmaps
+        self.assertEqual((4088 - 4) * 8 // (42 * 8 + 6), layout.capacity)
+        self.assertLessEqual(layout._page_size(layout.capacity),
+                             DiskPage.PAGE_DATA_SIZE)
+        with self.assertRaises(SchemaException):
+            PaxLayout(TableSchema('t', [
+                Column('c', SQLDataType.VARCHAR, 4090)]))
+
+    def test_insert_and_scan(self):
+        self.assertIsInstance(self.columnar_file, ColumnarFile)
+        rows = self._rows(1000)
+        rids = self.columnar_file.insert_rows(rows)
+        self.assertEqual(rows, [row for _, row in self.columnar_file.scan()])
+        self.assertEqual(rows[700], self.columnar_file.get(rids[700]))
+        capacity = self.columnar_file.layout.capacity
+        self.assertEqual(-(-1000 // capacity), self.columnar_file.num_pages)
+
+    def test_scan_decodes_only_the_selected_columns(self):
+        rows = self._rows(300)
+        for row in rows:
+            self.columnar_file.insert(row)
+        layout = self.columnar_file.layout
+        decoded = []
+        read_column = layout.read_column
+        layout.read_column = lambda data, col, n: \
+            decoded.append(col) or read_column(data, col, n)
+        result = [row for _, row in self.columnar_file.scan(['amount'])]
+        self.assertEqual([(r[1],) for r in rows], result)
+        self.assertEqual({1}, set(decoded))
+
+    def test_delete_and_reopen(self):
+        rids = self.columnar_file.insert_rows(self._rows(10))
+        self.columnar_file.delete(rids[3])
+        with self.assertRaises(RecordException):
+            self.columnar_file.get(rids[3])
+        with self.assertRaises(RecordException):
+            self.columnar_file.delete(RID(rids[0].page_id, 500))
+        self.buff_mngr.flush_all()
+        columnar_file = ColumnarFile(BufferManager(self.dsm, num_frames=4),
+                                     self.schema,
+                                     self.columnar_file.dir_page_id)
+        ids = [row[0] for _, row in columnar_file.scan(['id'])]
+        self.assertEqual([0, 1, 2, 4, 5, 6, 7, 8, 9], ids)
+
+    def test_scan_vectors_pins_each_page_once(self):
+        rows = self._rows(1000)
+        self.columnar_file.insert_rows(rows)
+        page_ids = self.columnar_file.page_ids
+        pinned = []
+        pin = self.buff_mngr.pin
+        self.buff_mngr.pin = lambda page_id: \
+            pinned.append(page_id) or pin(page_id)
+        ids = [value for batch in self.columnar_file.scan_vectors(['id'])
+               for value in batch.vectors[0].to_list()]
+        self.assertEqual([row[0] for row in rows], ids)
+        self.assertEqual(page_ids, pinned)
+
+    def test_invalid_rows(self):
+        with self.assertRaises(SchemaException):
+            self.columnar_file.insert((None, 1.0, None, 'a', 'b'))
+        with self.assertRaises(SchemaException):
+            self.columnar_file.insert((2 ** 40, 1.0, None, 'a', 'b'))
+
+    def test_update(self):
+        rows = self._rows(3)
+        rids = self.columnar_file.insert_rows(rows)
+        new_rid = self.columnar_file.update(rids[1], (10,) + rows[1][1:])
+        self.assertEqual((10,) + rows[1][1:], self.columnar_file.get(new_rid))
+        # An invalid row does not delete the old one
+        with self.assertRaises(SchemaException):
+            self.columnar_file.update(rids[0], (None,) + rows[0][1:])
+        self.assertEqual([0, 2, 10], [row[0] for _, row in
+                                      self.columnar_file.scan(['id'])])
+
+    def test_storage_option_in_the_grammar(self):
+        sql = 'CREATE TABLE t (a INTEGER, b FLOAT) STORAGE COLUMNAR;'
+        result = SQL_GRAMMAR.parseString(sql)
+        self.assertEqual(StorageType.COLUMNAR,
+                         StorageType.from_string(result.storage_type))
+        result = SQL_GRAMMAR.parseString('CREATE TABLE t (a INTEGER);')
+        self.assertEqual(StorageType.ROW,
+                         StorageType.from_string(result.storage_type))
+
+    def test_dictionary_column_and_scan_equal(self):
+        schema = TableSchema('visits', [
+            Column('id', SQLDataType.INTEGER),
+            Column('country', SQLDataType.CHAR, 10, dictionary=True),
+            Column('city', SQLDataType.VARCHAR, 10)], StorageType.COLUMNAR)
+        columnar_file = self.file_mngr.create_file(schema)
+        self.assertEqual(4, columnar_file.layout.widths[1])
+        countries = ['Peru', 'Chile', None]
+        rows = [(i, countries[i % 3], 'city%d' % (i % 5)) for i in range(900)]
+        rids = columnar_file.insert_rows(rows)
+        self.assertEqual(rows, [row for _, row in columnar_file.scan()])
+        self.assertEqual(['Peru', 'Chile'], schema.dictionaries[1].values)
+
+        columnar_file.delete(rids[1])
+        result = list(columnar_file.scan_equal('country', 'Chile', ['id']))
+        self.assertEqual(list(range(4, 900, 3)), [row[0] for _, row in result])
+        self.assertEqual([], list(columnar_file.scan_equal('country', 'X')))
+        result = list(columnar_file.scan_equal('city', 'city3'))
+        self.assertEqual([row for row in rows if row[2] == 'city3'],
+                         [row for _, row in result])
+        self.assertEqual(rids[3], result[0][0])
+
+    def test_vacuum(self):
+        rows = self._rows(1000)
+        rids = self.columnar_file.insert_rows(rows)
+        capacity = self.columnar_file.layout.capacity
+        num_pages = self.columnar_file.num_pages
+        # All the rows of the first page and half of the others
+        live = {}
+        for i, rid in enumerate(rids):
+            if i < capacity or i % 2:
+                self.columnar_file.delete(rid)
+            else:
+                live[rid] = rows[i]
+        # Nothing is moved while the file is scanned
+        scan = self.columnar_file.scan()
+        next(scan)
+        self.assertEqual((0, 0, []), self.columnar_file.vacuum())
+        scan.close()
+        moves = []
+        result = self.columnar_file.vacuum(on_move=moves.extend)
+        self.assertEqual(result.moved_rids, moves)
+        self.assertEqual(1, result.released_pages)
+        self.assertEqual(num_pages - 1, result.compacted_pages)
+        self.assertEqual(num_pages - 1, self.columnar_file.num_pages)
+        self.assertEqual(self.columnar_file.page_ids,
+                         ColumnarFile(self.buff_mngr, self.schema,
+                                      self.columnar_file.dir_page_id
+                                      ).page_ids)
+        for old_rid, new_rid in result.moved_rids:
+            live[new_rid] = live.pop(old_rid)
+        self.assertEqual(sorted(live.items()),
+                         sorted(self.columnar_file.scan()))
+        self.assertEqual(0, len(self.columnar_file.vacuum().moved_rids))
+
+        # The appends fill the space of the compacted pages
+        num_pages = self.columnar_file.num_pages
+        room = num_pages * capacity - len(live)
+        new_rids = self.columnar_file.insert_rows(rows[:room])
+        self.assertEqual(num_pages, self.columnar_file.num_pages)
+        live.update(zip(new_rids, rows[:room]))
+        self.assertEqual(sorted(live.items()),
+                         sorted(self.columnar_file.scan()))
+        self.columnar_file.insert(rows[1])
+        self.assertEqual(num_pages + 1, self.columnar_file.num_pages)
+
+    def test_invalid_value_leaves_the_page_unchanged(self):
+        schema = TableSchema('pairs', [
+            Column('a', SQLDataType.INTEGER),
+            Column('b', SQLDataType.INTEGER)], StorageType.COLUMNAR)
+        columnar_file = self.file_mngr.create_file(schema)
+        with self.assertRaises(SchemaException):
+            columnar_file.insert_rows([(None, 2**40)])
+        rid = columnar_file.insert((5, 1))
+        self.assertEqual((5, 1), columnar_file.get(rid))
@@ -0,0 +1,135 @@
+from unittest import TestCase, mock
+from pysilisk.dsm import DiskPage
+from pysilisk.compression import CompressedDiskSpaceManager
+from pysilisk.buffer import BufferManager
+import os
+
+
+class TestCompressedDiskSpaceManager(TestCase):
+
+    codec = 'zlib'
+
+    def setUp(self):
+        self.test_database_filename = 'test_compressed.db'
+        self.dsm = CompressedDiskSpaceManager(self.test_database_filename,
+                                              codec=self.codec)
+        self.num_pages = 100
+        self.dsm.create_file(self.num_pages)
+        self.dsm.open_file()
+
+    def tearDown(self):
+        self.dsm.delete_file()
+
+    def _text_page(self, page_id, word):
+        disk_page = DiskPage(page_id)
+        text = (word + ' ') * (DiskPage.PAGE_DATA_SIZE // (len(word) + 1))
+        disk_page.data[:len(text)] = text.encode()
+        return disk_page
+
+    def test_pages_are_stored_compressed(self):
+        # Each empty page takes a single granule
+        self.assertEqual(self.num_pages * self.dsm.GRANULE_SIZE,
+                         self.dsm.file_size)
+        self.assertEqual(self.num_pages, self.dsm.num_pages)
+        self.assertEqual(1, self.dsm.read_page(0).next_page_pointer)
+
+    def test_write_and_read(self):
+        disk_page = self._text_page(5, 'pysilisk')
+        disk_page.next_page_pointer = 9
+        self.dsm.write_page(disk_page)
+        read_page = self.dsm.read_page(5)
+        self.assertEqual(disk_page.buffer.tobytes(),
+                         read_page.buffer.tobytes())
+
+        # The map is persisted
+        self.dsm.close_file()
+        self.dsm.open_file()
+        self.assertEqual(disk_page.buffer.tobytes(),
+                         self.dsm.read_page(5).buffer.tobytes())
+
+    def test_incompressible_page(self):
+        disk_page = DiskPage(7)
+        disk_page.data = os.urandom(DiskPage.PAGE_DATA_SIZE)
+        self.dsm.write_page(disk_page)
+        self.assertEqual(disk_page.buffer.tobytes(),
+                         self.dsm.read_page(7).buffer.tobytes())
+
+    def test_released_slots_are_reused(self):
+        # Page-3 grows and moves to the end of the file
+        disk_page = DiskPage(3)
+        disk_page.data = os.urandom(DiskPage.PAGE_DATA_SIZE)
+        self.dsm.write_page(disk_page)
+        file_size = self.dsm.file_size
+
+        # Its old slot is reused only after the map is written
+        self.dsm.write_page(self._text_page(3, 'a'))
+        self.assertGreater(self.dsm.file_size, file_size)
+        file_size = self.dsm.file_size
+        self.dsm.flush_header()
+        self.dsm.write_page(disk_page)
+        self.assertEqual(file_size, self.dsm.file_size)
+
+    def test_slots_are_not_overwritten(self):
+        old_page = self._text_page(3, 'old')
+        self.dsm.write_page(old_page)
+        self.dsm.flush_header()
+        # A crash before the map is written: the map on disk still points
+        # to the complete old image
+        self.dsm.write_page(self._text_page(3, 'new'))
+        dsm = CompressedDiskSpaceManager(self.test_database_filename)
+        dsm.open_file()
+        self.assertEqual(old_page.buffer.tobytes(),
+                         dsm.read_page(3).buffer.tobytes())
+        dsm._dbfile.close()
+
+    def test_sequential_read(self):
+        pages = [self._text_page(i, 'word%d' % i) for i in range(10, 30)]
+        self.assertEqual(1, self.dsm.write_pages(pages))
+        num_bytes_read = self.dsm.num_bytes_read
+        with mock.patch('os.pread', wraps=os.pread) as pread:
+            read_pages, num_syscalls = self.dsm.read_pages(10, 20, True)
+        self.assertEqual(1, pread.call_count)
+        self.assertEqual(1, num_syscalls)
+        self.assertEqual([p.buffer.tobytes() for p in pages],
+                         [p.buffer.tobytes() for p in read_pages])
+        # Much less than 20 pages
+        self.assertLess(self.dsm.num_bytes_read - num_bytes_read,
+                        5 * DiskPage.PAGE_SIZE)
+
+    def test_allocation_and_growth(self):
+        disk_pages = self.dsm.allocate_pages(150)
+        self.assertGreaterEqual(self.dsm.num_pages, 150)
+        self.dsm.release_page(disk_pages[0].id)
+        self.assertEqual(disk_pages[0].id, self.dsm.get_free_page().id)
+
+    def test_buffer_manager(self):
+        buff_mngr = BufferManager(self.dsm, num_frames=4)
+        disk_page = buff_mngr.pin(2)
+        disk_page.data[:5] = b'hello'
+        buff_mngr.unpin(2, is_dirty=True)
+        buff_mngr.flush_all()
+        self.assertEqual(b'hello', self.dsm.read_page(2).data[:5].tobytes())
+
+
+class TestCompressedDiskSpaceManagerLzma(TestCompressedDiskSpaceManager):
+
+    codec = 'lzma'
+
+
+class TestCompressedDiskSpaceManagerLazy(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_compressed_lazy.db'
+        self.dsm = CompressedDiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(1000, lazy=True)
+        self.dsm.open_file()
+
+    def tearDown(self):
+        self.dsm.delete_file()
+
+    def test_lazy_create(self):
+        self.assertEqual(self.dsm.GRANULE_SIZE, self.dsm.file_size)
+        self.assertEqual(1, self.dsm.high_water_mark)
+        disk_page = self.dsm.get_free_page()
+        self.assertEqual(1, disk_page.id)
+        self.assertEqual(500, self.dsm.read_page(500).id)
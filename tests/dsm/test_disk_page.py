@@ -75,4 +75,31 @@ class TestDiskPage(TestCase):
             disk_page.data = bytearray(DiskPage.PAGE_DATA_SIZE-1)
 
         # It shouldn't throw any exception
-        disk_page.data = bytearray(DiskPage.PAGE_DATA_SIZE)
\ No newline at end of file
+        disk_page.data = bytearray(DiskPage.PAGE_DATA_SIZE)
+
+    def test_from_buffer(self):
+        # Wrap a slice of a bigger buffer (e.g. a frame of a buffer-pool)
+        pool = bytearray(3 * DiskPage.PAGE_SIZE)
+        frame = memoryview(pool)[DiskPage.PAGE_SIZE:2*DiskPage.PAGE_SIZE]
+        disk_page = DiskPage.from_buffer(frame)
+
+        # The header is written in place
+        disk_page.next_page_pointer = 21
+        offset = DiskPage.PAGE_SIZE + DiskPage.NEXT_PAGE_ID_OFFSET
+        self.assertEqual(21, struct.unpack_from('<i', pool, offset)[0])
+
+        # And the data too
+        data = bytearray(os.urandom(DiskPage.PAGE_DATA_SIZE))
+        disk_page.data = data
+        offset = DiskPage.PAGE_SIZE
+        self.assertEqual(data, pool[offset:offset+DiskPage.PAGE_DATA_SIZE])
+
+        # Changes in the buffer are seen by the page
+        struct.pack_into('<i', pool, DiskPage.PAGE_SIZE + DiskPage.ID_OFFSET, 8)
+        self.assertEqual(8, disk_page.id)
+
+        with self.assertRaises(ValueError):
+            DiskPage.from_buffer(bytearray(DiskPage.PAGE_SIZE-1))
+
+        with self.assertRaises(ValueError):
+            DiskPage.from_buffer(bytes(DiskPage.PAGE_SIZE))  # read-only
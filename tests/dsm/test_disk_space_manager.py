@@ -1,6 +1,8 @@
 from unittest import TestCase
 from pysilisk.dsm import DiskSpaceManager, DiskPage
+from pysilisk.dsm import FixedGrowth, GeometricGrowth
 import os
+import threading
 
 
 class TestDiskSpaceManager(TestCase):
@@ -89,3 +91,213 @@ class TestDiskSpaceManager(TestCase):
         for i in range(self.num_pages):
             disk_page = self.dsm.read_page(i)
             self.assertEqual(i, disk_page.id)
+
+    @extra_setup_teardown
+    def test_get_free_page_grows_file(self):
+        # Consume all the free-pages (page-0 is reserved)
+        for page_id in range(1, self.num_pages):
+            self.dsm.get_free_page()
+
+        # The next free-page must be allocated at the end of the file
+        disk_page = self.dsm.get_free_page()
+        self.assertEqual(self.num_pages, disk_page.id)
+
+        # The new page must be readable and writable
+        data = bytearray(os.urandom(DiskPage.PAGE_DATA_SIZE))
+        disk_page.data = data
+        self.dsm.write_page(disk_page)
+        self.assertEqual(data, self.dsm.read_page(disk_page.id).data)
+
+    @extra_setup_teardown
+    def test_read_pages(self):
+        disk_pages, num_syscalls = self.dsm.read_pages(2, 5, True)
+        self.assertEqual([2, 3, 4, 5, 6], [p.id for p in disk_pages])
+        if not self.dsm.use_mmap:
+            self.assertEqual(1, num_syscalls)
+
+        # The pages were created as a chain: 2 --> 3 --> ...
+        for disk_page in disk_pages:
+            self.assertEqual(disk_page.id + 1, disk_page.next_page_pointer)
+
+        # Try to read outside the database-space
+        with self.assertRaises(ValueError):
+            self.dsm.read_pages(self.num_pages - 2, 3)
+
+    @extra_setup_teardown
+    def test_write_pages(self):
+        # Pages 1-3 and 6-7 are two runs of adjacent pages
+        list_data = dict()
+        disk_pages = list()
+        for page_id in [7, 1, 3, 2, 6]:
+            disk_page = self.dsm.read_page(page_id)
+            disk_page.data = bytearray(os.urandom(DiskPage.PAGE_DATA_SIZE))
+            list_data[page_id] = bytearray(disk_page.data)
+            disk_pages.append(disk_page)
+        num_syscalls = self.dsm.write_pages(disk_pages)
+        if not self.dsm.use_mmap:
+            self.assertEqual(2, num_syscalls)
+
+        for page_id, data in list_data.items():
+            self.assertEqual(data, self.dsm.read_page(page_id).data)
+
+        # Try to write outside the database-space
+        with self.assertRaises(ValueError):
+            self.dsm.write_pages([DiskPage(self.num_pages + 1)])
+
+    @extra_setup_teardown
+    def test_allocate_pages(self):
+        # Pages 1...num_pages-1 are free and consecutive
+        extent = self.dsm.allocate_pages(4)
+        self.assertEqual([1, 2, 3, 4], [p.id for p in extent])
+
+        # The free-list is not consecutive anymore: 7 --> 5 --> 6 --> ...
+        self.dsm.release_page(7)
+        extent = self.dsm.allocate_pages(3)
+        first_new_id = self.num_pages
+        self.assertEqual(list(range(first_new_id, first_new_id + 3)),
+                         [p.id for p in extent])
+
+        # The rest of the new pages are beyond the high-water mark
+        num_new_pages = self.dsm.num_pages - first_new_id
+        extent = self.dsm.allocate_pages(num_new_pages - 3)
+        self.assertEqual(first_new_id + 3, extent[0].id)
+        self.assertEqual(self.dsm.num_pages - 1, extent[-1].id)
+
+        # The rest of the free-list is still available
+        self.assertEqual(7, self.dsm.get_free_page().id)
+        self.assertEqual(5, self.dsm.get_free_page().id)
+
+    def test_free_list_head_is_persisted(self):
+        self.dsm.open_file()
+        for page_id in [1, 2, 3]:
+            self.assertEqual(page_id, self.dsm.get_free_page().id)
+        self.dsm.release_page(2)
+        self.dsm.close_file()
+
+        self.dsm.open_file()
+        self.assertEqual(2, self.dsm.read_page(0).next_page_pointer)
+        self.assertEqual(2, self.dsm.get_free_page().id)
+        self.assertEqual(4, self.dsm.get_free_page().id)
+        self.dsm.close_file()
+
+    @extra_setup_teardown
+    def test_concurrent_writes_and_growth(self):
+        # A thread (e.g. the background writer) writes pages while the
+        # file grows (and, with mmap, is remapped)
+        self.dsm.growth_policy = FixedGrowth(chunk_pages=1)
+        pages = [self.dsm.get_free_page() for _ in range(1, self.num_pages)]
+        for disk_page in pages:
+            disk_page.data = bytes([disk_page.id]) * DiskPage.PAGE_DATA_SIZE
+
+        def write_pages():
+            for _ in range(200):
+                self.dsm.write_pages(pages)
+        writer = threading.Thread(target=write_pages)
+        writer.start()
+        for _ in range(200):
+            self.dsm.get_free_page()
+        writer.join()
+
+        self.assertEqual(self.num_pages + 200, self.dsm.num_pages)
+        for disk_page in pages:
+            self.assertEqual(disk_page.buffer.tobytes(),
+                             self.dsm.read_page(disk_page.id).buffer.tobytes())
+
+    def test_growth_policies(self):
+        fixed = FixedGrowth(chunk_pages=20)
+        self.assertEqual(20, fixed.num_new_pages(1000, 1))
+        self.assertEqual(30, fixed.num_new_pages(1000, 30))
+
+        geometric = GeometricGrowth(factor=0.5, min_pages=16, max_pages=1000)
+        self.assertEqual(16, geometric.num_new_pages(10, 1))
+        self.assertEqual(50, geometric.num_new_pages(100, 1))
+        self.assertEqual(1000, geometric.num_new_pages(10**6, 1))
+        self.assertEqual(2000, geometric.num_new_pages(10**6, 2000))
+
+
+class TestDiskSpaceManagerMmap(TestDiskSpaceManager):
+    """Runs the same tests using the memory-mapped backend"""
+
+    def setUp(self):
+        self.test_database_filename = 'test_database_mmap.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename, use_mmap=True)
+        self.num_pages = 10
+        self.dsm.create_file(self.num_pages)
+
+    def test_close_file_flushes_pages(self):
+        data = bytearray(os.urandom(DiskPage.PAGE_DATA_SIZE))
+        self.dsm.open_file()
+        disk_page = self.dsm.read_page(3)
+        disk_page.data = data
+        self.dsm.write_page(disk_page)
+        self.dsm.close_file()
+
+        # Read the page with the traditional (non-mmap) backend
+        dsm = DiskSpaceManager(self.test_database_filename)
+        dsm.open_file()
+        self.assertEqual(data, dsm.read_page(3).data)
+        dsm.close_file()
+
+
+class TestDiskSpaceManagerLazy(TestCase):
+    """Database spaces created with lazily initialized pages"""
+
+    def setUp(self):
+        self.test_database_filename = 'test_database_lazy.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.num_pages = 1000
+        self.dsm.create_file(self.num_pages, lazy=True)
+        self.dsm.open_file()
+
+    def tearDown(self):
+        self.dsm.close_file()
+        if os.path.exists(self.test_database_filename):
+            os.remove(self.test_database_filename)
+
+    def test_create_file(self):
+        expected_size = self.num_pages*DiskPage.PAGE_SIZE
+        real_size = os.path.getsize(self.test_database_filename)
+        self.assertEqual(expected_size, real_size)
+        self.assertEqual(1, self.dsm.high_water_mark)
+
+    def test_get_free_page(self):
+        # The never-used pages are allocated in order
+        for page_id in [1, 2, 3, 4]:
+            self.assertEqual(page_id, self.dsm.get_free_page().id)
+        self.assertEqual(5, self.dsm.high_water_mark)
+
+        # The released pages are reused first
+        self.dsm.release_page(3)
+        self.assertEqual(3, self.dsm.get_free_page().id)
+        self.assertEqual(5, self.dsm.get_free_page().id)
+
+        # Pages beyond the high-water mark can't be released
+        with self.assertRaises(ValueError):
+            self.dsm.release_page(10)
+
+    def test_read_never_used_pages(self):
+        disk_page = self.dsm.read_page(500)
+        self.assertEqual(500, disk_page.id)
+        self.assertEqual(-1, disk_page.next_page_pointer)
+
+        disk_pages = self.dsm.read_pages(998, 2)
+        self.assertEqual([998, 999], [p.id for p in disk_pages])
+
+    def test_grow_file(self):
+        extent = self.dsm.allocate_pages(self.num_pages + 10)
+        self.assertEqual(1, extent[0].id)
+        self.assertEqual(self.num_pages + 10, extent[-1].id)
+        self.assertTrue(self.dsm.num_pages > self.num_pages + 10)
+        real_size = os.path.getsize(self.test_database_filename)
+        self.assertEqual(self.dsm.num_pages*DiskPage.PAGE_SIZE, real_size)
+
+    def test_header_is_persisted(self):
+        for page_id in [1, 2, 3]:
+            self.dsm.get_free_page()
+        self.dsm.release_page(2)
+        self.dsm.close_file()
+
+        self.dsm.open_file()
+        self.assertEqual(4, self.dsm.high_water_mark)
+        self.assertEqual(2, self.dsm.get_free_page().id)
+        self.assertEqual(4, self.dsm.get_free_page().id)
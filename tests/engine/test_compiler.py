@@ -0,0 +1,83 @@
+from unittest import TestCase
+from datetime import date
+from itertools import product
+from pysilisk.parser.sqlparser import SQL_GRAMMAR, to_ast_expr
+from pysilisk.engine import TreeEvaluator, EngineException
+from pysilisk.engine import compile_expression, compile_filter
+from pysilisk.engine import compile_projection
+
+
+def parse_expr(condition):
+    parsed = SQL_GRAMMAR.parseString('SELECT id FROM t WHERE %s;'
+                                     % condition)
+    return to_ast_expr(parsed.where_clause, 'where_clause')
+
+
+COLUMNS = [('t', 'a'), ('t', 'b'), ('t', 'c')]
+VALUES = [None, -2, 0, 3]
+ROWS = list(product(VALUES, VALUES, ['x', None]))
+
+
+class TestExpressionCompiler(TestCase):
+
+    def assertSameAsTree(self, condition):
+        expr = parse_expr(condition)
+        evaluate = compile_expression(expr, COLUMNS)
+        tree = TreeEvaluator(expr, COLUMNS)
+        for row in ROWS:
+            self.assertEqual(tree(row), evaluate(row), (condition, row))
+            self.assertIs(type(tree(row)), type(evaluate(row)))
+
+    def test_three_valued_logic(self):
+        for condition in ['a = b', 'a <> b', 'a < 1 AND b > 0',
+                          'a < 1 OR b > 0', 'NOT a = 3',
+                          'NOT (a >= 0 AND (b <= 0 OR c = \'x\'))',
+                          'a + b * 2 > -a - 1', 'a - 1 = b',
+                          '(a = 0 OR a <> 0) AND c = \'x\'']:
+            self.assertSameAsTree(condition)
+
+    def test_null_results(self):
+        evaluate = compile_expression(parse_expr('a = 1 OR b = 2'), COLUMNS)
+        self.assertIsNone(evaluate((None, 3, 'x')))
+        self.assertTrue(evaluate((None, 2, 'x')))
+        evaluate = compile_expression(parse_expr('a = 1 AND b = 2'),
+                                      COLUMNS)
+        self.assertIsNone(evaluate((None, 2, 'x')))
+        self.assertIs(False, evaluate((None, 3, 'x')))
+
+    def test_filter_and_projection(self):
+        select = compile_filter(parse_expr('a > 0 OR c = \'x\''), COLUMNS)
+        self.assertEqual([r for r in ROWS
+                          if (r[0] is not None and r[0] > 0) or r[2] == 'x'],
+                         select(ROWS))
+        a_plus_b = parse_expr('a + b = 0').left_expr
+        project = compile_projection([a_plus_b, parse_expr('c = \'x\'')],
+                                     COLUMNS)
+        self.assertEqual([(None, None), (5, True)],
+                         project([(None, 1, None), (2, 3, 'x')]))
+
+    def test_date_literals(self):
+        # The string literals compared with a date are coerced
+        columns = [('t', 'd'), ('t', 'a')]
+        rows = [(date(2020, 2, 1), 1), (date(2020, 3, 1), 2), (None, 3)]
+        for condition, expected in [('d >= \'2020-03-01\'', rows[1:2]),
+                                    ('d = \'2020-03-01\'', rows[1:2]),
+                                    ('\'2020-03-01\' = d', rows[1:2]),
+                                    ('d <> \'2020-03-01\'', rows[:1])]:
+            expr = parse_expr(condition)
+            select = compile_filter(expr, columns)
+            tree = TreeEvaluator(expr, columns)
+            self.assertEqual(expected, select(rows), condition)
+            self.assertEqual(expected, [r for r in rows if tree(r)],
+                             condition)
+        select = compile_filter(parse_expr('d = \'March\''), columns)
+        with self.assertRaises(EngineException):
+            select(rows)
+
+    def test_fallback(self):
+        # A division by zero is handled by the tree-evaluator
+        columns = [('t', 'd'), ('t', 'a')]
+        evaluate = compile_expression(parse_expr('a / (a - 1) > 0'), columns)
+        self.assertTrue(evaluate((None, 2)))
+        with self.assertRaises(EngineException):
+            evaluate((None, 1))
@@ -0,0 +1,81 @@
+from unittest import TestCase
+from pysilisk.server import PysiliskSQL, ExecutionEngine
+from pysilisk.records import Column, TableSchema
+from pysilisk.sqltypes import SQLDataType
+from pysilisk.parser.ast import AST_Column, OrderType
+from pysilisk.parser.sqlparser import parse
+from pysilisk.engine import Sort
+import shutil
+
+
+class TestExternalSort(TestCase):
+
+    def setUp(self):
+        self.db_path = 'test_external_sort_db'
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        self.server.create_table(TableSchema('events', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('kind', SQLDataType.VARCHAR, 10),
+            Column('score', SQLDataType.FLOAT)]))
+        self.rows = [(i, None if i % 17 == 0 else 'kind-%d' % (i * 7 % 5),
+                      None if i % 11 == 0 else float((i * 7919) % 50))
+                     for i in range(5000)]
+        self.server.bulk_insert('events', self.rows)
+        self.engine = ExecutionEngine(batch_size=100)
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.db_path)
+
+    def _expected(self):
+        # kind ASC, score DESC (the NULLs are the greatest values), then
+        # the order of the table
+        rows = sorted(self.rows, key=lambda r: (r[2] is None, r[2] or 0),
+                      reverse=True)
+        rows.sort(key=lambda r: (r[1] is None, r[1] or ''))
+        return rows
+
+    def test_external_sort(self):
+        ast = parse('SELECT * FROM events ORDER BY kind, score DESC;')
+        high_water_mark = None
+        for _ in range(2):
+            plan = Sort(self.server.table_scan('events'), ast.order_by_list,
+                        self.server.buff_mngr, max_rows=300, merge_fan_in=4)
+            self.assertEqual(self._expected(),
+                             list(self.engine.execute(plan)))
+            # 17 runs: two merge passes (17 --> 5 --> 2 runs)
+            self.assertEqual(17, plan.num_runs)
+            self.assertEqual([], plan._runs)
+            if high_water_mark is None:
+                high_water_mark = self.server.dsm.high_water_mark
+        # The pages of the runs are released and reused
+        self.assertEqual(high_water_mark, self.server.dsm.high_water_mark)
+
+    def test_in_memory_sort(self):
+        plan = self.server.sort(self.server.table_scan('events'),
+                                [(AST_Column('kind'), OrderType.ASC),
+                                 (AST_Column('score'), OrderType.DESC)])
+        self.assertEqual(self._expected(), list(self.engine.execute(plan)))
+        self.assertEqual(0, plan.num_runs)
+
+    def test_descending_keys(self):
+        plan = self.server.sort(self.server.table_scan('events'),
+                                [(AST_Column('score'), OrderType.DESC)],
+                                max_rows=700)
+        expected = sorted(self.rows, key=lambda r: (r[2] is None, r[2]),
+                          reverse=True)
+        self.assertEqual(expected, list(self.engine.execute(plan)))
+        self.assertEqual(8, plan.num_runs)
+
+    def test_partial_read(self):
+        # Closing a sort that was not read to the end releases its runs
+        plan = self.server.sort(self.server.table_scan('events'),
+                                [(AST_Column('id'), OrderType.DESC)],
+                                max_rows=1000)
+        result_set = self.engine.execute(plan)
+        self.assertEqual([4999, 4998], [next(result_set)[0]
+                                        for _ in range(2)])
+        self.assertEqual(5, len(plan._runs))
+        result_set.close()
+        self.assertEqual([], plan._runs)
@@ -0,0 +1,112 @@
+from unittest import TestCase
+from pysilisk.server import PysiliskSQL, ExecutionEngine
+from pysilisk.records import Column, TableSchema
+from pysilisk.sqltypes import SQLDataType
+from pysilisk.parser.ast import AST_Column
+from pysilisk.parser.sqlparser import SQL_GRAMMAR, to_ast_expr
+from pysilisk.engine import HashJoin, NestedLoopJoin, Project
+from pysilisk.engine import extract_equi_join, make_join, EngineException
+import shutil
+
+
+def where(condition):
+    parsed = SQL_GRAMMAR.parseString('SELECT id FROM f WHERE %s;'
+                                     % condition)
+    return to_ast_expr(parsed.where_clause, 'where_clause')
+
+
+class TestHashJoin(TestCase):
+
+    def setUp(self):
+        self.db_path = 'test_hash_join_db'
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        self.server.create_table(TableSchema('sales', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('store_id', SQLDataType.INTEGER),
+            Column('day', SQLDataType.INTEGER),
+            Column('amount', SQLDataType.FLOAT)]))
+        self.server.create_table(TableSchema('stores', [
+            Column('id', SQLDataType.INTEGER),
+            Column('day', SQLDataType.INTEGER),
+            Column('name', SQLDataType.VARCHAR, 20)]))
+        self.sales = [(i, None if i % 13 == 0 else i % 300, i % 7, i * 0.5)
+                      for i in range(4000)]
+        # Two rows per store (days 0 and 1), and a store without id
+        self.stores = [(i // 2, i % 2, 'store-%d' % i) for i in range(500)]
+        self.stores.append((None, 0, 'unknown'))
+        self.server.bulk_insert('sales', self.sales)
+        self.server.bulk_insert('stores', self.stores)
+        self.engine = ExecutionEngine(batch_size=128)
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.db_path)
+
+    def _scans(self):
+        return (self.server.table_scan('sales', alias='s'),
+                self.server.table_scan('stores', alias='t'))
+
+    def _expected(self, same_day=False):
+        return sorted(sale + store for sale in self.sales
+                      for store in self.stores
+                      if sale[1] is not None and sale[1] == store[0] and
+                      (not same_day or sale[2] == store[1]))
+
+    def test_extract_equi_join(self):
+        sales, stores = self._scans()
+        condition = where('t.id = s.store_id AND s.amount > 10 AND '
+                          's.day = t.day AND s.id <> s.day')
+        left_keys, right_keys, residual = extract_equi_join(
+            condition, sales.columns, stores.columns)
+        self.assertEqual([1, 2], left_keys)
+        self.assertEqual([0, 1], right_keys)
+        # s.amount > 10 AND s.id <> s.day
+        self.assertEqual('amount', residual.left_expr.left_expr.col_name)
+        with self.assertRaises(EngineException):
+            extract_equi_join(where('id = store_id'), sales.columns,
+                              stores.columns)
+
+    def test_in_memory_join(self):
+        sales, stores = self._scans()
+        plan = make_join(sales, stores, where('s.store_id = t.id'))
+        self.assertIsInstance(plan, HashJoin)
+        rows = list(self.engine.execute(plan))
+        self.assertEqual(self._expected(), sorted(rows))
+        # The rows keep the order of the left (probe) side
+        self.assertEqual(sorted(rows, key=lambda r: r[0]), rows)
+        self.assertEqual(0, plan.num_spilled_partitions)
+
+    def test_residual_and_multiple_keys(self):
+        sales, stores = self._scans()
+        plan = self.server.join(
+            sales, stores, where('s.store_id = t.id AND s.day = t.day AND '
+                                 't.name <> \'store-3\''))
+        plan = Project(plan, [AST_Column('id', 's'), AST_Column('name')])
+        expected = [(r[0], r[6]) for r in self._expected(same_day=True)
+                    if r[6] != 'store-3']
+        self.assertEqual(expected, sorted(self.engine.execute(plan)))
+
+    def test_grace_join_spills_partitions(self):
+        dsm = self.server.dsm
+        high_water_mark = None
+        for _ in range(2):
+            sales, stores = self._scans()
+            plan = HashJoin(stores, sales, [0], [1], None,
+                            self.server.buff_mngr, max_build_rows=100,
+                            num_partitions=4)
+            rows = list(self.engine.execute(plan))
+            # The partitions of the build side (4000 rows) are split again
+            self.assertGreater(plan.num_spilled_partitions, 8)
+            self.assertEqual(sorted(r[4:] + r[:4] for r in self._expected()),
+                             sorted(rows))
+            self.assertEqual([], plan._spill_files)
+            if high_water_mark is None:
+                high_water_mark = dsm.high_water_mark
+        # The pages of the partitions are released and reused
+        self.assertEqual(high_water_mark, dsm.high_water_mark)
+
+    def test_nested_loop_without_equalities(self):
+        sales, stores = self._scans()
+        plan = make_join(sales, stores, where('s.store_id < t.id'))
+        self.assertIsInstance(plan, NestedLoopJoin)
@@ -0,0 +1,114 @@
+from unittest import TestCase
+from pysilisk.server import PysiliskSQL, ExecutionEngine
+from pysilisk.records import Column, TableSchema
+from pysilisk.sqltypes import SQLDataType
+from pysilisk.parser.ast import AST_Column, AST_Add, AST_NumberLiteral
+from pysilisk.parser.ast import OrderType
+from pysilisk.parser.sqlparser import SQL_GRAMMAR, to_ast_expr
+from pysilisk.engine import Filter, Project, Sort, NestedLoopJoin, Limit
+from pysilisk.engine import EngineException
+import shutil
+
+
+def where(condition):
+    parsed = SQL_GRAMMAR.parseString('SELECT id FROM people WHERE %s;'
+                                     % condition)
+    return to_ast_expr(parsed.where_clause, 'where_clause')
+
+
+class TestOperators(TestCase):
+
+    def setUp(self):
+        self.db_path = 'test_operators_db'
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        self.server.create_table(TableSchema('people', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('city_id', SQLDataType.INTEGER),
+            Column('name', SQLDataType.VARCHAR, 30)]))
+        self.server.create_table(TableSchema('cities', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('name', SQLDataType.VARCHAR, 20)]))
+        self.people = [(i, None if i % 10 == 0 else i % 5, 'person-%d' % i)
+                       for i in range(1000)]
+        self.cities = [(i, 'city-%d' % i) for i in range(5)]
+        self.server.bulk_insert('people', self.people)
+        self.server.bulk_insert('cities', self.cities)
+        self.engine = ExecutionEngine(batch_size=64)
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.db_path)
+
+    def test_scan_batches(self):
+        scan = self.server.table_scan('people', ['id', 'name'])
+        scan.set_batch_size(300)
+        scan.open()
+        sizes = []
+        batch = scan.next_batch()
+        while batch:
+            sizes.append(len(batch))
+            batch = scan.next_batch()
+        scan.close()
+        self.assertEqual([300, 300, 300, 100], sizes)
+        rows = list(self.engine.execute(self.server.table_scan('people')))
+        self.assertEqual(self.people, rows)
+
+    def test_filter_and_project(self):
+        scan = self.server.table_scan('people')
+        plan = Filter(scan, where('city_id = 2 AND id < 100'))
+        plan = Project(plan, [AST_Column('name'),
+                              AST_Add(AST_Column('id'), AST_NumberLiteral(1))],
+                       aliases=[None, 'next_id'])
+        result_set = self.engine.execute(plan)
+        self.assertEqual([('people', 'name'), ('', 'next_id')],
+                         result_set.columns)
+        expected = [(name, i + 1) for i, city_id, name in self.people
+                    if city_id == 2 and i < 100]
+        self.assertEqual(expected, list(result_set))
+
+    def test_filter_null_logic(self):
+        # NULL = 1 is NULL: the row is discarded by the filter, even with
+        # a NOT; NULL OR TRUE is TRUE
+        scan = self.server.table_scan('people')
+        plan = Filter(scan, where('NOT city_id = 1'))
+        rows = list(self.engine.execute(plan))
+        self.assertEqual([r for r in self.people
+                          if r[1] is not None and r[1] != 1], rows)
+        scan = self.server.table_scan('people')
+        plan = Filter(scan, where('city_id = 1 OR id < 20'))
+        self.assertEqual([r for r in self.people if r[1] == 1 or r[0] < 20],
+                         list(self.engine.execute(plan)))
+
+    def test_sort_and_limit(self):
+        scan = self.server.table_scan('people')
+        plan = Sort(scan, [(AST_Column('city_id'), OrderType.ASC),
+                           (AST_Column('id'), OrderType.DESC)])
+        plan = Limit(plan, 150, offset=190)
+        expected = sorted(self.people, key=lambda r: -r[0])
+        expected.sort(key=lambda r: (r[1] is None, r[1]))
+        self.assertEqual(expected[190:340], list(self.engine.execute(plan)))
+
+    def test_nested_loop_join(self):
+        people = self.server.table_scan('people', ['name', 'city_id'], 'p')
+        cities = self.server.table_scan('cities', alias='c')
+        plan = NestedLoopJoin(people, cities, where('p.city_id = c.id'))
+        plan = Project(plan, [AST_Column('name', 'p'),
+                              AST_Column('name', 'c')])
+        expected = [(name, 'city-%d' % city_id)
+                    for _, city_id, name in self.people if city_id is not None]
+        self.assertEqual(expected, list(self.engine.execute(plan)))
+
+    def test_unknown_and_ambiguous_columns(self):
+        people = self.server.table_scan('people')
+        with self.assertRaises(EngineException):
+            Filter(people, where('salary > 10'))
+        cities = self.server.table_scan('cities')
+        with self.assertRaises(EngineException):
+            NestedLoopJoin(people, cities, where('id = 1'))
+
+    def test_result_set_closes_the_plan(self):
+        result_set = self.engine.execute(self.server.table_scan('cities'))
+        self.assertEqual(self.cities[0], next(result_set))
+        result_set.close()
+        self.assertEqual([], list(result_set))
@@ -0,0 +1,50 @@
+from unittest import TestCase
+from pysilisk.dsm import DiskSpaceManager
+from pysilisk.buffer import BufferManager
+from pysilisk.sqltypes import Date, DateTime
+from pysilisk.engine import SpillFile
+import os
+
+
+class TestSpillFile(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_spill.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(10, lazy=True)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=8)
+
+    def tearDown(self):
+        self.dsm.close_file()
+        os.remove(self.test_database_filename)
+
+    def test_rows_are_stored_in_pages(self):
+        rows = [(i, i / 3, 'value-%d' % i * (i % 5), None,
+                 Date(2020, 1 + i % 12, 1),
+                 DateTime.from_timestamp(1.5e9 + i)) for i in range(5000)]
+        spill_file = SpillFile(self.buff_mngr)
+        spill_file.extend(rows[:100])
+        # The file can be read while it is written
+        self.assertEqual(rows[:100], list(spill_file.rows()))
+        spill_file.extend(rows[100:])
+        self.assertEqual(5000, len(spill_file))
+        # The pages do not fit in the buffer-pool
+        self.assertGreater(len(spill_file.page_ids), 8)
+        self.assertEqual(rows, list(spill_file.rows()))
+        self.assertEqual(rows, [row for chunk in spill_file.chunks()
+                                for row in chunk])
+
+    def test_free_releases_the_pages(self):
+        spill_file = SpillFile(self.buff_mngr)
+        spill_file.extend((i, 'x' * 100) for i in range(2000))
+        spill_file.flush()
+        num_pages = len(spill_file.page_ids)
+        high_water_mark = self.dsm.high_water_mark
+        spill_file.free()
+        self.assertEqual([], list(spill_file.rows()))
+        # The released pages are reused
+        spill_file.extend((i, 'y' * 100) for i in range(2000))
+        spill_file.flush()
+        self.assertEqual(num_pages, len(spill_file.page_ids))
+        self.assertEqual(high_water_mark, self.dsm.high_water_mark)
@@ -0,0 +1,119 @@
+from unittest import TestCase
+from datetime import date
+from pysilisk.server import PysiliskSQL, ExecutionEngine
+from pysilisk.records import Column, TableSchema
+from pysilisk.sqltypes import SQLDataType, StorageType
+from pysilisk.parser.ast import AST_Column, AST_EQ, AST_GT, AST_NumberLiteral
+from pysilisk.parser.sqlparser import SQL_GRAMMAR, to_ast_expr
+from pysilisk.engine import SeqScan, Filter, Project, VectorScan
+from pysilisk.engine import EngineException
+from pysilisk.engine.vectorized import VectorEvaluator
+from unittest import mock
+import shutil
+
+
+def parse_expr(condition):
+    parsed = SQL_GRAMMAR.parseString('SELECT id FROM sales WHERE %s;'
+                                     % condition)
+    return to_ast_expr(parsed.where_clause, 'where_clause')
+
+
+class TestVectorScan(TestCase):
+
+    def setUp(self):
+        self.db_path = 'test_vectorized_db'
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        self.rows = [(i, None if i % 7 == 0 else (i * 37) % 100,
+                      None if i % 11 == 0 else i / 8,
+                      date(2020, 1 + i % 12, 1 + i % 28),
+                      ['pe', 'cl', 'ar', None][i % 4])
+                     for i in range(3000)]
+        for storage in (StorageType.ROW, StorageType.COLUMNAR):
+            table_name = 'sales_%d' % storage
+            self.server.create_table(TableSchema(table_name, [
+                Column('id', SQLDataType.INTEGER, nullable=False),
+                Column('qty', SQLDataType.INTEGER),
+                Column('price', SQLDataType.FLOAT),
+                Column('day', SQLDataType.DATE),
+                Column('country', SQLDataType.CHAR, 2, dictionary=True)],
+                storage))
+            self.server.bulk_insert(table_name, self.rows)
+        self.engine = ExecutionEngine(batch_size=100)
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.db_path)
+
+    def assertSameAsRowWise(self, condition, expressions=None):
+        for storage in (StorageType.ROW, StorageType.COLUMNAR):
+            table_file = self.server.get_table_file('sales_%d' % storage)
+            plan = Filter(SeqScan(table_file, alias='sales'), condition)
+            if expressions is not None:
+                plan = Project(plan, expressions)
+            expected = list(self.engine.execute(plan))
+            plan = VectorScan(table_file, alias='sales', condition=condition,
+                              expressions=expressions, pages_per_batch=3)
+            self.assertEqual(expected, list(self.engine.execute(plan)))
+            self.assertTrue(plan.program.is_vectorized)
+
+    def test_filters(self):
+        for condition in ['qty > 50', 'qty * 2 + 1 <= price',
+                          'NOT (qty < 30 OR price > 100.5)',
+                          'qty = 10 OR country = \'cl\'',
+                          'NOT (qty >= 10 AND country <> \'ar\')',
+                          'day >= \'2020-06-15\' AND day < \'2020-09-01\'',
+                          '-qty > -20 AND qty / 4 > 2']:
+            self.assertSameAsRowWise(parse_expr(condition))
+
+    def test_projections(self):
+        expressions = [AST_Column('id'),
+                       parse_expr('qty * 2 > price').left_expr,
+                       parse_expr('qty > price OR country = \'pe\''),
+                       AST_Column('day'), AST_Column('country')]
+        self.assertSameAsRowWise(parse_expr('id < 500'), expressions)
+
+    def test_column_batches(self):
+        table_file = self.server.get_table_file('sales_1')
+        plan = VectorScan(table_file, condition=parse_expr('qty > 90'),
+                          expressions=[parse_expr('qty * price > 0')
+                                       .left_expr])
+        total = sum(batch.vectors[0].data.sum()
+                    for batch in plan.column_batches())
+        self.assertAlmostEqual(sum(r[1] * r[2] for r in self.rows
+                                   if r[1] is not None and r[1] > 90 and
+                                   r[2] is not None), total)
+
+    def test_dictionary_codes_are_compared(self):
+        # The country column is not decoded to be filtered
+        column_values = VectorEvaluator._column_values
+        decoded = []
+
+        def record(vector):
+            decoded.append(vector.dictionary is not None)
+            return column_values(vector)
+        with mock.patch.object(VectorEvaluator, '_column_values',
+                               staticmethod(record)):
+            for condition in ['country = \'cl\'', '\'ar\' <> country',
+                              'country = \'zz\' OR qty > 95',
+                              'NOT (country <> \'zz\')']:
+                self.assertSameAsRowWise(parse_expr(condition))
+        self.assertNotIn(True, decoded)
+
+    def test_fallback(self):
+        # A comparison of booleans is not vectorized: the rows are
+        # evaluated one by one
+        condition = AST_EQ(AST_GT(AST_Column('qty'), AST_NumberLiteral(50)),
+                           AST_GT(AST_Column('id'), AST_NumberLiteral(1500)))
+        table_file = self.server.get_table_file('sales_0')
+        plan = VectorScan(table_file, condition=condition)
+        self.assertFalse(plan.program.is_vectorized)
+        self.assertEqual([r for r in self.rows if r[1] is not None and
+                          (r[1] > 50) == (r[0] > 1500)],
+                         list(self.engine.execute(plan)))
+
+    def test_division_by_zero(self):
+        table_file = self.server.get_table_file('sales_1')
+        plan = VectorScan(table_file, condition=parse_expr('id / qty > 1'))
+        with self.assertRaises(EngineException):
+            list(self.engine.execute(plan))
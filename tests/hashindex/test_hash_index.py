@@ -0,0 +1,79 @@
+from unittest import TestCase
+import random
+from pysilisk.dsm import DiskSpaceManager
+from pysilisk.buffer import BufferManager
+from pysilisk.btree import IndexException
+from pysilisk.hashindex import LinearHashIndex
+from pysilisk.records import RID
+from pysilisk.sqltypes import SQLDataType
+import os
+
+
+class TestLinearHashIndex(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_hashindex.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(10, lazy=True)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=32)
+        self.key_types = [SQLDataType.INTEGER, SQLDataType.VARCHAR]
+
+    def tearDown(self):
+        self.dsm.close_file()
+        os.remove(self.test_database_filename)
+
+    def test_insert_search_and_delete(self):
+        index = LinearHashIndex.create(self.buff_mngr, self.key_types)
+        entries = [((i, 'key-%d' % i), RID(i // 50, i % 50))
+                   for i in range(20000)]
+        for key, rid in entries:
+            index.insert(key, rid)
+        # The buckets were split one at a time as the index grew
+        self.assertGreater(index.num_buckets, 100)
+        self.assertEqual(20000, index.num_entries)
+        self.assertEqual([RID(10, 7)], index.search((507, 'key-507')))
+        self.assertEqual([], index.search((507, 'other')))
+        index.insert((507, 'key-507'), RID(99, 1))
+        self.assertEqual({RID(10, 7), RID(99, 1)},
+                         set(index.search((507, 'key-507'))))
+        with self.assertRaises(IndexException):
+            index.insert((507, 'key-507'), RID(99, 1))
+        with self.assertRaises(IndexException):
+            index.search((507,))
+
+        # A lookup reads about one page
+        num_pages = sum(len(index._read_chain(b))
+                        for b in range(index.num_buckets))
+        self.assertLess(num_pages, index.num_buckets * 1.1)
+
+        random.Random(3).shuffle(entries)
+        for key, rid in entries[:19000]:
+            index.delete(key, rid)
+        with self.assertRaises(IndexException):
+            index.delete(*entries[0])
+        self.assertEqual(sorted(entries[19000:] +
+                                [((507, 'key-507'), RID(99, 1))]),
+                         sorted(index.scan()))
+
+        # The index is persisted in its pages
+        self.buff_mngr.flush_all()
+        index = LinearHashIndex(BufferManager(self.dsm, num_frames=8),
+                                self.key_types, index.header_page_id)
+        self.assertEqual(1001, index.num_entries)
+        key, rid = entries[19500]
+        self.assertEqual([rid], index.search(key))
+
+    def test_skewed_keys_and_drop(self):
+        index = LinearHashIndex.create(self.buff_mngr, [SQLDataType.CHAR])
+        # Many duplicates of a key go to overflow pages
+        for i in range(3000):
+            index.insert(('same',), RID(i, 0))
+        self.assertEqual(3000, len(index.search(('same',))))
+        for i in range(3000):
+            index.delete(('same',), RID(i, 0))
+        self.assertEqual([], list(index.scan()))
+        hwm = self.dsm.high_water_mark
+        index.drop()
+        index = LinearHashIndex.create(self.buff_mngr, [SQLDataType.CHAR])
+        self.assertEqual(hwm, self.dsm.high_water_mark)
@@ -0,0 +1,217 @@
+from unittest import TestCase
+from pysilisk.dsm import DiskSpaceManager
+from pysilisk.buffer import BufferManager
+from pysilisk.heapfile import HeapFile, FileManager
+from pysilisk.records import Column, TableSchema, RecordException
+from pysilisk.sqltypes import SQLDataType
+from pysilisk.records import SchemaException
+import os
+
+
+class TestHeapFile(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_heapfile.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(10, lazy=True)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=16)
+        self.schema = TableSchema('t', [
+            Column('id', SQLDataType.INTEGER),
+            Column('name', SQLDataType.VARCHAR, 200)])
+        self.file_mngr = FileManager(self.buff_mngr)
+        self.heap_file = self.file_mngr.create_file(self.schema)
+
+    def tearDown(self):
+        self.dsm.close_file()
+        os.remove(self.test_database_filename)
+
+    def _chain(self, heap_file):
+        page_ids = []
+        page_id = heap_file.page_ids[0] if heap_file.num_pages else -1
+        while page_id != -1:
+            page_ids.append(page_id)
+            next_id = self.buff_mngr.pin(page_id).next_page_pointer
+            self.buff_mngr.unpin(page_id)
+            page_id = next_id
+        return page_ids
+
+    def test_categories(self):
+        self.assertEqual(0, HeapFile.category(0))
+        self.assertEqual(15, HeapFile.category(4084))
+        self.assertEqual(1, HeapFile.required_category(1))
+        # A page of the required category always has room
+        for size in range(1, 4000, 37):
+            category = HeapFile.required_category(size)
+            min_free = -(-category * 4088 // 16)
+            self.assertGreaterEqual(min_free, size)
+
+    def test_insert_scan_and_reopen(self):
+        rows = [(i, 'name-%d' % i * 5) for i in range(1000)]
+        rids = [self.heap_file.insert(row) for row in rows]
+        self.assertEqual(rows, [row for _, row in self.heap_file.scan()])
+        self.assertEqual(rows[500], self.heap_file.get(rids[500]))
+        # The pages are full (almost) before a new page is allocated
+        self.assertLess(self.heap_file.num_pages, 1000 * 60 // 4000 + 3)
+
+        # The directory is persisted
+        self.buff_mngr.flush_all()
+        buff_mngr = BufferManager(self.dsm, num_frames=8)
+        heap_file = HeapFile(buff_mngr, self.schema,
+                             self.heap_file.dir_page_id)
+        self.assertEqual(self.heap_file.page_ids, heap_file.page_ids)
+        self.assertEqual(rows, [row for _, row in heap_file.scan()])
+
+    def test_delete_makes_room(self):
+        big_name = 'x' * 200
+        rids = [self.heap_file.insert((i, big_name)) for i in range(100)]
+        num_pages = self.heap_file.num_pages
+        first_page = rids[0].page_id
+        deleted = [rid for rid in rids if rid.page_id == first_page]
+        for rid in deleted:
+            self.heap_file.delete(rid)
+        # The free space is reused instead of allocating new pages
+        new_rids = [self.heap_file.insert((i, big_name))
+                    for i in range(len(deleted))]
+        self.assertIn(first_page, [rid.page_id for rid in new_rids])
+        self.assertEqual(num_pages, self.heap_file.num_pages)
+        with self.assertRaises(RecordException):
+            self.heap_file.get(type(rid)(12345, 0))
+
+    def test_update_moves_the_row(self):
+        rids = [self.heap_file.insert((i, 'x' * 190)) for i in range(21)]
+        rid = self.heap_file.update(rids[0], (0, 'short'))
+        self.assertEqual(rids[0], rid)
+        self.assertEqual((0, 'short'), self.heap_file.get(rid))
+
+    def test_many_directory_pages(self):
+        num_pages = HeapFile.ENTRIES_PER_PAGE + 5
+        for i in range(num_pages):
+            self.heap_file._add_data_page()
+        self.buff_mngr.flush_all()
+        heap_file = HeapFile(self.buff_mngr, self.schema,
+                             self.heap_file.dir_page_id)
+        self.assertEqual(num_pages, heap_file.num_pages)
+        self.assertEqual(2, len(heap_file._dir_pages))
+
+    def test_drop(self):
+        for i in range(100):
+            self.heap_file.insert((i, 'y' * 100))
+        self.file_mngr.drop_file(self.schema, self.heap_file.dir_page_id)
+        self.assertEqual(0, self.heap_file.num_pages)
+
+    def test_overflow_values(self):
+        schema = TableSchema('docs', [
+            Column('id', SQLDataType.INTEGER),
+            Column('body', SQLDataType.VARCHAR, 20000)])
+        heap_file = self.file_mngr.create_file(schema)
+        rows = [(i, ('body %d ' % i) * (500 * i)) for i in range(6)]
+        rids = heap_file.insert_rows(rows)
+        self.assertEqual(rows, [row for _, row in heap_file.scan()])
+        self.assertEqual(rows[5], heap_file.get(rids[5]))
+        self.assertEqual([(rids[3], rows[3])],
+                         list(heap_file.scan_equal('body', rows[3][1])))
+
+        # The overflow pages are reused after a delete or update
+        hwm = self.dsm.high_water_mark
+        heap_file.delete(rids[5])
+        rid = heap_file.update(rids[4], (4, rows[5][1]))
+        rids[5] = heap_file.insert(rows[4])
+        self.assertEqual(hwm, self.dsm.high_water_mark)
+        self.assertEqual(rows[5][1], heap_file.get(rid)[1])
+        self.assertEqual(rows[4], heap_file.get(rids[5]))
+
+        # A batch with an invalid row releases the chains of the others
+        with self.assertRaises(SchemaException):
+            heap_file.insert_rows([(1, 'a' * 5000), (2, 'b' * 30000)])
+        hwm = self.dsm.high_water_mark
+        heap_file.insert((1, 'a' * 5000))
+        self.assertEqual(hwm, self.dsm.high_water_mark)
+
+    def test_scan_equal_on_dictionary_column(self):
+        schema = TableSchema('sales', [
+            Column('id', SQLDataType.INTEGER),
+            Column('country', SQLDataType.CHAR, 10, dictionary=True)])
+        heap_file = self.file_mngr.create_file(schema)
+        countries = ['Peru', 'Chile', 'Bolivia']
+        heap_file.insert_rows([(i, countries[i % 3]) for i in range(300)])
+        self.assertEqual(3, len(schema.dictionaries[1]))
+        result = list(heap_file.scan_equal('country', 'Chile', ['id']))
+        self.assertEqual(list(range(1, 300, 3)), [row[0] for _, row in result])
+        self.assertEqual([], list(heap_file.scan_equal('country', 'Brazil')))
+
+    def test_vacuum(self):
+        rows = [(i, 'v' * 100) for i in range(2000)]
+        rids = self.heap_file.insert_rows(rows)
+        num_pages = self.heap_file.num_pages
+        # Keep one row of every 20 (all the pages become sparse)
+        live = {}
+        for i, rid in enumerate(rids):
+            if i % 20:
+                self.heap_file.delete(rid)
+            else:
+                live[rid] = rows[i]
+        hwm = self.dsm.high_water_mark
+
+        result = self.heap_file.vacuum()
+        self.assertGreater(result.released_pages, num_pages // 2)
+        self.assertEqual(num_pages - result.released_pages,
+                         self.heap_file.num_pages)
+        for old_rid, new_rid in result.moved_rids:
+            live[new_rid] = live.pop(old_rid)
+        self.assertEqual(sorted(live.items()),
+                         sorted(self.heap_file.scan()))
+        for rid, row in live.items():
+            self.assertEqual(row, self.heap_file.get(rid))
+
+        # The directory and the chain are consistent after a reopen
+        self.buff_mngr.flush_all()
+        heap_file = HeapFile(self.buff_mngr, self.schema,
+                             self.heap_file.dir_page_id)
+        self.assertEqual(self.heap_file.page_ids, heap_file.page_ids)
+        self.assertEqual(heap_file.page_ids, self._chain(heap_file))
+        # The released pages are reused (and linked after the last one)
+        heap_file.insert_rows(rows[:1500])
+        self.assertEqual(hwm, self.dsm.high_water_mark)
+        self.assertEqual(heap_file.page_ids, self._chain(heap_file))
+        self.heap_file = heap_file
+        self.assertEqual(0, self.heap_file.vacuum().released_pages)
+
+    def test_vacuum_in_steps(self):
+        rids = self.heap_file.insert_rows([(i, 'w' * 100)
+                                           for i in range(1000)])
+        for rid in rids[:900]:
+            self.heap_file.delete(rid)
+        num_pages = self.heap_file.num_pages
+        result = self.heap_file.vacuum(max_pages=2)
+        self.assertEqual(2, result.released_pages)
+        self.assertEqual(0, result.compacted_pages)
+        self.assertEqual(num_pages - 2, self.heap_file.num_pages)
+        while self.heap_file.vacuum(max_pages=2).released_pages:
+            pass
+        self.assertEqual(list(range(900, 1000)),
+                         [row[0] for _, row in self.heap_file.scan()])
+        self.assertEqual(-(-100 * 108 // 4000), self.heap_file.num_pages)
+
+    def test_directory_keeps_the_chain_order(self):
+        page_ids = [self.heap_file._add_data_page() for _ in range(5)]
+        self.heap_file._remove_data_page(page_ids[1])
+        self.buff_mngr.flush_all()
+        heap_file = HeapFile(self.buff_mngr, self.schema,
+                             self.heap_file.dir_page_id)
+        self.assertEqual(page_ids[:1] + page_ids[2:], heap_file.page_ids)
+        # The new page is linked after the tail of the chain
+        heap_file._add_data_page()
+        self.assertEqual(heap_file.page_ids, self._chain(heap_file))
+
+    def test_vacuum_releases_directory_pages(self):
+        schema = TableSchema('t2', [Column('id', SQLDataType.INTEGER)])
+        heap_file = self.file_mngr.create_file(schema)
+        num_pages = HeapFile.ENTRIES_PER_PAGE + 10
+        for i in range(num_pages):
+            heap_file._add_data_page()
+        self.assertEqual(2, len(heap_file._dir_pages))
+        rid = heap_file.insert((7,))
+        self.assertEqual(num_pages - 1, heap_file.vacuum().released_pages)
+        self.assertEqual(1, len(heap_file._dir_pages))
+        self.assertEqual([(rid, (7,))], list(heap_file.scan()))
@@ -0,0 +1,135 @@
+from unittest import TestCase
+from pysilisk.records import Column, TableSchema, RowCodec
+from pysilisk.records import SchemaException, RecordException
+from pysilisk.sqltypes import SQLDataType, Date, DateTime
+
+
+class TestRowCodec(TestCase):
+
+    def setUp(self):
+        self.schema = TableSchema('people', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('name', SQLDataType.VARCHAR, 20),
+            Column('code', SQLDataType.CHAR, 3),
+            Column('salary', SQLDataType.FLOAT),
+            Column('birth', SQLDataType.DATE),
+            Column('created', SQLDataType.DATETIME),
+            Column('notes', SQLDataType.VARCHAR, 50),
+        ])
+        self.codec = self.schema.codec
+
+    def test_codec_is_compiled_once(self):
+        self.assertIs(self.codec, self.schema.codec)
+        # bitmap(1) + int(4) + varchar(2+2) + char(3) + 2*8 + 4 + varchar(4)
+        self.assertEqual(36, self.codec.fixed_size)
+
+    def test_encode_decode(self):
+        created = DateTime.from_timestamp(1428344506.305786)
+        row = (7, 'Harold', 'PE', 1500.5, Date(1990, 4, 6), created, 'ñandú')
+        encoded = self.codec.encode(row)
+        self.assertEqual(self.codec.fixed_size + 6 + 7, len(encoded))
+        self.assertEqual(row, self.codec.decode(encoded))
+
+    def test_nulls(self):
+        row = (1, None, None, None, None, None, 'x')
+        self.assertEqual(row, self.codec.decode(self.codec.encode(row)))
+
+    def test_decode_at_offset(self):
+        encoded = self.codec.encode((1, 'a', 'b', 1.0, None, None, None))
+        buffer = bytes(10) + encoded
+        self.assertEqual((1, 'a', 'b', 1.0, None, None, None),
+                         self.codec.decode(buffer, 10))
+
+    def test_validation(self):
+        with self.assertRaises(SchemaException):
+            self.codec.encode((1, 'a'))
+        with self.assertRaises(SchemaException):
+            self.codec.encode((None, 'a', 'b', 1.0, None, None, None))
+        with self.assertRaises(SchemaException):
+            self.codec.encode((1, 'a' * 21, 'b', 1.0, None, None, None))
+        with self.assertRaises(SchemaException):
+            self.codec.encode(('x', 'a', 'b', 1.0, None, None, None))
+        with self.assertRaises(SchemaException):
+            TableSchema('t', [Column('a', SQLDataType.INTEGER),
+                              Column('a', SQLDataType.FLOAT)])
+
+    def test_dictionary_encoding(self):
+        schema = TableSchema('t', [
+            Column('country', SQLDataType.CHAR, 8, dictionary=True),
+            Column('id', SQLDataType.INTEGER)])
+        codec = schema.codec
+        # bitmap(1) + code(4) + int(4)
+        self.assertEqual(9, codec.fixed_size)
+        rows = [('PE', 1), ('CL', 2), ('PE', 3), (None, 4)]
+        encoded = [codec.encode(row) for row in rows]
+        self.assertEqual(rows, [codec.decode(e) for e in encoded])
+        dictionary = schema.dictionaries[0]
+        self.assertEqual(['PE', 'CL'], dictionary.values)
+        self.assertTrue(dictionary.is_dirty)
+
+        # Equality on codes
+        is_pe = codec.equal_predicate(0, 'PE')
+        self.assertEqual([True, False, True, False],
+                         [is_pe(e) for e in encoded])
+        is_ar = codec.equal_predicate(0, 'AR')
+        self.assertFalse(any(is_ar(e) for e in encoded))
+        self.assertEqual(2, len(dictionary))
+
+        with self.assertRaises(SchemaException):
+            codec.encode(('too long value', 5))
+        with self.assertRaises(SchemaException):
+            Column('c', SQLDataType.VARCHAR, 8, dictionary=True)
+
+    def test_equal_predicate(self):
+        encoded = [self.codec.encode((i, 'n%d' % (i % 3), 'c%d' % (i % 2),
+                                      i * 0.5, None, None, None))
+                   for i in range(6)]
+        is_equal = self.codec.equal_predicate(2, 'c1')
+        self.assertEqual([1, 3, 5], [i for i, e in enumerate(encoded)
+                                     if is_equal(e)])
+        is_equal = self.codec.equal_predicate(1, 'n2')
+        self.assertEqual([2, 5], [i for i, e in enumerate(encoded)
+                                  if is_equal(e)])
+        is_equal = self.codec.equal_predicate(4, Date(1990, 4, 6))
+        self.assertFalse(any(is_equal(e) for e in encoded))
+
+    def test_overflow_values(self):
+        schema = TableSchema('t', [
+            Column('id', SQLDataType.INTEGER),
+            Column('body', SQLDataType.VARCHAR, 20000),
+            Column('title', SQLDataType.CHAR, 2000)])
+        codec = schema.codec
+        self.assertTrue(codec.has_overflow)
+        self.assertFalse(self.codec.has_overflow)
+        # The long CHAR is stored like a varchar
+        self.assertEqual(1 + 4 + 4 + 4, codec.fixed_size)
+
+        chains = {}
+
+        def write_overflow(value):
+            chains[len(chains)] = value
+            return len(chains) - 1
+
+        def read_overflow(page_id, length):
+            self.assertEqual(len(chains[page_id]), length)
+            return chains[page_id]
+
+        row = (1, 'x' * 10000, 'short')
+        with self.assertRaises(SchemaException):
+            codec.encode(row)
+        encoded = codec.encode(row, write_overflow)
+        self.assertEqual(1, len(chains))
+        self.assertEqual(codec.fixed_size + RowCodec.OVERFLOW_POINTER_SIZE +
+                         5, len(encoded))
+        self.assertEqual(row, codec.decode(encoded, 0, read_overflow))
+        self.assertEqual([0], codec.overflow_pages(encoded))
+        with self.assertRaises(RecordException):
+            codec.decode(encoded)
+
+        # Several medium values that do not fit together in a page
+        schema = TableSchema('t', [Column('c%d' % i, SQLDataType.VARCHAR,
+                                          1000) for i in range(6)])
+        row = tuple(str(i) * 1000 for i in range(6))
+        encoded = schema.codec.encode(row, write_overflow)
+        self.assertLessEqual(len(encoded), 4080)
+        self.assertEqual(row, schema.codec.decode(encoded, 0, read_overflow))
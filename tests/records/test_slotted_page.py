@@ -0,0 +1,86 @@
+from unittest import TestCase
+from pysilisk.dsm import DiskSpaceManager, DiskPage
+from pysilisk.buffer import BufferManager
+from pysilisk.records import SlottedPage, RecordManager, RecordException
+from pysilisk.records import Column, TableSchema, RID
+from pysilisk.sqltypes import SQLDataType
+import os
+
+
+class TestSlottedPage(TestCase):
+
+    def setUp(self):
+        self.slotted_page = SlottedPage.format(DiskPage(1))
+
+    def test_insert_and_get(self):
+        self.assertEqual(0, self.slotted_page.insert(b'hello'))
+        self.assertEqual(1, self.slotted_page.insert(b'world!'))
+        self.assertEqual(b'hello', self.slotted_page.get(0).tobytes())
+        self.assertEqual(b'world!', self.slotted_page.get(1).tobytes())
+        self.assertEqual(2, self.slotted_page.num_slots)
+
+    def test_page_full(self):
+        record = bytes(100)
+        num_records = 0
+        while self.slotted_page.insert(record) != -1:
+            num_records += 1
+        self.assertEqual(DiskPage.PAGE_DATA_SIZE // 104, num_records)
+
+    def test_delete_reuses_slots_and_space(self):
+        record = bytes(1000)
+        slots = [self.slotted_page.insert(record) for _ in range(4)]
+        self.assertEqual(-1, self.slotted_page.insert(record))
+        self.slotted_page.delete(slots[1])
+        self.assertIsNone(self.slotted_page.get(slots[1]))
+        # The space is fragmented: the page is compacted
+        self.assertEqual(slots[1], self.slotted_page.insert(b'x' * 1000))
+        self.assertEqual(b'x' * 1000, self.slotted_page.get(1).tobytes())
+        self.assertEqual(record, self.slotted_page.get(2).tobytes())
+        with self.assertRaises(RecordException):
+            self.slotted_page.delete(7)
+
+    def test_update(self):
+        slot_no = self.slotted_page.insert(b'abcdef')
+        self.slotted_page.insert(b'other')
+        self.assertTrue(self.slotted_page.update(slot_no, b'xyz'))
+        self.assertEqual(b'xyz', self.slotted_page.get(slot_no).tobytes())
+        self.assertTrue(self.slotted_page.update(slot_no, b'longer value'))
+        self.assertEqual(b'longer value',
+                         self.slotted_page.get(slot_no).tobytes())
+        self.assertEqual(b'other', self.slotted_page.get(1).tobytes())
+        self.assertFalse(self.slotted_page.update(slot_no, bytes(5000)))
+
+
+class TestRecordManager(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_records.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(10)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=4)
+        self.record_mngr = RecordManager(self.buff_mngr)
+        self.schema = TableSchema('t', [
+            Column('id', SQLDataType.INTEGER),
+            Column('name', SQLDataType.VARCHAR, 30)])
+
+    def tearDown(self):
+        self.dsm.close_file()
+        os.remove(self.test_database_filename)
+
+    def test_insert_get_delete(self):
+        self.record_mngr.format_page(2)
+        rid = self.record_mngr.insert(2, self.schema, (1, 'one'))
+        self.assertEqual(RID(2, 0), rid)
+        self.record_mngr.insert(2, self.schema, (2, 'two'))
+        self.assertEqual((1, 'one'), self.record_mngr.get(rid, self.schema))
+        self.assertTrue(self.record_mngr.update(rid, self.schema,
+                                                (1, 'uno')))
+        self.record_mngr.delete(rid)
+        rows = self.record_mngr.scan_page(2, self.schema)
+        self.assertEqual([(RID(2, 1), (2, 'two'))], rows)
+
+        # The page survives an eviction
+        self.buff_mngr.flush_all()
+        rows = [r for _, r in SlottedPage(self.dsm.read_page(2)).records()]
+        self.assertEqual(1, len(rows))
@@ -0,0 +1,121 @@
+from unittest import TestCase
+from pysilisk.server import PysiliskSQL
+from pysilisk.records import Column, TableSchema, SchemaException
+from pysilisk.sqltypes import SQLDataType, StorageType, IndexType
+from pysilisk.wal import LogRecordType
+import shutil
+import os
+
+
+class TestBulkInsert(TestCase):
+
+    def setUp(self):
+        self.db_path = 'test_bulk_insert_db'
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        self.schema = TableSchema('people', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('name', SQLDataType.VARCHAR, 30)])
+        self.server.create_table(self.schema)
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.db_path)
+
+    def test_bulk_insert(self):
+        rows = [(i, 'person-%d' % i) for i in range(5000)]
+        self.assertEqual(5000, self.server.bulk_insert('people', iter(rows)))
+        heap_file = self.server.get_table_file('people')
+        self.assertEqual(rows, [row for _, row in heap_file.scan()])
+
+        # A single commit, and a few records per page (its allocation,
+        # the link of the chain, its directory entry and its data), not
+        # one per row
+        records = self.server.wal.read_records()
+        self.assertLessEqual(len(records), 8 * heap_file.num_pages)
+        self.assertEqual(LogRecordType.COMMIT, records[-1].type)
+
+    def test_data_survives_reopen(self):
+        rows = [(i, 'x' * (i % 30)) for i in range(2000)]
+        self.server.bulk_insert('people', rows, batch_size=300)
+        self.server.close()
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        heap_file = self.server.get_table_file('people')
+        self.assertEqual(rows, [row for _, row in heap_file.scan()])
+
+    def test_committed_rows_survive_a_crash(self):
+        rows = [(i, 'person-%d' % i) for i in range(5000)]
+        self.server.bulk_insert('people', rows)
+        high_water_mark = self.server.dsm.high_water_mark
+        # Crash: neither the dirty pages nor the header are written
+        crashed = self.server
+        crashed.buff_mngr.stop_background_writer()
+        os.close(crashed.wal._fd)
+        crashed.dsm._dbfile.close()
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        heap_file = self.server.get_table_file('people')
+        self.assertEqual(rows, [row for _, row in heap_file.scan()])
+        self.assertEqual(high_water_mark, self.server.dsm.high_water_mark)
+        # The recovered pages are not allocated again
+        self.server.bulk_insert('people', [(5000, 'x')])
+        self.assertEqual(rows + [(5000, 'x')],
+                         [row for _, row in heap_file.scan()])
+
+    def _indexes(self):
+        # The B+tree is found by a prefix of its key
+        return [self.server.index_mngr.get_index('people', [0, 1]),
+                self.server.index_mngr.get_index('people', [0])]
+
+    def test_invalid_row_rolls_back(self):
+        rows = [(i, 'ok') for i in range(50)]
+        self.server.bulk_insert('people', rows)
+        self.server.create_index('people_id_name', 'people', ['id', 'name'])
+        self.server.create_index('people_id', 'people', ['id'],
+                                 IndexType.HASH)
+        bad_rows = [(i, 'ok') for i in range(50, 3000)] + [(None, 'bad')]
+        with self.assertRaises(SchemaException):
+            self.server.bulk_insert('people', bad_rows, batch_size=400)
+        heap_file = self.server.get_table_file('people')
+        self.assertEqual(rows, [row for _, row in heap_file.scan()])
+        # The indexes are opened again from their rolled-back pages
+        for index in self._indexes():
+            self.assertEqual(1, len(index.search((10,))))
+            self.assertEqual([], index.search((60,)))
+
+        self.server.bulk_insert('people', [(60, 'a'), (61, 'b')])
+        for index in self._indexes():
+            rid = index.search((60,))[0]
+            self.assertEqual((60, 'a'), heap_file.get(rid))
+
+    def test_rollback_releases_the_pages(self):
+        self.server.create_table(TableSchema('notes', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('text', SQLDataType.VARCHAR, 2000)]))
+        dsm = self.server.dsm
+        header = (dsm.first_free_id, dsm.high_water_mark)
+        # Long values go to overflow pages
+        rows = [(i, 'x' * 1500) for i in range(100)] + [(None, 'bad')]
+        with self.assertRaises(SchemaException):
+            self.server.bulk_insert('notes', rows, batch_size=30)
+        self.assertEqual(header, (dsm.first_free_id, dsm.high_water_mark))
+        heap_file = self.server.get_table_file('notes')
+        self.assertEqual(0, heap_file.num_pages)
+
+        self.server.bulk_insert('notes', rows[:-1])
+        self.assertEqual(rows[:-1], [row for _, row in heap_file.scan()])
+
+    def test_columnar_table(self):
+        schema = TableSchema('facts', [
+            Column('id', SQLDataType.INTEGER),
+            Column('value', SQLDataType.FLOAT)], StorageType.COLUMNAR)
+        self.server.create_table(schema)
+        rows = [(i, i / 2) for i in range(3000)]
+        self.server.bulk_insert('facts', rows)
+        self.server.close()
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        table_file = self.server.get_table_file('facts')
+        self.assertEqual([(r[1],) for r in rows],
+                         [row for _, row in table_file.scan(['value'])])
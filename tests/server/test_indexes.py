@@ -0,0 +1,86 @@
+from unittest import TestCase
+from pysilisk.server import PysiliskSQL
+from pysilisk.catalog import CatalogException
+from pysilisk.records import Column, TableSchema
+from pysilisk.sqltypes import SQLDataType, IndexType
+from pysilisk.parser.sqlparser import parse
+import shutil
+
+
+class TestIndexes(TestCase):
+
+    def setUp(self):
+        self.db_path = 'test_indexes_db'
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        self.schema = TableSchema('people', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('city', SQLDataType.VARCHAR, 20),
+            Column('name', SQLDataType.VARCHAR, 30)])
+        self.server.create_table(self.schema)
+        self.rows = [(i, 'city-%d' % (i % 7), 'person-%d' % i)
+                     for i in range(2000)]
+        self.server.bulk_insert('people', self.rows)
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.db_path)
+
+    def test_create_index_statement(self):
+        ast = parse('CREATE INDEX people_city ON people (city, id) '
+                    'USING BTREE;')
+        self.assertEqual(IndexType.BTREE, IndexType.from_string(ast.idx_type))
+        self.assertEqual(['city', 'id'], ast.list_column_names)
+
+    def test_index_is_built_and_maintained(self):
+        index = self.server.create_index('people_city', 'people',
+                                         ['city', 'id'])
+        heap_file = self.server.get_table_file('people')
+        rids = index.search(('city-3',))
+        self.assertEqual([row for row in self.rows if row[1] == 'city-3'],
+                         [heap_file.get(rid) for rid in rids])
+        self.assertIs(index, self.server.index_mngr.get_index('people',
+                                                              [1]))
+        self.assertIsNone(self.server.index_mngr.get_index('people', [2]))
+
+        # The inserts update the index
+        self.server.bulk_insert('people', [(5000, 'city-3', 'new')])
+        rid = index.search(('city-3', 5000))[0]
+        self.assertEqual((5000, 'city-3', 'new'), heap_file.get(rid))
+        with self.assertRaises(CatalogException):
+            self.server.create_index('people_city', 'people', ['id'])
+        with self.assertRaises(CatalogException):
+            self.server.create_index('people_gist', 'people', ['id'],
+                                     'GIST')
+
+    def test_hash_index(self):
+        self.server.create_index('people_name', 'people', ['name'],
+                                 IndexType.HASH)
+        self.server.create_index('people_name_id', 'people', ['name', 'id'])
+        index = self.server.index_mngr.get_index('people', [2])
+        self.assertFalse(index.SUPPORTS_RANGES)
+        heap_file = self.server.get_table_file('people')
+        rids = index.search(('person-1234',))
+        self.assertEqual([self.rows[1234]], [heap_file.get(r) for r in rids])
+        self.server.close()
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        index = self.server.index_mngr.get_index('people', [2])
+        self.server.bulk_insert('people', [(9000, 'x', 'person-1234')])
+        self.assertEqual(2, len(index.search(('person-1234',))))
+
+    def test_indexes_are_reopened(self):
+        self.server.create_index('people_id', 'people', ['id'])
+        self.server.close()
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        index = self.server.index_mngr.get_index('people', [0])
+        self.assertEqual(2000, len(list(index.scan())))
+        self.server.bulk_insert('people', [(7000, 'x', 'y')])
+        self.assertEqual(1, len(index.search((7000,))))
+
+        hwm = self.server.dsm.high_water_mark
+        self.server.drop_index('people_id', 'people')
+        self.assertIsNone(self.server.index_mngr.get_index('people', [0]))
+        self.server.create_index('people_id', 'people', ['id'])
+        self.assertEqual(hwm, self.server.dsm.high_water_mark)
@@ -0,0 +1,128 @@
+from unittest import TestCase
+from pysilisk.server import PysiliskSQL
+from pysilisk.records import Column, TableSchema
+from pysilisk.sqltypes import SQLDataType
+from pysilisk.parser.sqlparser import parse
+import shutil
+import threading
+import time
+
+
+class FakeIndex(object):
+    def __init__(self):
+        self.entries = {}
+
+    def insert(self, key, rid):
+        self.entries[key] = rid
+
+    def delete(self, key, rid):
+        if self.entries.get(key) == rid:
+            del self.entries[key]
+
+
+class TestVacuum(TestCase):
+
+    def setUp(self):
+        self.db_path = 'test_vacuum_db'
+        self.server = PysiliskSQL(self.db_path)
+        self.server.open()
+        self.schema = TableSchema('people', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('name', SQLDataType.VARCHAR, 100)])
+        self.server.create_table(self.schema)
+        self.index = FakeIndex()
+        self.server.index_mngr.add_index('people', [0], self.index)
+        self.rows = [(i, 'person-%d' % i * 5) for i in range(3000)]
+        self.server.bulk_insert('people', self.rows)
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.db_path)
+
+    def _delete_most_rows(self):
+        heap_file = self.server.get_table_file('people')
+        for i, row in enumerate(self.rows):
+            if i % 10:
+                heap_file.delete(self.index.entries.pop((row[0],)))
+        return heap_file
+
+    def test_vacuum_statement(self):
+        self.assertIsNone(parse('VACUUM;').table_name)
+        self.assertEqual('people', parse('VACUUM people;').table_name)
+
+    def test_vacuum_updates_the_indexes(self):
+        heap_file = self._delete_most_rows()
+        num_pages = heap_file.num_pages
+        results = self.server.vacuum()
+        self.assertEqual(['people'], list(results))
+        self.assertGreater(results['people'].released_pages, 0)
+        self.assertLess(heap_file.num_pages, num_pages)
+        live = self.rows[::10]
+        self.assertEqual(len(live), len(self.index.entries))
+        for row in live:
+            self.assertEqual(row, heap_file.get(self.index.entries[(row[0],)]))
+
+    def test_vacuum_through_execute(self):
+        heap_file = self._delete_most_rows()
+        num_pages = heap_file.num_pages
+        self.server.execute('VACUUM people;')
+        self.assertGreater(self.server.affected_rows, 0)
+        self.assertIsNone(self.server.result_set)
+        self.assertLess(heap_file.num_pages, num_pages)
+        for row in self.rows[::10]:
+            self.assertEqual(row, heap_file.get(self.index.entries[(row[0],)]))
+
+    def test_rows_are_not_moved_while_scanning(self):
+        heap_file = self._delete_most_rows()
+        num_pages = heap_file.num_pages
+        scan = heap_file.scan()
+        first = next(scan)
+        result = self.server.vacuum('people')['people']
+        self.assertEqual((0, 0, []), result)
+        # The scan reads each live row once
+        rows = [first[1]] + [row for _, row in scan]
+        self.assertEqual(self.rows[::10], rows)
+        result = self.server.vacuum('people')['people']
+        self.assertGreater(result.released_pages, 0)
+        self.assertLess(heap_file.num_pages, num_pages)
+
+    def test_vacuum_updates_a_btree(self):
+        heap_file = self._delete_most_rows()
+        btree = self.server.create_index('people_id', 'people', ['id'])
+        result = self.server.vacuum('people')['people']
+        self.assertGreater(len(result.moved_rids), 0)
+        for row in self.rows[::10]:
+            rids = btree.search((row[0],))
+            self.assertEqual(1, len(rids))
+            self.assertEqual(row, heap_file.get(rids[0]))
+
+    def test_compactor_skips_running_transactions(self):
+        heap_file = self._delete_most_rows()
+        steps = []
+        compactor = threading.Thread(
+            target=lambda: steps.append(self.server._vacuum_step(8)))
+        with self.assertRaises(KeyError):
+            with self.server._transaction():
+                heap_file.insert((5000, 'new'))
+                compactor.start()
+                compactor.join()
+                raise KeyError('rollback')
+        self.assertEqual([0], steps)
+        live = self.rows[::10]
+        self.assertEqual(live, [row for _, row in heap_file.scan()])
+        self.assertGreater(self.server._vacuum_step(8), 0)
+        self.assertEqual(live, sorted(row for _, row in heap_file.scan()))
+
+    def test_background_compactor(self):
+        heap_file = self._delete_most_rows()
+        num_pages = heap_file.num_pages
+        self.server.start_compactor(interval=0.01, pages_per_step=2,
+                                    pause=0.001)
+        deadline = time.time() + 5
+        while heap_file.num_pages > num_pages // 5 and \
+                time.time() < deadline:
+            time.sleep(0.01)
+        self.server.stop_compactor()
+        self.assertLessEqual(heap_file.num_pages, num_pages // 5)
+        for row in self.rows[::10]:
+            self.assertEqual(row, heap_file.get(self.index.entries[(row[0],)]))
@@ -0,0 +1,136 @@
+from unittest import TestCase, skipIf
+from array import array
+from pysilisk.dsm import DiskSpaceManager
+from pysilisk.buffer import BufferManager
+from pysilisk.heapfile import FileManager
+from pysilisk.records import Column, TableSchema, RID
+from pysilisk.sqltypes import SQLDataType, StorageType, Date
+from pysilisk.vectors import ColumnVector, BatchDecoder, has_numpy
+import os
+
+
+class TestBatchDecoder(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_vectors.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(10, lazy=True)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=16)
+        self.file_mngr = FileManager(self.buff_mngr)
+        self.rows = [(i, i * 1.5 if i % 4 else None,
+                      Date(2015, 1 + i % 12, 1) if i % 3 else None,
+                      'c%d' % (i % 100), 'comment %d' % i)
+                     for i in range(500)]
+
+    def tearDown(self):
+        self.dsm.close_file()
+        os.remove(self.test_database_filename)
+
+    def _create_file(self, storage):
+        schema = TableSchema('sales', [
+            Column('id', SQLDataType.INTEGER, nullable=False),
+            Column('amount', SQLDataType.FLOAT),
+            Column('day', SQLDataType.DATE),
+            Column('code', SQLDataType.CHAR, 4),
+            Column('comment', SQLDataType.VARCHAR, 20)], storage)
+        table_file = self.file_mngr.create_file(schema)
+        rids = table_file.insert_rows(self.rows)
+        return table_file, rids
+
+    def _check_scan(self, storage, use_numpy):
+        table_file, rids = self._create_file(storage)
+        # Delete some rows
+        for rid in rids[10:20]:
+            table_file.delete(rid)
+        expected = list(table_file.scan())
+
+        batches = list(table_file.scan_vectors(pages_per_batch=2,
+                                               use_numpy=use_numpy))
+        self.assertGreater(len(batches), 1)
+        rows = [row for batch in batches for row in batch.rows()]
+        rids = [rid for batch in batches for rid in batch.rids]
+        self.assertEqual([row for _, row in expected], rows)
+        self.assertEqual([rid for rid, _ in expected], rids)
+        batches = list(table_file.scan_vectors(pages_per_batch=2,
+                                               use_numpy=use_numpy,
+                                               with_rids=False))
+        self.assertEqual(rows, [row for batch in batches
+                                for row in batch.rows()])
+        self.assertEqual([None], list({batch.rids for batch in batches}))
+
+        # The numeric columns are typed vectors
+        vector = batches[0].column('id')
+        if use_numpy:
+            self.assertEqual('int32', str(vector.data.dtype))
+        else:
+            self.assertIsInstance(vector.data, array)
+            self.assertEqual('i', vector.data.typecode)
+        self.assertIsNone(vector.null_mask)
+        amount = batches[0].column('amount')
+        self.assertTrue(amount.has_nulls)
+        self.assertEqual(bool(amount.null_mask[0]), True)
+        self.assertEqual(bool(amount.null_mask[1]), False)
+
+        # Projection
+        batch = next(table_file.scan_vectors(['comment', 'id'],
+                                             use_numpy=use_numpy))
+        self.assertEqual(['comment', 'id'], batch.col_names)
+        self.assertEqual(('comment 0', 0), batch.rows()[0])
+
+    def test_slotted_pages_with_arrays(self):
+        self._check_scan(StorageType.ROW, use_numpy=False)
+
+    def test_columnar_pages_with_arrays(self):
+        self._check_scan(StorageType.COLUMNAR, use_numpy=False)
+
+    @skipIf(not has_numpy(), 'numpy is not installed')
+    def test_slotted_pages_with_numpy(self):
+        self._check_scan(StorageType.ROW, use_numpy=True)
+
+    @skipIf(not has_numpy(), 'numpy is not installed')
+    def test_columnar_pages_with_numpy(self):
+        self._check_scan(StorageType.COLUMNAR, use_numpy=True)
+
+    def test_decode_pages(self):
+        table_file, _ = self._create_file(StorageType.COLUMNAR)
+        decoder = BatchDecoder(table_file, ['id'], use_numpy=False)
+        first_page = table_file.page_ids[0]
+        batch = decoder.decode_pages([first_page])
+        self.assertEqual(table_file.layout.capacity, batch.num_rows)
+        self.assertEqual(RID(first_page, 0), batch.rids[0])
+        self.assertEqual(list(range(batch.num_rows)),
+                         list(batch.column('id').data))
+
+    def test_column_vector(self):
+        vector = ColumnVector(SQLDataType.DATE,
+                              array('i', [20150102, 0, 20160304]),
+                              bytearray([0, 1, 0]))
+        self.assertEqual([Date(2015, 1, 2), None, Date(2016, 3, 4)],
+                         vector.to_list())
+        self.assertEqual([Date(2016, 3, 4)], vector.take([2]).to_list())
+        other = ColumnVector(SQLDataType.DATE, array('i', [20170101]))
+        concat = ColumnVector.concat(SQLDataType.DATE, [vector, other])
+        self.assertEqual(4, len(concat))
+        self.assertEqual(bytearray([0, 1, 0, 0]), concat.null_mask)
+
+    def test_dictionary_vectors(self):
+        for storage in (StorageType.ROW, StorageType.COLUMNAR):
+            schema = TableSchema('t_%d' % storage, [
+                Column('id', SQLDataType.INTEGER),
+                Column('country', SQLDataType.CHAR, 8, dictionary=True)],
+                storage)
+            table_file = self.file_mngr.create_file(schema)
+            countries = ['PE', 'CL', None]
+            rows = [(i, countries[i % 3]) for i in range(100)]
+            table_file.insert_rows(rows)
+            batch = next(table_file.scan_vectors(use_numpy=False))
+            vector = batch.column('country')
+            # The codes are kept in the vector
+            self.assertEqual('i', vector.data.typecode)
+            self.assertIs(schema.dictionaries[1], vector.dictionary)
+            self.assertEqual(rows, batch.rows())
+            mask = vector.equal_mask('CL')
+            self.assertEqual(list(range(1, 100, 3)),
+                             [i for i, m in enumerate(mask) if m])
+            self.assertFalse(any(vector.equal_mask('AR')))
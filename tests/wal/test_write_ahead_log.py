@@ -0,0 +1,204 @@
+from unittest import TestCase
+from pysilisk.dsm import DiskSpaceManager
+from pysilisk.buffer import BufferManager
+from pysilisk.wal import WriteAheadLog, LogRecord, LogRecordType
+from pysilisk.wal import WALException
+import os
+import threading
+
+
+class TestWriteAheadLog(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_wal.db'
+        self.test_log_filename = 'test_wal.log'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(20)
+        self.dsm.open_file()
+        self.wal = WriteAheadLog(self.test_log_filename)
+        self.wal.open()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=4, wal=self.wal)
+
+    def tearDown(self):
+        self.wal.close()
+        self.dsm.close_file()
+        for filename in [self.test_database_filename, self.test_log_filename]:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def _update(self, txn_id, page_id, offset, new_bytes):
+        disk_page = self.buff_mngr.pin(page_id)
+        lsn = self.wal.log_update(txn_id, disk_page, offset, new_bytes)
+        self.buff_mngr.unpin(page_id, is_dirty=True, page_lsn=lsn)
+        return lsn
+
+    def test_record_to_and_from_bytes(self):
+        record = LogRecord(LogRecordType.PAGE_WRITE, 7, 3, 10, b'abc', b'xyz')
+        buffer = record.to_bytes()
+        decoded = LogRecord.from_buffer(buffer, 0)
+        self.assertEqual((7, 3, 10, b'abc', b'xyz'),
+                         (decoded.txn_id, decoded.page_id, decoded.offset,
+                          decoded.before, decoded.after))
+        # Truncated or corrupted records are rejected
+        self.assertIsNone(LogRecord.from_buffer(buffer[:-1], 0))
+        corrupted = bytearray(buffer)
+        corrupted[-1] ^= 0xFF
+        self.assertIsNone(LogRecord.from_buffer(bytes(corrupted), 0))
+
+    def test_commit_flushes_the_log_only(self):
+        txn_id = self.wal.begin()
+        lsn = self._update(txn_id, 1, 0, b'hello')
+        self.assertEqual(0, self.wal.flushed_lsn)
+        self.wal.commit(txn_id)
+        self.assertGreaterEqual(self.wal.flushed_lsn, lsn)
+        self.assertEqual(1, self.wal.num_fsyncs)
+        # The data page was not written
+        self.assertNotEqual(b'hello', self.dsm.read_page(1).data[:5].tobytes())
+        with self.assertRaises(WALException):
+            self.wal.commit(txn_id)
+
+    def test_log_is_flushed_before_the_page(self):
+        txn_id = self.wal.begin()
+        lsn = self._update(txn_id, 1, 0, b'hello')
+        self.buff_mngr.flush_page(1)
+        self.assertGreaterEqual(self.wal.flushed_lsn, lsn)
+
+    def test_group_commit(self):
+        self.wal.commit_delay = 0.05
+        num_txns = 8
+        txn_ids = [self.wal.begin() for _ in range(num_txns)]
+        for i, txn_id in enumerate(txn_ids):
+            self._update(txn_id, 1 + i % 3, 4 * i, b'%04d' % i)
+        threads = [threading.Thread(target=self.wal.commit, args=(txn_id,))
+                   for txn_id in txn_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(num_txns, self.wal.num_commits)
+        self.assertLess(self.wal.num_fsyncs, num_txns)
+        committed = [r.txn_id for r in self.wal.read_records()
+                     if r.type == LogRecordType.COMMIT]
+        self.assertEqual(sorted(txn_ids), sorted(committed))
+
+    def test_rollback(self):
+        original = self.dsm.read_page(2).data[:5].tobytes()
+        txn_id = self.wal.begin()
+        self._update(txn_id, 2, 0, b'hello')
+        self._update(txn_id, 2, 2, b'XY')
+        self.wal.rollback(txn_id, self.buff_mngr)
+        disk_page = self.buff_mngr.pin(2)
+        self.assertEqual(original, disk_page.data[:5].tobytes())
+        self.buff_mngr.unpin(2)
+
+    def test_recovery(self):
+        committed = self.wal.begin()
+        loser = self.wal.begin()
+        self._update(committed, 1, 0, b'committed')
+        self._update(loser, 1, 100, b'lost')
+        self._update(loser, 2, 0, b'lost')
+        self.wal.commit(committed)
+
+        # Simulate a crash: page-2 was written, page-1 was not
+        self.buff_mngr.flush_page(2)
+        self.wal.close()
+        self.dsm.close_file()
+
+        self.dsm.open_file()
+        self.wal = WriteAheadLog(self.test_log_filename)
+        self.wal.open()
+        self.assertEqual({loser}, self.wal.recover(self.dsm))
+        page_1 = self.dsm.read_page(1)
+        self.assertEqual(b'committed', page_1.data[:9].tobytes())
+        self.assertEqual(bytes(4), page_1.data[100:104].tobytes())
+        self.assertEqual(bytes(4), self.dsm.read_page(2).data[:4].tobytes())
+        # The log was truncated
+        self.assertEqual([], self.wal.read_records())
+
+    def test_checkpoint_truncates_the_log(self):
+        txn_id = self.wal.begin()
+        self._update(txn_id, 3, 0, b'data')
+        self.wal.commit(txn_id)
+        self.wal.checkpoint(self.buff_mngr)
+        self.assertEqual(0, self.wal.next_lsn)
+        self.assertEqual(b'data', self.dsm.read_page(3).data[:4].tobytes())
+
+        # With a running transaction the log is kept
+        txn_id = self.wal.begin()
+        self._update(txn_id, 3, 0, b'more')
+        self.wal.checkpoint(self.buff_mngr)
+        types = [r.type for r in self.wal.read_records()]
+        self.assertEqual([LogRecordType.PAGE_WRITE, LogRecordType.CHECKPOINT],
+                         types)
+
+    def test_commit_during_a_checkpoint(self):
+        # A transaction that commits while the pages are written is not
+        # lost with the log
+        flush_all = self.buff_mngr.flush_all
+        def commit_and_flush_all():
+            txn_id = self.wal.begin()
+            self._update(txn_id, 4, 0, b'late')
+            self.wal.commit(txn_id)
+            self.buff_mngr.flush_all = flush_all
+        self.buff_mngr.flush_all = commit_and_flush_all
+        self.wal.checkpoint(self.buff_mngr)
+        types = [r.type for r in self.wal.read_records()]
+        self.assertEqual([LogRecordType.PAGE_WRITE, LogRecordType.COMMIT,
+                          LogRecordType.CHECKPOINT], types)
+
+    def test_allocations_are_logged(self):
+        used_page_id = self.buff_mngr.new_page().id
+        self.buff_mngr.unpin(used_page_id, is_dirty=True)
+        header = (self.dsm.first_free_id, self.dsm.high_water_mark)
+        txn_id = self.wal.begin()
+        self.buff_mngr.set_transaction(txn_id)
+        disk_page = self.buff_mngr.new_page()
+        new_page_id = disk_page.id
+        disk_page.data[:3] = b'new'
+        self.buff_mngr.unpin(new_page_id, is_dirty=True)
+        self.buff_mngr.free_page(used_page_id)
+        self.buff_mngr.set_transaction(None)
+        types = [r.type for r in self.wal.read_records()]
+        self.assertIn(LogRecordType.HEADER, types)
+
+        self.wal.rollback(txn_id, self.buff_mngr)
+        self.assertEqual(header, (self.dsm.first_free_id,
+                                  self.dsm.high_water_mark))
+        # The free-list is the original one (without the used page)
+        page_ids = []
+        for _ in range(3):
+            page_ids.append(self.buff_mngr.new_page().id)
+            self.buff_mngr.unpin(page_ids[-1])
+        self.assertEqual(new_page_id, page_ids[0])
+        self.assertNotIn(used_page_id, page_ids)
+
+    def test_rollback_after_another_allocation(self):
+        txn_id = self.wal.begin()
+        self.buff_mngr.set_transaction(txn_id)
+        rolled_back_id = self.buff_mngr.new_page().id
+        self.buff_mngr.unpin(rolled_back_id, is_dirty=True)
+        self.buff_mngr.set_transaction(None)
+        # Another transaction takes the next free page meanwhile
+        other_id = self.buff_mngr.new_page().id
+        self.buff_mngr.unpin(other_id, is_dirty=True)
+
+        self.wal.rollback(txn_id, self.buff_mngr)
+        # The page of the rolled-back transaction is released
+        page_id = self.buff_mngr.new_page().id
+        self.buff_mngr.unpin(page_id)
+        self.assertEqual(rolled_back_id, page_id)
+        self.assertNotEqual(other_id, self.buff_mngr.new_page().id)
+
+    def test_pages_pinned_by_a_transaction_are_not_written(self):
+        original = self.dsm.read_page(3).data[:4].tobytes()
+        txn_id = self.wal.begin()
+        self.buff_mngr.set_transaction(txn_id)
+        disk_page = self.buff_mngr.pin(3)
+        disk_page.data[:4] = b'todo'
+        # The change is not logged yet
+        self.wal.checkpoint(self.buff_mngr)
+        self.assertEqual(original, self.dsm.read_page(3).data[:4].tobytes())
+        self.buff_mngr.unpin(3, is_dirty=True)
+        self.buff_mngr.set_transaction(None)
+        self.wal.rollback(txn_id, self.buff_mngr)
+        self.assertEqual(original, self.dsm.read_page(3).data[:4].tobytes())
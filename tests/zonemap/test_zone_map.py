@@ -0,0 +1,122 @@
+from unittest import TestCase
+from datetime import timedelta
+from pysilisk.dsm import DiskSpaceManager
+from pysilisk.buffer import BufferManager
+from pysilisk.heapfile import FileManager
+from pysilisk.records import Column, TableSchema
+from pysilisk.sqltypes import SQLDataType, StorageType, Date
+from pysilisk.parser.sqlparser import SQL_GRAMMAR, to_ast_expr
+from pysilisk.zonemap import ZoneMap, ZonePredicate, extract_predicates
+import os
+
+
+def _where(condition):
+    parsed = SQL_GRAMMAR.parseString('SELECT id FROM events WHERE %s;'
+                                     % condition)
+    return to_ast_expr(parsed.where_clause, 'where_clause')
+
+
+class TestZoneMap(TestCase):
+
+    def setUp(self):
+        self.test_database_filename = 'test_zonemap.db'
+        self.dsm = DiskSpaceManager(self.test_database_filename)
+        self.dsm.create_file(10, lazy=True)
+        self.dsm.open_file()
+        self.buff_mngr = BufferManager(self.dsm, num_frames=16)
+        self.file_mngr = FileManager(self.buff_mngr)
+        self.columns = [Column('id', SQLDataType.INTEGER),
+                        Column('day', SQLDataType.DATE),
+                        Column('amount', SQLDataType.FLOAT),
+                        Column('note', SQLDataType.VARCHAR, 40)]
+        # Time-ordered rows: each page has a short range of days
+        first_day = Date(2020, 1, 1)
+        self.rows = [(i, first_day + timedelta(days=i // 10), i * 0.5,
+                      'note %d' % i) for i in range(3000)]
+
+    def tearDown(self):
+        self.dsm.close_file()
+        os.remove(self.test_database_filename)
+
+    def test_extract_predicates(self):
+        schema = TableSchema('events', self.columns)
+        where = _where("day >= '2020-03-01' AND 10 > id AND "
+                       "(id = 1 OR amount = 2) AND amount < -2.5 AND "
+                       "note = 'x' AND id <> 3")
+        self.assertEqual([ZonePredicate(1, '>=', 20200301),
+                          ZonePredicate(0, '<', 10),
+                          ZonePredicate(2, '<', -2.5)],
+                         extract_predicates(where, schema))
+        self.assertEqual([], extract_predicates(_where('id = 1 OR id = 2'),
+                                                schema))
+        self.assertEqual([], extract_predicates(_where("day = 'soon'"),
+                                                schema))
+
+    def test_may_match(self):
+        zone_map = ZoneMap(TableSchema('events', self.columns))
+        self.assertEqual([0, 1, 2], zone_map.col_indexes)
+        zone_map.add(5, [10, 20200101, None])
+        zone_map.add(5, [20, 20200102, None])
+        zone_map.set_built()
+        self.assertEqual((10, 20, 0), zone_map.get_zone(5, 0))
+        self.assertTrue(zone_map.may_match(5, [ZonePredicate(0, '<', 11)]))
+        self.assertFalse(zone_map.may_match(5, [ZonePredicate(0, '<', 10)]))
+        self.assertTrue(zone_map.may_match(5, [ZonePredicate(0, '>=', 20)]))
+        self.assertFalse(zone_map.may_match(5, [ZonePredicate(0, '=', 21)]))
+        # A column with only NULLs does not satisfy any comparison
+        self.assertFalse(zone_map.may_match(5, [ZonePredicate(2, '>', 0)]))
+        # A page without rows is skipped once the zone map is built
+        self.assertFalse(zone_map.may_match(6, [ZonePredicate(0, '>', 0)]))
+
+    def _check_scans(self, table_file):
+        where = _where("day >= '2020-06-01' AND day < '2020-06-11'")
+        predicates = extract_predicates(where, table_file.schema)
+        expected = [row for row in self.rows
+                    if Date(2020, 6, 1) <= row[1] < Date(2020, 6, 11)]
+        pages = table_file.pages_matching(predicates)
+        self.assertLess(len(pages), table_file.num_pages // 4)
+        # The pages are skipped, not the rows of the selected pages
+        rows = [row for _, row in table_file.scan(predicates=predicates)]
+        self.assertEqual(expected, [row for row in rows
+                                    if row in expected])
+        self.assertLess(len(rows), len(self.rows) // 4)
+        batches = table_file.scan_vectors(['id'], predicates=predicates)
+        self.assertEqual(len(rows), sum(b.num_rows for b in batches))
+        return predicates, expected
+
+    def test_heap_file(self):
+        schema = TableSchema('events', self.columns)
+        heap_file = self.file_mngr.create_file(schema)
+        rids = heap_file.insert_rows(self.rows)
+        predicates, expected = self._check_scans(heap_file)
+
+        # The zones are maintained by the inserts and updates
+        late = (5000, Date(2020, 6, 5), 1.0, 'late')
+        heap_file.insert(late)
+        rid = heap_file.update(rids[0], (0, Date(2020, 6, 2), 0.0,
+                                         'x' * 40))
+        rows = [row for _, row in heap_file.scan(predicates=predicates)]
+        self.assertIn(late, rows)
+        self.assertIn(heap_file.get(rid), rows)
+
+        # The released pages lose their zones
+        for rid in rids[1:2000]:
+            heap_file.delete(rid)
+        heap_file.vacuum()
+        self.assertEqual(heap_file.page_ids,
+                         heap_file.pages_matching([ZonePredicate(0, '>=',
+                                                                 0)]))
+
+    def test_columnar_file(self):
+        schema = TableSchema('events', self.columns, StorageType.COLUMNAR)
+        columnar_file = self.file_mngr.create_file(schema)
+        columnar_file.insert_rows(self.rows)
+        predicates, expected = self._check_scans(columnar_file)
+        late = (5000, Date(2020, 6, 5), 1.0, 'late')
+        columnar_file.insert(late)
+        rows = [row for _, row in columnar_file.scan(predicates=predicates)]
+        self.assertIn(late, rows)
+        # A cleared zone map is rebuilt by the next scan
+        columnar_file.zone_map.clear()
+        self.assertIn(late, [row for _, row in
+                             columnar_file.scan(predicates=predicates)])